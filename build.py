@@ -6,24 +6,77 @@ Simplified build script for ESP32-C3 only. Handles building and uploading
 firmware for different sensor configurations.
 
 Usage:
-    ./build.py <sensor_id> [clean] [upload]
+    ./build.py <sensor_id> [clean] [upload] [--force] [--no-size-gate]
+    ./build.py --all [clean] [-j N] [--force] [--no-size-gate]
+    ./build.py --envs <env1,env2,...> [clean] [-j N] [--force] [--no-size-gate]
 
 Examples:
     ./build.py sensor_temp             # Build only
     ./build.py sensor_temp upload      # Build and upload
     ./build.py sensor_temp clean       # Clean then build
     ./build.py sensor_temp clean upload # Clean, build, and upload
+    ./build.py --all -j 8              # Build every sensor, 8 at a time
+    ./build.py --envs sensor_1,sensor_2 # Build two sensors in parallel
 
 Arguments:
     sensor_id   - The sensor environment name from platformio.ini (e.g., sensor_temp)
     clean       - Optional: Clean build artifacts before building
-    upload      - Optional: Upload firmware after building
+    upload      - Optional: Upload firmware after building (single sensor only)
+    --all       - Build every [env:...] that extends env:esp32c3_base
+    --envs      - Build a comma-separated list of environments
+    -j N        - Number of parallel builds in fleet mode (default: CPU count)
+    --no-cache  - Don't use the shared object cache in .pio/objcache
+    --force     - Build even if the environment is up to date
+    --no-size-gate - Don't fail builds whose image or static RAM grew past the limit
+                     (their sizes are still recorded)
+
+In fleet mode each environment builds in its own .pio/build/<env> directory
+with its own generated headers, and its output goes to
+.pio/logs/<env>.log instead of the terminal.
+
+Compiled objects are shared between environments through a content-addressed
+cache (see tools/objcache.py), so objects that don't use per-sensor values
+are only compiled once for the whole fleet.
+
+Before building, every requested environment's credentials.ini section is
+checked (see tools/validate_config.py) and all problems are reported at once.
+
+Environments whose inputs (credentials section, platformio.ini sections,
+SDK config, sources, dependencies.lock and git commit) have not changed since
+their last successful build are skipped without running PlatformIO (see
+tools/build_plan.py). A clean build always builds.
+
+Every run that builds or uploads writes a JSON report to .pio/reports/ with
+each environment's phase timings, exit status, peak memory and artifact
+sizes, and appends to .pio/reports/build_history.csv (see
+tools/build_report.py).
+
+Each build's sizes and duration are also stored by git SHA in
+.pio/size_history.sqlite, and a build fails when its image or static RAM
+grew past the environment's limit against its baseline (see
+tools/size_store.py).
 """
 
+import io
+import sqlite3
 import sys
 import os
-import subprocess
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from get_git_info import get_git_info
+from tools.build_plan import BuildManifest, BuildPlanner
+from tools.build_report import LINK_MARKER, EnvReport, RunReport, run_monitored
+from tools.map_analyzer import analyze_build, format_diff, format_summary, headroom_warnings
+from tools.objcache import read_stats, format_stats
+from tools.sensor_config import BASE_ENV, ConfigError, load_project_config
+from tools.size_store import SizeStore, growth_limits
+from tools.validate_config import ERROR, validate_project
+
+BUILD_ROOT = os.path.join(".pio", "build")
+LOG_DIR = os.path.join(".pio", "logs")
+OBJCACHE_DIR = os.path.join(".pio", "objcache")
 
 
 def print_usage():
@@ -32,7 +85,7 @@ def print_usage():
     sys.exit(1)
 
 
-def run_command(command, description, capture_output=False):
+def run_command(command, description, capture_output=False, log_file=None, report=None, phase=None):
     """
     Run a shell command and handle errors.
 
@@ -40,68 +93,97 @@ def run_command(command, description, capture_output=False):
         command (str): The command to execute
         description (str): Description of what the command does
         capture_output (bool): If True, capture output; if False, stream to terminal
+        log_file (file): Optional open file; if given, banners and output go there
+                         instead of the terminal (used for parallel fleet builds)
+        report (EnvReport): Optional build report that receives the command's
+                            timing, exit status and peak RSS
+        phase (str): The report phase this command belongs to; "compile" is
+                     split into compile and link at PlatformIO's link step
 
     Returns:
         bool: True if command succeeded, False otherwise
     """
-    print(f"\n{'='*60}")
-    print(f"[INFO] {description}")
-    print(f"[CMD]  {command}")
-    print('='*60)
+    out = log_file if log_file is not None else sys.stdout
+    print(f"\n{'='*60}", file=out)
+    print(f"[INFO] {description}", file=out)
+    print(f"[CMD]  {command}", file=out)
+    print('='*60, file=out)
+    out.flush()
+
+    if log_file is not None:
+        # Send everything to the per-environment log so parallel builds don't interleave
+        result = run_monitored(command, log_file, {"link": LINK_MARKER})
+        captured = None
+    elif capture_output:
+        # Capture output for quiet operations (like clean)
+        captured = io.StringIO()
+        result = run_monitored(command, captured)
+    else:
+        # Stream output in real-time for build operations
+        result = run_monitored(command, sys.stdout, {"link": LINK_MARKER})
+        captured = None
 
-    try:
-        if capture_output:
-            # Capture output for quiet operations (like clean)
-            result = subprocess.run(command, shell=True, check=True,
-                                    capture_output=True, text=True)
-            if result.stdout:
-                print(result.stdout)
+    if report is not None:
+        if phase == "compile":
+            report.record_build(result)
         else:
-            # Stream output in real-time for build operations
-            result = subprocess.run(command, shell=True, check=True)
+            report.record_command(phase, result)
+            report.add_phase(phase, result.seconds)
 
+    if result.returncode == 0:
+        if captured is not None and captured.getvalue():
+            print(captured.getvalue())
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n[ERROR] Command failed with return code {e.returncode}")
-        if capture_output and hasattr(e, 'stdout') and e.stdout:
-            print(f"STDOUT: {e.stdout}")
-        if capture_output and hasattr(e, 'stderr') and e.stderr:
-            print(f"STDERR: {e.stderr}")
-        return False
+    print(f"\n[ERROR] Command failed with return code {result.returncode}", file=out)
+    if captured is not None and captured.getvalue():
+        print(f"STDOUT: {captured.getvalue()}", file=out)
+    return False
 
 
-def clean_build_artifacts(sensor_id):
+def clean_build_artifacts(sensor_id, log_file=None, report=None):
     """
     Clean build artifacts for the specified sensor.
 
     Args:
         sensor_id (str): The sensor environment name
+        log_file (file): Optional open file for output. When given (fleet mode),
+                         only this environment's build directory is removed so
+                         that other builds running in parallel are left alone.
+        report (EnvReport): Optional build report that receives the clean timing
     """
-    print(f"\n[INFO] Cleaning build artifacts for {sensor_id}")
+    start = time.monotonic()
+    out = log_file if log_file is not None else sys.stdout
+    print(f"\n[INFO] Cleaning build artifacts for {sensor_id}", file=out)
 
     # Clean PlatformIO build
     if not run_command(f"SENSOR_ENV={sensor_id} pio run -e {sensor_id} -t clean",
-                       "Cleaning PlatformIO build", capture_output=True):
-        print("[WARN] PlatformIO clean command failed, continuing...")
+                       "Cleaning PlatformIO build", capture_output=True, log_file=log_file):
+        print("[WARN] PlatformIO clean command failed, continuing...", file=out)
 
     # Remove build directories
-    dirs_to_remove = ["build", ".pio/build"]
+    if log_file is not None:
+        dirs_to_remove = [os.path.join(BUILD_ROOT, sensor_id)]
+    else:
+        dirs_to_remove = ["build", ".pio/build"]
     for dir_path in dirs_to_remove:
         if os.path.exists(dir_path):
-            print(f"[INFO] Removing directory: {dir_path}")
+            print(f"[INFO] Removing directory: {dir_path}", file=out)
             try:
                 shutil.rmtree(dir_path)
             except Exception as e:
-                print(f"[WARN] Failed to remove {dir_path}: {e}")
+                print(f"[WARN] Failed to remove {dir_path}: {e}", file=out)
 
     # Remove SDK config file
     sdkconfig_file = f"sdkconfig.{sensor_id}"
     if os.path.exists(sdkconfig_file):
-        print(f"[INFO] Removing SDK config: {sdkconfig_file}")
+        print(f"[INFO] Removing SDK config: {sdkconfig_file}", file=out)
         try:
             os.remove(sdkconfig_file)
         except Exception as e:
-            print(f"[WARN] Failed to remove {sdkconfig_file}: {e}")
+            print(f"[WARN] Failed to remove {sdkconfig_file}: {e}", file=out)
+
+    if report is not None:
+        report.add_phase("clean", time.monotonic() - start)
 
 
 def verify_environment(sensor_id):
@@ -114,27 +196,48 @@ def verify_environment(sensor_id):
     Returns:
         bool: True if environment exists, False otherwise
     """
-    platformio_ini = "platformio.ini"
-
-    if not os.path.exists(platformio_ini):
-        print(f"[ERROR] {platformio_ini} not found in current directory")
+    try:
+        project = load_project_config()
+    except ConfigError as e:
+        print(f"[ERROR] {e}")
         return False
 
-    # Simple check - look for the environment section
-    with open(platformio_ini, 'r') as f:
-        content = f.read()
-        if f"[env:{sensor_id}]" not in content:
-            print(f"[ERROR] Environment '[env:{sensor_id}]' not found in {platformio_ini}")
-            print(f"[INFO] Please check your platformio.ini for available environments")
-            return False
+    if sensor_id not in project.envs:
+        print(f"[ERROR] Environment '[env:{sensor_id}]' not found in platformio.ini")
+        print(f"[INFO] Please check your platformio.ini for available environments")
+        return False
 
     return True
 
 
-def setup_sdkconfig():
+def check_credentials(sensor_ids):
+    """
+    Validate the credentials.ini sections of the environments about to be
+    built, reporting every problem before any build starts.
+
+    Args:
+        sensor_ids (list): Environment names
+
+    Returns:
+        bool: True if there are no errors (warnings are printed but allowed)
+    """
+    diagnostics = validate_project(load_project_config(), sensor_ids)
+    for d in diagnostics:
+        print(f"[{'ERROR' if d.severity == ERROR else 'WARN'}] [{d.section}] {d.message}")
+    errors = sum(1 for d in diagnostics if d.severity == ERROR)
+    if errors:
+        print(f"[ERROR] {errors} problems in credentials.ini; see python -m tools.validate_config")
+    return errors == 0
+
+
+def setup_sdkconfig(run_report=None):
     """
     Copy the ESP32-C3 SDK config defaults file.
+
+    Args:
+        run_report (RunReport): Optional run report that receives the copy's timing
     """
+    start = time.monotonic()
     source_file = "sdkconfig.defaults_esp32c3_base"
     target_file = "sdkconfig.defaults"
 
@@ -149,34 +252,364 @@ def setup_sdkconfig():
     except Exception as e:
         print(f"[ERROR] Failed to copy SDK config: {e}")
         sys.exit(1)
+    if run_report is not None:
+        run_report.add_phase("sdkconfig", time.monotonic() - start)
 
 
-def build_firmware(sensor_id):
+def objcache_stats_path(sensor_id):
+    """Return the file object_cache.py writes an environment's cache counters to."""
+    return os.path.join(LOG_DIR, f"{sensor_id}.objcache.json")
+
+
+def build_firmware(sensor_id, log_file=None, use_cache=True, report=None, size_gate=True):
     """
     Build firmware for the specified sensor (without uploading).
 
     Args:
         sensor_id (str): The sensor environment name
+        log_file (file): Optional open file to receive the build output
+        use_cache (bool): Route compiles through the shared object cache
+        report (EnvReport): Optional build report that receives the compile and link timings
+        size_gate (bool): Fail the build if it grew past its size limits (see tools/size_store.py)
 
     Returns:
         bool: True if build succeeded, False otherwise
     """
     command = f"SENSOR_ENV={sensor_id} pio run -e {sensor_id}"
-    return run_command(command, f"Building firmware for {sensor_id}", capture_output=False)
+    if use_cache:
+        stats_path = objcache_stats_path(sensor_id)
+        if os.path.exists(stats_path):
+            os.remove(stats_path)
+        command = f"OBJCACHE_DIR={OBJCACHE_DIR} OBJCACHE_STATS={stats_path} {command}"
+    success = run_command(command, f"Building firmware for {sensor_id}", capture_output=False,
+                          log_file=log_file, report=report, phase="compile")
+    summary = analyze_memory(sensor_id, log_file=log_file, report=report) if success else None
+    if success:
+        success = check_size_gate(sensor_id, summary, log_file=log_file, report=report, enforce=size_gate)
+    if report is not None:
+        report.success = success
+        report.collect_artifacts(os.path.join(BUILD_ROOT, sensor_id))
+    return success
+
+
+def analyze_memory(sensor_id, log_file=None, report=None):
+    """
+    Summarize flash, IRAM and DRAM use from the build's linker map, show what
+    grew since the previous build, and warn when the factory partition or
+    DRAM is running out of room.
+
+    Args:
+        sensor_id (str): The sensor environment name
+        log_file (file): Optional open file for output
+        report (EnvReport): Optional build report that receives the summary and warnings
+
+    Returns:
+        dict: The map_analyzer summary, or None without a map
+    """
+    out = log_file if log_file is not None else sys.stdout
+    try:
+        analysis = analyze_build(os.path.join(BUILD_ROOT, sensor_id))
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Could not analyze the linker map for {sensor_id}: {e}", file=out)
+        return None
+    if analysis is None:
+        return None
+    summary, changes = analysis
+
+    print(f"\n[INFO] Memory use for {sensor_id} (python -m tools.map_analyzer for details):", file=out)
+    print(format_summary(summary), file=out)
+    grown = [change for change in changes if change[2] > change[1]]
+    if grown:
+        print("[INFO] Largest growth since the previous build:", file=out)
+        print(format_diff(grown, 5, "Symbol"), file=out)
+    warnings = headroom_warnings(summary)
+    for warning in warnings:
+        print(f"[WARN] {warning}", file=out)
+    if report is not None:
+        report.memory = summary
+        report.warnings.extend(warnings)
+    return summary
+
+
+def check_size_gate(sensor_id, summary, log_file=None, report=None, enforce=True):
+    """
+    Record the build in the size history and compare it with the
+    environment's baseline build.
+
+    Args:
+        sensor_id (str): The sensor environment name
+        summary (dict): The map_analyzer summary, or None without a map
+        log_file (file): Optional open file for output
+        report (EnvReport): Optional build report with the phase timings
+        enforce (bool): Compare with the baseline; False (--no-size-gate) only records the build
+
+    Returns:
+        bool: False if the image or static RAM grew past the environment's limits
+    """
+    out = log_file if log_file is not None else sys.stdout
+    commit, commit_time = get_git_info()
+    env = load_project_config().envs.get(sensor_id)
+    image = firmware_path(sensor_id)
+    try:
+        limits = growth_limits(env.options if env else {})
+        store = SizeStore()
+        try:
+            failures, warnings = store.gate(sensor_id, commit, commit_time, summary,
+                                            report.phases if report is not None else {},
+                                            report is not None and "clean" in report.phases, limits,
+                                            os.path.getsize(image) if os.path.exists(image) else None,
+                                            enforce)
+        finally:
+            store.close()
+    except (sqlite3.Error, ValueError) as e:
+        print(f"[WARN] Size history not updated for {sensor_id}: {e}", file=out)
+        return True
+
+    for warning in warnings:
+        print(f"[WARN] {warning}", file=out)
+    for failure in failures:
+        print(f"[ERROR] Size gate: {failure}", file=out)
+    if failures:
+        print("[INFO] Raise custom_max_image_growth/custom_max_ram_growth, pin a new baseline with "
+              f"python -m tools.size_store baseline {sensor_id}, or build with --no-size-gate", file=out)
+    if report is not None:
+        report.warnings.extend(warnings + [f"size gate: {failure}" for failure in failures])
+    return not failures
 
 
-def upload_firmware(sensor_id):
+def upload_firmware(sensor_id, report=None):
     """
     Upload firmware for the specified sensor (assumes already built).
 
     Args:
         sensor_id (str): The sensor environment name
+        report (EnvReport): Optional build report that receives the upload timing
 
     Returns:
         bool: True if upload succeeded, False otherwise
     """
     command = f"SENSOR_ENV={sensor_id} pio run -e {sensor_id} -t upload"
-    return run_command(command, f"Uploading firmware for {sensor_id}", capture_output=False)
+    success = run_command(command, f"Uploading firmware for {sensor_id}", capture_output=False,
+                          report=report, phase="upload")
+    if report is not None:
+        report.success = report.success is not False and success
+    return success
+
+
+def discover_sensor_envs():
+    """
+    Find every sensor environment that extends the ESP32-C3 base environment.
+
+    Returns:
+        list: Environment names in the order they appear in platformio.ini
+    """
+    return load_project_config().sensor_envs()
+
+
+def firmware_path(sensor_id):
+    """Return the path of the firmware image PlatformIO produces for an environment."""
+    return os.path.join(BUILD_ROOT, sensor_id, "firmware.bin")
+
+
+def plan_builds(sensor_ids, should_clean, force):
+    """
+    Work out which environments need building.
+
+    Args:
+        sensor_ids (list): Environment names requested
+        should_clean (bool): A clean build rebuilds every environment
+        force (bool): Build every environment even if it is up to date
+
+    Returns:
+        tuple: (manifest, fingerprints) where fingerprints maps each environment
+               to build to its input fingerprint, in the order requested
+    """
+    start = time.monotonic()
+    manifest = BuildManifest()
+    planner = BuildPlanner(manifest)
+    if should_clean or force:
+        reason = "clean build" if should_clean else "forced"
+        stale = [(sensor_id, reason, planner.fingerprint(sensor_id)) for sensor_id in sensor_ids]
+        current = []
+    else:
+        stale, current = planner.plan(sensor_ids, firmware_path)
+    elapsed_ms = (time.monotonic() - start) * 1000
+
+    for sensor_id in current:
+        print(f"[INFO] {sensor_id} is up to date (built {manifest.envs[sensor_id]['built_at']}), skipping")
+    for sensor_id, reason, _fingerprint in stale:
+        print(f"[INFO] {sensor_id} needs building: {reason}")
+    print(f"[INFO] {len(stale)} to build, {len(current)} up to date (planned in {elapsed_ms:.0f} ms)")
+    # Keep the digest cache even if nothing is built
+    manifest.save()
+    return manifest, {sensor_id: fingerprint for sensor_id, _reason, fingerprint in stale}
+
+
+def record_build(manifest, sensor_id, fingerprint, success):
+    """Record a build in the manifest, so an unchanged environment is skipped next time."""
+    image = firmware_path(sensor_id)
+    if success and os.path.exists(image):
+        manifest.record(sensor_id, fingerprint, image)
+    else:
+        manifest.forget(sensor_id)
+    manifest.save()
+
+
+def build_env_isolated(sensor_id, should_clean, use_cache=True, size_gate=True):
+    """
+    Clean (optionally) and build one environment with output captured to a log file.
+
+    This is the unit of work for fleet builds. It runs in a worker thread that
+    waits on its own `pio` process, so the pool size bounds the number of
+    concurrent compilers.
+
+    Args:
+        sensor_id (str): The sensor environment name
+        should_clean (bool): Whether to clean this environment first
+        use_cache (bool): Route compiles through the shared object cache
+        size_gate (bool): Fail the build if it grew past its size limits
+
+    Returns:
+        dict: Build result with env, success, seconds, size, cache stats, log path
+              and the environment's EnvReport
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{sensor_id}.log")
+    report = EnvReport(sensor_id)
+    report.log = log_path
+
+    start = time.monotonic()
+    with open(log_path, "w") as log_file:
+        if should_clean:
+            clean_build_artifacts(sensor_id, log_file=log_file, report=report)
+        success = build_firmware(sensor_id, log_file=log_file, use_cache=use_cache, report=report,
+                                 size_gate=size_gate)
+    elapsed = time.monotonic() - start
+
+    image = firmware_path(sensor_id)
+    size = os.path.getsize(image) if success and os.path.exists(image) else None
+
+    return {
+        "env": sensor_id,
+        "success": success,
+        "seconds": elapsed,
+        "size": size,
+        "cache": read_stats(objcache_stats_path(sensor_id)) if use_cache else None,
+        "log": log_path,
+        "report": report,
+    }
+
+
+def print_fleet_summary(results, wall_seconds):
+    """
+    Print a per-environment summary table for a fleet build.
+
+    Args:
+        results (list): Result dicts from build_env_isolated
+        wall_seconds (float): Total wall time for the whole fleet build
+    """
+    name_width = max([len("Environment")] + [len(r["env"]) for r in results])
+
+    print(f"\n{'='*60}")
+    print("FLEET BUILD SUMMARY")
+    print("="*60)
+    print(f"{'Environment':<{name_width}}  {'Status':<7}  {'Time':>8}  {'Size':>10}  {'Cache hits':>12}")
+    print(f"{'-'*name_width}  {'-'*7}  {'-'*8}  {'-'*10}  {'-'*12}")
+    for r in sorted(results, key=lambda r: r["env"]):
+        status = "OK" if r["success"] else "FAILED"
+        size = f"{r['size']:,}" if r["size"] is not None else "-"
+        cache = r.get("cache")
+        hits = f"{cache['hits']}/{cache['hits'] + cache['misses']}" if cache else "-"
+        print(f"{r['env']:<{name_width}}  {status:<7}  {r['seconds']:>7.1f}s  {size:>10}  {hits:>12}")
+
+    caches = [r["cache"] for r in results if r.get("cache")]
+    if caches:
+        total = {
+            "hits": sum(c["hits"] for c in caches),
+            "misses": sum(c["misses"] for c in caches),
+            "uncacheable": sum(c["uncacheable"] for c in caches),
+        }
+        lookups = total["hits"] + total["misses"]
+        total["hit_rate"] = total["hits"] / lookups if lookups else 0.0
+        print("-"*60)
+        print(f"Object cache: {format_stats(total)}")
+
+    failed = [r for r in results if not r["success"]]
+    print("-"*60)
+    print(f"{len(results) - len(failed)}/{len(results)} succeeded in {wall_seconds:.1f}s wall time")
+    for r in failed:
+        print(f"[ERROR] {r['env']} failed, see {r['log']}")
+    for r in results:
+        for warning in r["report"].warnings:
+            print(f"[WARN] {r['env']}: {warning}")
+    print("="*60)
+
+
+def build_fleet(sensor_ids, should_clean, jobs, use_cache=True, force=False, run_report=None, size_gate=True):
+    """
+    Build several sensor environments in a bounded pool of parallel builds.
+
+    Environments that are up to date are skipped unless should_clean or force is set.
+
+    Args:
+        sensor_ids (list): Environment names to build
+        should_clean (bool): Whether to clean each environment first
+        jobs (int): Maximum number of concurrent builds
+        use_cache (bool): Route compiles through the shared object cache
+        force (bool): Build environments that are up to date too
+        run_report (RunReport): Optional run report that receives each environment's report
+        size_gate (bool): Fail builds that grew past their size limits
+
+    Returns:
+        bool: True if every build succeeded, False otherwise
+    """
+    manifest, fingerprints = plan_builds(sensor_ids, should_clean, force)
+    if run_report is not None:
+        run_report.skipped = [sensor_id for sensor_id in sensor_ids if sensor_id not in fingerprints]
+    if not fingerprints:
+        print("[SUCCESS] Every environment is up to date")
+        return True
+    sensor_ids = list(fingerprints)
+
+    # A generated header left in include/ would shadow the per-environment copy
+    # that dynamic_envs.py writes into each build directory.
+    legacy_header = os.path.join("include", "generated_config.h")
+    if os.path.exists(legacy_header):
+        print(f"[INFO] Removing shared {legacy_header} (headers are generated per environment)")
+        os.remove(legacy_header)
+
+    print(f"[INFO] Building {len(sensor_ids)} environments with {jobs} parallel jobs")
+    print(f"[INFO] Build logs are written to .pio/logs/<env>.log")
+
+    results = []
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_env_isolated, sensor_id, should_clean, use_cache, size_gate): sensor_id
+                   for sensor_id in sensor_ids}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if run_report is not None:
+                run_report.add_env(result["report"])
+            record_build(manifest, result["env"], fingerprints[result["env"]], result["success"])
+            status = "OK" if result["success"] else "FAILED"
+            print(f"[INFO] [{len(results)}/{len(sensor_ids)}] {result['env']}: {status} "
+                  f"({result['seconds']:.1f}s)")
+    wall_seconds = time.monotonic() - start
+
+    print_fleet_summary(results, wall_seconds)
+    return all(r["success"] for r in results)
+
+
+def write_build_report(run_report):
+    """Write the run's build report, if anything was built or uploaded."""
+    if not run_report.envs:
+        return
+    try:
+        path = run_report.write()
+        print(f"[INFO] Build report: {path} (python -m tools.build_report)")
+    except OSError as e:
+        print(f"[WARN] Failed to write build report: {e}")
 
 
 def main():
@@ -185,21 +618,117 @@ def main():
     if len(sys.argv) < 2:
         print_usage()
 
-    sensor_id = sys.argv[1]
+    sensor_id = None
+    fleet_envs = None
+    build_all = False
+    jobs = os.cpu_count() or 1
 
     # Parse optional arguments
     should_clean = False
     should_upload = False
-
-    for arg in sys.argv[2:]:
+    use_cache = True
+    force = False
+    size_gate = True
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
         arg_lower = arg.lower()
         if arg_lower == "clean":
             should_clean = True
         elif arg_lower == "upload":
             should_upload = True
+        elif arg == "--all":
+            build_all = True
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg == "--force":
+            force = True
+        elif arg == "--no-size-gate":
+            size_gate = False
+        elif arg == "--envs" or arg.startswith("--envs="):
+            if "=" in arg:
+                value = arg.split("=", 1)[1]
+            elif i + 1 < len(args):
+                i += 1
+                value = args[i]
+            else:
+                print("[ERROR] --envs requires a comma-separated list of environments")
+                print_usage()
+            fleet_envs = [env.strip() for env in value.split(",") if env.strip()]
+        elif arg.startswith("-j"):
+            value = arg[2:]
+            if not value and i + 1 < len(args):
+                i += 1
+                value = args[i]
+            try:
+                jobs = int(value)
+            except ValueError:
+                print(f"[ERROR] Invalid job count: {value}")
+                print_usage()
+            if jobs < 1:
+                print("[ERROR] Job count must be at least 1")
+                print_usage()
+        elif sensor_id is None and not arg.startswith("-"):
+            sensor_id = arg
         else:
             print(f"[ERROR] Unknown argument: {arg}")
             print_usage()
+        i += 1
+
+    # Verify we're in the correct directory
+    if not os.path.exists("platformio.ini"):
+        print("[ERROR] platformio.ini not found. Please run this script from the project root directory.")
+        sys.exit(1)
+
+    if build_all or fleet_envs is not None:
+        if sensor_id is not None:
+            print("[ERROR] Give either a sensor_id or --all/--envs, not both")
+            print_usage()
+        if should_upload:
+            print("[ERROR] Upload is only supported when building a single sensor")
+            sys.exit(1)
+
+        if build_all:
+            try:
+                fleet_envs = discover_sensor_envs()
+            except ConfigError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+            if not fleet_envs:
+                print(f"[ERROR] No environments extending [{BASE_ENV}] found in platformio.ini")
+                sys.exit(1)
+
+        print("="*60)
+        print("ESP32-C3 Sensor Build Script (fleet mode)")
+        print("="*60)
+        print(f"Environments:   {', '.join(fleet_envs)}")
+        print(f"Clean build:    {'Yes' if should_clean else 'No'}")
+        print(f"Parallel jobs:  {jobs}")
+        print(f"Object cache:   {'Yes' if use_cache else 'No'}")
+        print(f"Force rebuild:  {'Yes' if force else 'No'}")
+        print(f"Size gate:      {'Yes' if size_gate else 'No'}")
+        print("="*60)
+
+        for env_name in fleet_envs:
+            if not verify_environment(env_name):
+                sys.exit(1)
+        if not check_credentials(fleet_envs):
+            sys.exit(1)
+
+        run_report = RunReport("fleet", {"clean": should_clean, "jobs": jobs, "object_cache": use_cache,
+                                         "force": force, "size_gate": size_gate})
+        setup_sdkconfig(run_report)
+
+        fleet_ok = build_fleet(fleet_envs, should_clean, jobs, use_cache, force, run_report, size_gate)
+        write_build_report(run_report)
+        if not fleet_ok:
+            sys.exit(1)
+        return
+
+    if sensor_id is None:
+        print_usage()
 
     print("="*60)
     print("ESP32-C3 Sensor Build Script")
@@ -207,38 +736,52 @@ def main():
     print(f"Sensor ID:      {sensor_id}")
     print(f"Clean build:    {'Yes' if should_clean else 'No'}")
     print(f"Upload:         {'Yes' if should_upload else 'No (build only)'}")
+    print(f"Object cache:   {'Yes' if use_cache else 'No'}")
+    print(f"Force rebuild:  {'Yes' if force else 'No'}")
+    print(f"Size gate:      {'Yes' if size_gate else 'No'}")
     print("="*60)
 
-    # Verify we're in the correct directory
-    if not os.path.exists("platformio.ini"):
-        print("[ERROR] platformio.ini not found. Please run this script from the project root directory.")
-        sys.exit(1)
-
     # Verify the environment exists
-    if not verify_environment(sensor_id):
+    if not verify_environment(sensor_id) or not check_credentials([sensor_id]):
         sys.exit(1)
 
-    # Clean build artifacts if requested
-    if should_clean:
-        clean_build_artifacts(sensor_id)
+    run_report = RunReport("single", {"clean": should_clean, "upload": should_upload, "object_cache": use_cache,
+                                      "force": force, "size_gate": size_gate})
+    env_report = EnvReport(sensor_id)
+    manifest, fingerprints = plan_builds([sensor_id], should_clean, force)
+    if sensor_id in fingerprints:
+        run_report.add_env(env_report)
 
-    # Setup SDK config for ESP32-C3
-    setup_sdkconfig()
+        # Clean build artifacts if requested
+        if should_clean:
+            clean_build_artifacts(sensor_id, report=env_report)
 
-    # Build firmware
-    print("\n" + "="*60)
-    print("BUILDING FIRMWARE")
-    print("="*60)
+        # Setup SDK config for ESP32-C3
+        setup_sdkconfig(run_report)
 
-    if not build_firmware(sensor_id):
-        print(f"\n{'='*60}")
-        print(f"[ERROR] Build failed for {sensor_id}")
+        # Build firmware
+        print("\n" + "="*60)
+        print("BUILDING FIRMWARE")
         print("="*60)
-        sys.exit(1)
 
-    print(f"\n{'='*60}")
-    print(f"[SUCCESS] Build completed successfully for {sensor_id}")
-    print("="*60)
+        build_ok = build_firmware(sensor_id, use_cache=use_cache, report=env_report, size_gate=size_gate)
+        record_build(manifest, sensor_id, fingerprints[sensor_id], build_ok)
+
+        if use_cache:
+            cache_stats = read_stats(objcache_stats_path(sensor_id))
+            if cache_stats:
+                print(f"\n[INFO] Object cache: {format_stats(cache_stats)}")
+
+        if not build_ok:
+            print(f"\n{'='*60}")
+            print(f"[ERROR] Build failed for {sensor_id}")
+            print("="*60)
+            write_build_report(run_report)
+            sys.exit(1)
+
+        print(f"\n{'='*60}")
+        print(f"[SUCCESS] Build completed successfully for {sensor_id}")
+        print("="*60)
 
     # Upload firmware if requested
     if should_upload:
@@ -246,7 +789,13 @@ def main():
         print("UPLOADING FIRMWARE")
         print("="*60)
 
-        if not upload_firmware(sensor_id):
+        if sensor_id not in fingerprints:
+            run_report.skipped = [sensor_id]
+            env_report.collect_artifacts(os.path.join(BUILD_ROOT, sensor_id))
+            run_report.add_env(env_report)
+        upload_ok = upload_firmware(sensor_id, report=env_report)
+        write_build_report(run_report)
+        if not upload_ok:
             print(f"\n{'='*60}")
             print(f"[ERROR] Upload failed for {sensor_id}")
             print("="*60)
@@ -256,6 +805,8 @@ def main():
         print(f"[SUCCESS] Upload completed successfully for {sensor_id}")
         print("="*60)
     else:
+        if sensor_id in fingerprints:
+            write_build_report(run_report)
         print("\n[INFO] Skipping upload (use 'upload' argument to upload)")
 
     print(f"\n{'='*60}")
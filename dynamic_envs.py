@@ -1,92 +1,197 @@
 import os
-import configparser
+import sys
 
 # Import the 'env' environment from the PlatformIO script context
 Import("env")
 
-# Get the SENSOR_ENV from the shell's environment variables.
-sensor_env = os.getenv("SENSOR_ENV", "sensor_1")
-
-if not sensor_env:
-    print("SENSOR_ENV not set. Skipping dynamic configuration.")
-    env.Exit(0)
-
-config_file = "credentials.ini"
-
-if not os.path.exists(config_file):
-    print(f"Error: Credentials file '{config_file}' not found.")
-    env.Exit(1)
-
-print(f"Loading credentials for '{sensor_env}' from {config_file}")
-
-config = configparser.ConfigParser()
-config.read(config_file)
-
-# Check for the required sections
-if not config.has_section("all_sensors"):
-    print(f"Error: Section '[all_sensors]' not found in {config_file}.")
+sys.path.insert(0, env.subst("$PROJECT_DIR"))
+from tools.generated_files import write_if_changed
+from tools.sensor_config import (CREDENTIALS_FILE, NVS_STRING_LIMITS, ConfigError, json_reading_problem,
+                                 load_project_config)
+
+# How the per-sensor values reach the firmware, from platformio.ini:
+#   custom_sensor_config = header  - #defines in generated_config.h (default)
+#   custom_sensor_config = object  - const symbols in generated_config.c plus a
+#                                    header of extern declarations that is the
+#                                    same for every sensor, so only one object
+#                                    differs between sensor builds
+#   custom_sensor_config = nvs     - no values in the image at all; they are
+#                                    read at boot from the sensor_cfg partition
+#                                    written by stamp_config.py
+config_mode = env.GetProjectOption("custom_sensor_config", "header").strip().lower()
+if config_mode not in ("header", "object", "nvs"):
+    print(f"Error: Unknown custom_sensor_config '{config_mode}' (expected 'header', 'object' or 'nvs').")
     env.Exit(1)
 
-if not config.has_section(sensor_env):
-    print(f"Error: Section '[{sensor_env}]' not found in {config_file}.")
-    env.Exit(1)
+def load_sensor_settings(sensor_env):
+    """Read one sensor's settings from credentials.ini, exiting the build on error."""
+    print(f"Loading credentials for '{sensor_env}' from {CREDENTIALS_FILE}")
+
+    # Parsed once and cached across the SCons processes of a fleet build
+    try:
+        return load_project_config(env.subst("$PROJECT_DIR")).sensor(sensor_env)._asdict()
+    except ConfigError as e:
+        print(f"Error: {e}")
+        env.Exit(1)
+
+
+def c_string(value):
+    """Quote a value as a C string literal."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def c_declaration(symbol, c_type, mutable=False):
+    qualifier = "" if mutable else "const "
+    if c_type == "char[]":
+        return f"{qualifier}char {symbol}[]"
+    return f"{qualifier}{c_type} {symbol}"
+
+
+if config_mode == "nvs":
+    print("Sensor settings will be loaded from the sensor_cfg partition at boot (custom_sensor_config = nvs)")
+    settings = None
+else:
+    # Get the SENSOR_ENV from the shell's environment variables.
+    sensor_env = os.getenv("SENSOR_ENV", "sensor_1")
+
+    if not sensor_env:
+        print("SENSOR_ENV not set. Skipping dynamic configuration.")
+        env.Exit(0)
+
+    settings = load_sensor_settings(sensor_env)
+    problem = json_reading_problem(settings["sensor_id"], settings["sensor_set_id"])
+    if problem:
+        print(f"Error: {problem} (in section [{sensor_env}])")
+        env.Exit(1)
+
+
+def setting_literal(key, c_type):
+    if settings is None:
+        return None
+    return c_string(settings[key]) if c_type == "char[]" else settings[key]
+
+
+# (macro, symbol, C type, settings key, literal) for every per-sensor setting
+config_values = [
+    (macro, symbol, c_type, key, setting_literal(key, c_type))
+    for macro, symbol, c_type, key in [
+        ("CONFIG_SENSOR_ID", "config_sensor_id", "char[]", "sensor_id"),
+        ("CONFIG_BEARER_TOKEN", "config_bearer_token", "char[]", "bearer_token"),
+        ("CONFIG_WIFI_CREDENTIALS", "config_wifi_credentials", "char[]", "wifi_credentials"),
+        ("CONFIG_API_URL", "config_api_url", "char[]", "url"),
+        ("CONFIG_SENSOR_SET", "config_sensor_set", "char[]", "sensor_set_id"),
+        ("CONFIG_SENSOR_SDA_GPIO", "config_sensor_sda_gpio", "int", "sda_gpio"),
+        ("CONFIG_SENSOR_SCL_GPIO", "config_sensor_scl_gpio", "int", "scl_gpio"),
+        ("CONFIG_BATTERY_ADC_GPIO", "config_battery_adc_gpio", "int", "battery_adc_gpio"),
+        ("CONFIG_NIGHT_START_HOUR", "config_night_start_hour", "int", "night_start_hour"),
+        ("CONFIG_NIGHT_END_HOUR", "config_night_end_hour", "int", "night_end_hour"),
+        ("CONFIG_LOCAL_TIMEZONE", "config_local_timezone", "char[]", "local_timezone"),
+    ]
+]
+
+if config_mode == "object":
+    header_content = """/**
+ * Auto-generated configuration declarations
+ * DO NOT EDIT MANUALLY
+ *
+ * The values are defined in generated_config.c. This header is the same for
+ * every sensor, so changing a sensor's settings only recompiles that file.
+ */
+#pragma once
 
-try:
-    url = config.get("all_sensors", "url")
-    sensor_set_id = config.get(sensor_env, "sensor_set_id")
-    sensor_id = config.get(sensor_env, "sensor_id")
-    bearer_token = config.get(sensor_env, "bearer_token")
-    wifi_cred = config.get(sensor_env, "wifi_credentials")
-    sda_gpio = config.get(sensor_env, "sda_gpio")
-    scl_gpio = config.get(sensor_env, "scl_gpio")
-
-    # Battery ADC GPIO - use -1 to indicate no battery circuit
-    battery_adc_gpio = config.get(sensor_env, "battery_adc_gpio", fallback="-1")
-
-    night_start_hour = config.get(sensor_env, "night_start_hour", fallback="22")
-    night_end_hour = config.get(sensor_env, "night_end_hour", fallback="4")
-    local_timezone = config.get(sensor_env, "local_timezone", fallback="CST6CDT,M3.2.0/2,M11.1.0/2")
-
-except configparser.NoOptionError as e:
-    print(f"Error: Missing configuration in section '[{sensor_env}]'. {e}")
-    env.Exit(1)
+"""
+    header_content += "".join(f"extern {c_declaration(symbol, c_type)};\n"
+                              for _macro, symbol, c_type, _key, _value in config_values)
+    header_content += "\n"
+    header_content += "".join(f"#define {macro} {symbol}\n"
+                              for macro, symbol, _c_type, _key, _value in config_values)
+elif config_mode == "nvs":
+    header_content = """/**
+ * Auto-generated configuration declarations
+ * DO NOT EDIT MANUALLY
+ *
+ * The values are defined in device_config.c and loaded at boot from the
+ * sensor_cfg partition, so one firmware image serves every sensor.
+ */
+#pragma once
 
-# Create a header file instead of using build flags
-header_content = f'''/**
+#define CONFIG_SENSOR_CONFIG_FROM_NVS 1
+
+"""
+    header_content += "".join(f"#define {macro}_MAX_LEN {NVS_STRING_LIMITS[key]}\n"
+                              for macro, _symbol, c_type, key, _value in config_values if c_type == "char[]")
+    header_content += "\n"
+    header_content += "".join(f"extern {c_declaration(symbol, c_type, mutable=True)};\n"
+                              for _macro, symbol, c_type, _key, _value in config_values)
+    header_content += "\n"
+    header_content += "".join(f"#define {macro} {symbol}\n"
+                              for macro, symbol, _c_type, _key, _value in config_values)
+else:
+    header_content = """/**
  * Auto-generated configuration file
  * DO NOT EDIT MANUALLY
  */
 #pragma once
 
-#define CONFIG_SENSOR_ID "{sensor_id}"
-#define CONFIG_BEARER_TOKEN "{bearer_token}"
-#define CONFIG_WIFI_CREDENTIALS "{wifi_cred}"
-#define CONFIG_API_URL "{url}"
-#define CONFIG_SENSOR_SET "{sensor_set_id}"
-#define CONFIG_SENSOR_SDA_GPIO {sda_gpio}
-#define CONFIG_SENSOR_SCL_GPIO {scl_gpio}
-#define CONFIG_BATTERY_ADC_GPIO {battery_adc_gpio}
-#define CONFIG_NIGHT_START_HOUR {night_start_hour}
-#define CONFIG_NIGHT_END_HOUR {night_end_hour}
-#define CONFIG_LOCAL_TIMEZONE "{local_timezone}"
+"""
+    header_content += "".join(f"#define {macro} {value}\n"
+                              for macro, _symbol, _c_type, _key, value in config_values)
 
+header_content += """
 // Helper macros
 #define CONFIG_HAS_BATTERY_CIRCUIT (CONFIG_BATTERY_ADC_GPIO >= 0)
-'''
-
-# Write the header file
-with open("include/generated_config.h", "w") as f:
-    f.write(header_content)
-
-print("Successfully generated configuration header:")
-print(f"  - SENSOR_ID: {sensor_id}")
-print(f"  - BEARER_TOKEN: redacted")
-print(f"  - WIFI_CREDENTIALS: redacted")
-print(f"  - API_URL: {url}")
-print(f"  - SENSOR_SET: {sensor_set_id}")
-print(f"  - SDA_GPIO: {sda_gpio}")
-print(f"  - SCL_GPIO: {scl_gpio}")
-print(f"  - BATTERY_ADC_GPIO: {battery_adc_gpio} ({'enabled' if int(battery_adc_gpio) >= 0 else 'disabled'})")
-print(f"  - NIGHT_START_HOUR: {night_start_hour}")
-print(f"  - NIGHT_END_HOUR: {night_end_hour}")
-print(f"  - LOCAL_TIMEZONE: {local_timezone}")
\ No newline at end of file
+"""
+
+# Write the header into this environment's build directory so that parallel
+# builds of different sensors never share (or overwrite) a generated header.
+# main/CMakeLists.txt adds this directory to the include path, and compiles
+# generated_config.c from it when present.
+# Files are only rewritten when their content changes, so an unchanged
+# configuration keeps its mtime and doesn't trigger a recompile.
+generated_dir = os.path.join(env.subst("$BUILD_DIR"), "generated")
+header_changed = write_if_changed(os.path.join(generated_dir, "generated_config.h"), header_content)
+
+source_path = os.path.join(generated_dir, "generated_config.c")
+if config_mode == "object":
+    source_content = """/**
+ * Auto-generated configuration values
+ * DO NOT EDIT MANUALLY
+ */
+#include "generated_config.h"
+
+"""
+    source_content += "".join(f"{c_declaration(symbol, c_type)} = {value};\n"
+                              for _macro, symbol, c_type, _key, value in config_values)
+    header_changed = write_if_changed(source_path, source_content) or header_changed
+else:
+    try:
+        os.remove(source_path)
+    except FileNotFoundError:
+        pass
+
+# A header left in include/ by older builds would shadow the per-environment one
+legacy_header = os.path.join("include", "generated_config.h")
+try:
+    os.remove(legacy_header)
+except FileNotFoundError:
+    pass
+
+if header_changed:
+    print(f"Successfully generated configuration ({config_mode} mode):")
+else:
+    print(f"Configuration unchanged ({config_mode} mode):")
+
+if settings is not None:
+    battery_adc_gpio = settings["battery_adc_gpio"]
+    print(f"  - SENSOR_ID: {settings['sensor_id']}")
+    print(f"  - BEARER_TOKEN: redacted")
+    print(f"  - WIFI_CREDENTIALS: redacted")
+    print(f"  - API_URL: {settings['url']}")
+    print(f"  - SENSOR_SET: {settings['sensor_set_id']}")
+    print(f"  - SDA_GPIO: {settings['sda_gpio']}")
+    print(f"  - SCL_GPIO: {settings['scl_gpio']}")
+    print(f"  - BATTERY_ADC_GPIO: {battery_adc_gpio} ({'enabled' if int(battery_adc_gpio) >= 0 else 'disabled'})")
+    print(f"  - NIGHT_START_HOUR: {settings['night_start_hour']}")
+    print(f"  - NIGHT_END_HOUR: {settings['night_end_hour']}")
+    print(f"  - LOCAL_TIMEZONE: {settings['local_timezone']}")
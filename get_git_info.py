@@ -10,8 +10,13 @@ Apache 2.0 Licensed as described in the file LICENSE
 """
 import subprocess
 import os
+import sys
 from datetime import datetime
 
+# PlatformIO runs pre-scripts from the project directory
+sys.path.insert(0, os.getcwd())
+from tools.generated_files import write_if_changed
+
 def get_git_info():
     try:
         # Get the full commit SHA and truncate to 7 characters
@@ -45,13 +50,12 @@ def generate_header():
 #define GIT_COMMIT_TIMESTAMP "{timestamp}"
 '''
 
-    # Ensure the include directory exists
-    os.makedirs('include', exist_ok=True)
-
-    with open('include/git_version.h', 'w') as f:
-        f.write(header_content)
-
-    print(f"Generated git version info: {sha} at {timestamp}")
+    # Only touch the header when the commit changes, so that no-op builds
+    # don't recompile everything that includes it
+    if write_if_changed(os.path.join('include', 'git_version.h'), header_content):
+        print(f"Generated git version info: {sha} at {timestamp}")
+    else:
+        print(f"Git version info unchanged: {sha} at {timestamp}")
 
 if __name__ == "__main__":
     generate_header()
\ No newline at end of file
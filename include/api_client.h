@@ -15,14 +15,29 @@
 #include "sensor_data.h"
 #include "esp_err.h"
 
+#define MAX_READINGS_PER_CHUNK 240  // Send at most 240 readings per HTTP request
+
+// Send readings as binary batches (batch_codec.h) instead of JSON. Off unless the
+// server is known to accept them: build with -DAPI_BINARY_BATCHES=1 to enable
+#ifndef API_BINARY_BATCHES
+#define API_BINARY_BATCHES 0
+#endif
+
 /**
  * @brief Send sensor data via API with chunked sending
  *
+ * Chunks are sent in order and sending stops at the first failed chunk.
+ * Every chunk before it has been acknowledged by the server, so a caller can
+ * resume from acked_count instead of sending those readings again.
+ *
  * @param readings Array of sensor readings
  * @param count Number of readings in the array
- * @return esp_err_t ESP_OK on success, error code on failure
+ * @param acked_count Output parameter - number of leading readings the server
+ *                    acknowledged (may be NULL)
+ * @return esp_err_t ESP_OK on success, ESP_ERR_INVALID_SIZE if no reading of a
+ *         chunk fits the JSON buffer (not worth retrying), error code on failure
  */
-esp_err_t api_send_sensor_data(const sensor_reading_t* readings, int count);
+esp_err_t api_send_sensor_data(const sensor_reading_t* readings, int count, int* acked_count);
 
 /**
  * @brief Send status update via API
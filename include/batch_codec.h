@@ -0,0 +1,40 @@
+/**
+* @file batch_codec.h
+ *
+ * Compact binary encoding of a batch of sensor readings.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "sensor_data.h"
+#include <stddef.h>
+#include <stdint.h>
+
+// Content-Type of an encoded batch; servers that do not accept it answer 415
+#define BATCH_CONTENT_TYPE "application/vnd.sunlight.batch"
+#define BATCH_FORMAT_VERSION 1
+
+// Worst case: header, two 255-byte ids, 10-byte varint deltas and two float columns
+#define BATCH_MAX_ENCODED_SIZE(count) (6 + 2 * 256 + 8 + 10 * (count) + 8 * (count))
+
+/**
+ * @brief Encode readings as one binary batch
+ *
+ * The layout is documented in tools/batch_codec.py, which is the reference
+ * decoder. chip_temp_f is not sent; the server derives it from chip_temp_c.
+ *
+ * @param readings Array of sensor readings
+ * @param count Number of readings (1 to 65535)
+ * @param sensor_id Sensor ID (at most 255 bytes)
+ * @param sensor_set_id Sensor set ID (at most 255 bytes)
+ * @param out Output buffer
+ * @param out_size Size of the output buffer
+ * @return size_t Encoded length, or 0 if the arguments are invalid or out is too small
+ */
+size_t batch_encode(const sensor_reading_t* readings, int count,
+                    const char* sensor_id, const char* sensor_set_id,
+                    uint8_t* out, size_t out_size);
@@ -51,7 +51,12 @@ bool send_readings_processor(sensor_reading_t* readings, int count);
 bool save_readings_processor(sensor_reading_t* readings, int count);
 
 /**
- * @brief Send all stored readings and clear storage on success
+ * @brief Send stored readings, oldest first, dropping each chunk once it is sent
+ *
+ * Readings are loaded, sent and dropped one chunk of MAX_READINGS_PER_CHUNK at
+ * a time, up to PERSISTENT_STORAGE_MAX_READINGS per call. Chunks the server
+ * acknowledged stay dropped when a later chunk fails, so a flaky link still
+ * drains storage over successive cycles.
  *
  * @return true if successful or no readings to send, false on error
  */
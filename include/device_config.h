@@ -0,0 +1,31 @@
+/**
+* @file device_config.h
+ *
+ * Per-sensor settings loaded at boot from the sensor_cfg NVS partition.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_err.h"
+
+// Partition and namespace written by stamp_config.py
+#define DEVICE_CONFIG_PARTITION "sensor_cfg"
+#define DEVICE_CONFIG_NAMESPACE "sensor_cfg"
+
+/**
+ * @brief Load the per-sensor settings
+ *
+ * Must be called after nvs_flash_init() and before anything reads a CONFIG_*
+ * sensor setting. In firmware built with custom_sensor_config = nvs the
+ * settings are read from the sensor_cfg partition; otherwise they are compiled
+ * in and this function does nothing.
+ *
+ * @return esp_err_t ESP_OK on success, error code if the partition is missing
+ *         or incomplete, or a required string is empty or an I2C pin unset
+ *         (app_main() then stops without starting the pipeline)
+ */
+esp_err_t device_config_load(void);
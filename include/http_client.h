@@ -13,6 +13,26 @@
 #pragma once
 
 #include "esp_err.h"
+#include <stdbool.h>
+#include <stddef.h>
+
+// An HTTP POST whose body is written in pieces (an esp_http_client handle)
+typedef struct esp_http_client *http_stream_t;
+
+/**
+ * @brief Start reusing one HTTP client for every request until http_session_end()
+ *
+ * Call once the network is up at the start of a send cycle. Requests in the
+ * session share a keep-alive connection, and the TLS session is saved so the
+ * first connection of the next session can resume it instead of running a
+ * full handshake. Outside a session every request uses its own connection.
+ */
+void http_session_begin(void);
+
+/**
+ * @brief Close the session's connection; call before WiFi is disconnected
+ */
+void http_session_end(void);
 
 /**
  * @brief Send a JSON payload via HTTP POST
@@ -21,4 +41,67 @@
  * @param bearer_token Authentication bearer token
  * @return esp_err_t ESP_OK on success, error code on failure
  */
-esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token);
\ No newline at end of file
+esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token);
+
+/**
+ * @brief Send a payload of any content type via HTTP POST
+ *
+ * @param payload Request body
+ * @param payload_size Length of the body in bytes
+ * @param content_type Value of the Content-Type header
+ * @param bearer_token Authentication bearer token
+ * @return esp_err_t ESP_OK on success, ESP_ERR_NOT_SUPPORTED if the server
+ *         rejected the content type (415), other error codes on failure
+ */
+esp_err_t http_send_payload(const void* payload, size_t payload_size,
+                            const char* content_type, const char* bearer_token);
+
+/**
+ * @brief HTTP status code of the most recent request
+ *
+ * @return int The status, or 0 if that request got no response
+ */
+int http_last_status_code(void);
+
+/**
+ * @brief Start a POST whose body is written in pieces
+ *
+ * Sends the headers with a Content-Length of content_length; exactly that
+ * many bytes must then be written with http_stream_write().
+ *
+ * @param content_length Total body length in bytes
+ * @param content_type Value of the Content-Type header
+ * @param bearer_token Authentication bearer token
+ * @param out_stream Receives the stream handle
+ * @return esp_err_t ESP_OK on success, error code on failure
+ */
+esp_err_t http_stream_open(size_t content_length, const char* content_type,
+                           const char* bearer_token, http_stream_t* out_stream);
+
+/**
+ * @brief Write the next piece of the request body
+ *
+ * @param stream Stream from http_stream_open()
+ * @param data Bytes to send
+ * @param len Number of bytes
+ * @return esp_err_t ESP_OK on success, ESP_FAIL if the connection failed
+ */
+esp_err_t http_stream_write(http_stream_t stream, const void* data, size_t len);
+
+/**
+ * @brief Read the response and release the stream
+ *
+ * Inside a session the connection stays open for the next request unless
+ * the server answered "Connection: close" or the response could not be read.
+ *
+ * @param stream Stream from http_stream_open()
+ * @return esp_err_t Same codes as http_send_payload()
+ */
+esp_err_t http_stream_finish(http_stream_t stream);
+
+/**
+ * @brief Release a stream without reading the response (after a write error)
+ *
+ * @param stream Stream from http_stream_open(), may be NULL
+ */
+void http_stream_abort(http_stream_t stream);
\ No newline at end of file
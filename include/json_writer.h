@@ -0,0 +1,92 @@
+/**
+* @file json_writer.h
+ *
+ * Streaming JSON writer into a caller-supplied fixed buffer.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "sensor_data.h"
+#include <stdbool.h>
+#include <stddef.h>
+
+#define JSON_WRITER_MAX_DEPTH 8
+
+// Room for one compact reading object, including a leading comma
+#define JSON_READING_MAX_SIZE 384
+
+/**
+ * @brief Writer state; output goes to buf, nothing is allocated
+ *
+ * Writing past the end of buf sets overflow and stops output; the length
+ * keeps counting so a caller can size a buffer by writing into a small one.
+ */
+typedef struct {
+    char *buf;
+    size_t size;
+    size_t len;
+    bool overflow;
+    int depth;
+    bool has_items[JSON_WRITER_MAX_DEPTH];
+} json_writer_t;
+
+/**
+ * @brief Start writing into buf
+ *
+ * @param w Writer
+ * @param buf Output buffer (may be NULL with size 0 to only measure)
+ * @param size Size of buf in bytes
+ */
+void json_writer_init(json_writer_t *w, char *buf, size_t size);
+
+/**
+ * @brief Discard the output written so far but keep the nesting state
+ *
+ * Used to stream a document in pieces: write a piece, send buf, clear.
+ */
+void json_writer_clear(json_writer_t *w);
+
+/**
+ * @brief Open an array or object, as a value of key inside an object or
+ *        as an element when key is NULL
+ */
+void json_writer_begin_array(json_writer_t *w, const char *key);
+void json_writer_begin_object(json_writer_t *w, const char *key);
+
+/**
+ * @brief Close the innermost array or object
+ */
+void json_writer_end_array(json_writer_t *w);
+void json_writer_end_object(json_writer_t *w);
+
+/**
+ * @brief Write an escaped string value
+ */
+void json_writer_add_string(json_writer_t *w, const char *key, const char *value);
+
+/**
+ * @brief Write a number formatted the way cJSON prints it
+ */
+void json_writer_add_number(json_writer_t *w, const char *key, double value);
+
+/**
+ * @brief Write one sensor reading object with the fields of the readings API
+ *
+ * @param w Writer, positioned inside an array
+ * @param reading Reading to write
+ * @param sensor_id Sensor ID
+ * @param sensor_set_id Sensor set ID
+ */
+void json_writer_add_reading(json_writer_t *w, const sensor_reading_t *reading,
+                             const char *sensor_id, const char *sensor_set_id);
+
+/**
+ * @brief Check that the output is complete and fit in the buffer
+ *
+ * @return true if nothing overflowed
+ */
+bool json_writer_ok(const json_writer_t *w);
@@ -1,7 +1,7 @@
 /**
 * @file persistent_storage.h
  *
- * Pure NVS operations for sensor readings.
+ * Ring-buffer storage for sensor readings in the raw "readings" partition.
  *
  * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
  *
@@ -14,13 +14,42 @@
 
 #include "sensor_data.h"
 #include "esp_err.h"
+#include <stdint.h>
 
 // 4 hours of readings at 15-second intervals = 4 * 60 * 60 / 15 = 960 readings
 #define PERSISTENT_STORAGE_MAX_READINGS 960
 
+// Label of the data partition that holds the ring (see partitions.csv)
+#define PERSISTENT_STORAGE_PARTITION "readings"
+
+/**
+ * @brief Storage usage and flash wear
+ *
+ * Erase counts are kept in the sector headers and survive reboots; the
+ * byte and reading counters cover the time since boot.
+ */
+typedef struct {
+    int capacity;                // Readings the ring holds before the oldest are overwritten
+    int count;                   // Readings stored and not yet dropped
+    int sectors;                 // Flash sectors in the ring
+    uint32_t min_erase_count;    // Least-erased sector
+    uint32_t max_erase_count;    // Most-erased sector
+    uint32_t total_erases;       // Sum of all sector erase counts
+    uint32_t erases;             // Sector erases since boot
+    uint32_t readings_saved;     // Readings appended since boot
+    uint32_t readings_overwritten; // Unsent readings lost to wrap-around since boot
+    uint32_t payload_bytes;      // sizeof(sensor_reading_t) for each reading saved
+    uint32_t flash_bytes;        // Bytes programmed: records, tail markers and sector headers
+    uint32_t corrupt_records;    // Records with a bad CRC found when mounting
+    float write_amplification;   // flash_bytes / payload_bytes, 0 before the first save
+} persistent_storage_stats_t;
+
 /**
  * @brief Initialize the persistent storage system
  *
+ * Mounts the ring, formatting it on first use, and moves any readings left
+ * by the old one-NVS-key-per-batch format into it.
+ *
  * @return esp_err_t ESP_OK on success
  */
 esp_err_t persistent_storage_init(void);
@@ -28,6 +57,9 @@ esp_err_t persistent_storage_init(void);
 /**
  * @brief Save readings to persistent storage
  *
+ * Appends to the ring. When it is full the oldest sector is erased, dropping
+ * the readings in it.
+ *
  * @param readings Array of sensor readings to save
  * @param count Number of readings in the array
  * @return esp_err_t ESP_OK on success
@@ -35,15 +67,25 @@ esp_err_t persistent_storage_init(void);
 esp_err_t persistent_storage_save_readings(const sensor_reading_t* readings, int count);
 
 /**
- * @brief Load all stored readings from persistent storage
+ * @brief Load the oldest stored readings, in the order they were saved
  *
- * @param readings Buffer to store loaded readings (must be at least PERSISTENT_STORAGE_MAX_READINGS size)
+ * Readings stay stored until dropped with persistent_storage_drop_oldest().
+ *
+ * @param readings Buffer to store loaded readings
  * @param max_count Maximum number of readings the buffer can hold
  * @param loaded_count Output parameter - actual number of readings loaded
  * @return esp_err_t ESP_OK on success
  */
 esp_err_t persistent_storage_load_readings(sensor_reading_t* readings, int max_count, int* loaded_count);
 
+/**
+ * @brief Drop the oldest stored readings, e.g. once they have been sent
+ *
+ * @param count Number of readings to drop (more than are stored drops all)
+ * @return esp_err_t ESP_OK on success
+ */
+esp_err_t persistent_storage_drop_oldest(int count);
+
 /**
  * @brief Clear all stored readings from persistent storage
  *
@@ -57,4 +99,12 @@ esp_err_t persistent_storage_clear_readings(void);
  * @param count Output parameter - number of stored readings
  * @return esp_err_t ESP_OK on success
  */
-esp_err_t persistent_storage_get_count(int* count);
\ No newline at end of file
+esp_err_t persistent_storage_get_count(int* count);
+
+/**
+ * @brief Get storage usage, flash wear and write amplification
+ *
+ * @param stats Output parameter
+ * @return esp_err_t ESP_OK on success
+ */
+esp_err_t persistent_storage_get_stats(persistent_storage_stats_t* stats);
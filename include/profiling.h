@@ -0,0 +1,122 @@
+/**
+* @file profiling.h
+ *
+ * Fixed-size timing counters for the phases that keep the radio on or the
+ * CPU busy, reported in the status payload instead of the serial log.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+/**
+ * @brief Timed phases; profile_name() and tools/profile_decode.py follow this order
+ */
+typedef enum {
+    PROFILE_I2C_READ,       // bh1750_read() in get_ambient_light()
+    PROFILE_JSON_BUILD,     // serializing a status or readings payload as JSON
+    PROFILE_HTTP_PERFORM,   // one HTTP request, connection through response
+    PROFILE_WIFI_CONNECT,   // WiFi start to getting an IP address
+    PROFILE_NVS_WRITE,      // NVS writes and commits, and readings ring writes
+    PROFILE_COUNT
+} profile_id_t;
+
+// Bucket 0 is under 256 us; each bucket after it is 4 times wider, and the last is unbounded
+#define PROFILE_BUCKETS 10
+#define PROFILE_FIRST_BUCKET_US 256
+
+// How often a sensor that sends no other status reports its counters
+#define PROFILE_REPORT_INTERVAL_S (6 * 3600)
+
+// Longest string profile_format() can write, including the terminator:
+// "p1 w=" and a uint32, then per phase " name=" and 3 numbers, 10 buckets and their separators
+#define PROFILE_FORMAT_MAX_SIZE 832
+
+/**
+ * @brief Counters for one phase
+ */
+typedef struct {
+    uint32_t count;
+    uint64_t total_us;
+    uint32_t max_us;
+    uint32_t buckets[PROFILE_BUCKETS];
+} profile_counter_t;
+
+/**
+ * @brief Counters for every phase since the last report
+ */
+typedef struct {
+    profile_counter_t counters[PROFILE_COUNT];
+    uint32_t window_s;  // seconds the counters cover
+} profile_snapshot_t;
+
+/**
+ * @brief Start timing a phase
+ *
+ * @return int64_t Start time to pass to profile_end()
+ */
+int64_t profile_begin(void);
+
+/**
+ * @brief Record the time since profile_begin() for a phase
+ *
+ * @param id Phase
+ * @param start_us Value returned by profile_begin()
+ */
+void profile_end(profile_id_t id, int64_t start_us);
+
+/**
+ * @brief Record one measured duration for a phase
+ *
+ * @param id Phase
+ * @param elapsed_us Duration in microseconds
+ */
+void profile_record(profile_id_t id, uint32_t elapsed_us);
+
+/**
+ * @brief Copy the counters
+ *
+ * @param[out] snapshot Counters since the last profile_consume()
+ * @return true if anything has been recorded
+ */
+bool profile_snapshot(profile_snapshot_t *snapshot);
+
+/**
+ * @brief Remove a reported snapshot from the counters
+ *
+ * Durations recorded after the snapshot was taken are kept for the next
+ * report. The maximums restart from zero.
+ *
+ * @param snapshot Snapshot that was sent
+ */
+void profile_consume(const profile_snapshot_t *snapshot);
+
+/**
+ * @brief Seconds since the counters were last reported (or since boot)
+ */
+uint32_t profile_window_seconds(void);
+
+/**
+ * @brief Format a snapshot for the status payload's "profile" field
+ *
+ * "p1 w=<window_s> <name>=<count>/<total_us>/<max_us>/<b0>.<b1>..." for
+ * each phase with a count, trailing empty buckets left out, e.g.
+ * "p1 w=300 i2c=20/5120/310/0.20 http=2/1834000/1102000/0.0.0.0.0.0.1.1".
+ *
+ * @param snapshot Counters to format
+ * @param buffer Output buffer
+ * @param buffer_size Size of buffer (PROFILE_FORMAT_MAX_SIZE always fits)
+ * @return size_t Length written, excluding the terminator
+ */
+size_t profile_format(const profile_snapshot_t *snapshot, char *buffer, size_t buffer_size);
+
+/**
+ * @brief Short name of a phase, as used by profile_format()
+ */
+const char *profile_name(profile_id_t id);
@@ -1,7 +1,7 @@
 /**
 * @file api_client.c
  *
- * High-level API client with JSON construction and chunked sending.
+ * High-level API client with payload construction and chunked sending.
  *
  * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
  *
@@ -13,102 +13,213 @@
 #include "api_client.h"
 #include "app_config.h"
 #include "http_client.h"
+#include "batch_codec.h"
+#include "json_writer.h"
 #include "adc_battery.h"
 #include "wifi_manager.h"
 #include "status_reporter.h"
+#include "profiling.h"
 #include "git_version.h"
 #include "cJSON.h"
 #include "esp_log.h"
 #include <time.h>
+#include <stdlib.h>
 #include <string.h>
 
 #define TAG "API_CLIENT"
-#define MAX_READINGS_PER_CHUNK 50  // Send at most 50 readings per HTTP request
+
+// Set once the server has refused a binary batch; JSON is used until reboot
+static bool s_binary_batches_rejected = false;
+
+// Counters added to the status being sent. Status updates are sent one at a
+// time (from app_main for a crash report, then only from the send task).
+static profile_snapshot_t s_profile;
+static char s_profile_text[PROFILE_FORMAT_MAX_SIZE];
 
 /**
- * @brief Internal function to send a single chunk of sensor data
+ * @brief Add the profiling counters to a status object
+ *
+ * @return true if counters were added; consume them once the status is sent
  */
-static esp_err_t send_sensor_data_chunk(const sensor_reading_t* readings, int count) {
-    if (readings == NULL || count <= 0) {
-        ESP_LOGE(TAG, "Invalid parameters for sensor data chunk send");
-        return ESP_ERR_INVALID_ARG;
+static bool add_profile_field(cJSON *status_object) {
+    if (!profile_snapshot(&s_profile)) {
+        return false;
     }
+    profile_format(&s_profile, s_profile_text, sizeof(s_profile_text));
+    return cJSON_AddStringToObject(status_object, "profile", s_profile_text) != NULL;
+}
 
-    cJSON *root_array = NULL;
-    char *json_payload = NULL;
-    esp_err_t result = ESP_FAIL;
-
-    // Log available heap before creating JSON
-    size_t free_heap_before = esp_get_free_heap_size();
-    ESP_LOGD(TAG, "Free heap before JSON creation: %zu bytes", free_heap_before);
+/**
+ * @brief Whether the server's answer to a binary batch means it does not take the format
+ *
+ * A server that does not know the content type may answer 400, 415, 422 or
+ * another 4xx. Authentication (401/403), timeout (408) and rate limiting
+ * (429) say nothing about the format.
+ */
+static bool binary_batch_refused(int status_code) {
+    return status_code >= 400 && status_code < 500 && status_code != 401 && status_code != 403 &&
+           status_code != 408 && status_code != 429;
+}
 
-    root_array = cJSON_CreateArray();
-    if (root_array == NULL) {
-        ESP_LOGE(TAG, "Failed to create JSON array");
+/**
+ * @brief Send a single chunk of sensor data as a compact binary batch
+ *
+ * @return esp_err_t ESP_ERR_NOT_SUPPORTED if the server refused the format,
+ *         ESP_ERR_INVALID_SIZE if the chunk could not be encoded (nothing was
+ *         sent), otherwise the result of the request
+ */
+static esp_err_t send_sensor_data_chunk_binary(const sensor_reading_t* readings, int count) {
+    size_t buffer_size = BATCH_MAX_ENCODED_SIZE(count);
+    uint8_t *payload = malloc(buffer_size);
+    if (payload == NULL) {
+        ESP_LOGE(TAG, "Failed to allocate %zu bytes for binary batch", buffer_size);
         return ESP_ERR_NO_MEM;
     }
 
-    int valid_readings = 0;
-    for (int i = 0; i < count; i++) {
-        cJSON *sensor_object = cJSON_CreateObject();
-        if (sensor_object == NULL) {
-            ESP_LOGE(TAG, "Failed to create sensor object for reading #%d (may be out of memory)", i);
-            break;
+    esp_err_t result;
+    size_t payload_size = batch_encode(readings, count, CONFIG_SENSOR_ID, CONFIG_SENSOR_SET,
+                                       payload, buffer_size);
+    if (payload_size == 0) {
+        ESP_LOGE(TAG, "Failed to encode binary batch of %d readings", count);
+        result = ESP_ERR_INVALID_SIZE;
+    } else {
+        ESP_LOGI(TAG, "Sending binary chunk with %d records (%zu bytes).", count, payload_size);
+        result = http_send_payload(payload, payload_size, BATCH_CONTENT_TYPE, CONFIG_BEARER_TOKEN);
+        if (result != ESP_OK && binary_batch_refused(http_last_status_code())) {
+            result = ESP_ERR_NOT_SUPPORTED;
         }
+    }
 
-        char timestamp_str[32];
-        strftime(timestamp_str, sizeof(timestamp_str), "%Y-%m-%dT%H:%M:%SZ", gmtime(&readings[i].timestamp));
-
-        if (cJSON_AddNumberToObject(sensor_object, "light_intensity", readings[i].lux) == NULL ||
-            cJSON_AddStringToObject(sensor_object, "sensor_id", CONFIG_SENSOR_ID) == NULL ||
-            cJSON_AddStringToObject(sensor_object, "timestamp", timestamp_str) == NULL ||
-            cJSON_AddStringToObject(sensor_object, "sensor_set_id", CONFIG_SENSOR_SET) == NULL ||
-            cJSON_AddNumberToObject(sensor_object, "chip_temp_c", readings[i].chip_temp_c) == NULL ||
-            cJSON_AddNumberToObject(sensor_object, "chip_temp_f", readings[i].chip_temp_f) == NULL) {
-            ESP_LOGE(TAG, "Failed to add fields to sensor object for reading #%d", i);
-            cJSON_Delete(sensor_object);
-            break;
-        }
+    free(payload);
+    return result;
+}
 
-        if (cJSON_AddItemToArray(root_array, sensor_object) == 0) {
-            ESP_LOGE(TAG, "Failed to add sensor object to array for reading #%d", i);
-            cJSON_Delete(sensor_object);
-            break;
-        }
+/**
+ * @brief Serialize one array element of the readings payload into the writer
+ *
+ * The opening bracket is written before the first reading and the closing
+ * bracket after the last, so concatenating every element gives the array. A
+ * reading that does not fit in the writer's buffer is left out and the
+ * brackets are still written.
+ *
+ * @return true if the reading was written
+ */
+static bool write_reading_element(json_writer_t *w, const sensor_reading_t* readings, int count, int i) {
+    if (i == 0) {
+        json_writer_begin_array(w, NULL);
+    }
+    json_writer_t before = *w;
+    json_writer_add_reading(w, &readings[i], CONFIG_SENSOR_ID, CONFIG_SENSOR_SET);
+    if (i == count - 1) {
+        json_writer_end_array(w);
+    }
+    if (!w->overflow) {
+        return true;
+    }
 
-        valid_readings++;
+    *w = before;
+    if (i == count - 1) {
+        json_writer_end_array(w);
     }
+    return false;
+}
 
-    if (valid_readings == 0) {
-        ESP_LOGW(TAG, "No valid readings to send in this chunk. Aborting HTTP POST.");
-        result = ESP_ERR_INVALID_ARG;
-        goto cleanup;
+/**
+ * @brief Send a single chunk of sensor data as a JSON array
+ *
+ * The array is streamed into the request body one reading at a time through
+ * a small stack buffer, so memory use does not grow with the chunk size. A
+ * first pass measures the body for the Content-Length header.
+ *
+ * A reading too large for the buffer is dropped rather than failing the
+ * chunk, which would be retried with the same data on every cycle.
+ *
+ * @return esp_err_t ESP_ERR_INVALID_SIZE if no reading fits (nothing was
+ *         sent; the IDs are too long, which validate_config.py and the build
+ *         reject), otherwise the result of the request
+ */
+static esp_err_t send_sensor_data_chunk_json(const sensor_reading_t* readings, int count) {
+    char piece[JSON_READING_MAX_SIZE];
+    json_writer_t w;
+
+    // The sizing pass serializes every reading, so it stands for the JSON build time
+    size_t payload_size = 0;
+    int dropped = 0;
+    int64_t build_start = profile_begin();
+    json_writer_init(&w, piece, sizeof(piece));
+    for (int i = 0; i < count; i++) {
+        json_writer_clear(&w);
+        if (!write_reading_element(&w, readings, count, i)) {
+            ESP_LOGE(TAG, "Dropping reading #%d: it does not fit in %zu bytes", i, sizeof(piece));
+            dropped++;
+        }
+        payload_size += w.len;
     }
+    profile_end(PROFILE_JSON_BUILD, build_start);
 
-    json_payload = cJSON_Print(root_array);
-    if (json_payload == NULL) {
-        ESP_LOGE(TAG, "Failed to print JSON payload (likely out of memory)");
-        result = ESP_ERR_NO_MEM;
-        goto cleanup;
+    if (dropped == count) {
+        ESP_LOGE(TAG, "No reading in the chunk fits; sensor_id or sensor_set_id is too long");
+        return ESP_ERR_INVALID_SIZE;
     }
 
-    ESP_LOGD(TAG, "JSON Payload for chunk: %s", json_payload);
-    ESP_LOGI(TAG, "Sending JSON chunk with %d records.", valid_readings);
+    ESP_LOGI(TAG, "Streaming JSON chunk with %d records (%zu bytes).", count - dropped, payload_size);
 
-    result = http_send_json_payload(json_payload, CONFIG_BEARER_TOKEN);
+    http_stream_t stream = NULL;
+    esp_err_t result = http_stream_open(payload_size, "application/json", CONFIG_BEARER_TOKEN, &stream);
+    if (result != ESP_OK) {
+        return result;
+    }
 
-cleanup:
-    if (root_array) cJSON_Delete(root_array);
-    if (json_payload) free(json_payload);
+    // Same buffer as the sizing pass, so the same readings are left out
+    json_writer_init(&w, piece, sizeof(piece));
+    for (int i = 0; i < count; i++) {
+        json_writer_clear(&w);
+        write_reading_element(&w, readings, count, i);
+        result = http_stream_write(stream, piece, w.len);
+        if (result != ESP_OK) {
+            http_stream_abort(stream);
+            return result;
+        }
+    }
 
-    // Log final heap status
-    size_t free_heap_final = esp_get_free_heap_size();
-    ESP_LOGD(TAG, "Free heap after cleanup: %zu bytes", free_heap_final);
+    return http_stream_finish(stream);
+}
 
-    return result;
+/**
+ * @brief Internal function to send a single chunk of sensor data
+ *
+ * With API_BINARY_BATCHES, prefers the binary batch format. If the server
+ * refuses it (see binary_batch_refused()) the chunk is resent as JSON and JSON
+ * is used for the rest of this boot. A chunk that cannot be encoded is sent
+ * as JSON without giving up on the format.
+ */
+static esp_err_t send_sensor_data_chunk(const sensor_reading_t* readings, int count) {
+    if (readings == NULL || count <= 0) {
+        ESP_LOGE(TAG, "Invalid parameters for sensor data chunk send");
+        return ESP_ERR_INVALID_ARG;
+    }
+
+    if (API_BINARY_BATCHES && !s_binary_batches_rejected) {
+        esp_err_t result = send_sensor_data_chunk_binary(readings, count);
+        if (result == ESP_ERR_INVALID_SIZE) {
+            ESP_LOGW(TAG, "Sending this chunk as JSON instead");
+        } else if (result == ESP_ERR_NOT_SUPPORTED) {
+            ESP_LOGW(TAG, "Server rejected binary batch (status %d) - falling back to JSON",
+                     http_last_status_code());
+            s_binary_batches_rejected = true;
+        } else {
+            return result;
+        }
+    }
+
+    return send_sensor_data_chunk_json(readings, count);
 }
 
-esp_err_t api_send_sensor_data(const sensor_reading_t* readings, int count) {
+esp_err_t api_send_sensor_data(const sensor_reading_t* readings, int count, int* acked_count) {
+    if (acked_count != NULL) {
+        *acked_count = 0;
+    }
+
     if (readings == NULL || count <= 0) {
         ESP_LOGE(TAG, "Invalid parameters for sensor data send");
         return ESP_ERR_INVALID_ARG;
@@ -136,12 +247,10 @@ esp_err_t api_send_sensor_data(const sensor_reading_t* readings, int count) {
         }
 
         sent_count += chunk_size;
-        ESP_LOGI(TAG, "Successfully sent chunk. Progress: %d/%d readings", sent_count, count);
-
-        // Small delay between chunks to let the system recover
-        if (sent_count < count) {
-            vTaskDelay(pdMS_TO_TICKS(1000)); // 1 second delay between chunks
+        if (acked_count != NULL) {
+            *acked_count = sent_count;
         }
+        ESP_LOGI(TAG, "Successfully sent chunk. Progress: %d/%d readings", sent_count, count);
     }
 
     if (final_result == ESP_OK) {
@@ -173,7 +282,9 @@ esp_err_t api_send_status_update(const char* status_message) {
     cJSON *root_array = NULL;
     char *json_payload = NULL;
     esp_err_t result = ESP_FAIL;
+    bool has_profile = false;
 
+    int64_t build_start = profile_begin();
     root_array = cJSON_CreateArray();
     if (root_array == NULL) {
         ESP_LOGE(TAG, "Failed to create JSON array - heap: %zu", esp_get_free_heap_size());
@@ -200,6 +311,7 @@ esp_err_t api_send_status_update(const char* status_message) {
     // Add the Git commit info to the status payload
     cJSON_AddStringToObject(status_object, "commit_sha", GIT_COMMIT_SHA);
     cJSON_AddStringToObject(status_object, "commit_timestamp", GIT_COMMIT_TIMESTAMP);
+    has_profile = add_profile_field(status_object);
 
     cJSON_AddItemToArray(root_array, status_object);
 
@@ -207,6 +319,7 @@ esp_err_t api_send_status_update(const char* status_message) {
     ESP_LOGI(TAG, "Heap before cJSON_Print: %zu bytes", heap_before_print);
 
     json_payload = cJSON_PrintUnformatted(root_array);
+    profile_end(PROFILE_JSON_BUILD, build_start);
 
     size_t json_length = strlen(json_payload);
     ESP_LOGI(TAG, "cJSON_PrintUnformatted returned %zu bytes (expected ~%zu)", json_length, strlen(enhanced_status) + 200);
@@ -239,6 +352,9 @@ esp_err_t api_send_status_update(const char* status_message) {
     ESP_LOGD(TAG, "Status JSON Payload: %s", json_payload);
 
     result = http_send_json_payload(json_payload, CONFIG_BEARER_TOKEN);
+    if (result == ESP_OK && has_profile) {
+        profile_consume(&s_profile);
+    }
 
 cleanup:
     if (root_array) cJSON_Delete(root_array);
@@ -263,7 +379,9 @@ esp_err_t api_send_battery_status(void) {
     cJSON *root_array = NULL;
     char *json_payload = NULL;
     esp_err_t result = ESP_FAIL;
+    bool has_profile = false;
 
+    int64_t build_start = profile_begin();
     root_array = cJSON_CreateArray();
     if (root_array == NULL) {
         ESP_LOGE(TAG, "Failed to create JSON array for battery status update");
@@ -304,6 +422,7 @@ esp_err_t api_send_battery_status(void) {
     // Add the Git commit info
     cJSON_AddStringToObject(status_object, "commit_sha", GIT_COMMIT_SHA);
     cJSON_AddStringToObject(status_object, "commit_timestamp", GIT_COMMIT_TIMESTAMP);
+    has_profile = add_profile_field(status_object);
 
     cJSON_AddItemToArray(root_array, status_object);
 
@@ -313,11 +432,15 @@ esp_err_t api_send_battery_status(void) {
         result = ESP_ERR_NO_MEM;
         goto cleanup;
     }
+    profile_end(PROFILE_JSON_BUILD, build_start);
 
     ESP_LOGI(TAG, "Sending battery status update");
     ESP_LOGD(TAG, "Battery Status JSON Payload: %s", json_payload);
 
     result = http_send_json_payload(json_payload, CONFIG_BEARER_TOKEN);
+    if (result == ESP_OK && has_profile) {
+        profile_consume(&s_profile);
+    }
 
 cleanup:
     if (root_array) cJSON_Delete(root_array);
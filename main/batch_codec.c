@@ -0,0 +1,97 @@
+/**
+* @file batch_codec.c
+ *
+ * Compact binary encoding of a batch of sensor readings.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "batch_codec.h"
+#include <string.h>
+
+typedef struct {
+    uint8_t* data;
+    size_t size;
+    size_t pos;
+    int overflow;
+} batch_writer_t;
+
+static void put_bytes(batch_writer_t* w, const void* src, size_t len) {
+    if (w->overflow || len > w->size - w->pos) {
+        w->overflow = 1;
+        return;
+    }
+    memcpy(w->data + w->pos, src, len);
+    w->pos += len;
+}
+
+static void put_u8(batch_writer_t* w, uint8_t value) {
+    put_bytes(w, &value, 1);
+}
+
+static void put_le(batch_writer_t* w, uint64_t value, int len) {
+    uint8_t bytes[8];
+    for (int i = 0; i < len; i++) {
+        bytes[i] = (uint8_t)(value >> (8 * i));
+    }
+    put_bytes(w, bytes, len);
+}
+
+static void put_varint(batch_writer_t* w, int64_t value) {
+    // Zigzag so that small negative deltas stay small
+    uint64_t zigzag = ((uint64_t)value << 1) ^ (uint64_t)(value >> 63);
+    while (zigzag >= 0x80) {
+        put_u8(w, (uint8_t)(zigzag | 0x80));
+        zigzag >>= 7;
+    }
+    put_u8(w, (uint8_t)zigzag);
+}
+
+static void put_float(batch_writer_t* w, float value) {
+    uint32_t bits;
+    memcpy(&bits, &value, sizeof(bits));
+    put_le(w, bits, 4);
+}
+
+static int put_id(batch_writer_t* w, const char* id) {
+    size_t len = strlen(id);
+    if (len > 255) {
+        return 0;
+    }
+    put_u8(w, (uint8_t)len);
+    put_bytes(w, id, len);
+    return 1;
+}
+
+size_t batch_encode(const sensor_reading_t* readings, int count,
+                    const char* sensor_id, const char* sensor_set_id,
+                    uint8_t* out, size_t out_size) {
+    if (readings == NULL || count <= 0 || count > 0xFFFF ||
+        sensor_id == NULL || sensor_set_id == NULL || out == NULL) {
+        return 0;
+    }
+
+    batch_writer_t w = { .data = out, .size = out_size, .pos = 0, .overflow = 0 };
+
+    put_bytes(&w, "SLB", 3);
+    put_u8(&w, BATCH_FORMAT_VERSION);
+    put_le(&w, (uint64_t)count, 2);
+    if (!put_id(&w, sensor_id) || !put_id(&w, sensor_set_id)) {
+        return 0;
+    }
+
+    put_le(&w, (uint64_t)(int64_t)readings[0].timestamp, 8);
+    for (int i = 1; i < count; i++) {
+        put_varint(&w, (int64_t)readings[i].timestamp - (int64_t)readings[i - 1].timestamp);
+    }
+    for (int i = 0; i < count; i++) {
+        put_float(&w, readings[i].lux);
+    }
+    for (int i = 0; i < count; i++) {
+        put_float(&w, readings[i].chip_temp_c);
+    }
+
+    return w.overflow ? 0 : w.pos;
+}
@@ -86,10 +86,15 @@ bool data_processor_init(void) {
 
     ESP_LOGI(TAG, "Data processor initialized successfully");
 
-    int stored_count = 0;
-    err = persistent_storage_get_count(&stored_count);
-    if (err == ESP_OK && stored_count > 0) {
-        ESP_LOGI(TAG, "Found %d stored readings from previous session", stored_count);
+    persistent_storage_stats_t stats;
+    err = persistent_storage_get_stats(&stats);
+    if (err == ESP_OK) {
+        if (stats.count > 0) {
+            ESP_LOGI(TAG, "Found %d stored readings from previous session", stats.count);
+        }
+        ESP_LOGI(TAG, "Storage: %d/%d readings, sector erases %u..%u over %d sectors",
+                 stats.count, stats.capacity, (unsigned)stats.min_erase_count,
+                 (unsigned)stats.max_erase_count, stats.sectors);
     }
 
     return true;
@@ -123,37 +128,34 @@ bool process_buffered_readings(app_context_t *context, bool (*processor)(sensor_
     return success;
 }
 
-bool send_readings_processor(sensor_reading_t* readings, int count) {
-    ESP_LOGI(TAG, "Sending %d batched readings.", count);
-
-    // Create filtered readings
-    int filtered_count;
-    sensor_reading_t* filtered_readings = create_filtered_readings(readings, count, &filtered_count);
-
-    if (filtered_readings == NULL || filtered_count == 0) {
-        ESP_LOGW(TAG, "No valid readings to send after timestamp filtering");
-        if (filtered_readings) free(filtered_readings);
-        return true; // No valid readings is considered success
-    }
-
-    bool success = false;
+/**
+ * @brief Send readings, retrying failed chunks
+ *
+ * A retry resumes from the first chunk the server has not acknowledged, so
+ * chunks that already went through are not sent again.
+ */
+static bool send_with_retries(const sensor_reading_t* readings, int count) {
+    int sent = 0;
     for (int attempt = 1; attempt <= MAX_HTTP_RETRY_ATTEMPTS; attempt++) {
-        ESP_LOGI(TAG, "Sensor data send attempt %d/%d (%d filtered readings)",
-                 attempt, MAX_HTTP_RETRY_ATTEMPTS, filtered_count);
+        ESP_LOGI(TAG, "Sensor data send attempt %d/%d (%d of %d readings left)",
+                 attempt, MAX_HTTP_RETRY_ATTEMPTS, count - sent, count);
 
-        esp_err_t result = api_send_sensor_data(filtered_readings, filtered_count);
+        int acked = 0;
+        esp_err_t result = api_send_sensor_data(&readings[sent], count - sent, &acked);
+        sent += acked;
 
         if (result == ESP_OK) {
             ESP_LOGI(TAG, "Sensor data sent successfully on attempt %d", attempt);
-            success = true;
-            break;
+            return true;
         }
 
-        ESP_LOGE(TAG, "Sensor data attempt %d failed: %s", attempt, esp_err_to_name(result));
+        ESP_LOGE(TAG, "Sensor data attempt %d failed after %d/%d readings: %s",
+                 attempt, sent, count, esp_err_to_name(result));
 
-        if (result == ESP_ERR_INVALID_ARG || result == ESP_ERR_NOT_ALLOWED) {
+        // ESP_ERR_INVALID_SIZE: the readings cannot be serialized, so resending cannot help
+        if (result == ESP_ERR_INVALID_ARG || result == ESP_ERR_NOT_ALLOWED || result == ESP_ERR_INVALID_SIZE) {
             ESP_LOGE(TAG, "Non-retryable error, aborting retry attempts");
-            break;
+            return false;
         }
 
         if (attempt < MAX_HTTP_RETRY_ATTEMPTS) {
@@ -162,12 +164,26 @@ bool send_readings_processor(sensor_reading_t* readings, int count) {
         }
     }
 
-    free(filtered_readings);
+    ESP_LOGE(TAG, "Sensor data send failed after %d attempts", MAX_HTTP_RETRY_ATTEMPTS);
+    return false;
+}
+
+bool send_readings_processor(sensor_reading_t* readings, int count) {
+    ESP_LOGI(TAG, "Sending %d batched readings.", count);
+
+    // Create filtered readings
+    int filtered_count;
+    sensor_reading_t* filtered_readings = create_filtered_readings(readings, count, &filtered_count);
 
-    if (!success) {
-        ESP_LOGE(TAG, "Sensor data send failed after %d attempts", MAX_HTTP_RETRY_ATTEMPTS);
+    if (filtered_readings == NULL || filtered_count == 0) {
+        ESP_LOGW(TAG, "No valid readings to send after timestamp filtering");
+        if (filtered_readings) free(filtered_readings);
+        return true; // No valid readings is considered success
     }
 
+    bool success = send_with_retries(filtered_readings, filtered_count);
+
+    free(filtered_readings);
     return success;
 }
 
@@ -197,46 +213,55 @@ bool send_all_stored_readings(void) {
         return true;
     }
 
-    // Allocate memory for stored readings
-    sensor_reading_t *stored_readings = malloc(PERSISTENT_STORAGE_MAX_READINGS * sizeof(sensor_reading_t));
-    if (stored_readings == NULL) {
+    // Storage is drained one chunk at a time so only a chunk is held in memory
+    sensor_reading_t *chunk = malloc(MAX_READINGS_PER_CHUNK * sizeof(sensor_reading_t));
+    if (chunk == NULL) {
         ESP_LOGE(TAG, "Failed to allocate memory for stored readings");
         return false;
     }
 
-    // Load stored readings
-    int loaded_count = 0;
-    err = persistent_storage_load_readings(stored_readings, PERSISTENT_STORAGE_MAX_READINGS, &loaded_count);
-    if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to load stored readings: %s", esp_err_to_name(err));
-        free(stored_readings);
-        return false;
-    }
+    ESP_LOGI(TAG, "Attempting to send %d stored readings", stored_count);
 
-    if (loaded_count == 0) {
-        ESP_LOGI(TAG, "No stored readings loaded");
-        free(stored_readings);
-        return true;
-    }
+    bool success = true;
+    int drained = 0;
+    while (drained < PERSISTENT_STORAGE_MAX_READINGS) {
+        int max_count = PERSISTENT_STORAGE_MAX_READINGS - drained;
+        if (max_count > MAX_READINGS_PER_CHUNK) {
+            max_count = MAX_READINGS_PER_CHUNK;
+        }
 
-    ESP_LOGI(TAG, "Attempting to send %d stored readings", loaded_count);
+        int loaded_count = 0;
+        err = persistent_storage_load_readings(chunk, max_count, &loaded_count);
+        if (err != ESP_OK) {
+            ESP_LOGE(TAG, "Failed to load stored readings: %s", esp_err_to_name(err));
+            success = false;
+            break;
+        }
+        if (loaded_count == 0) {
+            break;
+        }
 
-    // Send the stored readings
-    bool send_success = send_readings_processor(stored_readings, loaded_count);
+        if (!send_readings_processor(chunk, loaded_count)) {
+            ESP_LOGE(TAG, "Failed to send stored readings; %d sent, the rest are kept for next cycle", drained);
+            success = false;
+            break;
+        }
 
-    if (send_success) {
-        // Clear stored readings after successful send
-        err = persistent_storage_clear_readings();
+        // Drop each chunk as soon as the server has it, so a failure later in
+        // the drain (or a reset) does not send it again
+        err = persistent_storage_drop_oldest(loaded_count);
         if (err != ESP_OK) {
-            ESP_LOGE(TAG, "Failed to clear stored readings after send: %s", esp_err_to_name(err));
-            free(stored_readings);
-            return false;
+            ESP_LOGE(TAG, "Failed to drop stored readings after send: %s", esp_err_to_name(err));
+            success = false;
+            break;
         }
-        ESP_LOGI(TAG, "Successfully sent and cleared %d stored readings", loaded_count);
-    } else {
-        ESP_LOGE(TAG, "Failed to send stored readings");
+        drained += loaded_count;
     }
 
-    free(stored_readings);
-    return send_success;
+    if (success) {
+        ESP_LOGI(TAG, "Successfully sent and dropped %d stored readings", drained);
+    }
+
+    free(chunk);
+    return success;
 }
\ No newline at end of file
@@ -0,0 +1,139 @@
+/**
+* @file device_config.c
+ *
+ * Per-sensor settings loaded at boot from the sensor_cfg NVS partition.
+ *
+ * A generic firmware image built with custom_sensor_config = nvs carries no
+ * sensor identity. stamp_config.py writes each sensor's settings into a small
+ * NVS partition image that is flashed next to the shared firmware, and this
+ * module copies them into the CONFIG_* storage declared by generated_config.h.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "device_config.h"
+#include "app_config.h"
+#include "nvs_flash.h"
+#include "nvs.h"
+#include "esp_log.h"
+#include <stdbool.h>
+#include <string.h>
+
+#define TAG "DEVICE_CONFIG"
+
+#if CONFIG_SENSOR_CONFIG_FROM_NVS
+
+char config_sensor_id[CONFIG_SENSOR_ID_MAX_LEN];
+char config_bearer_token[CONFIG_BEARER_TOKEN_MAX_LEN];
+char config_wifi_credentials[CONFIG_WIFI_CREDENTIALS_MAX_LEN];
+char config_api_url[CONFIG_API_URL_MAX_LEN];
+char config_sensor_set[CONFIG_SENSOR_SET_MAX_LEN];
+int config_sensor_sda_gpio = -1;
+int config_sensor_scl_gpio = -1;
+int config_battery_adc_gpio = -1;
+int config_night_start_hour = 22;
+int config_night_end_hour = 4;
+char config_local_timezone[CONFIG_LOCAL_TIMEZONE_MAX_LEN] = "CST6CDT,M3.2.0/2,M11.1.0/2";
+
+typedef struct {
+    const char *key;
+    char *value;
+    size_t size;
+    bool required;
+} string_setting_t;
+
+typedef struct {
+    const char *key;
+    int *value;
+    bool required;
+} int_setting_t;
+
+// Keys must match stamp_config.py
+static const string_setting_t s_string_settings[] = {
+    { "sensor_id",     config_sensor_id,        sizeof(config_sensor_id),        true },
+    { "bearer_token",  config_bearer_token,     sizeof(config_bearer_token),     true },
+    { "wifi_creds",    config_wifi_credentials, sizeof(config_wifi_credentials), true },
+    { "api_url",       config_api_url,          sizeof(config_api_url),          true },
+    { "sensor_set_id", config_sensor_set,       sizeof(config_sensor_set),       true },
+    { "local_tz",      config_local_timezone,   sizeof(config_local_timezone),   false },
+};
+
+static const int_setting_t s_int_settings[] = {
+    { "sda_gpio",     &config_sensor_sda_gpio,  true },
+    { "scl_gpio",     &config_sensor_scl_gpio,  true },
+    { "battery_gpio", &config_battery_adc_gpio, false },
+    { "night_start",  &config_night_start_hour, false },
+    { "night_end",    &config_night_end_hour,   false },
+};
+
+esp_err_t device_config_load(void) {
+    esp_err_t err = nvs_flash_init_partition(DEVICE_CONFIG_PARTITION);
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to initialize '%s' partition: %s", DEVICE_CONFIG_PARTITION, esp_err_to_name(err));
+        return err;
+    }
+
+    nvs_handle_t handle;
+    err = nvs_open_from_partition(DEVICE_CONFIG_PARTITION, DEVICE_CONFIG_NAMESPACE, NVS_READONLY, &handle);
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "No sensor settings found (was sensor_cfg flashed?): %s", esp_err_to_name(err));
+        return err;
+    }
+
+    esp_err_t result = ESP_OK;
+
+    for (size_t i = 0; i < sizeof(s_string_settings) / sizeof(s_string_settings[0]); i++) {
+        const string_setting_t *setting = &s_string_settings[i];
+        size_t length = setting->size;
+        err = nvs_get_str(handle, setting->key, setting->value, &length);
+        if (err == ESP_ERR_NVS_NOT_FOUND && !setting->required) {
+            continue; // Keep the default
+        }
+        if (err != ESP_OK) {
+            ESP_LOGE(TAG, "Failed to read '%s': %s", setting->key, esp_err_to_name(err));
+            result = err;
+        } else if (setting->required && setting->value[0] == '\0') {
+            ESP_LOGE(TAG, "'%s' is empty", setting->key);
+            result = ESP_ERR_INVALID_ARG;
+        }
+    }
+
+    for (size_t i = 0; i < sizeof(s_int_settings) / sizeof(s_int_settings[0]); i++) {
+        const int_setting_t *setting = &s_int_settings[i];
+        int32_t value = 0;
+        err = nvs_get_i32(handle, setting->key, &value);
+        if (err == ESP_ERR_NVS_NOT_FOUND && !setting->required) {
+            continue; // Keep the default
+        }
+        if (err != ESP_OK) {
+            ESP_LOGE(TAG, "Failed to read '%s': %s", setting->key, esp_err_to_name(err));
+            result = err;
+            continue;
+        }
+        *setting->value = (int)value;
+    }
+
+    nvs_close(handle);
+
+    if (config_sensor_sda_gpio < 0 || config_sensor_scl_gpio < 0) {
+        ESP_LOGE(TAG, "I2C pins not set (sda %d, scl %d)", config_sensor_sda_gpio, config_sensor_scl_gpio);
+        result = ESP_ERR_INVALID_ARG;
+    }
+
+    if (result == ESP_OK) {
+        ESP_LOGI(TAG, "Loaded settings for sensor '%s' (set '%s') from '%s' partition",
+                 config_sensor_id, config_sensor_set, DEVICE_CONFIG_PARTITION);
+    }
+    return result;
+}
+
+#else
+
+esp_err_t device_config_load(void) {
+    // Settings are compiled into this image by dynamic_envs.py
+    return ESP_OK;
+}
+
+#endif
@@ -14,13 +14,26 @@
 #include "app_config.h"
 #include "esp_http_client.h"
 #include "esp_log.h"
+#include "profiling.h"
 #include <string.h>
+#include <strings.h>
 
 #define TAG "HTTP_CLIENT"
 
 extern const uint8_t _binary_server_cert_pem_start[];
 extern const uint8_t _binary_server_cert_pem_end[];
 
+// Client shared by the requests between http_session_begin() and http_session_end()
+static esp_http_client_handle_t s_session_client = NULL;
+static bool s_session_active = false;
+static int s_session_requests = 0;
+// When the open streamed request started; only one is open at a time
+static int64_t s_stream_start_us = 0;
+// Status of the most recent request, 0 until it gets a response
+static int s_last_status_code = 0;
+// Cleared when the response to the open request says "Connection: close"
+static bool s_response_keep_alive = true;
+
 /**
  * @brief HTTP event handler for logging
  */
@@ -38,6 +51,9 @@ static esp_err_t http_event_handler(esp_http_client_event_t *evt)
         break;
     case HTTP_EVENT_ON_HEADER:
         ESP_LOGD(TAG, "HTTP_EVENT_ON_HEADER, key=%s, value=%s", evt->header_key, evt->header_value);
+        if (strcasecmp(evt->header_key, "Connection") == 0 && strcasecmp(evt->header_value, "close") == 0) {
+            s_response_keep_alive = false;
+        }
         break;
     case HTTP_EVENT_ON_DATA:
         ESP_LOGD(TAG, "HTTP_EVENT_ON_DATA, len=%d", evt->data_len);
@@ -55,20 +71,65 @@ static esp_err_t http_event_handler(esp_http_client_event_t *evt)
     return ESP_OK;
 }
 
-esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token) {
-    esp_http_client_handle_t client = NULL;
-    esp_err_t err = ESP_FAIL;
+/**
+ * @brief Map an HTTP status code to an ESP error code
+ */
+static esp_err_t http_status_to_err(int status_code) {
+    // Check if HTTP status indicates success (2xx range)
+    if (status_code >= 200 && status_code < 300) {
+        ESP_LOGI(TAG, "HTTP request successful with status %d", status_code);
+        return ESP_OK;
+    }
 
-    if (json_payload == NULL || bearer_token == NULL) {
-        ESP_LOGE(TAG, "Invalid parameters: json_payload or bearer_token is NULL");
-        return ESP_ERR_INVALID_ARG;
+    ESP_LOGE(TAG, "HTTP request failed with status %d", status_code);
+    switch (status_code) {
+        case 400:
+            return ESP_ERR_INVALID_ARG;
+        case 401:
+        case 403:
+            return ESP_ERR_NOT_ALLOWED;
+        case 404:
+            return ESP_ERR_NOT_FOUND;
+        case 415:
+            return ESP_ERR_NOT_SUPPORTED;
+        case 500:
+        case 502:
+        case 503:
+            return ESP_ERR_INVALID_RESPONSE;
+        default:
+            return ESP_FAIL;
     }
+}
 
-    size_t payload_size = strlen(json_payload);
-    ESP_LOGI(TAG, "HTTP request starting - URL: %s", CONFIG_API_URL);
-    ESP_LOGI(TAG, "HTTP payload size: %zu bytes (heap: %zu bytes)",
-             payload_size, esp_get_free_heap_size());
+/**
+ * @brief Set the headers that change from request to request
+ */
+static esp_err_t http_set_request_headers(esp_http_client_handle_t client,
+                                          const char* content_type, const char* bearer_token) {
+    ESP_LOGI(TAG, "Setting Content-Type header: %s", content_type);
+    esp_err_t err = esp_http_client_set_header(client, "Content-Type", content_type);
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to set Content-Type header: %s", esp_err_to_name(err));
+        return err;
+    }
+
+    char auth_header[128];
+    snprintf(auth_header, sizeof(auth_header), "Bearer %s", bearer_token);
+    ESP_LOGI(TAG, "Setting Authorization header");
+    err = esp_http_client_set_header(client, "Authorization", auth_header);
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to set Authorization header: %s", esp_err_to_name(err));
+    }
+    return err;
+}
 
+/**
+ * @brief Create a POST client for the API URL
+ *
+ * @param persistent Keep the connection alive between requests and save the
+ *                   TLS session so a reconnect can resume it
+ */
+static esp_http_client_handle_t http_create_post_client(bool persistent) {
     const char *cert_pem = (const char *)_binary_server_cert_pem_start;
 
     esp_http_client_config_t config = {
@@ -76,93 +137,220 @@ esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_to
         .event_handler = http_event_handler,
         .cert_pem = cert_pem,
         .timeout_ms = 30000, // 30 second timeout
+        .keep_alive_enable = persistent,
+#ifdef CONFIG_ESP_TLS_CLIENT_SESSION_TICKETS
+        .save_client_session = persistent,
+#endif
     };
 
-    ESP_LOGI(TAG, "Initializing HTTP client");
-    client = esp_http_client_init(&config);
+    ESP_LOGI(TAG, "Initializing HTTP client%s", persistent ? " (persistent session)" : "");
+    esp_http_client_handle_t client = esp_http_client_init(&config);
     if (client == NULL) {
         ESP_LOGE(TAG, "Failed to initialize HTTP client");
-        return ESP_ERR_NO_MEM;
+        return NULL;
     }
 
-    // Set HTTP method and headers
+    // Set HTTP method
     ESP_LOGI(TAG, "Setting HTTP method to POST");
-    err = esp_http_client_set_method(client, HTTP_METHOD_POST);
+    esp_err_t err = esp_http_client_set_method(client, HTTP_METHOD_POST);
     if (err != ESP_OK) {
         ESP_LOGE(TAG, "Failed to set HTTP method: %s", esp_err_to_name(err));
         esp_http_client_cleanup(client);
+        return NULL;
+    }
+    return client;
+}
+
+/**
+ * @brief Get a client for one request: the session client inside a session,
+ *        otherwise a new one
+ */
+static esp_err_t http_acquire_client(const char* content_type, const char* bearer_token,
+                                     esp_http_client_handle_t* out_client) {
+    esp_http_client_handle_t client;
+    if (s_session_active) {
+        if (s_session_client == NULL) {
+            s_session_client = http_create_post_client(true);
+        }
+        client = s_session_client;
+    } else {
+        client = http_create_post_client(false);
+    }
+    if (client == NULL) {
+        return ESP_ERR_NO_MEM;
+    }
+
+    esp_err_t err = http_set_request_headers(client, content_type, bearer_token);
+    if (err != ESP_OK) {
+        if (client != s_session_client) {
+            esp_http_client_cleanup(client);
+        }
         return err;
     }
 
-    ESP_LOGI(TAG, "Setting Content-Type header");
-    err = esp_http_client_set_header(client, "Content-Type", "application/json");
+    if (client == s_session_client) {
+        s_session_requests++;
+    }
+    *out_client = client;
+    return ESP_OK;
+}
+
+/**
+ * @brief Finish with a client from http_acquire_client()
+ *
+ * @param reusable False after a transport error, so the session client
+ *                 reconnects instead of reusing a broken connection
+ */
+static void http_release_client(esp_http_client_handle_t client, bool reusable) {
+    if (client == NULL) {
+        return;
+    }
+    if (client == s_session_client) {
+        if (!reusable) {
+            esp_http_client_close(client);
+        }
+        return;
+    }
+    esp_http_client_cleanup(client);
+}
+
+void http_session_begin(void) {
+    s_session_active = true;
+    s_session_requests = 0;
+    ESP_LOGI(TAG, "HTTP session started (requests reuse one connection)");
+}
+
+void http_session_end(void) {
+    if (!s_session_active) {
+        return;
+    }
+    s_session_active = false;
+    if (s_session_client != NULL) {
+        // The handle is kept so the saved TLS session can be resumed next cycle
+        esp_http_client_close(s_session_client);
+    }
+    ESP_LOGI(TAG, "HTTP session ended after %d requests", s_session_requests);
+}
+
+esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token) {
+    if (json_payload == NULL) {
+        ESP_LOGE(TAG, "Invalid parameters: json_payload is NULL");
+        return ESP_ERR_INVALID_ARG;
+    }
+    return http_send_payload(json_payload, strlen(json_payload), "application/json", bearer_token);
+}
+
+esp_err_t http_send_payload(const void* payload, size_t payload_size,
+                            const char* content_type, const char* bearer_token) {
+    if (payload == NULL || content_type == NULL || bearer_token == NULL) {
+        ESP_LOGE(TAG, "Invalid parameters: payload, content_type or bearer_token is NULL");
+        return ESP_ERR_INVALID_ARG;
+    }
+
+    // Sent as a stream rather than with esp_http_client_perform(): perform() cannot follow a
+    // streamed request on the same connection, and both kinds share the session client
+    http_stream_t stream = NULL;
+    esp_err_t err = http_stream_open(payload_size, content_type, bearer_token, &stream);
     if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to set Content-Type header: %s", esp_err_to_name(err));
-        esp_http_client_cleanup(client);
         return err;
     }
 
-    char auth_header[128];
-    snprintf(auth_header, sizeof(auth_header), "Bearer %s", bearer_token);
-    ESP_LOGI(TAG, "Setting Authorization header");
-    err = esp_http_client_set_header(client, "Authorization", auth_header);
+    err = http_stream_write(stream, payload, payload_size);
+    if (err != ESP_OK) {
+        http_stream_abort(stream);
+        return err;
+    }
+    return http_stream_finish(stream);
+}
+
+int http_last_status_code(void) {
+    return s_last_status_code;
+}
+
+esp_err_t http_stream_open(size_t content_length, const char* content_type,
+                           const char* bearer_token, http_stream_t* out_stream) {
+    if (content_type == NULL || bearer_token == NULL || out_stream == NULL) {
+        ESP_LOGE(TAG, "Invalid parameters: content_type, bearer_token or out_stream is NULL");
+        return ESP_ERR_INVALID_ARG;
+    }
+    *out_stream = NULL;
+
+    ESP_LOGI(TAG, "HTTP streaming request starting - URL: %s", CONFIG_API_URL);
+    ESP_LOGI(TAG, "HTTP payload size: %zu bytes (heap: %zu bytes)",
+             content_length, esp_get_free_heap_size());
+    s_stream_start_us = profile_begin();
+    s_last_status_code = 0;
+    s_response_keep_alive = true;
+
+    esp_http_client_handle_t client = NULL;
+    esp_err_t err = http_acquire_client(content_type, bearer_token, &client);
     if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to set Authorization header: %s", esp_err_to_name(err));
-        esp_http_client_cleanup(client);
         return err;
     }
 
-    ESP_LOGI(TAG, "Setting POST data (%zu bytes)", payload_size);
-    err = esp_http_client_set_post_field(client, json_payload, payload_size);
+    // Sends the request line and headers (reusing an open session connection);
+    // the body follows through http_stream_write()
+    err = esp_http_client_open(client, (int)content_length);
     if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to set POST data: %s", esp_err_to_name(err));
-        esp_http_client_cleanup(client);
+        ESP_LOGE(TAG, "Failed to open HTTP connection: %s", esp_err_to_name(err));
+        http_release_client(client, false);
         return err;
     }
 
-    // Perform the HTTP request
-    ESP_LOGI(TAG, "Performing HTTP request (timeout: 30s)");
-    err = esp_http_client_perform(client);
-    if (err == ESP_OK) {
-        int status_code = esp_http_client_get_status_code(client);
-        int content_length = esp_http_client_get_content_length(client);
+    *out_stream = client;
+    return ESP_OK;
+}
+
+esp_err_t http_stream_write(http_stream_t stream, const void* data, size_t len) {
+    if (stream == NULL || (data == NULL && len > 0)) {
+        return ESP_ERR_INVALID_ARG;
+    }
+
+    size_t written = 0;
+    while (written < len) {
+        int result = esp_http_client_write(stream, (const char*)data + written, (int)(len - written));
+        if (result <= 0) {
+            ESP_LOGE(TAG, "Failed to write request body (%zu of %zu bytes written)", written, len);
+            return ESP_FAIL;
+        }
+        written += (size_t)result;
+    }
+    return ESP_OK;
+}
+
+esp_err_t http_stream_finish(http_stream_t stream) {
+    if (stream == NULL) {
+        return ESP_ERR_INVALID_ARG;
+    }
 
+    esp_err_t err;
+    bool reusable = false;
+    int content_length = esp_http_client_fetch_headers(stream);
+    if (content_length < 0) {
+        ESP_LOGE(TAG, "Failed to read HTTP response headers");
+        err = ESP_FAIL;
+    } else {
+        int status_code = esp_http_client_get_status_code(stream);
         ESP_LOGI(TAG, "HTTPS POST request completed, status = %d, content_length = %d",
                  status_code, content_length);
+        s_last_status_code = status_code;
+        err = http_status_to_err(status_code);
 
-        // Check if HTTP status indicates success (2xx range)
-        if (status_code >= 200 && status_code < 300) {
-            ESP_LOGI(TAG, "HTTP request successful with status %d", status_code);
-            err = ESP_OK;
+        // Read the rest of the response so the next esp_http_client_open() on the
+        // session client sends its request on the same connection
+        if (esp_http_client_flush_response(stream, NULL) != ESP_OK) {
+            ESP_LOGW(TAG, "Failed to read HTTP response body");
         } else {
-            ESP_LOGE(TAG, "HTTP request failed with status %d", status_code);
-            // Map HTTP status codes to ESP error codes
-            switch (status_code) {
-                case 400:
-                    err = ESP_ERR_INVALID_ARG;
-                    break;
-                case 401:
-                case 403:
-                    err = ESP_ERR_NOT_ALLOWED;
-                    break;
-                case 404:
-                    err = ESP_ERR_NOT_FOUND;
-                    break;
-                case 500:
-                case 502:
-                case 503:
-                    err = ESP_ERR_INVALID_RESPONSE;
-                    break;
-                default:
-                    err = ESP_FAIL;
-                    break;
-            }
+            reusable = s_response_keep_alive;
         }
-    } else {
-        ESP_LOGE(TAG, "HTTPS POST request failed: %s", esp_err_to_name(err));
     }
 
-    esp_http_client_cleanup(client);
-    ESP_LOGI(TAG, "HTTP client cleaned up, returning: %s", esp_err_to_name(err));
+    http_release_client(stream, reusable);
+    profile_end(PROFILE_HTTP_PERFORM, s_stream_start_us);
+    ESP_LOGI(TAG, "HTTP request finished, returning: %s", esp_err_to_name(err));
     return err;
-}
\ No newline at end of file
+}
+
+void http_stream_abort(http_stream_t stream) {
+    http_release_client(stream, false);
+}
@@ -0,0 +1,200 @@
+/**
+* @file json_writer.c
+ *
+ * Streaming JSON writer into a caller-supplied fixed buffer.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "json_writer.h"
+#include <float.h>
+#include <limits.h>
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+// cJSON's own tolerance when checking that %1.15g round-trips
+static bool same_double(double a, double b) {
+    double max_val = fabs(a) > fabs(b) ? fabs(a) : fabs(b);
+    return fabs(a - b) <= max_val * DBL_EPSILON;
+}
+
+static void put(json_writer_t *w, const char *src, size_t len) {
+    if (!w->overflow && len <= w->size - w->len) {
+        memcpy(w->buf + w->len, src, len);
+    } else {
+        w->overflow = true;
+    }
+    w->len += len;
+}
+
+static void put_char(json_writer_t *w, char c) {
+    put(w, &c, 1);
+}
+
+static void put_escaped(json_writer_t *w, const char *s) {
+    put_char(w, '"');
+    const char *run = s;
+    for (; *s; s++) {
+        unsigned char c = (unsigned char)*s;
+        if (c >= 0x20 && c != '"' && c != '\\') {
+            continue;
+        }
+        put(w, run, (size_t)(s - run));
+        run = s + 1;
+        switch (c) {
+            case '"':  put(w, "\\\"", 2); break;
+            case '\\': put(w, "\\\\", 2); break;
+            case '\b': put(w, "\\b", 2); break;
+            case '\f': put(w, "\\f", 2); break;
+            case '\n': put(w, "\\n", 2); break;
+            case '\r': put(w, "\\r", 2); break;
+            case '\t': put(w, "\\t", 2); break;
+            default: {
+                char escape[7];
+                snprintf(escape, sizeof(escape), "\\u%04x", c);
+                put(w, escape, 6);
+                break;
+            }
+        }
+    }
+    put(w, run, (size_t)(s - run));
+    put_char(w, '"');
+}
+
+// Comma and key for the next value at the current depth
+static void begin_value(json_writer_t *w, const char *key) {
+    if (w->depth > 0) {
+        if (w->has_items[w->depth - 1]) {
+            put_char(w, ',');
+        }
+        w->has_items[w->depth - 1] = true;
+    }
+    if (key != NULL) {
+        put_escaped(w, key);
+        put_char(w, ':');
+    }
+}
+
+static void open_container(json_writer_t *w, const char *key, char bracket) {
+    begin_value(w, key);
+    put_char(w, bracket);
+    if (w->depth < JSON_WRITER_MAX_DEPTH) {
+        w->has_items[w->depth] = false;
+        w->depth++;
+    } else {
+        w->overflow = true;
+    }
+}
+
+static void close_container(json_writer_t *w, char bracket) {
+    put_char(w, bracket);
+    if (w->depth > 0) {
+        w->depth--;
+    }
+}
+
+void json_writer_init(json_writer_t *w, char *buf, size_t size) {
+    memset(w, 0, sizeof(*w));
+    w->buf = buf;
+    w->size = buf ? size : 0;
+}
+
+void json_writer_clear(json_writer_t *w) {
+    w->len = 0;
+    w->overflow = false;
+}
+
+void json_writer_begin_array(json_writer_t *w, const char *key) {
+    open_container(w, key, '[');
+}
+
+void json_writer_begin_object(json_writer_t *w, const char *key) {
+    open_container(w, key, '{');
+}
+
+void json_writer_end_array(json_writer_t *w) {
+    close_container(w, ']');
+}
+
+void json_writer_end_object(json_writer_t *w) {
+    close_container(w, '}');
+}
+
+void json_writer_add_string(json_writer_t *w, const char *key, const char *value) {
+    begin_value(w, key);
+    put_escaped(w, value ? value : "");
+}
+
+void json_writer_add_number(json_writer_t *w, const char *key, double value) {
+    char number[32];
+    int len;
+
+    // Same choices as cJSON's print_number so both paths send identical values
+    if (isnan(value) || isinf(value)) {
+        len = snprintf(number, sizeof(number), "null");
+    } else if (value >= INT_MIN && value <= INT_MAX && value == (double)(int)value) {
+        len = snprintf(number, sizeof(number), "%d", (int)value);
+    } else {
+        len = snprintf(number, sizeof(number), "%1.15g", value);
+        if (!same_double(strtod(number, NULL), value)) {
+            len = snprintf(number, sizeof(number), "%1.17g", value);
+        }
+    }
+
+    begin_value(w, key);
+    put(w, number, (size_t)len);
+}
+
+static void put_digits(char *out, int value, int width) {
+    for (int i = width - 1; i >= 0; i--) {
+        out[i] = (char)('0' + value % 10);
+        value /= 10;
+    }
+}
+
+// strftime(..., "%Y-%m-%dT%H:%M:%SZ", gmtime(...)) without the locale and format parsing.
+// A time gmtime_r() cannot convert, or outside years 0-9999, is written as the epoch.
+static void format_timestamp(time_t timestamp, char *out, size_t out_size) {
+    struct tm tm_utc;
+    if (out_size < 21) {
+        if (out_size > 0) {
+            out[0] = '\0';
+        }
+        return;
+    }
+    if (gmtime_r(&timestamp, &tm_utc) == NULL || tm_utc.tm_year + 1900 < 0 || tm_utc.tm_year + 1900 > 9999) {
+        memcpy(out, "1970-01-01T00:00:00Z", 21);
+        return;
+    }
+    memcpy(out, "0000-00-00T00:00:00Z", 21);
+    put_digits(out, tm_utc.tm_year + 1900, 4);
+    put_digits(out + 5, tm_utc.tm_mon + 1, 2);
+    put_digits(out + 8, tm_utc.tm_mday, 2);
+    put_digits(out + 11, tm_utc.tm_hour, 2);
+    put_digits(out + 14, tm_utc.tm_min, 2);
+    put_digits(out + 17, tm_utc.tm_sec, 2);
+}
+
+void json_writer_add_reading(json_writer_t *w, const sensor_reading_t *reading,
+                             const char *sensor_id, const char *sensor_set_id) {
+    char timestamp_str[32];
+    format_timestamp(reading->timestamp, timestamp_str, sizeof(timestamp_str));
+
+    json_writer_begin_object(w, NULL);
+    json_writer_add_number(w, "light_intensity", reading->lux);
+    json_writer_add_string(w, "sensor_id", sensor_id);
+    json_writer_add_string(w, "timestamp", timestamp_str);
+    json_writer_add_string(w, "sensor_set_id", sensor_set_id);
+    json_writer_add_number(w, "chip_temp_c", reading->chip_temp_c);
+    json_writer_add_number(w, "chip_temp_f", reading->chip_temp_f);
+    json_writer_end_object(w);
+}
+
+bool json_writer_ok(const json_writer_t *w) {
+    return !w->overflow && w->depth == 0;
+}
@@ -14,6 +14,7 @@
 #include "app_config.h"
 #include "bh1750.h"
 #include "light_sensor.h"
+#include "profiling.h"
 #include "i2cdev.h"
 #include <esp_check.h> // Include for ESP_RETURN_ON_ERROR and other check macros
 
@@ -58,7 +59,9 @@ esp_err_t get_ambient_light(i2c_dev_t *dev, float *lux)
 
     uint16_t raw_lux = 0;
     // The driver reads an unsigned 16-bit integer representing lux
+    int64_t start = profile_begin();
     esp_err_t result = bh1750_read(dev, &raw_lux);
+    profile_end(PROFILE_I2C_READ, start);
 
     if (result != ESP_OK)
     {
@@ -11,6 +11,7 @@
  */
 
 #include "log_capture.h"
+#include "profiling.h"
 #include "nvs_flash.h"
 #include "nvs.h"
 #include "esp_log.h"
@@ -71,10 +72,12 @@ static int custom_log_func(const char* format, va_list args) {
         char key[16];
         snprintf(key, sizeof(key), "log_%lu", index % LOG_BUFFER_SIZE);
 
+        int64_t write_start = profile_begin();
         if (nvs_set_str(log_nvs_handle, key, timestamped_entry) == ESP_OK) {
             nvs_set_u32(log_nvs_handle, "log_index", index + 1);
             nvs_commit(log_nvs_handle);
         }
+        profile_end(PROFILE_NVS_WRITE, write_start);
 
         xSemaphoreGive(log_mutex);
     }
@@ -34,6 +34,7 @@
 #include "time_utils.h"
 #include "power_management.h"
 #include "status_reporter.h"
+#include "device_config.h"
 
 #define TAG "MAIN"
 
@@ -46,6 +47,20 @@
 static sensor_reading_t g_reading_buffer[READING_BUFFER_SIZE];
 static int g_reading_idx = 0;
 
+/**
+ * @brief Stop here when the sensor settings could not be loaded
+ *
+ * Without them there are no GPIOs, WiFi networks, token or API URL, so none
+ * of the pipeline is started. The device deep sleeps with no wakeup source
+ * until it is reset, which flashing a sensor_cfg image does.
+ */
+static void halt_unconfigured(void) {
+    ESP_LOGE(TAG, "Sensor settings missing or invalid - flash a sensor_cfg image from stamp_config.py");
+    ESP_LOGE(TAG, "Not starting the sensor, WiFi or send tasks; sleeping until reset");
+    vTaskDelay(pdMS_TO_TICKS(100)); // Let the log drain
+    esp_deep_sleep_start();
+}
+
 void app_main(void)
 {
     // Initialize NVS first
@@ -59,6 +74,12 @@ void app_main(void)
     // Initialize log capture EARLY - before other logging happens
     log_capture_init();
 
+    // Load per-sensor settings before anything uses them (no-op unless built
+    // with custom_sensor_config = nvs)
+    if (device_config_load() != ESP_OK) {
+        halt_unconfigured();
+    }
+
     // Filter out noisy WiFi system logs - ADD THESE LINES
     esp_log_level_set("wifi", ESP_LOG_WARN);
     esp_log_level_set("wifi_init", ESP_LOG_WARN);
@@ -1,8 +1,28 @@
 /**
  * @file persistent_storage.c
  *
- * Pure NVS operations for sensor readings.
- * Uses an append-only method, saving each batch as a separate NVS entry.
+ * Ring-buffer storage for sensor readings in the raw "readings" partition.
+ *
+ * The partition is a ring of 4 KB flash sectors, each made of 32-byte slots.
+ * Slot 0 is a sector header; the other 127 slots hold records, appended in
+ * order and never rewritten until the sector is erased again.
+ *
+ *   header: magic "SLRS", version, slot size, sector sequence number,
+ *           erase count, tail and next record sequence number when the
+ *           sector was opened, CRC32
+ *   record: sequence number, type, timestamp (or new tail), lux,
+ *           chip_temp_c, chip_temp_f, CRC32
+ *
+ * Readings get consecutive sequence numbers. Dropping the oldest readings
+ * appends one tail record ("everything before N is gone") rather than
+ * touching the readings themselves, so append, drop and clear each cost one
+ * record write, and loading is a sequential read from the tail. When the
+ * head sector is full the next sector is erased and reused, which spreads
+ * erases evenly over the partition; readings still in it are lost.
+ *
+ * Readings saved by the old format (one NVS blob per batch in namespace
+ * sensor_data) are moved into the ring at init. tools/ring_store.py reads
+ * the ring from flash dumps and must match the layout here.
  *
  * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
  *
@@ -12,49 +32,485 @@
  */
 
 #include "persistent_storage.h"
+#include "profiling.h"
 #include "nvs_flash.h"
 #include "nvs.h"
+#include "esp_partition.h"
+#include "esp_rom_crc.h"
 #include "esp_log.h"
 #include "freertos/FreeRTOS.h"
 #include "freertos/semphr.h"
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdlib.h>
 #include <string.h>
 #include <stdio.h>
 
 #define TAG "PERSISTENT_STORAGE"
+
+// Old storage format, migrated into the ring at init
 #define NVS_NAMESPACE "sensor_data"
 #define KEY_BATCH_COUNT "batch_count"
 #define KEY_BATCH_PREFIX "batch_"
 
-static nvs_handle_t s_nvs_handle = 0;
+#define RING_SECTOR_SIZE 4096
+#define RING_SLOT_SIZE 32
+#define RING_SLOTS_PER_SECTOR (RING_SECTOR_SIZE / RING_SLOT_SIZE)
+#define RING_RECORDS_PER_SECTOR (RING_SLOTS_PER_SECTOR - 1)
+#define RING_MAX_SECTORS 64
+#define RING_MAGIC 0x53524C53 // "SLRS"
+#define RING_VERSION 1
+
+// Slots read or written per flash operation
+#define RING_IO_SLOTS 8
+
+#define RECORD_READING 0x01
+#define RECORD_TAIL 0x02
+
+typedef struct {
+    uint32_t magic;
+    uint16_t version;
+    uint16_t slot_size;
+    uint32_t sector_seq;  // Increases each time a sector is opened; the highest is the head
+    uint32_t erase_count;
+    uint32_t tail_seq;    // Tail when the sector was opened, so erasing older markers loses nothing
+    uint32_t base_seq;    // Next reading sequence number when the sector was opened
+    uint32_t reserved;
+    uint32_t crc;
+} ring_header_t;
+
+typedef struct {
+    uint32_t seq;
+    uint8_t type;
+    uint8_t reserved[3];
+    int64_t value;        // Timestamp of a reading, or the new tail for RECORD_TAIL
+    float lux;
+    float chip_temp_c;
+    float chip_temp_f;
+    uint32_t crc;
+} ring_record_t;
+
+_Static_assert(sizeof(ring_header_t) == RING_SLOT_SIZE, "ring header must fill one slot");
+_Static_assert(sizeof(ring_record_t) == RING_SLOT_SIZE, "ring record must fill one slot");
+
+// What mounting learned about each sector, kept up to date while appending
+typedef struct {
+    bool valid;           // Has a valid header
+    bool blank;           // Fully erased, can be opened without erasing
+    uint32_t sector_seq;
+    uint32_t erase_count;
+    uint32_t first_seq;   // Sequence numbers of the readings in the sector: [first_seq, end_seq)
+    uint32_t end_seq;
+    int used_slots;       // Slots up to the last one written, header included
+} ring_sector_t;
+
+static const esp_partition_t *s_partition = NULL;
+static ring_sector_t s_sectors[RING_MAX_SECTORS];
+static int s_sector_count = 0;
+static int s_head = 0;
+static uint32_t s_next_seq = 0;
+static uint32_t s_tail_seq = 0;
+static persistent_storage_stats_t s_stats;
+
 static bool s_initialized = false;
-static SemaphoreHandle_t s_nvs_mutex = NULL;
+static SemaphoreHandle_t s_storage_mutex = NULL;
+
+static uint32_t ring_crc(const void *data, size_t len) {
+    return esp_rom_crc32_le(UINT32_MAX, data, len);
+}
+
+static size_t ring_offset(int sector, int slot) {
+    return (size_t)sector * RING_SECTOR_SIZE + (size_t)slot * RING_SLOT_SIZE;
+}
+
+static bool slot_is_erased(const uint8_t *slot) {
+    for (int i = 0; i < RING_SLOT_SIZE; i++) {
+        if (slot[i] != 0xFF) {
+            return false;
+        }
+    }
+    return true;
+}
+
+/**
+ * @brief First reading still stored: after the tail, and not in an erased sector
+ */
+static uint32_t ring_live_start(void) {
+    uint32_t start = s_next_seq;
+    for (int i = 0; i < s_sector_count; i++) {
+        const ring_sector_t *s = &s_sectors[i];
+        if (s->valid && s->end_seq > s->first_seq && s->first_seq < start) {
+            start = s->first_seq;
+        }
+    }
+    return start > s_tail_seq ? start : s_tail_seq;
+}
+
+/**
+ * @brief Write records into the head sector from its first free slot
+ *
+ * The slots are used up even if the write fails, since they may now be
+ * partly programmed.
+ */
+static esp_err_t ring_write_slots(const ring_record_t *records, int count) {
+    ring_sector_t *head = &s_sectors[s_head];
+    esp_err_t err = esp_partition_write(s_partition, ring_offset(s_head, head->used_slots),
+                                        records, (size_t)count * RING_SLOT_SIZE);
+    head->used_slots += count;
+    s_stats.flash_bytes += (uint32_t)count * RING_SLOT_SIZE;
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to write %d records: %s", count, esp_err_to_name(err));
+    }
+    return err;
+}
+
+/**
+ * @brief Erase the sector after the head and make it the new head
+ */
+static esp_err_t ring_advance_head(void) {
+    int next = (s_head + 1) % s_sector_count;
+    ring_sector_t *s = &s_sectors[next];
+
+    if (s->valid && s->end_seq > s->first_seq) {
+        uint32_t live_start = ring_live_start();
+        if (s->end_seq > live_start) {
+            uint32_t lost = s->end_seq - (s->first_seq > live_start ? s->first_seq : live_start);
+            s_stats.readings_overwritten += lost;
+            ESP_LOGW(TAG, "Storage full, overwriting the %u oldest readings", (unsigned)lost);
+        }
+        if (s_tail_seq < s->end_seq) {
+            s_tail_seq = s->end_seq;
+        }
+    }
+
+    if (!s->blank) {
+        esp_err_t err = esp_partition_erase_range(s_partition, ring_offset(next, 0), RING_SECTOR_SIZE);
+        if (err != ESP_OK) {
+            ESP_LOGE(TAG, "Failed to erase sector %d: %s", next, esp_err_to_name(err));
+            return err;
+        }
+        s->erase_count++;
+        s_stats.erases++;
+    }
+
+    ring_header_t header = {
+        .magic = RING_MAGIC,
+        .version = RING_VERSION,
+        .slot_size = RING_SLOT_SIZE,
+        .sector_seq = s_sectors[s_head].valid ? s_sectors[s_head].sector_seq + 1 : 1,
+        .erase_count = s->erase_count,
+        .tail_seq = s_tail_seq,
+        .base_seq = s_next_seq,
+        .reserved = UINT32_MAX,
+    };
+    header.crc = ring_crc(&header, offsetof(ring_header_t, crc));
+
+    s->valid = false;
+    s->blank = false;
+    s->sector_seq = header.sector_seq;
+    s->first_seq = s_next_seq;
+    s->end_seq = s_next_seq;
+    s->used_slots = 1;
+    s_stats.flash_bytes += RING_SLOT_SIZE;
+    esp_err_t err = esp_partition_write(s_partition, ring_offset(next, 0), &header, sizeof(header));
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to write header of sector %d: %s", next, esp_err_to_name(err));
+        return err;
+    }
+    s->valid = true;
+    s_head = next;
+    return ESP_OK;
+}
+
+/**
+ * @brief Make sure the head sector has a free slot
+ */
+static esp_err_t ring_make_room(void) {
+    if (s_sectors[s_head].valid && s_sectors[s_head].used_slots < RING_SLOTS_PER_SECTOR) {
+        return ESP_OK;
+    }
+    return ring_advance_head();
+}
+
+/**
+ * @brief Append a tail record: readings before tail_seq are dropped
+ */
+static esp_err_t ring_set_tail(uint32_t tail_seq) {
+    esp_err_t err = ring_make_room();
+    if (err != ESP_OK) {
+        return err;
+    }
+
+    ring_record_t marker;
+    memset(&marker, 0xFF, sizeof(marker));
+    marker.seq = s_next_seq;
+    marker.type = RECORD_TAIL;
+    marker.value = tail_seq;
+    marker.crc = ring_crc(&marker, offsetof(ring_record_t, crc));
+
+    err = ring_write_slots(&marker, 1);
+    if (err == ESP_OK) {
+        s_tail_seq = tail_seq;
+    }
+    return err;
+}
+
+/**
+ * @brief Scan one sector's header and records
+ */
+static esp_err_t ring_scan_sector(int sector, uint32_t *max_erase_count) {
+    ring_sector_t *s = &s_sectors[sector];
+    ring_record_t slots[RING_IO_SLOTS];
+    bool erased = true;
+    bool have_readings = false;
+
+    memset(s, 0, sizeof(*s));
+    for (int slot = 0; slot < RING_SLOTS_PER_SECTOR; slot += RING_IO_SLOTS) {
+        esp_err_t err = esp_partition_read(s_partition, ring_offset(sector, slot), slots, sizeof(slots));
+        if (err != ESP_OK) {
+            ESP_LOGE(TAG, "Failed to read sector %d: %s", sector, esp_err_to_name(err));
+            return err;
+        }
+
+        for (int i = 0; i < RING_IO_SLOTS; i++) {
+            if (slot_is_erased((const uint8_t *)&slots[i])) {
+                continue;
+            }
+            erased = false;
+            s->used_slots = slot + i + 1;
+
+            if (slot + i == 0) {
+                const ring_header_t *header = (const ring_header_t *)&slots[0];
+                if (header->magic != RING_MAGIC || header->version != RING_VERSION ||
+                    header->slot_size != RING_SLOT_SIZE ||
+                    header->crc != ring_crc(header, offsetof(ring_header_t, crc))) {
+                    break; // Not a ring sector (or a torn header); erased before reuse
+                }
+                s->valid = true;
+                s->sector_seq = header->sector_seq;
+                s->erase_count = header->erase_count;
+                if (header->tail_seq > s_tail_seq) {
+                    s_tail_seq = header->tail_seq;
+                }
+                if (header->base_seq > s_next_seq) {
+                    s_next_seq = header->base_seq;
+                }
+                continue;
+            }
+            if (!s->valid) {
+                break;
+            }
+
+            const ring_record_t *record = &slots[i];
+            if (record->crc != ring_crc(record, offsetof(ring_record_t, crc))) {
+                s_stats.corrupt_records++; // Torn by a power loss mid-write
+                continue;
+            }
+            if (record->type == RECORD_READING) {
+                if (!have_readings) {
+                    s->first_seq = record->seq;
+                    have_readings = true;
+                }
+                s->end_seq = record->seq + 1;
+                if (s->end_seq > s_next_seq) {
+                    s_next_seq = s->end_seq;
+                }
+            } else if (record->type == RECORD_TAIL && (uint32_t)record->value > s_tail_seq) {
+                s_tail_seq = (uint32_t)record->value;
+            }
+        }
+        if (!erased && !s->valid) {
+            break;
+        }
+    }
+
+    s->blank = erased;
+    if (s->valid && s->erase_count > *max_erase_count) {
+        *max_erase_count = s->erase_count;
+    }
+    return ESP_OK;
+}
+
+/**
+ * @brief Rebuild the ring state from flash, formatting the first sector if there is no ring
+ */
+static esp_err_t ring_mount(void) {
+    s_partition = esp_partition_find_first(ESP_PARTITION_TYPE_DATA, ESP_PARTITION_SUBTYPE_ANY,
+                                           PERSISTENT_STORAGE_PARTITION);
+    if (s_partition == NULL) {
+        ESP_LOGE(TAG, "No '%s' partition in the partition table", PERSISTENT_STORAGE_PARTITION);
+        return ESP_ERR_NOT_FOUND;
+    }
+
+    s_sector_count = (int)(s_partition->size / RING_SECTOR_SIZE);
+    if (s_sector_count > RING_MAX_SECTORS) {
+        s_sector_count = RING_MAX_SECTORS;
+    }
+    if (s_sector_count < 2) {
+        ESP_LOGE(TAG, "'%s' partition is too small for a ring", PERSISTENT_STORAGE_PARTITION);
+        return ESP_ERR_INVALID_SIZE;
+    }
+
+    memset(&s_stats, 0, sizeof(s_stats));
+    s_next_seq = 0;
+    s_tail_seq = 0;
+    uint32_t max_erase_count = 0;
+    bool have_head = false;
+    for (int i = 0; i < s_sector_count; i++) {
+        esp_err_t err = ring_scan_sector(i, &max_erase_count);
+        if (err != ESP_OK) {
+            return err;
+        }
+        const ring_sector_t *s = &s_sectors[i];
+        if (s->valid && (!have_head || s->sector_seq > s_sectors[s_head].sector_seq)) {
+            s_head = i;
+            have_head = true;
+        }
+    }
+
+    // Sectors whose erase count was lost with their header are assumed as worn as the worst
+    for (int i = 0; i < s_sector_count; i++) {
+        if (!s_sectors[i].valid && !s_sectors[i].blank) {
+            s_sectors[i].erase_count = max_erase_count;
+        }
+    }
+
+    if (!have_head) {
+        ESP_LOGI(TAG, "Formatting '%s' partition (%d sectors)", PERSISTENT_STORAGE_PARTITION, s_sector_count);
+        s_head = s_sector_count - 1; // So that the first sector opened is sector 0
+        return ring_advance_head();
+    }
+
+    ESP_LOGI(TAG, "Mounted ring: %d sectors, head %d, readings %u..%u, tail %u",
+             s_sector_count, s_head, (unsigned)ring_live_start(), (unsigned)s_next_seq, (unsigned)s_tail_seq);
+    return ESP_OK;
+}
+
+static esp_err_t ring_append_readings(const sensor_reading_t *readings, int count) {
+    ring_record_t block[RING_IO_SLOTS];
+    int saved = 0;
+
+    while (saved < count) {
+        esp_err_t err = ring_make_room();
+        if (err != ESP_OK) {
+            return err;
+        }
+
+        ring_sector_t *head = &s_sectors[s_head];
+        int n = count - saved;
+        if (n > RING_IO_SLOTS) {
+            n = RING_IO_SLOTS;
+        }
+        if (n > RING_SLOTS_PER_SECTOR - head->used_slots) {
+            n = RING_SLOTS_PER_SECTOR - head->used_slots;
+        }
+
+        for (int i = 0; i < n; i++) {
+            const sensor_reading_t *reading = &readings[saved + i];
+            ring_record_t *record = &block[i];
+            memset(record, 0xFF, sizeof(*record));
+            record->seq = s_next_seq + (uint32_t)i;
+            record->type = RECORD_READING;
+            record->value = (int64_t)reading->timestamp;
+            record->lux = reading->lux;
+            record->chip_temp_c = reading->chip_temp_c;
+            record->chip_temp_f = reading->chip_temp_f;
+            record->crc = ring_crc(record, offsetof(ring_record_t, crc));
+        }
+
+        err = ring_write_slots(block, n);
+        if (err != ESP_OK) {
+            return err;
+        }
+        if (head->end_seq == head->first_seq) {
+            head->first_seq = s_next_seq;
+        }
+        s_next_seq += (uint32_t)n;
+        head->end_seq = s_next_seq;
+        saved += n;
+        s_stats.readings_saved += (uint32_t)n;
+        s_stats.payload_bytes += (uint32_t)(n * sizeof(sensor_reading_t));
+    }
+    return ESP_OK;
+}
+
+/**
+ * @brief Move readings saved as NVS batches by earlier firmware into the ring
+ */
+static void migrate_nvs_batches(void) {
+    nvs_handle_t handle;
+    if (nvs_open(NVS_NAMESPACE, NVS_READWRITE, &handle) != ESP_OK) {
+        return;
+    }
+
+    int32_t batch_count = 0;
+    if (nvs_get_i32(handle, KEY_BATCH_COUNT, &batch_count) != ESP_OK) {
+        nvs_close(handle);
+        return;
+    }
+
+    int migrated = 0;
+    for (int i = 0; i < batch_count; i++) {
+        char batch_key[32];
+        snprintf(batch_key, sizeof(batch_key), "%s%d", KEY_BATCH_PREFIX, i);
+
+        size_t required_size = 0;
+        if (nvs_get_blob(handle, batch_key, NULL, &required_size) != ESP_OK || required_size == 0) {
+            continue;
+        }
+        sensor_reading_t *batch = malloc(required_size);
+        if (batch == NULL) {
+            ESP_LOGE(TAG, "Failed to allocate %zu bytes to migrate '%s'", required_size, batch_key);
+            continue;
+        }
+        if (nvs_get_blob(handle, batch_key, batch, &required_size) == ESP_OK) {
+            int count = (int)(required_size / sizeof(sensor_reading_t));
+            if (ring_append_readings(batch, count) == ESP_OK) {
+                migrated += count;
+            }
+        }
+        free(batch);
+    }
+
+    // Erase the whole namespace in one operation rather than key by key
+    nvs_erase_all(handle);
+    esp_err_t err = nvs_commit(handle);
+    nvs_close(handle);
+    if (err != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to erase migrated NVS batches: %s", esp_err_to_name(err));
+        return;
+    }
+    ESP_LOGI(TAG, "Migrated %d readings from %d NVS batches into the ring", migrated, (int)batch_count);
+}
 
 esp_err_t persistent_storage_init(void) {
     if (s_initialized) {
         return ESP_OK;
     }
 
-    if (s_nvs_mutex == NULL) {
-        s_nvs_mutex = xSemaphoreCreateMutex();
+    if (s_storage_mutex == NULL) {
+        s_storage_mutex = xSemaphoreCreateMutex();
     }
-    if (s_nvs_mutex == NULL) {
-        ESP_LOGE(TAG, "Failed to create NVS mutex");
+    if (s_storage_mutex == NULL) {
+        ESP_LOGE(TAG, "Failed to create storage mutex");
         return ESP_FAIL;
     }
 
-    esp_err_t err = nvs_open(NVS_NAMESPACE, NVS_READWRITE, &s_nvs_handle);
+    esp_err_t err = ring_mount();
     if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to open NVS handle: %s", esp_err_to_name(err));
+        ESP_LOGE(TAG, "Failed to mount readings ring: %s", esp_err_to_name(err));
         return err;
     }
 
+    migrate_nvs_batches();
+
     s_initialized = true;
     ESP_LOGI(TAG, "Persistent storage initialized");
     return ESP_OK;
 }
 
 esp_err_t persistent_storage_save_readings(const sensor_reading_t* readings, int count) {
-    if (!s_initialized || s_nvs_mutex == NULL) {
+    if (!s_initialized || s_storage_mutex == NULL) {
         ESP_LOGE(TAG, "Storage not initialized");
         return ESP_ERR_INVALID_STATE;
     }
@@ -62,59 +518,25 @@ esp_err_t persistent_storage_save_readings(const sensor_reading_t* readings, int
         return ESP_ERR_INVALID_ARG;
     }
 
-    if (xSemaphoreTake(s_nvs_mutex, portMAX_DELAY) != pdTRUE) {
-        ESP_LOGE(TAG, "Failed to take NVS mutex");
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
+        ESP_LOGE(TAG, "Failed to take storage mutex");
         return ESP_ERR_TIMEOUT;
     }
 
-    esp_err_t err;
-    int32_t batch_count = 0;
-
-    // Get the current number of stored batches
-    err = nvs_get_i32(s_nvs_handle, KEY_BATCH_COUNT, &batch_count);
-    if (err == ESP_ERR_NVS_NOT_FOUND) {
-        batch_count = 0; // This is the first batch
-    } else if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to get batch count: %s", esp_err_to_name(err));
-        xSemaphoreGive(s_nvs_mutex);
-        return err;
-    }
-
-    // Create the key for the new batch, e.g., "batch_0", "batch_1"
-    char batch_key[32];
-    snprintf(batch_key, sizeof(batch_key), "%s%d", KEY_BATCH_PREFIX, (int)batch_count);
-
-    // Save the new batch of readings as a blob
-    err = nvs_set_blob(s_nvs_handle, batch_key, readings, count * sizeof(sensor_reading_t));
-    if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to save batch '%s': %s", batch_key, esp_err_to_name(err));
-        xSemaphoreGive(s_nvs_mutex);
-        return err;
+    int64_t write_start = profile_begin();
+    esp_err_t err = ring_append_readings(readings, count);
+    profile_end(PROFILE_NVS_WRITE, write_start);
+    if (err == ESP_OK) {
+        ESP_LOGI(TAG, "Successfully saved %d readings (%u stored)",
+                 count, (unsigned)(s_next_seq - ring_live_start()));
     }
 
-    // Increment the batch count and save it
-    batch_count++;
-    err = nvs_set_i32(s_nvs_handle, KEY_BATCH_COUNT, batch_count);
-    if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to update batch count: %s", esp_err_to_name(err));
-        xSemaphoreGive(s_nvs_mutex);
-        return err;
-    }
-
-    // Commit changes to flash
-    err = nvs_commit(s_nvs_handle);
-    if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to commit NVS changes: %s", esp_err_to_name(err));
-    } else {
-        ESP_LOGI(TAG, "Successfully saved batch #%d (%d readings)", (int)(batch_count - 1), count);
-    }
-
-    xSemaphoreGive(s_nvs_mutex);
+    xSemaphoreGive(s_storage_mutex);
     return err;
 }
 
 esp_err_t persistent_storage_load_readings(sensor_reading_t* readings, int max_count, int* loaded_count) {
-    if (!s_initialized || s_nvs_mutex == NULL) {
+    if (!s_initialized || s_storage_mutex == NULL) {
         ESP_LOGE(TAG, "Storage not initialized");
         return ESP_ERR_INVALID_STATE;
     }
@@ -124,137 +546,166 @@ esp_err_t persistent_storage_load_readings(sensor_reading_t* readings, int max_c
 
     *loaded_count = 0;
 
-    if (xSemaphoreTake(s_nvs_mutex, portMAX_DELAY) != pdTRUE) {
-        ESP_LOGE(TAG, "Failed to take NVS mutex");
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
+        ESP_LOGE(TAG, "Failed to take storage mutex");
         return ESP_ERR_TIMEOUT;
     }
 
-    esp_err_t err;
-    int32_t batch_count = 0;
-
-    err = nvs_get_i32(s_nvs_handle, KEY_BATCH_COUNT, &batch_count);
-    if (err == ESP_ERR_NVS_NOT_FOUND) {
-        ESP_LOGI(TAG, "No batches found in storage.");
-        xSemaphoreGive(s_nvs_mutex);
-        return ESP_OK;
-    } else if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to get batch count: %s", esp_err_to_name(err));
-        xSemaphoreGive(s_nvs_mutex);
-        return err;
-    }
-
-    if (batch_count == 0) {
-        xSemaphoreGive(s_nvs_mutex);
-        return ESP_OK;
-    }
-
-    // Iterate through each stored batch and load it
-    for (int i = 0; i < batch_count; i++) {
-        char batch_key[32];
-        snprintf(batch_key, sizeof(batch_key), "%s%d", KEY_BATCH_PREFIX, i);
-
-        size_t required_size;
-        // First, get the size of the blob
-        err = nvs_get_blob(s_nvs_handle, batch_key, NULL, &required_size);
-        if (err != ESP_OK) {
-            ESP_LOGW(TAG, "Failed to get size for batch '%s': %s", batch_key, esp_err_to_name(err));
-            continue; // Skip corrupted batch
+    esp_err_t err = ESP_OK;
+    uint32_t seq = ring_live_start();
+    ring_record_t slots[RING_IO_SLOTS];
+
+    // Read sector by sector, oldest first, starting with the one holding the tail
+    while (*loaded_count < max_count && seq < s_next_seq && err == ESP_OK) {
+        int sector = -1;
+        for (int i = 0; i < s_sector_count; i++) {
+            const ring_sector_t *s = &s_sectors[i];
+            if (s->valid && s->end_seq > s->first_seq && s->end_seq > seq &&
+                (sector < 0 || s->first_seq < s_sectors[sector].first_seq)) {
+                sector = i;
+            }
         }
-
-        int readings_in_batch = required_size / sizeof(sensor_reading_t);
-        if (*loaded_count + readings_in_batch > max_count) {
-            ESP_LOGW(TAG, "Buffer full. Cannot load more readings.");
+        if (sector < 0) {
             break;
         }
 
-        // Now, load the blob into the correct position in the output buffer
-        err = nvs_get_blob(s_nvs_handle, batch_key, readings + *loaded_count, &required_size);
-        if (err != ESP_OK) {
-            ESP_LOGW(TAG, "Failed to load batch '%s': %s", batch_key, esp_err_to_name(err));
-            continue; // Skip corrupted batch
+        const ring_sector_t *s = &s_sectors[sector];
+        for (int slot = 1; slot < s->used_slots && *loaded_count < max_count; slot += RING_IO_SLOTS) {
+            int n = s->used_slots - slot < RING_IO_SLOTS ? s->used_slots - slot : RING_IO_SLOTS;
+            err = esp_partition_read(s_partition, ring_offset(sector, slot), slots, (size_t)n * RING_SLOT_SIZE);
+            if (err != ESP_OK) {
+                ESP_LOGE(TAG, "Failed to read sector %d: %s", sector, esp_err_to_name(err));
+                break;
+            }
+            for (int i = 0; i < n && *loaded_count < max_count; i++) {
+                const ring_record_t *record = &slots[i];
+                if (record->type != RECORD_READING || record->seq < seq ||
+                    record->crc != ring_crc(record, offsetof(ring_record_t, crc))) {
+                    continue;
+                }
+                sensor_reading_t *reading = &readings[(*loaded_count)++];
+                reading->timestamp = (time_t)record->value;
+                reading->lux = record->lux;
+                reading->chip_temp_c = record->chip_temp_c;
+                reading->chip_temp_f = record->chip_temp_f;
+                seq = record->seq + 1;
+            }
+        }
+        if (seq < s->end_seq && *loaded_count < max_count) {
+            seq = s->end_seq; // The rest of the sector was unreadable
         }
-        *loaded_count += readings_in_batch;
     }
 
-    ESP_LOGI(TAG, "Loaded %d readings from %d batches.", *loaded_count, (int)batch_count);
+    ESP_LOGI(TAG, "Loaded %d readings.", *loaded_count);
 
-    xSemaphoreGive(s_nvs_mutex);
-    return ESP_OK;
+    xSemaphoreGive(s_storage_mutex);
+    return err;
 }
 
-esp_err_t persistent_storage_clear_readings(void) {
-    if (!s_initialized || s_nvs_mutex == NULL) {
+esp_err_t persistent_storage_drop_oldest(int count) {
+    if (!s_initialized || s_storage_mutex == NULL) {
         ESP_LOGE(TAG, "Storage not initialized");
         return ESP_ERR_INVALID_STATE;
     }
-    if (xSemaphoreTake(s_nvs_mutex, portMAX_DELAY) != pdTRUE) {
-        ESP_LOGE(TAG, "Failed to take NVS mutex");
+    if (count <= 0) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
+        ESP_LOGE(TAG, "Failed to take storage mutex");
         return ESP_ERR_TIMEOUT;
     }
 
-    esp_err_t err;
-    int32_t batch_count = 0;
+    esp_err_t err = ESP_OK;
+    uint32_t start = ring_live_start();
+    uint32_t stored = s_next_seq - start;
+    uint32_t dropped = (uint32_t)count < stored ? (uint32_t)count : stored;
+    if (dropped > 0) {
+        int64_t write_start = profile_begin();
+        err = ring_set_tail(start + dropped);
+        profile_end(PROFILE_NVS_WRITE, write_start);
+        if (err == ESP_OK) {
+            ESP_LOGI(TAG, "Dropped %u stored readings, %u left", (unsigned)dropped, (unsigned)(stored - dropped));
+        }
+    }
 
-    // Get the number of batches to erase
-    nvs_get_i32(s_nvs_handle, KEY_BATCH_COUNT, &batch_count);
+    xSemaphoreGive(s_storage_mutex);
+    return err;
+}
 
-    // Erase each batch
-    for (int i = 0; i < batch_count; i++) {
-        char batch_key[32];
-        snprintf(batch_key, sizeof(batch_key), "%s%d", KEY_BATCH_PREFIX, i);
-        nvs_erase_key(s_nvs_handle, batch_key);
+esp_err_t persistent_storage_clear_readings(void) {
+    if (!s_initialized || s_storage_mutex == NULL) {
+        ESP_LOGE(TAG, "Storage not initialized");
+        return ESP_ERR_INVALID_STATE;
+    }
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
+        ESP_LOGE(TAG, "Failed to take storage mutex");
+        return ESP_ERR_TIMEOUT;
     }
 
-    // Erase the counter itself
-    nvs_erase_key(s_nvs_handle, KEY_BATCH_COUNT);
-
-    err = nvs_commit(s_nvs_handle);
+    esp_err_t err = ESP_OK;
+    if (ring_live_start() < s_next_seq) {
+        err = ring_set_tail(s_next_seq);
+    }
     if (err != ESP_OK) {
-        ESP_LOGE(TAG, "Failed to commit clear operation: %s", esp_err_to_name(err));
+        ESP_LOGE(TAG, "Failed to clear stored readings: %s", esp_err_to_name(err));
     } else {
         ESP_LOGI(TAG, "Cleared all stored readings.");
     }
 
-    xSemaphoreGive(s_nvs_mutex);
+    xSemaphoreGive(s_storage_mutex);
     return err;
 }
 
 esp_err_t persistent_storage_get_count(int* count) {
-    if (!s_initialized || s_nvs_mutex == NULL) {
+    if (!s_initialized || s_storage_mutex == NULL) {
         ESP_LOGE(TAG, "Storage not initialized");
         return ESP_ERR_INVALID_STATE;
     }
     if (count == NULL) {
         return ESP_ERR_INVALID_ARG;
     }
-    *count = 0;
 
-    if (xSemaphoreTake(s_nvs_mutex, portMAX_DELAY) != pdTRUE) {
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
         return ESP_ERR_TIMEOUT;
     }
+    *count = (int)(s_next_seq - ring_live_start());
+    xSemaphoreGive(s_storage_mutex);
+    return ESP_OK;
+}
 
-    int32_t batch_count = 0;
-    esp_err_t err = nvs_get_i32(s_nvs_handle, KEY_BATCH_COUNT, &batch_count);
-    if (err == ESP_ERR_NVS_NOT_FOUND) {
-        xSemaphoreGive(s_nvs_mutex);
-        return ESP_OK; // No batches, count is 0
-    } else if (err != ESP_OK) {
-        xSemaphoreGive(s_nvs_mutex);
-        return err;
+esp_err_t persistent_storage_get_stats(persistent_storage_stats_t* stats) {
+    if (!s_initialized || s_storage_mutex == NULL) {
+        ESP_LOGE(TAG, "Storage not initialized");
+        return ESP_ERR_INVALID_STATE;
+    }
+    if (stats == NULL) {
+        return ESP_ERR_INVALID_ARG;
     }
 
-    for (int i = 0; i < batch_count; i++) {
-        char batch_key[32];
-        snprintf(batch_key, sizeof(batch_key), "%s%d", KEY_BATCH_PREFIX, i);
+    if (xSemaphoreTake(s_storage_mutex, portMAX_DELAY) != pdTRUE) {
+        return ESP_ERR_TIMEOUT;
+    }
 
-        size_t required_size = 0;
-        // Get the size of the blob without reading its contents
-        err = nvs_get_blob(s_nvs_handle, batch_key, NULL, &required_size);
-        if (err == ESP_OK) {
-            *count += required_size / sizeof(sensor_reading_t);
+    *stats = s_stats;
+    stats->sectors = s_sector_count;
+    stats->capacity = (s_sector_count - 1) * RING_RECORDS_PER_SECTOR;
+    stats->count = (int)(s_next_seq - ring_live_start());
+    stats->min_erase_count = UINT32_MAX;
+    stats->max_erase_count = 0;
+    stats->total_erases = 0;
+    for (int i = 0; i < s_sector_count; i++) {
+        uint32_t erases = s_sectors[i].erase_count;
+        if (erases < stats->min_erase_count) {
+            stats->min_erase_count = erases;
+        }
+        if (erases > stats->max_erase_count) {
+            stats->max_erase_count = erases;
         }
+        stats->total_erases += erases;
     }
+    stats->write_amplification = s_stats.payload_bytes > 0
+        ? (float)s_stats.flash_bytes / (float)s_stats.payload_bytes : 0.0f;
 
-    xSemaphoreGive(s_nvs_mutex);
+    xSemaphoreGive(s_storage_mutex);
     return ESP_OK;
-}
\ No newline at end of file
+}
@@ -0,0 +1,144 @@
+/**
+* @file profiling.c
+ *
+ * Fixed-size timing counters for the phases that keep the radio on or the
+ * CPU busy, reported in the status payload instead of the serial log.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "profiling.h"
+#include "esp_timer.h"
+#include "freertos/FreeRTOS.h"
+#include "freertos/task.h"
+#include <inttypes.h>
+#include <stdio.h>
+#include <string.h>
+
+static const char *const s_names[PROFILE_COUNT] = {
+    [PROFILE_I2C_READ] = "i2c",
+    [PROFILE_JSON_BUILD] = "json",
+    [PROFILE_HTTP_PERFORM] = "http",
+    [PROFILE_WIFI_CONNECT] = "wifi",
+    [PROFILE_NVS_WRITE] = "nvs",
+};
+
+// Recorded from the sensor and send tasks, and from every log call through
+// log_capture.c, so updates are a few additions under a spinlock
+static portMUX_TYPE s_lock = portMUX_INITIALIZER_UNLOCKED;
+static profile_counter_t s_counters[PROFILE_COUNT];
+static int64_t s_window_start_us = 0;
+
+static int bucket_for(uint32_t elapsed_us) {
+    uint32_t limit = PROFILE_FIRST_BUCKET_US;
+    int bucket = 0;
+    while (bucket < PROFILE_BUCKETS - 1 && elapsed_us >= limit) {
+        limit <<= 2;
+        bucket++;
+    }
+    return bucket;
+}
+
+int64_t profile_begin(void) {
+    return esp_timer_get_time();
+}
+
+void profile_end(profile_id_t id, int64_t start_us) {
+    int64_t elapsed = esp_timer_get_time() - start_us;
+    profile_record(id, elapsed < 0 ? 0 : (elapsed > UINT32_MAX ? UINT32_MAX : (uint32_t)elapsed));
+}
+
+void profile_record(profile_id_t id, uint32_t elapsed_us) {
+    if ((unsigned)id >= PROFILE_COUNT) {
+        return;
+    }
+    int bucket = bucket_for(elapsed_us);
+
+    taskENTER_CRITICAL(&s_lock);
+    profile_counter_t *counter = &s_counters[id];
+    counter->count++;
+    counter->total_us += elapsed_us;
+    if (elapsed_us > counter->max_us) {
+        counter->max_us = elapsed_us;
+    }
+    counter->buckets[bucket]++;
+    taskEXIT_CRITICAL(&s_lock);
+}
+
+uint32_t profile_window_seconds(void) {
+    return (uint32_t)((esp_timer_get_time() - s_window_start_us) / 1000000);
+}
+
+bool profile_snapshot(profile_snapshot_t *snapshot) {
+    taskENTER_CRITICAL(&s_lock);
+    memcpy(snapshot->counters, s_counters, sizeof(s_counters));
+    taskEXIT_CRITICAL(&s_lock);
+    snapshot->window_s = profile_window_seconds();
+
+    for (int i = 0; i < PROFILE_COUNT; i++) {
+        if (snapshot->counters[i].count > 0) {
+            return true;
+        }
+    }
+    return false;
+}
+
+void profile_consume(const profile_snapshot_t *snapshot) {
+    taskENTER_CRITICAL(&s_lock);
+    for (int i = 0; i < PROFILE_COUNT; i++) {
+        profile_counter_t *counter = &s_counters[i];
+        const profile_counter_t *sent = &snapshot->counters[i];
+        counter->count -= sent->count;
+        counter->total_us -= sent->total_us;
+        counter->max_us = 0;
+        for (int b = 0; b < PROFILE_BUCKETS; b++) {
+            counter->buckets[b] -= sent->buckets[b];
+        }
+    }
+    taskEXIT_CRITICAL(&s_lock);
+    s_window_start_us = esp_timer_get_time();
+}
+
+size_t profile_format(const profile_snapshot_t *snapshot, char *buffer, size_t buffer_size) {
+    if (buffer == NULL || buffer_size == 0) {
+        return 0;
+    }
+    size_t len = 0;
+
+#define APPEND(...) do { \
+        if (len < buffer_size) { \
+            int n = snprintf(buffer + len, buffer_size - len, __VA_ARGS__); \
+            len += n > 0 ? (size_t)n : 0; \
+        } \
+    } while (0)
+
+    APPEND("p1 w=%" PRIu32, snapshot->window_s);
+    for (int i = 0; i < PROFILE_COUNT; i++) {
+        const profile_counter_t *counter = &snapshot->counters[i];
+        if (counter->count == 0) {
+            continue;
+        }
+        APPEND(" %s=%" PRIu32 "/%" PRIu64 "/%" PRIu32 "/", s_names[i], counter->count, counter->total_us,
+               counter->max_us);
+        int used = PROFILE_BUCKETS;
+        while (used > 1 && counter->buckets[used - 1] == 0) {
+            used--;
+        }
+        for (int b = 0; b < used; b++) {
+            APPEND(b == 0 ? "%" PRIu32 : ".%" PRIu32, counter->buckets[b]);
+        }
+    }
+#undef APPEND
+
+    if (len >= buffer_size) {
+        // Truncated: snprintf has already terminated it
+        len = buffer_size - 1;
+    }
+    return len;
+}
+
+const char *profile_name(profile_id_t id) {
+    return (unsigned)id < PROFILE_COUNT ? s_names[id] : "?";
+}
@@ -15,6 +15,7 @@
 #include "api_client.h"
 #include "adc_battery.h"
 #include "wifi_manager.h"
+#include "profiling.h"
 #include "esp_sleep.h"
 #include "esp_log.h"
 #include <string.h>
@@ -129,6 +130,9 @@ void send_device_status_if_appropriate(void) {
             send_status_update_with_retry("no battery detected");
             initial_no_battery_sent = true;
             ESP_LOGI(TAG, "Initial 'no battery' status sent");
+        } else if (profile_window_seconds() >= PROFILE_REPORT_INTERVAL_S) {
+            // Without battery statuses nothing else carries the profiling counters
+            send_status_update_with_retry("profile");
         } else {
             ESP_LOGD(TAG, "Skipping repeated 'no battery' status");
         }
@@ -18,6 +18,7 @@
 #include "status_reporter.h"
 #include "time_utils.h"
 #include "power_management.h"
+#include "http_client.h"
 #include "esp_log.h"
 #include <time.h>
 
@@ -45,6 +46,7 @@ void task_send_data(void *arg) {
     ESP_LOGI(TAG, "Starting initial network connection (attempt 1 of 15)");
     if (initialize_network_connection(15)) {
         ESP_LOGI(TAG, "WiFi connected successfully, performing initial setup");
+        http_session_begin();
 
         // Send WiFi connection status (initial connection = true)
         ESP_LOGI(TAG, "Sending WiFi connection status");
@@ -66,6 +68,7 @@ void task_send_data(void *arg) {
             ESP_LOGW(TAG, "Failed to process stored readings, will retry later");
         }
 
+        http_session_end();
         context->wifi_send_failed = false;
         ESP_LOGI(TAG, "Initial setup completed successfully");
     } else {
@@ -109,6 +112,7 @@ void task_send_data(void *arg) {
 
             if (initialize_network_connection(15)) {
                 ESP_LOGI(TAG, "Network connection established - proceeding with data operations");
+                http_session_begin();
 
                 // Handle NTP synchronization
                 ESP_LOGI(TAG, "Checking NTP synchronization requirements");
@@ -118,14 +122,15 @@ void task_send_data(void *arg) {
                 ESP_LOGI(TAG, "Sending device status update");
                 send_device_status_if_appropriate();
 
-                // Send any stored readings first if previous send failed
+                // Send any stored readings first: those saved when a previous send failed,
+                // and any left over from a catch-up larger than one load
                 if (context->wifi_send_failed) {
                     ESP_LOGI(TAG, "Previous send failed, attempting to send stored readings first");
-                    if (send_all_stored_readings()) {
-                        ESP_LOGI(TAG, "Successfully sent stored readings");
-                    } else {
-                        ESP_LOGW(TAG, "Failed to send stored readings");
-                    }
+                }
+                if (send_all_stored_readings()) {
+                    ESP_LOGI(TAG, "Stored readings processed");
+                } else {
+                    ESP_LOGW(TAG, "Failed to send stored readings");
                 }
 
                 // Send current buffered readings
@@ -144,6 +149,7 @@ void task_send_data(void *arg) {
 
                 context->wifi_send_failed = !send_success;
 
+                http_session_end();
                 ESP_LOGI(TAG, "Disconnecting WiFi for power savings");
                 disconnect_wifi_for_power_saving();
 
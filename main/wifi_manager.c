@@ -17,6 +17,7 @@
 #include "esp_event.h"
 #include "esp_netif.h"
 #include "wifi_manager.h"
+#include "profiling.h"
 #include "sdkconfig.h"
 #include <stdbool.h>
 
@@ -139,6 +140,8 @@ static int s_num_networks = 0;
 static int s_current_network_index = 0;
 static int s_reconnect_retries = 0;
 static bool s_is_connected = false;
+// When the WiFi stack last started, until it gets an IP address (0 when not connecting)
+static int64_t s_connect_start_us = 0;
 static bool s_is_initialized = false;
 
 // Forward declaration
@@ -152,6 +155,7 @@ static void wifi_event_handler(void* arg, esp_event_base_t event_base, int32_t e
     if (event_base == WIFI_EVENT && event_id == WIFI_EVENT_STA_START)
     {
         ESP_LOGI(TAG, "WiFi stack started - beginning connection sequence");
+        s_connect_start_us = profile_begin();
         try_to_connect(); // Start connection attempts when WiFi stack is ready
     }
     else if (event_base == WIFI_EVENT && event_id == WIFI_EVENT_STA_DISCONNECTED)
@@ -203,6 +207,10 @@ static void wifi_event_handler(void* arg, esp_event_base_t event_base, int32_t e
         ESP_LOGI(TAG, "Successfully connected to '%s' with IP: " IPSTR, s_wifi_networks[s_current_network_index].ssid,
                  IP2STR(&event->ip_info.ip));
         ESP_LOGI(TAG, "Connection successful - resetting retry counters");
+        if (s_connect_start_us != 0) {
+            profile_end(PROFILE_WIFI_CONNECT, s_connect_start_us);
+            s_connect_start_us = 0;
+        }
         s_reconnect_retries = 0;
         s_is_connected = true;
     }
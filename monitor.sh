@@ -1,4 +1,7 @@
-while true; do
-    python -m serial.tools.miniterm /dev/ttyACM0 115200 --raw
-    sleep 1
-done
\ No newline at end of file
+#!/bin/sh
+
+# Show the serial log of every connected sensor, reconnecting when a board
+# resets, and keep a rotating JSONL copy in .pio/logs.  Pass ports to watch
+# only some boards, e.g. ./monitor.sh /dev/ttyACM0=sensor_1
+
+python -m tools.serial_monitor --output .pio/logs "$@"
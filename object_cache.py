@@ -0,0 +1,48 @@
+"""
+object_cache.py
+
+A pre-build script for PlatformIO that routes compiler invocations through
+the shared object cache in tools/objcache.py.
+
+The cache is only enabled when OBJCACHE_DIR is set (build.py sets it unless
+--no-cache is given), so plain `pio run` builds behave exactly as before.
+OBJCACHE_STATS names a JSON file that receives this build's hit/miss counts.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import atexit
+import os
+import shlex
+import sys
+
+Import("env")
+
+cache_dir = os.getenv("OBJCACHE_DIR")
+
+if cache_dir:
+    sys.path.insert(0, env.subst("$PROJECT_DIR"))
+    from tools.objcache import ObjectCache
+
+    cache = ObjectCache(cache_dir, build_dir=env.subst("$BUILD_DIR"))
+    original_spawn = env["SPAWN"]
+
+    def cached_spawn(sh, escape, cmd, args, spawn_env):
+        """Serve compiles from the cache; hand everything else to the normal spawner."""
+        argv = shlex.split(" ".join(args))
+        compiler = os.path.basename(argv[0]) if argv else ""
+        if compiler.endswith(("gcc", "g++", "cc", "c++", "clang", "clang++")):
+            result = cache.compile(argv, env=spawn_env)
+            if result is not None:
+                return result
+        return original_spawn(sh, escape, cmd, args, spawn_env)
+
+    # Set before the platform builder runs so every cloned component
+    # environment inherits the cached spawner.
+    env.Replace(SPAWN=cached_spawn)
+
+    stats_path = os.getenv("OBJCACHE_STATS")
+    if stats_path:
+        atexit.register(cache.write_stats, stats_path)
+
+    print(f"Object cache enabled: {cache.cache_dir}")
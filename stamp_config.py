@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+ESP32-C3 Sensor Config Stamper
+
+Build once, flash many: instead of compiling a firmware image per sensor,
+build the generic `sensor_generic` environment once and give every sensor
+its own small NVS partition image holding its settings. The firmware reads
+them from the `sensor_cfg` partition at boot (see main/device_config.c).
+
+Usage:
+    ./stamp_config.py [sensor_section ...] [--out DIR] [--benchmark N]
+
+Examples:
+    ./stamp_config.py                     # Stamp every section in credentials.ini
+    ./stamp_config.py sensor_1 sensor_2   # Stamp two sensors
+    ./build.py sensor_generic             # Build the shared firmware image once
+    ./stamp_config.py --benchmark 100     # Measure image generation throughput
+
+Arguments:
+    sensor_section - Section names from credentials.ini (default: all of them)
+    --out DIR      - Output directory (default: .pio/stamped)
+    --benchmark N  - Generate every image N times in memory and report images/sec
+
+For each sensor this writes <out>/<section>/sensor_cfg.bin and prints the
+esptool command that flashes it next to the generic firmware. Images are
+built in-process by tools/nvs_image.py.
+"""
+
+import argparse
+import configparser
+import os
+import sys
+import time
+
+from tools.nvs_image import NvsImageError, build_image
+from tools.partitions import find_partition
+from tools.sensor_config import json_reading_problem, nvs_length_problem
+
+CREDENTIALS_FILE = "credentials.ini"
+PARTITIONS_FILE = "partitions.csv"
+CONFIG_PARTITION = "sensor_cfg"
+CONFIG_NAMESPACE = "sensor_cfg"
+GENERIC_ENV = "sensor_generic"
+DEFAULT_OUT_DIR = os.path.join(".pio", "stamped")
+
+# (NVS key, credentials.ini option, type, default) - keys must match main/device_config.c
+SETTINGS = [
+    ("sensor_id", "sensor_id", "string", None),
+    ("bearer_token", "bearer_token", "string", None),
+    ("wifi_creds", "wifi_credentials", "string", None),
+    ("sensor_set_id", "sensor_set_id", "string", None),
+    ("local_tz", "local_timezone", "string", "CST6CDT,M3.2.0/2,M11.1.0/2"),
+    ("sda_gpio", "sda_gpio", "i32", None),
+    ("scl_gpio", "scl_gpio", "i32", None),
+    ("battery_gpio", "battery_adc_gpio", "i32", "-1"),
+    ("night_start", "night_start_hour", "i32", "22"),
+    ("night_end", "night_end_hour", "i32", "4"),
+]
+
+
+class StampError(Exception):
+    """Raised when a sensor's settings cannot be turned into a config image."""
+
+
+def sensor_entries(config, section):
+    """
+    Collect the NVS entries for one sensor section.
+
+    Args:
+        config (ConfigParser): Parsed credentials.ini
+        section (str): Sensor section name
+
+    Returns:
+        list: (key, type, value) tuples in the order they are written
+    """
+    url = config.get("all_sensors", "url")
+    problem = nvs_length_problem("url", url)
+    if problem:
+        raise StampError(f"{problem} (in section [all_sensors])")
+    entries = [("api_url", "string", url)]
+    for key, option, value_type, default in SETTINGS:
+        value = config.get(section, option, fallback=default)
+        if value is None:
+            raise StampError(f"Missing '{option}' in section [{section}]")
+        problem = nvs_length_problem(option, value) if value_type == "string" else None
+        if problem:
+            raise StampError(f"{problem} (in section [{section}])")
+        if value_type == "i32":
+            try:
+                int(value)
+            except ValueError:
+                raise StampError(f"'{option}' in section [{section}] is not an integer: {value}")
+        entries.append((key, value_type, value))
+    values = {key: value for key, _value_type, value in entries}
+    problem = json_reading_problem(values["sensor_id"], values["sensor_set_id"])
+    if problem:
+        raise StampError(f"{problem} (in section [{section}])")
+    return entries
+
+
+def sensor_image(config, section, partition):
+    """
+    Build the config partition image for one sensor.
+
+    Args:
+        config (ConfigParser): Parsed credentials.ini
+        section (str): Sensor section name
+        partition (Partition): The sensor_cfg partition
+
+    Returns:
+        bytes: The partition image
+    """
+    try:
+        return build_image(partition.size, CONFIG_NAMESPACE, sensor_entries(config, section))
+    except NvsImageError as e:
+        raise StampError(f"[{section}]: {e}")
+
+
+def stamp_sensor(config, section, out_dir, partition):
+    """
+    Write the config partition image for one sensor.
+
+    Args:
+        config (ConfigParser): Parsed credentials.ini
+        section (str): Sensor section name
+        out_dir (str): Root output directory
+        partition (Partition): The sensor_cfg partition
+
+    Returns:
+        str: Path of the generated image
+    """
+    image = sensor_image(config, section, partition)
+    sensor_dir = os.path.join(out_dir, section)
+    os.makedirs(sensor_dir, exist_ok=True)
+    bin_path = os.path.join(sensor_dir, "sensor_cfg.bin")
+    with open(bin_path, "wb") as f:
+        f.write(image)
+    return bin_path
+
+
+def run_benchmark(config, sections, partition, rounds):
+    """
+    Generate every sensor's image repeatedly in memory and report throughput.
+
+    Args:
+        config (ConfigParser): Parsed credentials.ini
+        sections (list): Sensor section names
+        partition (Partition): The sensor_cfg partition
+        rounds (int): Number of times to build each image
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for section in sections:
+            sensor_image(config, section, partition)
+    elapsed = time.perf_counter() - start
+    count = rounds * len(sections)
+    print(f"[INFO] Generated {count} images of {partition.size} bytes in {elapsed:.3f}s "
+          f"({count / elapsed:.0f} images/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate per-sensor config partition images")
+    parser.add_argument("sections", nargs="*", help="sensor sections from credentials.ini")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="output directory")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="build every image N times in memory and report images/sec")
+    args = parser.parse_args()
+
+    if not os.path.exists(CREDENTIALS_FILE):
+        print(f"[ERROR] {CREDENTIALS_FILE} not found. Please run this script from the project root directory.")
+        sys.exit(1)
+
+    partition = find_partition(CONFIG_PARTITION, PARTITIONS_FILE)
+    if partition is None:
+        print(f"[ERROR] No '{CONFIG_PARTITION}' partition in {PARTITIONS_FILE}")
+        sys.exit(1)
+
+    config = configparser.ConfigParser()
+    config.read(CREDENTIALS_FILE)
+    if not config.has_section("all_sensors"):
+        print(f"[ERROR] Section '[all_sensors]' not found in {CREDENTIALS_FILE}")
+        sys.exit(1)
+
+    sections = args.sections or [s for s in config.sections() if s != "all_sensors"]
+    missing = [s for s in sections if not config.has_section(s)]
+    if missing:
+        print(f"[ERROR] Sections not found in {CREDENTIALS_FILE}: {', '.join(missing)}")
+        sys.exit(1)
+
+    if args.benchmark:
+        try:
+            run_benchmark(config, sections, partition, args.benchmark)
+        except StampError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        return
+
+    results = []
+    start = time.monotonic()
+    for section in sections:
+        try:
+            results.append((section, stamp_sensor(config, section, args.out, partition), None))
+        except StampError as e:
+            results.append((section, None, str(e)))
+    elapsed = time.monotonic() - start
+
+    failed = 0
+    for section, bin_path, error in results:
+        if error:
+            failed += 1
+            print(f"[ERROR] {error}")
+        else:
+            print(f"[INFO] {section}: {bin_path}")
+
+    firmware = os.path.join(".pio", "build", GENERIC_ENV, "firmware.bin")
+    app_partition = find_partition("factory", PARTITIONS_FILE)
+    print(f"\n[INFO] Stamped {len(results) - failed}/{len(results)} sensors in {elapsed:.2f}s")
+    print(f"[INFO] After uploading {GENERIC_ENV} once (for the bootloader and partition table),")
+    print(f"[INFO] flash a sensor with the shared image and its config partition:")
+    print(f"       esptool.py write_flash {hex(app_partition.offset)} {firmware} "
+          f"{hex(partition.offset)} {os.path.join(args.out, '<section>', 'sensor_cfg.bin')}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Host-side tooling for the ESP32 sunlight sensor project.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
@@ -0,0 +1,349 @@
+"""
+batch_codec.py
+
+Reference encoder/decoder for the compact binary readings batch the firmware
+sends instead of a JSON array (main/batch_codec.c), with the test vectors in
+batch_vectors.json.
+
+A batch carries the sensor ids once and the readings as columns. All
+integers are little-endian:
+
+    offset  size       field
+    0       3          magic "SLB"
+    3       1          format version (1)
+    4       2          reading count N (u16)
+    6       1          sensor_id length L1, then L1 bytes of UTF-8
+    ...     1          sensor_set_id length L2, then L2 bytes of UTF-8
+    ...     8          first timestamp, Unix seconds (i64)
+    ...     varies     N-1 timestamp deltas, zigzag LEB128 varints
+    ...     4*N        light_intensity, float32
+    ...     4*N        chip_temp_c, float32 (-999 when the reading failed)
+
+chip_temp_f is not sent; the decoder derives it the way the firmware does,
+in float32. A 50-reading chunk is under 500 bytes instead of about 8 KB of
+formatted JSON.
+
+    python -m tools.batch_codec check
+    python -m tools.batch_codec check --firmware   # also main/batch_codec.c, built for the host
+    python -m tools.batch_codec decode batch.bin
+    python -m tools.batch_codec vectors > tools/batch_vectors.json
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+CONTENT_TYPE = "application/vnd.sunlight.batch"
+MAGIC = b"SLB"
+VERSION = 1
+MAX_READINGS = 0xFFFF
+MAX_ID_LENGTH = 0xFF
+TEMP_UNAVAILABLE = -999.0
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+VECTORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_vectors.json")
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRMWARE_SOURCES = [os.path.join(PROJECT_DIR, "tools", "host", "batch_vectors.c"),
+                    os.path.join(PROJECT_DIR, "main", "batch_codec.c")]
+DEFAULT_BUILD_DIR = os.path.join(PROJECT_DIR, ".pio", "batch_vectors")
+
+_HEADER = struct.Struct("<3sBH")
+_TIMESTAMP = struct.Struct("<q")
+_F32 = struct.Struct("<f")
+
+
+class BatchFormatError(Exception):
+    """Raised when a batch cannot be encoded or decoded."""
+
+
+def _f32(value):
+    return _F32.unpack(_F32.pack(value))[0]
+
+
+def chip_temp_f(chip_temp_c):
+    """Fahrenheit exactly as task_get_sensor_data.c computes it in float32."""
+    if chip_temp_c == TEMP_UNAVAILABLE:
+        return TEMP_UNAVAILABLE
+    return _f32(_f32(_f32(chip_temp_c * 9.0) / 5.0) + 32.0)
+
+
+def _write_varint(out, value):
+    zigzag = (value << 1) ^ (value >> 63)
+    while zigzag >= 0x80:
+        out.append((zigzag & 0x7F) | 0x80)
+        zigzag >>= 7
+    out.append(zigzag)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise BatchFormatError("Truncated timestamp delta")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 63:
+            raise BatchFormatError("Timestamp delta too long")
+    return (result >> 1) ^ -(result & 1), pos
+
+
+def _id_bytes(name, value):
+    raw = value.encode("utf-8")
+    if len(raw) > MAX_ID_LENGTH:
+        raise BatchFormatError(f"{name} is longer than {MAX_ID_LENGTH} bytes")
+    return bytes([len(raw)]) + raw
+
+
+def encode_batch(sensor_id, sensor_set_id, readings):
+    """
+    Encode readings as one binary batch.
+
+    Args:
+        sensor_id (str): Sensor ID
+        sensor_set_id (str): Sensor set ID
+        readings (list): (timestamp, lux, chip_temp_c) tuples, timestamps in Unix seconds
+
+    Returns:
+        bytes: The encoded batch
+    """
+    if not 0 < len(readings) <= MAX_READINGS:
+        raise BatchFormatError(f"A batch holds 1 to {MAX_READINGS} readings, got {len(readings)}")
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, len(readings)))
+    out += _id_bytes("sensor_id", sensor_id)
+    out += _id_bytes("sensor_set_id", sensor_set_id)
+    out += _TIMESTAMP.pack(readings[0][0])
+    for previous, reading in zip(readings, readings[1:]):
+        _write_varint(out, reading[0] - previous[0])
+    out += struct.pack(f"<{len(readings)}f", *(reading[1] for reading in readings))
+    out += struct.pack(f"<{len(readings)}f", *(reading[2] for reading in readings))
+    return bytes(out)
+
+
+def decode_batch(data):
+    """
+    Decode a binary batch into the objects the firmware would have sent as JSON.
+
+    Args:
+        data (bytes): The encoded batch
+
+    Returns:
+        list: Reading dicts with the JSON payload's fields
+    """
+    if len(data) < _HEADER.size:
+        raise BatchFormatError("Batch shorter than its header")
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise BatchFormatError("Not a readings batch (bad magic)")
+    if version != VERSION:
+        raise BatchFormatError(f"Unsupported batch version {version}")
+    if count == 0:
+        raise BatchFormatError("Batch holds no readings")
+
+    pos = _HEADER.size
+    ids = []
+    for _ in range(2):
+        if pos >= len(data) or pos + 1 + data[pos] > len(data):
+            raise BatchFormatError("Truncated sensor ids")
+        length = data[pos]
+        try:
+            ids.append(data[pos + 1:pos + 1 + length].decode("utf-8"))
+        except UnicodeDecodeError:
+            raise BatchFormatError("Sensor ids are not UTF-8")
+        pos += 1 + length
+    sensor_id, sensor_set_id = ids
+
+    if pos + _TIMESTAMP.size > len(data):
+        raise BatchFormatError("Truncated first timestamp")
+    timestamps = [_TIMESTAMP.unpack_from(data, pos)[0]]
+    pos += _TIMESTAMP.size
+    for _ in range(count - 1):
+        delta, pos = _read_varint(data, pos)
+        timestamps.append(timestamps[-1] + delta)
+
+    if len(data) - pos != 8 * count:
+        raise BatchFormatError(f"Expected {8 * count} bytes of values, found {len(data) - pos}")
+    lux = struct.unpack_from(f"<{count}f", data, pos)
+    temps = struct.unpack_from(f"<{count}f", data, pos + 4 * count)
+
+    try:
+        return [{
+            "light_intensity": lux[i],
+            "sensor_id": sensor_id,
+            "timestamp": datetime.fromtimestamp(timestamps[i], timezone.utc).strftime(TIMESTAMP_FORMAT),
+            "sensor_set_id": sensor_set_id,
+            "chip_temp_c": temps[i],
+            "chip_temp_f": chip_temp_f(temps[i]),
+        } for i in range(count)]
+    except (OverflowError, OSError, ValueError):
+        raise BatchFormatError("Timestamp out of range")
+
+
+def build_vectors():
+    """
+    Build the test vector suite: named inputs with their expected encodings.
+
+    Returns:
+        list: Dicts with name, sensor_id, sensor_set_id, readings and hex
+    """
+    start = 1750000000
+    cases = [
+        ("single", "sensor_1", "set_a", [(start, 0.0, 25.5)]),
+        ("chunk_of_50", "sensor_1", "set_a",
+         [(start + 15 * i, _f32(100.25 * i), _f32(30.0 + i / 8)) for i in range(50)]),
+        ("temp_unavailable", "sensor_2", "set_a",
+         [(start, 12.5, TEMP_UNAVAILABLE), (start + 15, 13.0, 41.75)]),
+        ("irregular_deltas", "sensor_3", "set_b",
+         [(start, 1.0, 20.0), (start + 1, 2.0, 20.0), (start + 3600, 3.0, 20.0),
+          (start + 3590, 4.0, 20.0), (start + 86400 * 30, 5.0, 20.0)]),
+        ("empty_set_id", "s", "", [(start, 65535.0, -40.0)]),
+        ("utf8_ids", "capteur_été", "jardin", [(start, 0.5, 0.0)]),
+        ("large_timestamp", "sensor_4", "set_b", [(2 ** 32, 1.5, 2.5), (2 ** 32 + 15, 1.5, 2.5)]),
+    ]
+    return [{
+        "name": name,
+        "sensor_id": sensor_id,
+        "sensor_set_id": sensor_set_id,
+        "readings": [list(reading) for reading in readings],
+        "hex": encode_batch(sensor_id, sensor_set_id, readings).hex(),
+    } for name, sensor_id, sensor_set_id, readings in cases]
+
+
+def check_vectors(path=VECTORS_FILE):
+    """
+    Check the encoder and decoder against the stored test vectors.
+
+    Args:
+        path (str): Vector file
+
+    Returns:
+        list: Failure messages, empty when every vector passes
+    """
+    with open(path, "r") as f:
+        vectors = json.load(f)
+    failures = []
+    for vector in vectors:
+        readings = [tuple(reading) for reading in vector["readings"]]
+        expected = bytes.fromhex(vector["hex"])
+        encoded = encode_batch(vector["sensor_id"], vector["sensor_set_id"], readings)
+        if encoded != expected:
+            failures.append(f"{vector['name']}: encoding differs")
+        decoded = decode_batch(expected)
+        if [(datetime.strptime(obj["timestamp"], TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp(),
+             obj["light_intensity"], obj["chip_temp_c"]) for obj in decoded] != \
+                [(float(ts), lux, temp) for ts, lux, temp in readings] or \
+                any(obj["sensor_id"] != vector["sensor_id"] or obj["sensor_set_id"] != vector["sensor_set_id"]
+                    for obj in decoded):
+            failures.append(f"{vector['name']}: decoding differs")
+    return failures
+
+
+def build_firmware_encoder(build_dir, cc=None):
+    """
+    Compile main/batch_codec.c with the tools/host/batch_vectors.c driver.
+
+    Args:
+        build_dir (str): Output directory
+        cc (str): C compiler (default: $CC, cc, gcc or clang)
+
+    Returns:
+        str: Path of the executable
+    """
+    cc = cc or os.environ.get("CC") or next(
+        (name for name in ("cc", "gcc", "clang") if shutil.which(name)), None)
+    if cc is None:
+        raise RuntimeError("No C compiler found; set CC")
+    os.makedirs(build_dir, exist_ok=True)
+    exe = os.path.join(build_dir, "batch_vectors")
+    cmd = [cc, "-O2", "-std=gnu11", "-Wall", "-I", os.path.join(PROJECT_DIR, "include")] + FIRMWARE_SOURCES
+    cmd += ["-o", exe]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Compile failed:\n{' '.join(cmd)}\n{result.stderr}")
+    return exe
+
+
+def check_firmware_vectors(path=VECTORS_FILE, build_dir=DEFAULT_BUILD_DIR):
+    """
+    Check that the firmware encoder reproduces the stored test vectors byte for byte.
+
+    Args:
+        path (str): Vector file
+        build_dir (str): Where to build the host encoder
+
+    Returns:
+        list: Failure messages, empty when every vector passes
+    """
+    with open(path, "r") as f:
+        vectors = json.load(f)
+    exe = build_firmware_encoder(build_dir)
+
+    def id_hex(value):
+        return value.encode("utf-8").hex() or "-"
+
+    lines = []
+    for vector in vectors:
+        lines.append(f"{len(vector['readings'])} {id_hex(vector['sensor_id'])} {id_hex(vector['sensor_set_id'])}")
+        lines += [f"{int(ts)} {float(lux).hex()} {float(temp).hex()}" for ts, lux, temp in vector["readings"]]
+    result = subprocess.run([exe], input="\n".join(lines) + "\n", capture_output=True, text=True)
+    if result.returncode != 0:
+        return [f"firmware encoder failed: {result.stderr.strip()}"]
+    outputs = result.stdout.split()
+    if len(outputs) != len(vectors):
+        return [f"firmware encoder returned {len(outputs)} results for {len(vectors)} vectors"]
+    return [f"{vector['name']}: firmware encoding differs" for vector, output in zip(vectors, outputs)
+            if output != vector["hex"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary readings batch encoder/decoder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="verify the codec against the test vectors")
+    check.add_argument("--vectors", default=VECTORS_FILE)
+    check.add_argument("--firmware", action="store_true",
+                       help="also build main/batch_codec.c for the host and check its encodings")
+    check.add_argument("--build-dir", default=DEFAULT_BUILD_DIR, help="where to build the firmware encoder")
+    decode = sub.add_parser("decode", help="print a batch file as the equivalent JSON")
+    decode.add_argument("path")
+    sub.add_parser("vectors", help="print freshly generated test vectors")
+    args = parser.parse_args()
+
+    if args.command == "vectors":
+        print(json.dumps(build_vectors(), indent=2, ensure_ascii=False))
+        return
+
+    if args.command == "decode":
+        try:
+            with open(args.path, "rb") as f:
+                print(json.dumps(decode_batch(f.read()), indent="\t"))
+        except (OSError, BatchFormatError) as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        return
+
+    failures = check_vectors(args.vectors)
+    if args.firmware:
+        try:
+            failures += check_firmware_vectors(args.vectors, args.build_dir)
+        except RuntimeError as e:
+            failures.append(str(e))
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"[INFO] All test vectors in {args.vectors} pass" + (" (Python and firmware)" if args.firmware else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+build_plan.py
+
+Decides which sensor environments need rebuilding. Each environment's
+inputs are fingerprinted:
+
+- credentials: its credentials.ini section and [all_sensors] (not for
+  custom_sensor_config = nvs, whose image carries no per-sensor values)
+- platformio: its platformio.ini section and every section it extends,
+  plus [env] and [platformio]
+- sdkconfig: sdkconfig.defaults_esp32c3_base
+- sources: main/, include/, components/, lib/, partitions.csv, the CMake
+  files, the extra_scripts in platformio.ini and every project module they
+  import (found by parsing their imports, so a new helper is picked up)
+- lock: dependencies.lock
+- git: the commit SHA, which get_git_info.py compiles into the image
+
+build.py records the fingerprint of every successful build in a manifest
+(.pio/build_manifest.json) and skips environments whose fingerprint and
+firmware image are unchanged. File digests are cached in the manifest by
+size and mtime, so checking an up-to-date fleet only stats the sources.
+
+    python -m tools.build_plan                 # status of every sensor env
+    python -m tools.build_plan sensor_1 sensor_temp
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.generated_files import file_digest
+from tools.sensor_config import SHARED_SECTION, ConfigError, load_project_config
+
+DEFAULT_MANIFEST = os.path.join(".pio", "build_manifest.json")
+MANIFEST_VERSION = 1
+
+SOURCE_DIRS = ["main", "include", "components", "lib"]
+SOURCE_FILES = ["CMakeLists.txt", "partitions.csv"]
+# Written during the build, and covered by the git and credentials inputs
+GENERATED_FILES = {os.path.join("include", "git_version.h"), os.path.join("include", "generated_config.h")}
+SDKCONFIG_FILE = "sdkconfig.defaults_esp32c3_base"
+LOCK_FILE = "dependencies.lock"
+INPUTS = ["credentials", "platformio", "sdkconfig", "sources", "lock", "git"]
+
+
+def _digest_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _section_text(sections, section):
+    """Serialize one ini section's keys and values in a stable order."""
+    if section not in sections:
+        return f"[{section}] missing\n"
+    return f"[{section}]\n" + "".join(f"{key}={value}\n" for key, value in sorted(sections[section].items()))
+
+
+def git_sha(project_dir):
+    """Return the HEAD commit SHA, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=project_dir,
+                                       stderr=subprocess.DEVNULL).decode("utf-8").strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def script_modules(project_dir, scripts):
+    """
+    Find the project's Python files a set of scripts depends on.
+
+    Follows absolute imports that resolve to a file under project_dir
+    (e.g. tools.sensor_config -> tools/sensor_config.py), recursively.
+    Standard library and installed packages are not part of the result.
+
+    Args:
+        project_dir (str): Project root
+        scripts (list): Script paths, relative to project_dir
+
+    Returns:
+        list: The scripts and the modules they import, relative to project_dir, sorted
+    """
+    def module_files(module):
+        parts = module.split(".")
+        candidates = [os.path.join(*parts[:i], "__init__.py") for i in range(1, len(parts) + 1)]
+        candidates.append(os.path.join(*parts) + ".py")
+        return [path for path in candidates if os.path.isfile(os.path.join(project_dir, path))]
+
+    found = set()
+    pending = list(scripts)
+    while pending:
+        relative = os.path.normpath(pending.pop())
+        path = os.path.join(project_dir, relative)
+        if relative in found or not os.path.isfile(path):
+            continue
+        found.add(relative)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read(), relative)
+        except (OSError, SyntaxError, ValueError):
+            # Still fingerprinted as a file; only its imports are unknown
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                # "from tools import x" may name a module as well as an attribute
+                modules = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            for module in modules:
+                pending.extend(module_files(module))
+    return sorted(found)
+
+
+class BuildManifest:
+    """
+    The last successful build of each environment, and a digest cache for
+    the source files.
+
+    Args:
+        path (str): Manifest file (created on first save)
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = path
+        self.envs = {}
+        self.files = {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.envs = data.get("envs", {})
+                self.files = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def cached_digest(self, path):
+        """
+        Return a file's digest, hashing it only if its size or mtime changed.
+
+        Returns:
+            str: Hex digest, or None if the file does not exist
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.files.pop(path, None)
+            return None
+        cached = self.files.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = file_digest(path)
+        self.files[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def record(self, env_name, fingerprint, artifact):
+        """Remember a successful build of env_name from the given inputs."""
+        st = os.stat(artifact)
+        self.envs[env_name] = {
+            "inputs": fingerprint,
+            "artifact": artifact,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    def forget(self, env_name):
+        self.envs.pop(env_name, None)
+
+    def save(self):
+        """Write the manifest atomically."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": MANIFEST_VERSION, "envs": self.envs, "files": self.files}, f, indent=1,
+                          sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class BuildPlanner:
+    """
+    Fingerprints environments' inputs and compares them with the manifest.
+
+    The shared inputs (sources, sdkconfig, lock file, git SHA) are computed
+    once per planner, so planning a fleet costs one pass over the sources.
+
+    Args:
+        manifest (BuildManifest): Previous builds
+        project_dir (str): Project root
+
+    Raises:
+        ConfigError: If platformio.ini cannot be read
+    """
+
+    def __init__(self, manifest, project_dir="."):
+        self.manifest = manifest
+        self.project_dir = project_dir
+        self.project = load_project_config(project_dir)
+        self._shared = None
+
+    def _path(self, relative):
+        return os.path.join(self.project_dir, relative)
+
+    def build_scripts(self):
+        """Return the extra_scripts of every platformio.ini section, relative to the project root."""
+        scripts = set()
+        for options in self.project.platformio_sections.values():
+            for line in options.get("extra_scripts", "").splitlines():
+                script = line.strip()
+                if script.startswith(("pre:", "post:")):
+                    script = script.split(":", 1)[1]
+                if script:
+                    scripts.add(script)
+        return sorted(scripts)
+
+    def source_files(self):
+        """Return every source input, relative to the project root, sorted."""
+        files = [name for name in SOURCE_FILES if os.path.isfile(self._path(name))]
+        files += script_modules(self.project_dir, self.build_scripts())
+        for directory in SOURCE_DIRS:
+            for root, dirs, names in os.walk(self._path(directory)):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in names:
+                    relative = os.path.relpath(os.path.join(root, name), self.project_dir)
+                    if relative not in GENERATED_FILES and not name.startswith("."):
+                        files.append(relative)
+        return sorted(files)
+
+    def shared_inputs(self):
+        """Return the digests of the inputs every environment shares."""
+        if self._shared is None:
+            sources = hashlib.sha256()
+            for relative in self.source_files():
+                digest = self.manifest.cached_digest(self._path(relative))
+                sources.update(f"{relative}\0{digest}\n".encode("utf-8"))
+            self._shared = {
+                "sdkconfig": self.manifest.cached_digest(self._path(SDKCONFIG_FILE)),
+                "sources": sources.hexdigest(),
+                "lock": self.manifest.cached_digest(self._path(LOCK_FILE)),
+                "git": git_sha(self.project_dir),
+            }
+        return self._shared
+
+    def fingerprint(self, env_name):
+        """
+        Return the digest of each input of an environment.
+
+        Returns:
+            dict: Input name (see INPUTS) -> digest
+        """
+        env = self.project.envs.get(env_name)
+        chain = list(env.chain if env else [f"env:{env_name}"]) + ["platformio"]
+        platformio = "".join(_section_text(self.project.platformio_sections, section) for section in chain)
+        if self.project.config_mode(env_name) == "nvs":
+            credentials = "nvs"
+        else:
+            sections = self.project.credential_sections
+            credentials = _section_text(sections, SHARED_SECTION) + _section_text(sections, env_name)
+        fingerprint = {"credentials": _digest_text(credentials), "platformio": _digest_text(platformio)}
+        fingerprint.update(self.shared_inputs())
+        return fingerprint
+
+    def stale_reason(self, env_name, fingerprint, artifact):
+        """
+        Explain why an environment needs building.
+
+        Args:
+            env_name (str): Environment name
+            fingerprint (dict): Its current inputs, from fingerprint()
+            artifact (str): Path of the firmware image a build produces
+
+        Returns:
+            str: The reason, or None if the last build is still current
+        """
+        entry = self.manifest.envs.get(env_name)
+        if entry is None:
+            return "never built"
+        try:
+            st = os.stat(artifact)
+        except OSError:
+            return "firmware image missing"
+        if entry.get("artifact") != artifact or st.st_size != entry.get("size") or \
+                st.st_mtime_ns != entry.get("mtime_ns"):
+            return "firmware image changed outside build.py"
+        changed = [name for name in INPUTS if entry["inputs"].get(name) != fingerprint.get(name)]
+        if changed:
+            return f"{', '.join(changed)} changed"
+        return None
+
+    def plan(self, env_names, artifact_for):
+        """
+        Split environments into those to build and those that are current.
+
+        Args:
+            env_names (list): Environments to consider
+            artifact_for (callable): env name -> firmware image path
+
+        Returns:
+            tuple: (stale, current) where stale is a list of (env, reason, fingerprint)
+                   and current is a list of env names
+        """
+        stale, current = [], []
+        for env_name in env_names:
+            fingerprint = self.fingerprint(env_name)
+            reason = self.stale_reason(env_name, fingerprint, artifact_for(env_name))
+            if reason:
+                stale.append((env_name, reason, fingerprint))
+            else:
+                current.append(env_name)
+        return stale, current
+
+
+def main():
+    from build import discover_sensor_envs, firmware_path
+
+    parser = argparse.ArgumentParser(description="Show which sensor environments need rebuilding")
+    parser.add_argument("envs", nargs="*", help="environments to check (default: every sensor env)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    if not os.path.exists("platformio.ini"):
+        print("[ERROR] platformio.ini not found. Please run this from the project root directory.")
+        sys.exit(1)
+
+    start = time.monotonic()
+    manifest = BuildManifest(args.manifest)
+    try:
+        planner = BuildPlanner(manifest)
+        stale, current = planner.plan(args.envs or discover_sensor_envs(), firmware_path)
+    except ConfigError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    elapsed_ms = (time.monotonic() - start) * 1000
+
+    for env_name in current:
+        built_at = manifest.envs[env_name]["built_at"]
+        print(f"{env_name:<20} up to date (built {built_at})")
+    for env_name, reason, _fingerprint in stale:
+        print(f"{env_name:<20} stale: {reason}")
+    print(f"[INFO] {len(stale)} to build, {len(current)} up to date (planned in {elapsed_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
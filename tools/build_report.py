@@ -0,0 +1,443 @@
+"""
+build_report.py
+
+Machine-readable reports of build.py runs. For every environment built, a
+report records:
+
+- phase timings: clean, compile, link and upload (the sdkconfig copy is
+  timed once per run)
+- each pio command's exit status and peak RSS
+- the artifacts produced, with their sizes
+- flash, IRAM and DRAM use from the linker map (see tools/map_analyzer.py)
+
+PlatformIO compiles and links in one `pio run`, so its output is read line by
+line: the compile phase runs from the start of the command (including
+PlatformIO's own configuration) to the "Linking ...firmware.elf" line, and
+the link phase from there to the end (ELF to binary conversion and the size
+check included).
+
+Each run is written to .pio/reports/build-<time>.json, and one row per
+environment is appended to .pio/reports/build_history.csv, so build times
+and image sizes can be followed from commit to commit:
+
+    python -m tools.build_report                   # the latest run
+    python -m tools.build_report --history sensor_temp
+    python -m tools.build_report --compare         # regressions against the previous commit
+    python -m tools.build_report --export fleet.json   # every run as one JSON (or .csv)
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import csv
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from tools.build_plan import git_sha
+
+DEFAULT_REPORT_DIR = os.path.join(".pio", "reports")
+HISTORY_FILE = "build_history.csv"
+REPORT_VERSION = 1
+
+PHASES = ["clean", "sdkconfig", "compile", "link", "upload"]
+LINK_MARKER = re.compile(r"^Linking .*\.elf")
+# Files PlatformIO leaves in .pio/build/<env>/ that are worth tracking
+ARTIFACTS = ["firmware.bin", "firmware.elf", "firmware.map", "bootloader.bin", "partitions.bin"]
+
+HISTORY_FIELDS = ["started_at", "commit", "mode", "env", "success", "exit_status", "total_seconds"] + \
+    [f"{phase}_seconds" for phase in PHASES] + ["peak_rss_kb", "firmware_bytes", "elf_bytes"]
+
+# Default thresholds for --compare
+DEFAULT_TIME_REGRESSION = 0.20
+DEFAULT_SIZE_REGRESSION = 1024
+
+CommandResult = collections.namedtuple("CommandResult", ["returncode", "seconds", "peak_rss_kb", "marks"])
+
+
+def _timestamp():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _maxrss_kb(rusage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if rusage is None:
+        return None
+    return rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+
+
+def run_monitored(command, out=None, markers=None):
+    """
+    Run a shell command, copying its output to out line by line.
+
+    Args:
+        command (str): The command to execute
+        out (file): Where the output goes (None discards it)
+        markers (dict): Name -> compiled regex; the time of the first output
+                        line matching each is recorded
+
+    Returns:
+        CommandResult: Exit status, seconds, peak RSS of the largest process in
+                       the command's tree (kB, None where unavailable), and
+                       marker name -> seconds after the start
+    """
+    markers = markers or {}
+    env = None
+    if out is sys.stdout and sys.stdout.isatty():
+        # Output is piped through here, so tell PlatformIO the terminal can take colors
+        env = dict(os.environ, PLATFORMIO_FORCE_ANSI="true")
+
+    start = time.monotonic()
+    marks = {}
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    for raw in proc.stdout:
+        line = raw.decode("utf-8", errors="replace")
+        for name, pattern in markers.items():
+            if name not in marks and pattern.search(line):
+                marks[name] = time.monotonic() - start
+        if out is not None:
+            out.write(line)
+            out.flush()
+    proc.stdout.close()
+
+    rusage = None
+    if hasattr(os, "wait4"):
+        # wait4 reports the peak RSS of the shell and everything it waited for (pio, the compilers)
+        _pid, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    else:
+        proc.wait()
+    return CommandResult(proc.returncode, time.monotonic() - start, _maxrss_kb(rusage), marks)
+
+
+class EnvReport:
+    """
+    What happened while building one environment.
+
+    Args:
+        env (str): Environment name
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.started_at = _timestamp()
+        self.phases = {}
+        self.commands = {}
+        self.artifacts = {}
+        self.success = None
+        self.log = None
+        self.memory = None
+        self.warnings = []
+
+    def add_phase(self, phase, seconds):
+        """Add time to a phase (a phase may be timed in several pieces)."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def record_command(self, phase, result):
+        """Record the exit status and peak RSS of the pio command run for a phase."""
+        self.commands[phase] = {"exit_status": result.returncode, "seconds": round(result.seconds, 3),
+                                "peak_rss_kb": result.peak_rss_kb}
+
+    def record_build(self, result):
+        """Record `pio run`, splitting its time into compile and link at the link marker."""
+        self.record_command("compile", result)
+        link_start = result.marks.get("link")
+        if link_start is None:
+            self.add_phase("compile", result.seconds)
+        else:
+            self.add_phase("compile", link_start)
+            self.add_phase("link", result.seconds - link_start)
+
+    @property
+    def exit_status(self):
+        """The first non-zero exit status of a pio command, or 0."""
+        return next((c["exit_status"] for c in self.commands.values() if c["exit_status"]), 0)
+
+    @property
+    def peak_rss_kb(self):
+        values = [c["peak_rss_kb"] for c in self.commands.values() if c["peak_rss_kb"] is not None]
+        return max(values) if values else None
+
+    def collect_artifacts(self, build_dir):
+        """Record the path and size of every artifact present in build_dir."""
+        for name in ARTIFACTS:
+            path = os.path.join(build_dir, name)
+            if os.path.isfile(path):
+                self.artifacts[name] = {"path": path, "bytes": os.path.getsize(path)}
+
+    def to_dict(self):
+        return {
+            "env": self.env,
+            "started_at": self.started_at,
+            "success": self.success,
+            "exit_status": self.exit_status,
+            "total_seconds": round(sum(self.phases.values()), 3),
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            "peak_rss_kb": self.peak_rss_kb,
+            "commands": self.commands,
+            "artifacts": self.artifacts,
+            "memory": self.memory,
+            "warnings": self.warnings,
+            "log": self.log,
+        }
+
+
+class RunReport:
+    """
+    One invocation of build.py: its options, the run-wide phases and a
+    report per environment built.
+
+    Args:
+        mode (str): "single" or "fleet"
+        options (dict): The build options worth keeping (clean, jobs, ...)
+        project_dir (str): Project root, for the commit SHA
+    """
+
+    def __init__(self, mode, options, project_dir="."):
+        self.mode = mode
+        self.options = options
+        self.started_at = _timestamp()
+        self.commit = git_sha(project_dir)
+        self.phases = {}
+        self.envs = []
+        self.skipped = []
+        self._start = time.monotonic()
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_env(self, env_report):
+        self.envs.append(env_report)
+
+    def to_dict(self):
+        return {
+            "version": REPORT_VERSION,
+            "started_at": self.started_at,
+            "commit": self.commit,
+            "mode": self.mode,
+            "options": self.options,
+            "wall_seconds": round(time.monotonic() - self._start, 3),
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            "skipped": self.skipped,
+            "envs": [env_report.to_dict() for env_report in sorted(self.envs, key=lambda r: r.env)],
+        }
+
+    def history_rows(self, report=None):
+        """Return one HISTORY_FIELDS row per environment built."""
+        report = report or self.to_dict()
+        return [history_row(report, env) for env in report["envs"]]
+
+    def write(self, report_dir=DEFAULT_REPORT_DIR):
+        """
+        Write the run's JSON report and append its rows to the history CSV.
+
+        Returns:
+            str: Path of the JSON report
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        report = self.to_dict()
+        stamp = self.started_at.replace("-", "").replace(":", "")
+        path = os.path.join(report_dir, f"build-{stamp}.json")
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(report_dir, f"build-{stamp}-{suffix}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        rows = self.history_rows(report)
+        if rows:
+            history_path = os.path.join(report_dir, HISTORY_FILE)
+            new_file = not os.path.exists(history_path)
+            with open(history_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        return path
+
+
+def history_row(report, env):
+    """Flatten one environment of a run report into a HISTORY_FIELDS row."""
+    phases = dict(report.get("phases", {}), **env["phases"])
+    row = {
+        "started_at": env["started_at"],
+        "commit": report["commit"],
+        "mode": report["mode"],
+        "env": env["env"],
+        "success": env["success"],
+        "exit_status": env["exit_status"],
+        "total_seconds": env["total_seconds"],
+        "peak_rss_kb": env["peak_rss_kb"],
+        "firmware_bytes": env["artifacts"].get("firmware.bin", {}).get("bytes"),
+        "elf_bytes": env["artifacts"].get("firmware.elf", {}).get("bytes"),
+    }
+    row.update({f"{phase}_seconds": phases.get(phase) for phase in PHASES})
+    return row
+
+
+def load_reports(report_dir=DEFAULT_REPORT_DIR):
+    """Return every run report in report_dir, oldest first."""
+    reports = []
+    for path in sorted(glob.glob(os.path.join(report_dir, "build-*.json"))):
+        try:
+            with open(path, "r") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if report.get("version") == REPORT_VERSION:
+            reports.append(report)
+    reports.sort(key=lambda r: r["started_at"])
+    return reports
+
+
+def load_history(report_dir=DEFAULT_REPORT_DIR):
+    """Return the rows of the history CSV, oldest first."""
+    try:
+        with open(os.path.join(report_dir, HISTORY_FILE), "r", newline="") as f:
+            return list(csv.DictReader(f))
+    except OSError:
+        return []
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_regressions(rows, time_threshold=DEFAULT_TIME_REGRESSION, size_threshold=DEFAULT_SIZE_REGRESSION):
+    """
+    Compare each environment's latest successful build with its latest
+    successful build from a different commit.
+
+    Args:
+        rows (list): History rows, oldest first
+        time_threshold (float): Flag builds this fraction slower
+        size_threshold (int): Flag images this many bytes larger
+
+    Returns:
+        list: (env, metric, before, after, previous commit, commit) tuples
+    """
+    by_env = collections.defaultdict(list)
+    for row in rows:
+        if row["success"] == "True":
+            by_env[row["env"]].append(row)
+
+    regressions = []
+    for env, env_rows in sorted(by_env.items()):
+        latest = env_rows[-1]
+        previous = next((row for row in reversed(env_rows) if row["commit"] != latest["commit"]), None)
+        if previous is None:
+            continue
+        for metric in ("compile_seconds", "link_seconds", "total_seconds"):
+            before, after = _number(previous[metric]), _number(latest[metric])
+            if before and after is not None and after > before * (1 + time_threshold):
+                regressions.append((env, metric, before, after, previous["commit"], latest["commit"]))
+        for metric in ("firmware_bytes", "elf_bytes"):
+            before, after = _number(previous[metric]), _number(latest[metric])
+            if before is not None and after is not None and after - before > size_threshold:
+                regressions.append((env, metric, before, after, previous["commit"], latest["commit"]))
+    return regressions
+
+
+def format_run(report):
+    """Format one run report as a table."""
+    lines = [f"Run {report['started_at']} ({report['mode']}) at commit {(report['commit'] or 'unknown')[:10]}, "
+             f"{report['wall_seconds']:.1f}s wall time"]
+    for phase, seconds in report["phases"].items():
+        lines.append(f"  {phase}: {seconds:.2f}s")
+    if report["skipped"]:
+        lines.append(f"  up to date: {', '.join(report['skipped'])}")
+    if not report["envs"]:
+        return "\n".join(lines)
+    width = max(len("Environment"), max(len(env["env"]) for env in report["envs"]))
+    lines.append(f"{'Environment':<{width}}  {'Exit':>4}  {'Clean':>7}  {'Compile':>8}  {'Link':>7}  "
+                 f"{'Upload':>7}  {'Peak RSS':>9}  {'Image':>10}")
+    for env in report["envs"]:
+        phases = env["phases"]
+        cells = [f"{phases[phase]:.1f}s" if phase in phases else "-"
+                 for phase in ("clean", "compile", "link", "upload")]
+        rss = f"{env['peak_rss_kb'] / 1024:.0f} MB" if env["peak_rss_kb"] else "-"
+        image = env["artifacts"].get("firmware.bin", {}).get("bytes")
+        lines.append(f"{env['env']:<{width}}  {env['exit_status']:>4}  {cells[0]:>7}  {cells[1]:>8}  {cells[2]:>7}  "
+                     f"{cells[3]:>7}  {rss:>9}  {f'{image:,}' if image is not None else '-':>10}")
+    return "\n".join(lines)
+
+
+def export(reports, path):
+    """Write every run as one JSON document, or every environment build as CSV rows."""
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS)
+            writer.writeheader()
+            for report in reports:
+                writer.writerows(history_row(report, env) for env in report["envs"])
+    else:
+        with open(path, "w") as f:
+            json.dump({"version": REPORT_VERSION, "runs": reports}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show build.py's build reports and trends")
+    parser.add_argument("--dir", default=DEFAULT_REPORT_DIR, help="report directory")
+    parser.add_argument("--history", metavar="ENV", help="show every recorded build of one environment")
+    parser.add_argument("--compare", action="store_true",
+                        help="flag environments that got slower or bigger since the previous commit")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_REGRESSION,
+                        help="fraction slower that counts as a regression (default: 0.2)")
+    parser.add_argument("--size-threshold", type=int, default=DEFAULT_SIZE_REGRESSION,
+                        help="bytes larger that counts as a regression (default: 1024)")
+    parser.add_argument("--export", metavar="PATH", help="write every run to PATH (.json or .csv)")
+    args = parser.parse_args()
+
+    if args.export:
+        reports = load_reports(args.dir)
+        export(reports, args.export)
+        print(f"[INFO] Wrote {len(reports)} runs to {args.export}")
+        return
+
+    if args.history or args.compare:
+        rows = load_history(args.dir)
+        if not rows:
+            print(f"[ERROR] No build history in {args.dir}")
+            sys.exit(1)
+        if args.history:
+            print(f"{'Started':<20}  {'Commit':<10}  {'OK':<5}  {'Compile':>8}  {'Link':>7}  {'Total':>8}  "
+                  f"{'Image':>10}")
+            for row in rows:
+                if row["env"] != args.history:
+                    continue
+                compile_s, link_s, total_s = (_number(row[f]) for f in ("compile_seconds", "link_seconds",
+                                                                        "total_seconds"))
+                image = _number(row["firmware_bytes"])
+                print(f"{row['started_at']:<20}  {row['commit'][:10]:<10}  {row['success']:<5}  "
+                      f"{f'{compile_s:.1f}s' if compile_s is not None else '-':>8}  "
+                      f"{f'{link_s:.1f}s' if link_s is not None else '-':>7}  "
+                      f"{f'{total_s:.1f}s' if total_s is not None else '-':>8}  "
+                      f"{f'{image:,.0f}' if image is not None else '-':>10}")
+        if args.compare:
+            regressions = find_regressions(rows, args.time_threshold, args.size_threshold)
+            for env, metric, before, after, old_commit, new_commit in regressions:
+                print(f"[WARN] {env}: {metric} {before:,.1f} -> {after:,.1f} "
+                      f"({old_commit[:10]} -> {new_commit[:10]})")
+            print(f"[INFO] {len(regressions)} regressions")
+            if regressions:
+                sys.exit(1)
+        return
+
+    reports = load_reports(args.dir)
+    if not reports:
+        print(f"[ERROR] No build reports in {args.dir}")
+        sys.exit(1)
+    print(format_run(reports[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+drain_replay.py
+
+Replay test for draining stored readings over a flaky link. Builds
+tools/host/drain_replay.c, which runs the firmware's own storage and sending
+code (persistent_storage.c, data_processor.c, api_client.c) on the host, and
+runs it against an in-process mock ingest server that fails a fraction of
+requests with 503.
+
+Each cycle is a separate process, like a sensor waking up with the readings
+partition kept in an image file: it calls send_all_stored_readings() once.
+The test checks that storage shrinks whenever any chunk was accepted, that
+it empties within --max-cycles, and that the server received every reading
+exactly once.
+
+cJSON is needed to build api_client.c; it is found as for tools/json_bench.py.
+
+    python -m tools.drain_replay
+    python -m tools.drain_replay --readings 1397 --fail-rate 0.5 --seed 7
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+from tools.json_bench import find_cjson
+from tools.mock_server import IngestServer, SqliteStore
+from tools.partitions import find_partition
+from tools.ring_store import DEFAULT_PARTITION as RING_PARTITION, capacity as ring_capacity
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST_DIR = os.path.join(PROJECT_DIR, "tools", "host")
+INCLUDE_DIR = os.path.join(PROJECT_DIR, "include")
+DEFAULT_BUILD_DIR = os.path.join(PROJECT_DIR, ".pio", "drain_replay")
+HOST_SOURCES = ["drain_replay.c", "host_platform.c", "firmware_stubs.c", "http_client_host.c"]
+FIRMWARE_SOURCES = ["data_processor.c", "api_client.c", "persistent_storage.c", "status_reporter.c", "batch_codec.c",
+                    "json_writer.c", "profiling.c"]
+
+
+def build_replay(build_dir, cjson_dir, cc=None):
+    """
+    Compile the host replay driver with the firmware sources it exercises.
+
+    Args:
+        build_dir (str): Output directory
+        cjson_dir (str): Directory with cJSON.c and cJSON.h
+        cc (str): C compiler (default: $CC, cc, gcc or clang)
+
+    Returns:
+        str: Path of the executable
+    """
+    cc = cc or os.environ.get("CC") or next(
+        (name for name in ("cc", "gcc", "clang") if shutil.which(name)), None)
+    if cc is None:
+        raise RuntimeError("No C compiler found; set CC")
+    os.makedirs(build_dir, exist_ok=True)
+    exe = os.path.join(build_dir, "drain_replay")
+    # The shims come first so they stand in for the ESP-IDF and generated headers
+    cmd = [cc, "-O1", "-g", "-std=gnu11", "-Wall",
+           "-I", os.path.join(HOST_DIR, "shim"), "-I", HOST_DIR, "-I", INCLUDE_DIR, "-I", cjson_dir]
+    cmd += [os.path.join(HOST_DIR, name) for name in HOST_SOURCES]
+    cmd += [os.path.join(PROJECT_DIR, "main", name) for name in FIRMWARE_SOURCES]
+    cmd += [os.path.join(cjson_dir, "cJSON.c"), "-o", exe, "-lm", "-lpthread"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Compile failed:\n{' '.join(cmd)}\n{result.stderr}")
+    return exe
+
+
+class FlakyServer:
+    """
+    Runs the mock ingest server on a background event loop, failing a
+    fraction of requests.
+
+    Args:
+        fail_rate (float): Fraction of valid POSTs answered 503
+        seed (int): Seed for choosing which requests fail
+    """
+
+    def __init__(self, fail_rate, seed):
+        self.server = IngestServer(SqliteStore(":memory:"), flush_interval=0.0, fail_rate=fail_rate, seed=seed)
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def start(self):
+        self._thread.start()
+        self.port = self._run(self.server.start("127.0.0.1", 0))
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/"
+
+    def received_lux(self):
+        """Return the light_intensity of every stored reading (the driver sets it to the reading's index)."""
+        return [row[0] for row in self.server.store.db.execute("SELECT light_intensity FROM readings")]
+
+    def stop(self):
+        self._run(self.server.stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def run_driver(exe, image, partition_size, command, value, verbose=False):
+    """
+    Run one boot of the driver.
+
+    Returns:
+        dict: The driver's result line (command, ok, stored, virtual_ms)
+    """
+    cmd = [exe] + (["-v"] if verbose else []) + [image, str(partition_size), command, str(value)]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL,
+                            text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} exited with {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def replay(exe, server, partition_size, readings, max_cycles, build_dir, verbose=False):
+    """
+    Store readings, then drain them one cycle at a time.
+
+    Returns:
+        list: One dict per cycle with the outcome, readings left and requests made
+    """
+    image = os.path.join(build_dir, "readings.bin")
+    if os.path.exists(image):
+        os.remove(image)
+    stored = run_driver(exe, image, partition_size, "store", readings, verbose)["stored"]
+
+    cycles = []
+    stats = server.server.stats
+    for cycle in range(1, max_cycles + 1):
+        requests_before, failures_before = stats.total_requests, stats.injected_failures
+        result = run_driver(exe, image, partition_size, "drain", server.url, verbose)
+        cycles.append({
+            "cycle": cycle,
+            "ok": result["ok"],
+            "stored_before": stored,
+            "stored": result["stored"],
+            "requests": stats.total_requests - requests_before,
+            "failed_requests": stats.injected_failures - failures_before,
+            "retry_wait_s": result["virtual_ms"] / 1000,
+        })
+        stored = result["stored"]
+        if stored == 0:
+            break
+    return cycles
+
+
+def check_replay(cycles, readings, received):
+    """
+    Check forward progress and exactly-once delivery.
+
+    Args:
+        cycles (list): Output of replay()
+        readings (int): Readings stored before the first cycle
+        received (list): light_intensity of every reading the server stored
+
+    Returns:
+        list: Problems found (empty if the replay passed)
+    """
+    problems = []
+    for c in cycles:
+        accepted = c["requests"] - c["failed_requests"]
+        if c["stored"] > c["stored_before"]:
+            problems.append(f"cycle {c['cycle']}: storage grew from {c['stored_before']} to {c['stored']}")
+        elif accepted and c["stored"] == c["stored_before"]:
+            problems.append(f"cycle {c['cycle']}: {accepted} chunks accepted but storage did not shrink")
+    if not cycles or cycles[-1]["stored"] != 0:
+        problems.append(f"{cycles[-1]['stored'] if cycles else readings} readings still stored "
+                        f"after {len(cycles)} cycles")
+
+    counts = {}
+    for lux in received:
+        counts[int(round(lux))] = counts.get(int(round(lux)), 0) + 1
+    duplicates = sorted(index for index, n in counts.items() if n > 1)
+    missing = [index for index in range(readings) if index not in counts]
+    if duplicates:
+        problems.append(f"{len(duplicates)} readings received more than once (first: {duplicates[:5]})")
+    if missing and cycles and cycles[-1]["stored"] == 0:
+        problems.append(f"{len(missing)} readings never received (first: {missing[:5]})")
+    return problems
+
+
+def format_cycles(cycles):
+    lines = [f"{'Cycle':>5} {'Result':>6} {'Stored':>13} {'Requests':>8} {'Failed':>6} {'Retry wait':>10}"]
+    for c in cycles:
+        lines.append(f"{c['cycle']:>5} {'ok' if c['ok'] else 'failed':>6} "
+                     f"{c['stored_before']:>5} -> {c['stored']:>4} {c['requests']:>8} {c['failed_requests']:>6} "
+                     f"{c['retry_wait_s']:>9.0f}s")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the stored-readings drain against a failing server")
+    parser.add_argument("--readings", type=int, default=1000, help="readings stored before the first cycle")
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="fraction of requests answered 503")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the failures")
+    parser.add_argument("--max-cycles", type=int, default=20, help="cycles allowed to empty storage")
+    parser.add_argument("--cjson", help="directory with cJSON.c and cJSON.h")
+    parser.add_argument("--cc", help="C compiler")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    parser.add_argument("--partitions", default=os.path.join(PROJECT_DIR, "partitions.csv"))
+    parser.add_argument("--verbose", action="store_true", help="show the firmware's log output")
+    args = parser.parse_args()
+
+    partition = find_partition(RING_PARTITION, args.partitions)
+    if partition is None:
+        print(f"[ERROR] No '{RING_PARTITION}' partition in {args.partitions}")
+        sys.exit(1)
+    if not 0 < args.readings <= ring_capacity(partition.size):
+        print(f"[ERROR] --readings must be 1..{ring_capacity(partition.size)} (the ring's capacity)")
+        sys.exit(1)
+
+    cjson_dir = find_cjson(args.cjson)
+    if cjson_dir is None:
+        print("[ERROR] cJSON not found (pass --cjson or set IDF_PATH); api_client.c needs it")
+        sys.exit(1)
+    try:
+        exe = build_replay(args.build_dir, cjson_dir, args.cc)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    server = FlakyServer(args.fail_rate, args.seed)
+    server.start()
+    try:
+        cycles = replay(exe, server, partition.size, args.readings, args.max_cycles, args.build_dir,
+                        args.verbose)
+        received = server.received_lux()
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    finally:
+        server.stop()
+
+    print(format_cycles(cycles))
+    total_requests = sum(c["requests"] for c in cycles)
+    total_failed = sum(c["failed_requests"] for c in cycles)
+    print(f"[INFO] {args.readings} readings, {total_requests} requests, {total_failed} failed "
+          f"({total_failed / max(total_requests, 1):.0%}), {len(received)} readings received")
+
+    problems = check_replay(cycles, args.readings, received)
+    for problem in problems:
+        print(f"[ERROR] {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"[INFO] Storage drained in {len(cycles)} cycles with every reading received exactly once")
+
+
+if __name__ == "__main__":
+    main()
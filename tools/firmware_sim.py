@@ -0,0 +1,244 @@
+"""
+firmware_sim.py
+
+Runs the firmware's data pipeline on the host for simulated days at a time.
+Builds tools/host/firmware_sim.c with the firmware's own tasks and modules
+(task_get_sensor_data.c, task_send_data.c, data_processor.c, api_client.c,
+persistent_storage.c, status_reporter.c, time_utils.c) on a host scheduler
+with a virtual clock, a simulated board (a clear-sky light curve, no deep
+sleep) and a simulated WiFi link and ingest server in place of the network.
+
+Unlike tools/fleet_sim.py, which models the firmware's schedule in Python
+against a real endpoint, this runs the C code itself, so buffer sizing,
+storage growth and send cadence follow the code as it is. A simulated day
+takes a fraction of a second; --sensors runs that many independent sensors
+(each with its own seed) in parallel and sums the results.
+
+cJSON is needed to build api_client.c; it is found as for tools/json_bench.py.
+
+    python -m tools.firmware_sim --days 7
+    python -m tools.firmware_sim --sensors 200 --days 3 --fail-rate 0.2 --outage 600:240
+    python -m tools.firmware_sim --buffer-size 40 --expect-delivery 99.5 --timeline timeline.csv
+    python -m tools.firmware_sim --binary --json-only   # binary batches, refused by the server
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.fleet_sim import parse_outage, parse_start
+from tools.json_bench import find_cjson
+from tools.partitions import find_partition
+from tools.ring_store import DEFAULT_PARTITION as RING_PARTITION
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST_DIR = os.path.join(PROJECT_DIR, "tools", "host")
+INCLUDE_DIR = os.path.join(PROJECT_DIR, "include")
+DEFAULT_BUILD_DIR = os.path.join(PROJECT_DIR, ".pio", "firmware_sim")
+DEFAULT_START = "2025-06-01T00:00"
+HOST_SOURCES = ["firmware_sim.c", "host_platform.c", "firmware_stubs.c", "sim_link.c", "sim_board.c"]
+FIRMWARE_SOURCES = ["task_get_sensor_data.c", "task_send_data.c", "data_processor.c", "api_client.c",
+                    "persistent_storage.c", "status_reporter.c", "time_utils.c", "batch_codec.c", "json_writer.c",
+                    "profiling.c"]
+
+# Summary fields added up across sensors
+TOTALS = ["readings_taken", "readings_received", "duplicate_readings", "readings_buffered", "readings_stored",
+          "readings_overwritten", "readings_lost", "requests", "failed_requests", "status_requests", "bytes_sent",
+          "connects", "connect_failures", "sessions", "readings_saved", "sector_erases"]
+
+
+def build_sim(build_dir, cjson_dir, cc=None, binary=False):
+    """
+    Compile the host simulation with the firmware sources it runs.
+
+    Args:
+        build_dir (str): Output directory
+        cjson_dir (str): Directory with cJSON.c and cJSON.h
+        cc (str): C compiler (default: $CC, cc, gcc or clang)
+        binary (bool): Build with API_BINARY_BATCHES, as for a server that accepts them
+
+    Returns:
+        str: Path of the executable
+    """
+    cc = cc or os.environ.get("CC") or next(
+        (name for name in ("cc", "gcc", "clang") if shutil.which(name)), None)
+    if cc is None:
+        raise RuntimeError("No C compiler found; set CC")
+    os.makedirs(build_dir, exist_ok=True)
+    exe = os.path.join(build_dir, "firmware_sim_binary" if binary else "firmware_sim")
+    # The shims come first so they stand in for the ESP-IDF and generated headers
+    cmd = [cc, "-O2", "-g", "-std=gnu11", "-Wall",
+           "-I", os.path.join(HOST_DIR, "shim"), "-I", HOST_DIR, "-I", INCLUDE_DIR, "-I", cjson_dir]
+    if binary:
+        cmd.append("-DAPI_BINARY_BATCHES=1")
+    cmd += [os.path.join(HOST_DIR, name) for name in HOST_SOURCES]
+    cmd += [os.path.join(PROJECT_DIR, "main", name) for name in FIRMWARE_SOURCES]
+    cmd += [os.path.join(cjson_dir, "cJSON.c"), "-o", exe, "-lm", "-lpthread"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Compile failed:\n{' '.join(cmd)}\n{result.stderr}")
+    return exe
+
+
+def sim_command(exe, args, partition_size, seed):
+    """Build the command line for one simulated sensor."""
+    cmd = [exe, "--days", str(args.days), "--epoch", str(int(args.start)),
+           "--partition-size", str(partition_size), "--fail-rate", str(args.fail_rate),
+           "--latency-ms", str(args.latency_ms), "--sample-minutes", str(args.sample_minutes),
+           "--seed", str(seed)]
+    if args.buffer_size:
+        cmd += ["--buffer-size", str(args.buffer_size)]
+    for begin, end in args.outage:
+        cmd += ["--outage", f"{begin / 60:g}:{(end - begin) / 60:g}"]
+    if args.json_only:
+        cmd.append("--json-only")
+    return cmd
+
+
+def run_sensor(cmd):
+    """
+    Run one simulated sensor.
+
+    Returns:
+        tuple: (samples, summary) parsed from the program's JSON lines
+    """
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} exited with {result.returncode}: {result.stderr.strip()}")
+    samples, summary = [], None
+    for line in result.stdout.splitlines():
+        record = json.loads(line)
+        if record.pop("type") == "summary":
+            summary = record
+        else:
+            samples.append(record)
+    if summary is None:
+        raise RuntimeError(f"{' '.join(cmd)} printed no summary")
+    return samples, summary
+
+
+def aggregate(summaries, days):
+    """
+    Add up the per-sensor summaries.
+
+    Args:
+        summaries (list): Summary dicts, one per sensor
+        days (float): Simulated days per sensor
+
+    Returns:
+        dict: Totals, delivery percentage and per-sensor-day rates
+    """
+    totals = {key: sum(s[key] for s in summaries) for key in TOTALS}
+    sensor_days = len(summaries) * days
+    # Readings still buffered or stored at the end are neither delivered nor lost yet
+    settled = totals["readings_taken"] - totals["readings_buffered"] - totals["readings_stored"]
+    result = {"sensors": len(summaries), "days": days, "buffer_size": summaries[0]["buffer_size"]}
+    result.update(totals)
+    result.update({
+        "delivery_pct": round(100.0 * totals["readings_received"] / settled, 3) if settled else 100.0,
+        "max_stored": max(s["max_stored"] for s in summaries),
+        "requests_per_sensor_day": round(totals["requests"] / sensor_days, 1),
+        "bytes_per_sensor_day": round(totals["bytes_sent"] / sensor_days),
+        "connects_per_sensor_day": round(totals["connects"] / sensor_days, 1),
+        "sector_erases_per_sensor_day": round(totals["sector_erases"] / sensor_days, 2),
+        "write_amplification": round(max(s["write_amplification"] for s in summaries), 3),
+    })
+    return result
+
+
+def write_timeline(path, timelines):
+    """Write every sensor's samples to a CSV file."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sensor", "hours", "buffer", "stored", "received"])
+        for sensor, samples in enumerate(timelines):
+            for s in samples:
+                writer.writerow([sensor, s["hours"], s["buffer"], s["stored"], s["received"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the firmware's data pipeline on the host for simulated days")
+    parser.add_argument("--days", type=float, default=1.0, help="simulated days per sensor")
+    parser.add_argument("--sensors", type=int, default=1, help="independent sensors to simulate")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="sensors simulated at once")
+    parser.add_argument("--start", type=parse_start, default=parse_start(DEFAULT_START),
+                        help=f"virtual start time, YYYY-MM-DDTHH:MM UTC (default {DEFAULT_START})")
+    parser.add_argument("--buffer-size", type=int, help="reading buffer size (default: main.c's)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--latency-ms", type=int, default=200, help="server round trip per request")
+    parser.add_argument("--outage", type=parse_outage, action="append", default=[], metavar="START:DURATION",
+                        help="WiFi outage in minutes from the start; may be repeated")
+    parser.add_argument("--binary", action="store_true",
+                        help="build the firmware with API_BINARY_BATCHES (readings sent as binary batches)")
+    parser.add_argument("--json-only", action="store_true", help="server refuses binary batches (with --binary)")
+    parser.add_argument("--sample-minutes", type=int, default=60, help="simulated minutes between timeline samples")
+    parser.add_argument("--timeline", help="write every sensor's samples to this CSV file")
+    parser.add_argument("--expect-delivery", type=float, metavar="PCT",
+                        help="exit with status 1 if fewer than PCT%% of settled readings are delivered")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first sensor; sensor i uses seed + i")
+    parser.add_argument("--cjson", help="directory with cJSON.c and cJSON.h")
+    parser.add_argument("--cc", help="C compiler")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    parser.add_argument("--partitions", default=os.path.join(PROJECT_DIR, "partitions.csv"))
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.days <= 0 or args.sensors <= 0 or args.jobs <= 0:
+        print("[ERROR] --days, --sensors and --jobs must be positive")
+        sys.exit(1)
+    partition = find_partition(RING_PARTITION, args.partitions)
+    if partition is None:
+        print(f"[ERROR] No '{RING_PARTITION}' partition in {args.partitions}")
+        sys.exit(1)
+    cjson_dir = find_cjson(args.cjson)
+    if cjson_dir is None:
+        print("[ERROR] cJSON not found (pass --cjson or set IDF_PATH); api_client.c needs it")
+        sys.exit(1)
+    try:
+        exe = build_sim(args.build_dir, cjson_dir, args.cc, args.binary)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    commands = [sim_command(exe, args, partition.size, args.seed + i) for i in range(args.sensors)]
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(run_sensor, commands))
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    wall_s = time.monotonic() - started
+
+    summary = aggregate([s for _, s in results], args.days)
+    summary["wall_s"] = round(wall_s, 2)
+    summary["simulated_days_per_s"] = round(args.sensors * args.days / wall_s, 1) if wall_s else None
+    if args.timeline:
+        write_timeline(args.timeline, [samples for samples, _ in results])
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"[INFO] Simulated {args.sensors} sensors x {args.days:g} days in {wall_s:.1f}s "
+              f"({summary['simulated_days_per_s']} sensor-days/s)")
+        print("\nSimulation summary:")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+        if args.timeline:
+            print(f"[INFO] Timeline written to {args.timeline}")
+
+    if args.expect_delivery is not None and summary["delivery_pct"] < args.expect_delivery:
+        print(f"[ERROR] Delivered {summary['delivery_pct']}% of readings, expected at least {args.expect_delivery}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,686 @@
+"""
+fleet_sim.py
+
+Traffic simulator that plays N sensors' send cycles against an ingest
+endpoint, to predict backend load before a fleet (or a whole site coming
+back from an outage) hits it.
+
+Each simulated sensor follows the firmware's schedule:
+
+- a reading every READING_INTERVAL_S (15 s) except at night, into a buffer of
+  one send interval's worth of readings
+- every DATA_SEND_INTERVAL_MINUTES (5 min) a send cycle: readings are POSTed
+  in chunks of up to MAX_READINGS_PER_CHUNK (240) back to back, retried
+  MAX_HTTP_RETRY_ATTEMPTS times HTTP_RETRY_DELAY_MS apart from the first
+  chunk that was not accepted
+- one keep-alive connection per send cycle (and per boot), as between
+  http_session_begin() and http_session_end()
+- boot status messages (WiFi, device, NTP), and a battery status each cycle
+  for battery-powered sensors
+- nothing between night_start_hour and night_end_hour; battery-powered
+  sensors deep sleep until night_end_hour, waking every 30 minutes only to
+  go back to sleep, and boot (with its statuses and catch-up) once it is over
+- while WiFi is down (--outage) readings go to the persistent storage ring
+  (its capacity comes from the readings partition; the oldest are
+  overwritten when it is full), and each cycle sends up to
+  PERSISTENT_STORAGE_MAX_READINGS (960) stored readings as a catch-up burst
+  until it is empty, dropping each chunk from storage once it is accepted
+
+With --binary readings go out as binary batches (tools/batch_codec.py) the
+way api_client.c sends them, falling back to JSON when the server refuses
+them, so the two formats can be compared under load.
+
+The constants are read from the firmware sources so the model follows the
+code. Time is virtual and can run faster than real time with --speedup, which
+compresses the schedule and so multiplies the request rate by the same
+factor. Server latency is not compressed, so at high speedups send cycles
+take longer in virtual time and more readings are lost to the firmware's
+buffer reset than a real fleet would lose.
+
+The summary accounts for every reading generated: delivered, dropped (split
+by DROP_REASONS), still in persistent storage or still in a sensor's buffer.
+
+    python -m tools.fleet_sim --sensors 2000 --duration 60 --url http://127.0.0.1:8080/
+    python -m tools.fleet_sim --sensors 500 --stub --speedup 30 --outage 20:60
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import asyncio
+import configparser
+import glob
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from tools.batch_codec import CONTENT_TYPE as BATCH_CONTENT_TYPE, encode_batch
+from tools.partitions import find_partition
+from tools.ring_store import DEFAULT_PARTITION as RING_PARTITION, capacity as ring_capacity
+
+# Fallbacks for when the firmware sources are not available
+DEFAULT_FIRMWARE_CONSTANTS = {
+    "READING_INTERVAL_S": 15,
+    "DATA_SEND_INTERVAL_MINUTES": 5,
+    "MAX_READINGS_PER_CHUNK": 240,
+    "PERSISTENT_STORAGE_MAX_READINGS": 960,
+    "MAX_HTTP_RETRY_ATTEMPTS": 3,
+    "HTTP_RETRY_DELAY_MS": 5000,
+    "STORAGE_RING_CAPACITY": 1397,
+}
+NIGHT_WAKE_INTERVAL_S = 30 * 60
+HTTP_TIMEOUT_S = 30
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Where readings are lost: a full buffer being reset, a send cycle that failed, the buffer
+# lost to a battery sensor's deep sleep, and the oldest stored readings overwritten by the ring
+DROP_REASONS = ("buffer_full", "send_failed", "deep_sleep", "ring_overflow")
+
+_DEFINE_RE = re.compile(r"^\s*#define\s+(\w+)\s+\(?(\d+)\)?\b", re.MULTILINE)
+_TZ_OFFSET_RE = re.compile(r"^(?:<[^>]*>|[A-Za-z]+)([+-]?\d{1,2})")
+
+
+def read_firmware_constants(project_dir="."):
+    """
+    Read the timing constants from the firmware's #defines, and the storage
+    ring's capacity from the readings partition in partitions.csv.
+
+    Args:
+        project_dir (str): Project root holding main/, include/ and partitions.csv
+
+    Returns:
+        dict: Constant name -> integer value
+    """
+    constants = dict(DEFAULT_FIRMWARE_CONSTANTS)
+    sources = glob.glob(os.path.join(project_dir, "main", "*.c")) + \
+        glob.glob(os.path.join(project_dir, "include", "*.h"))
+    for path in sources:
+        with open(path, "r", errors="replace") as f:
+            for name, value in _DEFINE_RE.findall(f.read()):
+                if name in constants:
+                    constants[name] = int(value)
+    partitions_csv = os.path.join(project_dir, "partitions.csv")
+    if os.path.exists(partitions_csv):
+        partition = find_partition(RING_PARTITION, partitions_csv)
+        if partition is not None:
+            constants["STORAGE_RING_CAPACITY"] = ring_capacity(partition.size)
+    return constants
+
+
+def utc_offset_hours(posix_tz):
+    """
+    Standard-time UTC offset of a POSIX TZ string such as CST6CDT,M3.2.0/2,M11.1.0/2.
+
+    Daylight saving time is ignored; this is only used to place night hours.
+
+    Args:
+        posix_tz (str): POSIX TZ string
+
+    Returns:
+        int: Offset from UTC in hours (east positive)
+    """
+    match = _TZ_OFFSET_RE.match(posix_tz or "")
+    return -int(match.group(1)) if match else 0
+
+
+class VirtualClock:
+    """Simulation time that runs speedup times faster than the wall clock."""
+
+    def __init__(self, start, speedup):
+        self.start = start
+        self.speedup = speedup
+        self._wall_start = time.monotonic()
+
+    def now(self):
+        return self.start + (time.monotonic() - self._wall_start) * self.speedup
+
+    async def sleep(self, seconds):
+        if seconds > 0:
+            await asyncio.sleep(seconds / self.speedup)
+
+    async def sleep_until(self, when):
+        await self.sleep(when - self.now())
+
+
+class SimSensor:
+    """Static description of one simulated sensor."""
+
+    def __init__(self, sensor_id, sensor_set_id, token, battery, night_start, night_end, tz_offset):
+        self.sensor_id = sensor_id
+        self.sensor_set_id = sensor_set_id
+        self.token = token
+        self.battery = battery
+        self.night_start = night_start
+        self.night_end = night_end
+        self.tz_offset = tz_offset
+
+    def is_night(self, now):
+        hour = int(((now / 3600) + self.tz_offset) % 24)
+        return hour >= self.night_start or hour < self.night_end
+
+    def sleep_duration(self, now, cap_s):
+        """calculate_night_sleep_duration_us() at Unix time now, in seconds."""
+        local_minutes = int((now / 60 + self.tz_offset * 60) % (24 * 60))
+        hour, minute = divmod(local_minutes, 60)
+        if not (hour >= self.night_start or hour < self.night_end):
+            return 0
+        if hour >= self.night_start:
+            minutes_until_wake = (24 - hour) * 60 - minute + self.night_end * 60
+        else:
+            minutes_until_wake = self.night_end * 60 - (hour * 60 + minute)
+        return min(minutes_until_wake * 60, cap_s)
+
+
+def make_sensors(count, credentials=None, battery_fraction=0.0, seed=0):
+    """
+    Create the simulated fleet.
+
+    Args:
+        count (int): Number of sensors
+        credentials (str): credentials.ini to take identities, tokens and night
+                           hours from (cycled if count exceeds its sections),
+                           or None for synthetic sim_N sensors with token sim_N
+        battery_fraction (float): Share of synthetic sensors that are battery powered
+        seed (int): Random seed
+
+    Returns:
+        list: SimSensor objects
+    """
+    rng = random.Random(seed)
+    templates = []
+    if credentials:
+        config = configparser.ConfigParser()
+        if not config.read(credentials):
+            raise FileNotFoundError(f"{credentials} not found")
+        for section in config.sections():
+            if section == "all_sensors" or not config.has_option(section, "bearer_token"):
+                continue
+            templates.append(SimSensor(
+                config.get(section, "sensor_id", fallback=section),
+                config.get(section, "sensor_set_id", fallback="sim"),
+                config.get(section, "bearer_token"),
+                config.getint(section, "battery_adc_gpio", fallback=-1) >= 0,
+                config.getint(section, "night_start_hour", fallback=22),
+                config.getint(section, "night_end_hour", fallback=4),
+                utc_offset_hours(config.get(section, "local_timezone", fallback="CST6CDT")),
+            ))
+        if not templates:
+            raise ValueError(f"No sensor sections with a bearer_token in {credentials}")
+
+    sensors = []
+    for i in range(count):
+        if templates:
+            sensors.append(templates[i % len(templates)])
+        else:
+            sensors.append(SimSensor(f"sim_{i}", "sim", f"sim_{i}", rng.random() < battery_fraction,
+                                     22, 4, utc_offset_hours("CST6CDT")))
+    return sensors
+
+
+class Endpoint:
+    """Ingest endpoint plus the request statistics of the whole simulation."""
+
+    def __init__(self, url, max_connections, insecure=False):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.https = parts.scheme == "https"
+        self.port = parts.port or (443 if self.https else 80)
+        self.path = parts.path or "/"
+        self.ssl_context = None
+        if self.https:
+            self.ssl_context = ssl.create_default_context()
+            if insecure:
+                self.ssl_context.check_hostname = False
+                self.ssl_context.verify_mode = ssl.CERT_NONE
+        self._slots = asyncio.Semaphore(max_connections)
+        self.latencies = []
+        self.status_counts = {}
+        self.requests_per_second = {}
+        self.bytes_sent = 0
+
+    async def post_json(self, objects, token, compact=False, session=None):
+        """POST a JSON array, compact like json_writer.c or indented with tabs like cJSON_Print."""
+        if compact:
+            body = json.dumps(objects, separators=(",", ":"))
+        else:
+            body = json.dumps(objects, indent="\t")
+        return await self.post(body.encode(), token, session=session)
+
+    async def post(self, body, token, content_type="application/json", session=None):
+        """
+        POST a body the way http_client.c does: over the session's keep-alive
+        connection if there is one, otherwise on a connection of its own.
+
+        Returns:
+            int: HTTP status, or 0 if the request failed or timed out
+        """
+        request = (f"POST {self.path} HTTP/1.1\r\n"
+                   f"Host: {self.host}\r\n"
+                   f"Content-Type: {content_type}\r\n"
+                   f"Authorization: Bearer {token}\r\n"
+                   f"Content-Length: {len(body)}\r\n"
+                   f"Connection: {'keep-alive' if session else 'close'}\r\n\r\n").encode() + body
+        async with self._slots:
+            start = time.monotonic()
+            try:
+                status = await asyncio.wait_for(self._exchange(request, session), HTTP_TIMEOUT_S)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                status = 0
+                if session:
+                    session.close()  # Like http_release_client() after a failed perform
+            elapsed = time.monotonic() - start
+        self.latencies.append(elapsed)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        second = int(time.monotonic())
+        self.requests_per_second[second] = self.requests_per_second.get(second, 0) + 1
+        self.bytes_sent += len(request)
+        return status
+
+    async def _exchange(self, request, session=None):
+        if session is None:
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                await reader.read()
+                return int(status_line.split()[1])
+            finally:
+                writer.close()
+
+        if session.writer is None:
+            session.reader, session.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context)
+        reader, writer = session.reader, session.writer
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        length = 0
+        keep_alive = True
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection":
+                keep_alive = value.strip().lower() != "close"
+        await reader.readexactly(length)
+        if not keep_alive:
+            session.close()
+        return int(status_line.split()[1])
+
+
+class HttpSession:
+    """A keep-alive connection shared by the requests of one send cycle."""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+
+class SensorState:
+    """What one simulated sensor has generated, delivered and dropped."""
+
+    def __init__(self):
+        self.buffer = []
+        self.stored = []
+        self.wifi_send_failed = False
+        self.binary_rejected = False
+        self.generated = 0
+        self.delivered = 0
+        self.dropped = dict.fromkeys(DROP_REASONS, 0)
+
+
+class FleetSimulation:
+    """
+    Runs every sensor's firmware schedule concurrently.
+
+    Args:
+        sensors (list): SimSensor objects
+        endpoint (Endpoint): Where requests go
+        clock (VirtualClock): Simulation time
+        constants (dict): Firmware timing constants
+        outages (list): (start, end) virtual times with no WiFi
+        stagger (float): Boot times are spread over this many seconds
+        seed (int): Random seed
+        binary (bool): Send readings as binary batches, falling back to JSON when the server refuses one
+    """
+
+    def __init__(self, sensors, endpoint, clock, constants, outages=(), stagger=300, seed=0, binary=False):
+        self.sensors = sensors
+        self.endpoint = endpoint
+        self.clock = clock
+        self.outages = list(outages)
+        self.stagger = stagger
+        self.rng = random.Random(seed)
+        self.reading_interval = constants["READING_INTERVAL_S"]
+        self.send_interval = constants["DATA_SEND_INTERVAL_MINUTES"] * 60
+        self.chunk_size = constants["MAX_READINGS_PER_CHUNK"]
+        self.storage_max = constants["PERSISTENT_STORAGE_MAX_READINGS"]
+        self.ring_capacity = constants["STORAGE_RING_CAPACITY"]
+        self.retry_attempts = constants["MAX_HTTP_RETRY_ATTEMPTS"]
+        self.retry_delay = constants["HTTP_RETRY_DELAY_MS"] / 1000
+        self.buffer_size = self.send_interval // self.reading_interval
+        self.states = [SensorState() for _ in sensors]
+        self.binary = binary
+
+    def wifi_up(self, now):
+        return not any(start <= now < end for start, end in self.outages)
+
+    @staticmethod
+    def _timestamp(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+    def _status(self, sensor, message, now, battery=False):
+        obj = {
+            "sensor_id": sensor.sensor_id,
+            "timestamp": self._timestamp(now),
+            "sensor_set_id": sensor.sensor_set_id,
+            "status": f"[sim] {message}",
+        }
+        if battery:
+            obj["battery_voltage"] = round(self.rng.uniform(3.6, 4.2), 3)
+            obj["battery_percent"] = self.rng.randint(40, 100)
+            obj["wifi_dbm"] = self.rng.randint(-80, -40)
+        obj["commit_sha"] = "sim"
+        obj["commit_timestamp"] = "1970-01-01 00:00:00 +0000"
+        return obj
+
+    async def _post_readings(self, sensor, state, timestamps, session=None):
+        """send_sensor_data_chunk(): one chunk, as a binary batch unless the server refused one."""
+        values = [(ts, round(self.rng.uniform(0, 2000), 2), round(self.rng.uniform(20, 45), 2))
+                  for ts in timestamps]
+        if self.binary and not state.binary_rejected:
+            body = encode_batch(sensor.sensor_id, sensor.sensor_set_id, values)
+            status = await self.endpoint.post(body, sensor.token, BATCH_CONTENT_TYPE, session)
+            # binary_batch_refused() in api_client.c
+            if not 400 <= status < 500 or status in (401, 403, 408, 429):
+                return status
+            state.binary_rejected = True
+        return await self.endpoint.post_json([{
+            "light_intensity": lux,
+            "sensor_id": sensor.sensor_id,
+            "timestamp": self._timestamp(ts),
+            "sensor_set_id": sensor.sensor_set_id,
+            "chip_temp_c": temp_c,
+            "chip_temp_f": round(temp_c * 9 / 5 + 32, 2),
+        } for ts, lux, temp_c in values], sensor.token, compact=True, session=session)
+
+    async def _send_readings(self, sensor, state, readings, session=None):
+        """send_readings_processor(): a retry resumes from the first chunk that was not accepted."""
+        sent = 0
+        for attempt in range(1, self.retry_attempts + 1):
+            status = 200
+            while sent < len(readings):
+                chunk = readings[sent:sent + self.chunk_size]
+                status = await self._post_readings(sensor, state, chunk, session)
+                if not 200 <= status < 300:
+                    break
+                sent += len(chunk)
+            if 200 <= status < 300:
+                return True
+            if status in (400, 401, 403):
+                return False  # Not retried by the firmware
+            if attempt < self.retry_attempts:
+                await self.clock.sleep(self.retry_delay)
+        return False
+
+    async def _send_stored(self, sensor, state, session=None):
+        """send_all_stored_readings(): send the oldest readings a chunk at a time, dropping each once sent."""
+        drained = 0
+        while state.stored and drained < self.storage_max:
+            chunk = state.stored[:min(self.chunk_size, self.storage_max - drained)]
+            if not await self._send_readings(sensor, state, chunk, session):
+                return False
+            state.delivered += len(chunk)
+            del state.stored[:len(chunk)]
+            drained += len(chunk)
+        return True
+
+    def _save_readings(self, state, readings):
+        """persistent_storage_save_readings(): append to the ring, overwriting the oldest when full."""
+        state.stored.extend(readings)
+        overflow = len(state.stored) - self.ring_capacity
+        if overflow > 0:
+            state.dropped["ring_overflow"] += overflow
+            del state.stored[:overflow]
+
+    async def _boot(self, sensor, state):
+        now = self.clock.now()
+        if not self.wifi_up(now):
+            state.wifi_send_failed = True
+            return
+        session = HttpSession()
+        try:
+            await self.endpoint.post_json([self._status(sensor, "wifi connected", now)], sensor.token,
+                                          session=session)
+            await self.endpoint.post_json([self._status(sensor, "battery" if sensor.battery else "no battery",
+                                                   now, sensor.battery)], sensor.token, session=session)
+            await self.endpoint.post_json([self._status(sensor, "ntp set", now)], sensor.token, session=session)
+            await self._send_stored(sensor, state, session)
+        finally:
+            session.close()
+        state.wifi_send_failed = False
+
+    async def _send_cycle(self, sensor, state):
+        readings, state.buffer = state.buffer, []
+        if not self.wifi_up(self.clock.now()):
+            state.wifi_send_failed = True
+            if readings:
+                self._save_readings(state, readings)
+            return
+
+        session = HttpSession()
+        try:
+            if sensor.battery:
+                await self.endpoint.post_json([self._status(sensor, "battery", self.clock.now(), True)],
+                                              sensor.token, session=session)
+            await self._send_stored(sensor, state, session)
+            success = True
+            if readings:
+                success = await self._send_readings(sensor, state, readings, session)
+                if success:
+                    state.delivered += len(readings)
+                else:
+                    # process_buffered_readings() has already cleared them
+                    state.dropped["send_failed"] += len(readings)
+        finally:
+            session.close()
+        state.wifi_send_failed = not success
+
+    async def run_sensor(self, index, end):
+        sensor = self.sensors[index]
+        state = self.states[index]
+        await self.clock.sleep(self.rng.uniform(0, self.stagger))
+        await self._boot(sensor, state)
+
+        start = self.clock.now()
+        next_reading = start + self.reading_interval
+        next_send = start + self.send_interval
+        while True:
+            wake = min(next_reading, next_send)
+            if wake >= end:
+                return
+            await self.clock.sleep_until(wake)
+
+            if wake == next_reading:
+                next_reading += self.reading_interval
+                if not sensor.is_night(wake):
+                    if len(state.buffer) >= self.buffer_size:
+                        state.dropped["buffer_full"] += len(state.buffer)  # The firmware resets a full buffer
+                        state.buffer = []
+                    state.buffer.append(int(wake))
+                    state.generated += 1
+                continue
+
+            if sensor.is_night(wake):
+                if sensor.battery:
+                    # Deep sleep; the buffer is lost. A timer wakeup at night goes straight back to
+                    # sleep without WiFi (app_main()), so the sensor only boots once the night is over.
+                    state.dropped["deep_sleep"] += len(state.buffer)
+                    state.buffer = []
+                    duration = sensor.sleep_duration(self.clock.now(), NIGHT_WAKE_INTERVAL_S)
+                    while duration and self.clock.now() < end:
+                        await self.clock.sleep(duration)
+                        duration = sensor.sleep_duration(self.clock.now(), NIGHT_WAKE_INTERVAL_S)
+                    if self.clock.now() >= end:
+                        return
+                    await self._boot(sensor, state)
+                    now = self.clock.now()
+                    next_reading = now + self.reading_interval
+                    next_send = now + self.send_interval
+                else:
+                    next_send = wake + self.send_interval
+                continue
+
+            await self._send_cycle(sensor, state)
+            next_send = self.clock.now() + self.send_interval
+
+    async def run(self, duration, report_interval):
+        end = self.clock.start + duration
+        tasks = [asyncio.create_task(self.run_sensor(i, end)) for i in range(len(self.sensors))]
+        reporter = asyncio.create_task(self._report(report_interval))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+
+    async def _report(self, interval):
+        last_count = 0
+        while True:
+            await asyncio.sleep(interval)
+            count = len(self.endpoint.latencies)
+            backlog = sum(len(state.stored) for state in self.states)
+            virtual = datetime.fromtimestamp(self.clock.now(), timezone.utc).strftime("%Y-%m-%d %H:%M")
+            print(f"[INFO] {virtual} UTC: {(count - last_count) / interval:.1f} req/s, "
+                  f"{count} requests, {backlog} readings waiting in storage")
+            last_count = count
+
+    def summary(self):
+        latencies = sorted(self.endpoint.latencies)
+
+        def pct(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else 0.0
+
+        peak = max(self.endpoint.requests_per_second.values(), default=0)
+        return {
+            "sensors": len(self.sensors),
+            "requests": len(latencies),
+            "status_counts": {str(k): v for k, v in sorted(self.endpoint.status_counts.items())},
+            "p50_ms": round(pct(0.50), 1),
+            "p99_ms": round(pct(0.99), 1),
+            "peak_requests_per_second": peak,
+            "peak_requests_per_second_real_time": round(peak / self.clock.speedup, 2),
+            "megabytes_sent": round(self.endpoint.bytes_sent / 1e6, 2),
+            "readings_generated": sum(s.generated for s in self.states),
+            "readings_delivered": sum(s.delivered for s in self.states),
+            "readings_dropped": sum(sum(s.dropped.values()) for s in self.states),
+            **{f"readings_dropped_{reason}": sum(s.dropped[reason] for s in self.states) for reason in DROP_REASONS},
+            "readings_in_storage": sum(len(s.stored) for s in self.states),
+            "readings_in_buffer": sum(len(s.buffer) for s in self.states),
+        }
+
+
+def parse_outage(value):
+    """Parse START:DURATION in minutes from the start of the simulation."""
+    try:
+        start, duration = (float(part) for part in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:DURATION in minutes, got '{value}'")
+    return start * 60, (start + duration) * 60
+
+
+def parse_start(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DDTHH:MM (UTC), got '{value}'")
+
+
+async def simulate(args):
+    constants = read_firmware_constants(args.project_dir)
+    sensors = make_sensors(args.sensors, args.credentials, args.battery_fraction, args.seed)
+
+    stub = None
+    url = args.url
+    if args.stub:
+        from tools.mock_server import IngestServer, SqliteStore
+        stub = IngestServer(SqliteStore(":memory:"))
+        port = await stub.start("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{port}/"
+
+    start = args.start if args.start is not None else time.time()
+    clock = VirtualClock(start, args.speedup)
+    outages = [(start + begin, start + end) for begin, end in args.outage]
+    endpoint = Endpoint(url, args.max_connections, args.insecure)
+    sim = FleetSimulation(sensors, endpoint, clock, constants, outages, args.stagger, args.seed,
+                          args.binary)
+
+    print(f"[INFO] Simulating {len(sensors)} sensors for {args.duration:g} minutes against {url} "
+          f"(speedup {args.speedup:g}x)")
+    print(f"[INFO] Firmware timing: {json.dumps(constants)}")
+    try:
+        await sim.run(args.duration * 60, args.report_interval)
+    finally:
+        if stub:
+            await stub.stop()
+    return sim.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a sensor fleet's traffic against an ingest endpoint")
+    parser.add_argument("--sensors", type=int, default=100, help="number of simulated sensors")
+    parser.add_argument("--duration", type=float, default=30, help="simulated minutes")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/", help="ingest endpoint")
+    parser.add_argument("--stub", action="store_true", help="run an in-process mock server instead of --url")
+    parser.add_argument("--speedup", type=float, default=1.0, help="run virtual time this many times faster")
+    parser.add_argument("--start", type=parse_start, help="virtual start time, YYYY-MM-DDTHH:MM UTC (default: now)")
+    parser.add_argument("--outage", type=parse_outage, action="append", default=[], metavar="START:DURATION",
+                        help="WiFi outage in minutes from the start; may be repeated")
+    parser.add_argument("--credentials", help="take sensor identities and tokens from this credentials.ini")
+    parser.add_argument("--battery-fraction", type=float, default=0.0,
+                        help="share of synthetic sensors that are battery powered")
+    parser.add_argument("--stagger", type=float, default=300, help="spread sensor boots over this many seconds")
+    parser.add_argument("--max-connections", type=int, default=512, help="concurrent connections limit")
+    parser.add_argument("--binary", action="store_true",
+                        help="send readings as binary batches (tools/batch_codec.py) instead of JSON")
+    parser.add_argument("--insecure", action="store_true", help="skip TLS certificate verification")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="wall seconds between progress lines")
+    parser.add_argument("--project-dir", default=".", help="firmware sources to read timing constants from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    try:
+        summary = asyncio.run(simulate(args))
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print("\nSimulation summary:")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+generated_files.py
+
+Helpers for build scripts that generate source files.
+
+Generated headers are included by almost every translation unit, so touching
+one forces a full recompile. These helpers only replace a file when its
+content actually changes, and do so atomically so a compiler running in
+parallel never sees a half-written file.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import hashlib
+import os
+import tempfile
+
+
+def content_digest(data):
+    """
+    Return the SHA-256 hex digest of some file content.
+
+    Args:
+        data (bytes): The content to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path):
+    """
+    Return the SHA-256 hex digest of a file on disk.
+
+    Args:
+        path (str): File to hash
+
+    Returns:
+        str: Hex digest, or None if the file does not exist
+    """
+    try:
+        with open(path, 'rb') as f:
+            return content_digest(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def write_if_changed(path, content):
+    """
+    Write content to path only if it differs from what is already there.
+
+    The new content is written to a temporary file in the same directory and
+    renamed over the target, so readers see either the old or the new file.
+
+    Args:
+        path (str): Destination file
+        content (str): Rendered file content
+
+    Returns:
+        bool: True if the file was written, False if it was already up to date
+    """
+    data = content.encode('utf-8')
+    if file_digest(path) == content_digest(data):
+        return False
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return True
@@ -0,0 +1,95 @@
+/**
+* @file batch_vectors.c
+ *
+ * Host driver that encodes test vectors with the firmware's batch_encode()
+ * (main/batch_codec.c). Built and run by python -m tools.batch_codec check
+ * --firmware, which compares the output with tools/batch_vectors.json.
+ *
+ * Reads vectors from stdin, each a header line followed by one line per
+ * reading:
+ *
+ *     <count> <sensor_id hex> <sensor_set_id hex>   ("-" for an empty id)
+ *     <timestamp> <lux> <chip_temp_c>               (floats in C99 hex, %a)
+ *
+ * and prints one line per vector: the encoding in hex, or "error" if
+ * batch_encode() returned 0.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "batch_codec.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define MAX_ID_HEX 512
+
+static int hex_to_string(const char *hex, char *out, size_t out_size) {
+    if (strcmp(hex, "-") == 0) {
+        out[0] = '\0';
+        return 1;
+    }
+    size_t len = strlen(hex);
+    if (len % 2 != 0 || len / 2 >= out_size) {
+        return 0;
+    }
+    for (size_t i = 0; i < len / 2; i++) {
+        unsigned int byte;
+        if (sscanf(hex + 2 * i, "%2x", &byte) != 1) {
+            return 0;
+        }
+        out[i] = (char)byte;
+    }
+    out[len / 2] = '\0';
+    return 1;
+}
+
+int main(void) {
+    int count;
+    char id_hex[MAX_ID_HEX + 1];
+    char set_hex[MAX_ID_HEX + 1];
+    char sensor_id[MAX_ID_HEX / 2 + 1];
+    char sensor_set_id[MAX_ID_HEX / 2 + 1];
+
+    while (scanf("%d %512s %512s", &count, id_hex, set_hex) == 3) {
+        if (count <= 0 || !hex_to_string(id_hex, sensor_id, sizeof(sensor_id)) ||
+            !hex_to_string(set_hex, sensor_set_id, sizeof(sensor_set_id))) {
+            fprintf(stderr, "Bad vector header\n");
+            return 2;
+        }
+
+        sensor_reading_t *readings = calloc((size_t)count, sizeof(sensor_reading_t));
+        size_t out_size = BATCH_MAX_ENCODED_SIZE(count);
+        uint8_t *out = malloc(out_size);
+        if (readings == NULL || out == NULL) {
+            fprintf(stderr, "Out of memory\n");
+            return 2;
+        }
+        for (int i = 0; i < count; i++) {
+            long long timestamp;
+            char lux[64], temp[64];
+            if (scanf("%lld %63s %63s", &timestamp, lux, temp) != 3) {
+                fprintf(stderr, "Bad reading line\n");
+                return 2;
+            }
+            readings[i].timestamp = (time_t)timestamp;
+            readings[i].lux = strtof(lux, NULL);
+            readings[i].chip_temp_c = strtof(temp, NULL);
+        }
+
+        size_t len = batch_encode(readings, count, sensor_id, sensor_set_id, out, out_size);
+        if (len == 0) {
+            printf("error\n");
+        } else {
+            for (size_t i = 0; i < len; i++) {
+                printf("%02x", out[i]);
+            }
+            printf("\n");
+        }
+        free(readings);
+        free(out);
+    }
+    return 0;
+}
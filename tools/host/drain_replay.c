@@ -0,0 +1,105 @@
+/**
+* @file drain_replay.c
+ *
+ * Host driver for the stored-readings drain: main/persistent_storage.c,
+ * main/data_processor.c and main/api_client.c built for the host with the
+ * shims in tools/host. Each run is one boot of the sensor, with the readings
+ * partition kept in an image file between runs. Built and run by
+ * tools/drain_replay.py.
+ *
+ * Usage: drain_replay [-v] <image> <partition_size> store <count>
+ *        drain_replay [-v] <image> <partition_size> drain <url>
+ *
+ * "store" saves count readings, 15 s apart and ending now, with lux set to
+ * each reading's index. "drain" runs send_all_stored_readings() once against
+ * the ingest server at url. Both print one JSON line with the outcome and
+ * the number of readings left in storage.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "data_processor.h"
+#include "persistent_storage.h"
+#include "host_platform.h"
+#include "esp_log.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#define READING_SPACING_S 15
+#define STORE_BATCH 240
+
+static int usage(void) {
+    fprintf(stderr, "usage: drain_replay [-v] <image> <partition_size> store <count>\n"
+                    "       drain_replay [-v] <image> <partition_size> drain <url>\n");
+    return 2;
+}
+
+static esp_err_t store_readings(int count) {
+    sensor_reading_t batch[STORE_BATCH];
+    time_t first = time(NULL) - (time_t)count * READING_SPACING_S;
+
+    for (int start = 0; start < count; start += STORE_BATCH) {
+        int n = count - start < STORE_BATCH ? count - start : STORE_BATCH;
+        for (int i = 0; i < n; i++) {
+            batch[i].timestamp = first + (time_t)(start + i) * READING_SPACING_S;
+            batch[i].lux = (float)(start + i);
+            batch[i].chip_temp_c = 25.0f;
+            batch[i].chip_temp_f = 77.0f;
+        }
+        esp_err_t err = persistent_storage_save_readings(batch, n);
+        if (err != ESP_OK) {
+            return err;
+        }
+    }
+    return ESP_OK;
+}
+
+int main(int argc, char **argv) {
+    int arg = 1;
+    host_log_level = ESP_LOG_NONE;
+    if (arg < argc && strcmp(argv[arg], "-v") == 0) {
+        host_log_level = ESP_LOG_INFO;
+        arg++;
+    }
+    if (argc - arg != 4) {
+        return usage();
+    }
+    const char *image = argv[arg];
+    size_t partition_size = strtoul(argv[arg + 1], NULL, 0);
+    const char *command = argv[arg + 2];
+    const char *value = argv[arg + 3];
+
+    if (host_flash_open(image, PERSISTENT_STORAGE_PARTITION, partition_size) != ESP_OK) {
+        fprintf(stderr, "Cannot open %s as a %zu byte partition\n", image, partition_size);
+        return 1;
+    }
+    if (!data_processor_init()) {
+        return 1;
+    }
+
+    bool ok;
+    if (strcmp(command, "store") == 0) {
+        ok = store_readings(atoi(value)) == ESP_OK;
+    } else if (strcmp(command, "drain") == 0) {
+        http_host_set_url(value);
+        ok = send_all_stored_readings();
+    } else {
+        return usage();
+    }
+
+    int stored = -1;
+    persistent_storage_get_count(&stored);
+    if (host_flash_save() != ESP_OK) {
+        fprintf(stderr, "Cannot write %s\n", image);
+        return 1;
+    }
+    host_flash_close();
+
+    printf("{\"command\": \"%s\", \"ok\": %s, \"stored\": %d, \"virtual_ms\": %llu}\n",
+           command, ok ? "true" : "false", stored, (unsigned long long)host_virtual_ms());
+    return 0;
+}
@@ -0,0 +1,222 @@
+/**
+* @file firmware_sim.c
+ *
+ * Host simulation of one sensor running the firmware's data pipeline for
+ * days of virtual time: task_get_sensor_data.c and task_send_data.c with
+ * data_processor.c, api_client.c, persistent_storage.c, status_reporter.c
+ * and time_utils.c, on the scheduler and flash in host_platform.c, the
+ * board in sim_board.c and the WiFi link and ingest server in sim_link.c.
+ * Built and run by tools/firmware_sim.py.
+ *
+ * Usage: firmware_sim [options]
+ *   --days D              virtual days to run (default 1)
+ *   --epoch S             Unix time the run starts at (default 2025-06-01T00:00Z)
+ *   --buffer-size N       readings buffered between sends (default as main.c)
+ *   --partition-size N    size of the readings partition (default 0xC000)
+ *   --image PATH          keep the readings partition in this file
+ *   --fail-rate F         fraction of requests the server fails (default 0)
+ *   --latency-ms N        virtual time per request (default 200)
+ *   --outage START:LEN    WiFi down from START for LEN minutes (repeatable)
+ *   --json-only           server refuses binary batches
+ *   --sample-minutes M    interval between sample lines (default 60)
+ *   --seed N              seed for the failed requests
+ *   -v                    firmware log output on stderr
+ *
+ * Prints one JSON line per sample (buffer fill, stored readings, readings
+ * received) and a summary line at the end.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "app_context.h"
+#include "light_sensor.h"
+#include "persistent_storage.h"
+#include "task_get_sensor_data.h"
+#include "task_send_data.h"
+#include "host_platform.h"
+#include "sim_board.h"
+#include "sim_link.h"
+#include "esp_log.h"
+#include "freertos/FreeRTOS.h"
+#include "freertos/semphr.h"
+#include "freertos/task.h"
+#include <getopt.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+// READING_BUFFER_SIZE in main/main.c: one send interval of readings
+#define DEFAULT_BUFFER_SIZE ((5 * 60) / 15)
+#define DEFAULT_EPOCH 1748736000  // 2025-06-01T00:00:00Z
+#define DEFAULT_PARTITION_SIZE 0xC000
+#define TASK_START_DELAY_MS 10000  // app_main's wait between starting the two tasks
+
+typedef struct {
+    double days;
+    time_t epoch;
+    int buffer_size;
+    size_t partition_size;
+    const char *image;
+    int sample_minutes;
+    sim_link_config_t link;
+} sim_options_t;
+
+static int usage(void) {
+    fprintf(stderr, "usage: firmware_sim [--days D] [--epoch S] [--buffer-size N] [--partition-size N]\n"
+                    "                    [--image PATH] [--fail-rate F] [--latency-ms N] [--outage START:LEN]\n"
+                    "                    [--json-only] [--sample-minutes M] [--seed N] [-v]\n");
+    return 2;
+}
+
+static int parse_options(int argc, char **argv, sim_options_t *options) {
+    static const struct option long_options[] = {
+        {"days", required_argument, NULL, 'd'},
+        {"epoch", required_argument, NULL, 'e'},
+        {"buffer-size", required_argument, NULL, 'b'},
+        {"partition-size", required_argument, NULL, 'p'},
+        {"image", required_argument, NULL, 'i'},
+        {"fail-rate", required_argument, NULL, 'f'},
+        {"latency-ms", required_argument, NULL, 'l'},
+        {"outage", required_argument, NULL, 'o'},
+        {"json-only", no_argument, NULL, 'j'},
+        {"sample-minutes", required_argument, NULL, 'm'},
+        {"seed", required_argument, NULL, 's'},
+        {NULL, 0, NULL, 0},
+    };
+
+    int opt;
+    while ((opt = getopt_long(argc, argv, "v", long_options, NULL)) != -1) {
+        switch (opt) {
+            case 'd': options->days = atof(optarg); break;
+            case 'e': options->epoch = (time_t)strtoll(optarg, NULL, 0); break;
+            case 'b': options->buffer_size = atoi(optarg); break;
+            case 'p': options->partition_size = strtoul(optarg, NULL, 0); break;
+            case 'i': options->image = optarg; break;
+            case 'f': options->link.fail_rate = atof(optarg); break;
+            case 'l': options->link.latency_ms = (uint32_t)atoi(optarg); break;
+            case 'j': options->link.accept_binary = false; break;
+            case 'm': options->sample_minutes = atoi(optarg); break;
+            case 's': options->link.seed = (uint32_t)strtoul(optarg, NULL, 0); break;
+            case 'v': host_log_level = ESP_LOG_INFO; break;
+            case 'o': {
+                double start = 0, length = 0;
+                if (sscanf(optarg, "%lf:%lf", &start, &length) != 2 || start < 0 || length <= 0 ||
+                    sim_link_add_outage((uint64_t)(start * 60), (uint64_t)(length * 60)) != ESP_OK) {
+                    fprintf(stderr, "Bad --outage %s\n", optarg);
+                    return -1;
+                }
+                break;
+            }
+            default:
+                return -1;
+        }
+    }
+    if (optind != argc || options->days <= 0 || options->buffer_size <= 0 || options->sample_minutes <= 0) {
+        return -1;
+    }
+    return 0;
+}
+
+static void print_sample(app_context_t *context) {
+    int stored = 0;
+    persistent_storage_get_count(&stored);
+    sim_link_stats_t link;
+    sim_link_get_stats(&link);
+    printf("{\"type\": \"sample\", \"hours\": %.3f, \"buffer\": %d, \"stored\": %d, \"received\": %d}\n",
+           host_virtual_ms() / 3600000.0, *context->reading_idx, stored, link.readings_received);
+}
+
+static void print_summary(const sim_options_t *options, app_context_t *context, int max_stored) {
+    persistent_storage_stats_t storage;
+    memset(&storage, 0, sizeof(storage));
+    persistent_storage_get_stats(&storage);
+    sim_link_stats_t link;
+    sim_link_get_stats(&link);
+
+    int taken = sim_board_readings_taken();
+    int buffered = *context->reading_idx;
+    // Whatever was taken but is neither delivered, still buffered or stored,
+    // nor overwritten in the ring was dropped from the RAM buffer
+    int lost = taken - link.readings_received - buffered - storage.count - (int)storage.readings_overwritten;
+
+    printf("{\"type\": \"summary\", \"days\": %.3f, \"buffer_size\": %d, "
+           "\"readings_taken\": %d, \"readings_received\": %d, \"duplicate_readings\": %d, "
+           "\"readings_buffered\": %d, \"readings_stored\": %d, \"max_stored\": %d, "
+           "\"readings_overwritten\": %u, \"readings_lost\": %d, "
+           "\"requests\": %d, \"failed_requests\": %d, \"status_requests\": %d, \"bytes_sent\": %zu, "
+           "\"connects\": %d, \"connect_failures\": %d, \"sessions\": %d, "
+           "\"readings_saved\": %u, \"sector_erases\": %u, \"write_amplification\": %.3f}\n",
+           options->days, options->buffer_size,
+           taken, link.readings_received, link.duplicate_readings,
+           buffered, storage.count, max_stored, (unsigned)storage.readings_overwritten, lost,
+           link.requests, link.failed_requests, link.status_requests, link.bytes_sent,
+           link.connects, link.connect_failures, link.sessions,
+           (unsigned)storage.readings_saved, (unsigned)storage.erases, storage.write_amplification);
+}
+
+int main(int argc, char **argv) {
+    sim_options_t options = {
+        .days = 1.0,
+        .epoch = DEFAULT_EPOCH,
+        .buffer_size = DEFAULT_BUFFER_SIZE,
+        .partition_size = DEFAULT_PARTITION_SIZE,
+        .image = NULL,
+        .sample_minutes = 60,
+        .link = { .fail_rate = 0.0, .latency_ms = 200, .connect_ms = 3000, .accept_binary = true, .seed = 1 },
+    };
+    host_log_level = ESP_LOG_NONE;
+    if (parse_options(argc, argv, &options) != 0) {
+        return usage();
+    }
+
+    host_set_epoch(options.epoch);
+    sim_link_init(&options.link);
+    const char *image = options.image ? options.image : "/dev/null";
+    if (host_flash_open(image, PERSISTENT_STORAGE_PARTITION, options.partition_size) != ESP_OK) {
+        fprintf(stderr, "Bad --partition-size %zu\n", options.partition_size);
+        return 1;
+    }
+
+    // Set up the shared context and start the tasks the way app_main() does
+    app_context_t context;
+    memset(&context, 0, sizeof(context));
+    int reading_idx = 0;
+    context.reading_buffer = calloc((size_t)options.buffer_size, sizeof(sensor_reading_t));
+    context.reading_idx = &reading_idx;
+    context.buffer_size = options.buffer_size;
+    context.buffer_mutex = xSemaphoreCreateMutex();
+    init_light_sensor(&context.light_sensor_dev);
+    if (context.reading_buffer == NULL || context.buffer_mutex == NULL) {
+        return 1;
+    }
+
+    xTaskCreate(task_send_data, "send_data_task", 8192, &context, 5, NULL);
+    vTaskDelay(pdMS_TO_TICKS(TASK_START_DELAY_MS));
+    xTaskCreate(task_get_sensor_data, "sensor_task", 6144, &context, 5, NULL);
+
+    uint64_t end_ms = (uint64_t)(options.days * 24 * 3600 * 1000);
+    uint64_t sample_ms = (uint64_t)options.sample_minutes * 60 * 1000;
+    int max_stored = 0;
+    while (host_virtual_ms() < end_ms) {
+        uint64_t next = (host_virtual_ms() / sample_ms + 1) * sample_ms;
+        vTaskDelay((TickType_t)((next < end_ms ? next : end_ms) - host_virtual_ms()));
+
+        int stored = 0;
+        persistent_storage_get_count(&stored);
+        if (stored > max_stored) {
+            max_stored = stored;
+        }
+        print_sample(&context);
+    }
+
+    print_summary(&options, &context, max_stored);
+    fflush(stdout);
+    if (options.image != NULL && host_flash_save() != ESP_OK) {
+        fprintf(stderr, "Cannot write %s\n", options.image);
+        return 1;
+    }
+    // The firmware's tasks never return; leave them parked
+    exit(0);
+}
@@ -0,0 +1,43 @@
+/**
+* @file firmware_stubs.c
+ *
+ * Stand-ins for the firmware modules that need hardware (battery ADC and
+ * WiFi), for host builds that compile api_client.c, status_reporter.c and
+ * the modules that call them. The host sensor has no battery and a fixed
+ * signal strength.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "adc_battery.h"
+#include "wifi_manager.h"
+#include <stdio.h>
+
+#define HOST_WIFI_RSSI -60
+
+bool adc_battery_is_present(void) {
+    return false;
+}
+
+esp_err_t adc_battery_get_voltage(float *voltage) {
+    (void)voltage;
+    return ESP_ERR_NOT_FOUND;
+}
+
+esp_err_t adc_battery_get_api_data(float *voltage, int *percentage) {
+    (void)voltage;
+    (void)percentage;
+    return ESP_ERR_NOT_FOUND;
+}
+
+esp_err_t wifi_get_rssi(int8_t *rssi) {
+    *rssi = HOST_WIFI_RSSI;
+    return ESP_OK;
+}
+
+esp_err_t wifi_get_status_string(char *buffer, size_t buffer_size) {
+    snprintf(buffer, buffer_size, "wifi %ddBm", HOST_WIFI_RSSI);
+    return ESP_OK;
+}
@@ -0,0 +1,481 @@
+/**
+* @file host_platform.c
+ *
+ * Host implementations of the ESP-IDF and FreeRTOS calls the firmware's
+ * tasks, storage and sending code make: logging, error names, a virtual
+ * clock, a scheduler that runs one task at a time in virtual time, mutexes,
+ * an in-memory NOR flash partition, an empty NVS store, heap queries and
+ * the wake-up cause.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "host_platform.h"
+#include "esp_log.h"
+#include "esp_partition.h"
+#include "esp_system.h"
+#include "esp_sleep.h"
+#include "esp_timer.h"
+#include "nvs_flash.h"
+#include "freertos/FreeRTOS.h"
+#include "freertos/semphr.h"
+#include "freertos/task.h"
+#include <pthread.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+// The epoch defaults to the real time at start-up
+#undef time
+
+#define FLASH_SECTOR_SIZE 4096
+#define HOST_FREE_HEAP 200000
+#define HOST_MAX_TASKS 8
+
+esp_log_level_t host_log_level = ESP_LOG_INFO;
+
+static uint64_t s_virtual_ms = 0;
+static time_t s_epoch = 0;
+static bool s_epoch_set = false;
+
+struct host_task {
+    pthread_t thread;
+    pthread_cond_t turn;
+    TaskFunction_t code;
+    void *parameters;
+    uint64_t wake_ms;
+    bool finished;
+    char name[16];
+};
+
+// The running task holds the CPU; every other task waits on its turn condition
+static pthread_mutex_t s_scheduler_lock = PTHREAD_MUTEX_INITIALIZER;
+static struct host_task *s_tasks[HOST_MAX_TASKS];
+static int s_task_count = 0;
+static struct host_task *s_running = NULL;
+static __thread struct host_task *s_self = NULL;
+
+static esp_partition_t s_partition;
+static uint8_t *s_flash = NULL;
+static char *s_flash_path = NULL;
+
+struct host_semaphore {
+    int taken;
+};
+
+// --- Logging and errors ---
+
+uint32_t esp_log_timestamp(void) {
+    return (uint32_t)s_virtual_ms;
+}
+
+int64_t esp_timer_get_time(void) {
+    return (int64_t)s_virtual_ms * 1000;
+}
+
+const char *esp_err_to_name(esp_err_t code) {
+    switch (code) {
+        case ESP_OK: return "ESP_OK";
+        case ESP_FAIL: return "ESP_FAIL";
+        case ESP_ERR_NO_MEM: return "ESP_ERR_NO_MEM";
+        case ESP_ERR_INVALID_ARG: return "ESP_ERR_INVALID_ARG";
+        case ESP_ERR_INVALID_STATE: return "ESP_ERR_INVALID_STATE";
+        case ESP_ERR_INVALID_SIZE: return "ESP_ERR_INVALID_SIZE";
+        case ESP_ERR_NOT_FOUND: return "ESP_ERR_NOT_FOUND";
+        case ESP_ERR_NOT_SUPPORTED: return "ESP_ERR_NOT_SUPPORTED";
+        case ESP_ERR_TIMEOUT: return "ESP_ERR_TIMEOUT";
+        case ESP_ERR_INVALID_RESPONSE: return "ESP_ERR_INVALID_RESPONSE";
+        case ESP_ERR_INVALID_CRC: return "ESP_ERR_INVALID_CRC";
+        case ESP_ERR_INVALID_VERSION: return "ESP_ERR_INVALID_VERSION";
+        case ESP_ERR_INVALID_MAC: return "ESP_ERR_INVALID_MAC";
+        case ESP_ERR_NOT_FINISHED: return "ESP_ERR_NOT_FINISHED";
+        case ESP_ERR_NOT_ALLOWED: return "ESP_ERR_NOT_ALLOWED";
+        case ESP_ERR_NVS_NOT_INITIALIZED: return "ESP_ERR_NVS_NOT_INITIALIZED";
+        case ESP_ERR_NVS_NOT_FOUND: return "ESP_ERR_NVS_NOT_FOUND";
+        default: return "UNKNOWN ERROR";
+    }
+}
+
+// --- Virtual clock and scheduler ---
+
+uint64_t host_virtual_ms(void) {
+    return s_virtual_ms;
+}
+
+void host_advance_ms(uint32_t ms) {
+    s_virtual_ms += ms;
+}
+
+void host_set_epoch(time_t epoch) {
+    s_epoch = epoch;
+    s_epoch_set = true;
+}
+
+time_t host_time(time_t *out) {
+    if (!s_epoch_set) {
+        host_set_epoch(time(NULL));
+    }
+    time_t now = s_epoch + (time_t)(s_virtual_ms / 1000);
+    if (out != NULL) {
+        *out = now;
+    }
+    return now;
+}
+
+/**
+ * @brief The calling thread's task, registering the main thread on first use
+ *
+ * Must be called with the scheduler lock held.
+ */
+static struct host_task *current_task(void) {
+    if (s_self == NULL) {
+        struct host_task *task = calloc(1, sizeof(*task));
+        if (task == NULL || s_task_count == HOST_MAX_TASKS) {
+            fprintf(stderr, "Cannot register the main task\n");
+            abort();
+        }
+        pthread_cond_init(&task->turn, NULL);
+        snprintf(task->name, sizeof(task->name), "main");
+        s_tasks[s_task_count++] = task;
+        s_self = task;
+        s_running = task;
+    }
+    return s_self;
+}
+
+/**
+ * @brief Hand the CPU to the task that wakes first and wait for it to come back
+ *
+ * Tasks waking at the same time take turns, starting after the caller. The
+ * virtual clock jumps to the chosen task's wake-up time. Must be called with
+ * the scheduler lock held.
+ */
+static void switch_task(struct host_task *self) {
+    int self_index = 0;
+    while (s_tasks[self_index] != self) {
+        self_index++;
+    }
+
+    struct host_task *next = NULL;
+    for (int k = 1; k <= s_task_count; k++) {
+        struct host_task *task = s_tasks[(self_index + k) % s_task_count];
+        if (!task->finished && (next == NULL || task->wake_ms < next->wake_ms)) {
+            next = task;
+        }
+    }
+    if (next == NULL) {
+        fprintf(stderr, "Every task has finished\n");
+        exit(1);
+    }
+
+    if (next->wake_ms > s_virtual_ms) {
+        s_virtual_ms = next->wake_ms;
+    }
+    s_running = next;
+    pthread_cond_signal(&next->turn);
+    while (s_running != self && !self->finished) {
+        pthread_cond_wait(&self->turn, &s_scheduler_lock);
+    }
+}
+
+static void *task_entry(void *arg) {
+    struct host_task *task = arg;
+    pthread_mutex_lock(&s_scheduler_lock);
+    s_self = task;
+    while (s_running != task) {
+        pthread_cond_wait(&task->turn, &s_scheduler_lock);
+    }
+    pthread_mutex_unlock(&s_scheduler_lock);
+
+    task->code(task->parameters);
+
+    // FreeRTOS tasks must not return; treat it as deleting itself
+    vTaskDelete(NULL);
+    return NULL;
+}
+
+BaseType_t xTaskCreate(TaskFunction_t task_code, const char *name, uint32_t stack_depth,
+                       void *parameters, UBaseType_t priority, TaskHandle_t *created_task) {
+    (void)stack_depth;
+    (void)priority;
+    pthread_mutex_lock(&s_scheduler_lock);
+    current_task();
+
+    struct host_task *task = calloc(1, sizeof(*task));
+    if (task == NULL || s_task_count == HOST_MAX_TASKS) {
+        free(task);
+        pthread_mutex_unlock(&s_scheduler_lock);
+        return pdFALSE;
+    }
+    pthread_cond_init(&task->turn, NULL);
+    task->code = task_code;
+    task->parameters = parameters;
+    task->wake_ms = s_virtual_ms;
+    snprintf(task->name, sizeof(task->name), "%s", name);
+    s_tasks[s_task_count++] = task;
+
+    // The new task starts once the creator delays
+    if (pthread_create(&task->thread, NULL, task_entry, task) != 0) {
+        s_task_count--;
+        free(task);
+        pthread_mutex_unlock(&s_scheduler_lock);
+        return pdFALSE;
+    }
+    pthread_detach(task->thread);
+    pthread_mutex_unlock(&s_scheduler_lock);
+
+    if (created_task != NULL) {
+        *created_task = task;
+    }
+    return pdPASS;
+}
+
+void vTaskDelete(TaskHandle_t task) {
+    pthread_mutex_lock(&s_scheduler_lock);
+    struct host_task *self = current_task();
+    if (task == NULL) {
+        task = self;
+    }
+    task->finished = true;
+    if (task == self) {
+        switch_task(self);
+        pthread_mutex_unlock(&s_scheduler_lock);
+        pthread_exit(NULL);
+    }
+    pthread_mutex_unlock(&s_scheduler_lock);
+}
+
+void vTaskDelay(TickType_t ticks) {
+    pthread_mutex_lock(&s_scheduler_lock);
+    struct host_task *self = current_task();
+    self->wake_ms = s_virtual_ms + (uint64_t)ticks * portTICK_PERIOD_MS;
+    switch_task(self);
+    pthread_mutex_unlock(&s_scheduler_lock);
+}
+
+void vTaskDelayUntil(TickType_t *previous_wake_time, TickType_t time_increment) {
+    TickType_t wake_time = *previous_wake_time + time_increment;
+    TickType_t now = xTaskGetTickCount();
+    *previous_wake_time = wake_time;
+    vTaskDelay((TickType_t)(wake_time - now) <= time_increment ? wake_time - now : 0);
+}
+
+TickType_t xTaskGetTickCount(void) {
+    return (TickType_t)(s_virtual_ms / portTICK_PERIOD_MS);
+}
+
+// --- Mutexes ---
+
+SemaphoreHandle_t xSemaphoreCreateMutex(void) {
+    return calloc(1, sizeof(struct host_semaphore));
+}
+
+void vSemaphoreDelete(SemaphoreHandle_t semaphore) {
+    free(semaphore);
+}
+
+BaseType_t xSemaphoreTake(SemaphoreHandle_t semaphore, TickType_t ticks_to_wait) {
+    if (semaphore == NULL) {
+        return pdFALSE;
+    }
+    // Only one task runs at a time, so the mutex can only be held by a task
+    // that is delayed; wait for it the way a blocked FreeRTOS task would
+    TickType_t waited = 0;
+    while (semaphore->taken) {
+        if (waited >= ticks_to_wait) {
+            return pdFALSE;
+        }
+        vTaskDelay(1);
+        waited++;
+    }
+    semaphore->taken = 1;
+    return pdTRUE;
+}
+
+BaseType_t xSemaphoreGive(SemaphoreHandle_t semaphore) {
+    if (semaphore == NULL || !semaphore->taken) {
+        return pdFALSE;
+    }
+    semaphore->taken = 0;
+    return pdTRUE;
+}
+
+// --- Flash partition ---
+
+esp_err_t host_flash_open(const char *path, const char *label, size_t size) {
+    if (path == NULL || label == NULL || size == 0 || size % FLASH_SECTOR_SIZE != 0) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    host_flash_close();
+
+    s_flash = malloc(size);
+    s_flash_path = strdup(path);
+    if (s_flash == NULL || s_flash_path == NULL) {
+        host_flash_close();
+        return ESP_ERR_NO_MEM;
+    }
+    memset(s_flash, 0xFF, size);
+
+    FILE *f = fopen(path, "rb");
+    if (f != NULL) {
+        size_t read = fread(s_flash, 1, size, f);
+        fclose(f);
+        if (read != size) {
+            ESP_LOGW("HOST_FLASH", "%s holds %zu of %zu bytes; the rest is erased", path, read, size);
+        }
+    }
+
+    memset(&s_partition, 0, sizeof(s_partition));
+    s_partition.type = ESP_PARTITION_TYPE_DATA;
+    s_partition.subtype = 0x06;
+    s_partition.size = (uint32_t)size;
+    s_partition.erase_size = FLASH_SECTOR_SIZE;
+    snprintf(s_partition.label, sizeof(s_partition.label), "%s", label);
+    return ESP_OK;
+}
+
+esp_err_t host_flash_save(void) {
+    if (s_flash == NULL) {
+        return ESP_ERR_INVALID_STATE;
+    }
+    FILE *f = fopen(s_flash_path, "wb");
+    if (f == NULL) {
+        return ESP_FAIL;
+    }
+    size_t written = fwrite(s_flash, 1, s_partition.size, f);
+    fclose(f);
+    return written == s_partition.size ? ESP_OK : ESP_FAIL;
+}
+
+void host_flash_close(void) {
+    free(s_flash);
+    free(s_flash_path);
+    s_flash = NULL;
+    s_flash_path = NULL;
+}
+
+const esp_partition_t *esp_partition_find_first(esp_partition_type_t type, esp_partition_subtype_t subtype,
+                                                const char *label) {
+    (void)subtype;
+    if (s_flash == NULL || type != s_partition.type) {
+        return NULL;
+    }
+    if (label != NULL && strcmp(label, s_partition.label) != 0) {
+        return NULL;
+    }
+    return &s_partition;
+}
+
+static bool partition_range_ok(const esp_partition_t *partition, size_t offset, size_t size) {
+    return partition == &s_partition && s_flash != NULL &&
+           offset <= partition->size && size <= partition->size - offset;
+}
+
+esp_err_t esp_partition_read(const esp_partition_t *partition, size_t src_offset, void *dst, size_t size) {
+    if (dst == NULL || !partition_range_ok(partition, src_offset, size)) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    memcpy(dst, s_flash + src_offset, size);
+    return ESP_OK;
+}
+
+esp_err_t esp_partition_write(const esp_partition_t *partition, size_t dst_offset, const void *src, size_t size) {
+    if (src == NULL || !partition_range_ok(partition, dst_offset, size)) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    // NOR flash programming can only clear bits
+    const uint8_t *bytes = src;
+    for (size_t i = 0; i < size; i++) {
+        s_flash[dst_offset + i] &= bytes[i];
+    }
+    return ESP_OK;
+}
+
+esp_err_t esp_partition_erase_range(const esp_partition_t *partition, size_t offset, size_t size) {
+    if (!partition_range_ok(partition, offset, size) ||
+        offset % FLASH_SECTOR_SIZE != 0 || size % FLASH_SECTOR_SIZE != 0) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    memset(s_flash + offset, 0xFF, size);
+    return ESP_OK;
+}
+
+// --- NVS (always empty) ---
+
+esp_err_t nvs_flash_init(void) {
+    return ESP_OK;
+}
+
+esp_err_t nvs_open(const char *name, nvs_open_mode_t open_mode, nvs_handle_t *out_handle) {
+    (void)name;
+    (void)open_mode;
+    *out_handle = 1;
+    return ESP_OK;
+}
+
+esp_err_t nvs_get_i32(nvs_handle_t handle, const char *key, int32_t *out_value) {
+    (void)handle;
+    (void)key;
+    (void)out_value;
+    return ESP_ERR_NVS_NOT_FOUND;
+}
+
+esp_err_t nvs_set_i32(nvs_handle_t handle, const char *key, int32_t value) {
+    (void)handle;
+    (void)key;
+    (void)value;
+    return ESP_OK;
+}
+
+esp_err_t nvs_get_blob(nvs_handle_t handle, const char *key, void *out_value, size_t *length) {
+    (void)handle;
+    (void)key;
+    (void)out_value;
+    (void)length;
+    return ESP_ERR_NVS_NOT_FOUND;
+}
+
+esp_err_t nvs_set_blob(nvs_handle_t handle, const char *key, const void *value, size_t length) {
+    (void)handle;
+    (void)key;
+    (void)value;
+    (void)length;
+    return ESP_OK;
+}
+
+esp_err_t nvs_erase_key(nvs_handle_t handle, const char *key) {
+    (void)handle;
+    (void)key;
+    return ESP_ERR_NVS_NOT_FOUND;
+}
+
+esp_err_t nvs_erase_all(nvs_handle_t handle) {
+    (void)handle;
+    return ESP_OK;
+}
+
+esp_err_t nvs_commit(nvs_handle_t handle) {
+    (void)handle;
+    return ESP_OK;
+}
+
+void nvs_close(nvs_handle_t handle) {
+    (void)handle;
+}
+
+// --- Heap and sleep ---
+
+size_t esp_get_free_heap_size(void) {
+    return HOST_FREE_HEAP;
+}
+
+uint32_t esp_get_minimum_free_heap_size(void) {
+    return HOST_FREE_HEAP;
+}
+
+esp_sleep_wakeup_cause_t esp_sleep_get_wakeup_cause(void) {
+    return ESP_SLEEP_WAKEUP_UNDEFINED;
+}
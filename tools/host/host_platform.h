@@ -0,0 +1,72 @@
+/**
+* @file host_platform.h
+ *
+ * Controls for the host build of the firmware: the virtual clock and its
+ * epoch, the in-memory flash behind the partition API and the ingest URL
+ * used by http_client_host.c. The ESP-IDF and FreeRTOS calls themselves are declared
+ * by the headers in tools/host/shim and implemented in host_platform.c.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_err.h"
+#include <stddef.h>
+#include <stdint.h>
+#include <time.h>
+
+/**
+ * @brief Milliseconds of virtual time since start; vTaskDelay() advances it
+ */
+uint64_t host_virtual_ms(void);
+
+/**
+ * @brief Advance the virtual clock, e.g. to stand for time spent on the network
+ *
+ * @param ms Milliseconds to add
+ */
+void host_advance_ms(uint32_t ms);
+
+/**
+ * @brief Set the wall-clock time that virtual time 0 stands for
+ *
+ * time() returns epoch plus the virtual time. Without a call, the epoch is
+ * the real time when time() is first called.
+ *
+ * @param epoch Seconds since 1970
+ */
+void host_set_epoch(time_t epoch);
+
+/**
+ * @brief Back the partition API with a flash image file
+ *
+ * The file is read if it exists and otherwise starts erased (all 0xFF).
+ *
+ * @param path Image file, written back by host_flash_save()
+ * @param label Partition label esp_partition_find_first() answers to
+ * @param size Partition size, a multiple of the 4 KB sector size
+ * @return esp_err_t ESP_OK on success
+ */
+esp_err_t host_flash_open(const char *path, const char *label, size_t size);
+
+/**
+ * @brief Write the flash contents back to the image file
+ *
+ * @return esp_err_t ESP_OK on success
+ */
+esp_err_t host_flash_save(void);
+
+/**
+ * @brief Free the flash image (without saving it)
+ */
+void host_flash_close(void);
+
+/**
+ * @brief Set the URL http_client_host.c posts to, in place of CONFIG_API_URL
+ *
+ * @param url http:// URL (HTTPS is not supported on the host)
+ */
+void http_host_set_url(const char *url);
@@ -0,0 +1,244 @@
+/**
+* @file http_client_host.c
+ *
+ * Host implementation of http_client.h over plain POSIX sockets, so the
+ * firmware's sending code can run against tools/mock_server.py. Only http://
+ * URLs are supported and every request uses its own connection; response
+ * statuses map to the same error codes as main/http_client.c.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "http_client.h"
+#include "host_platform.h"
+#include "app_config.h"
+#include "esp_log.h"
+#include <netdb.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/socket.h>
+#include <unistd.h>
+
+#define TAG "HTTP_CLIENT"
+#define MAX_HOST_LEN 128
+#define MAX_PATH_LEN 256
+#define RESPONSE_HEAD_SIZE 2048
+
+struct esp_http_client {
+    int fd;
+    size_t remaining;
+};
+
+static char s_url[MAX_HOST_LEN + MAX_PATH_LEN + 16] = CONFIG_API_URL;
+static int s_last_status_code = 0;
+
+void http_host_set_url(const char *url) {
+    snprintf(s_url, sizeof(s_url), "%s", url);
+}
+
+/**
+ * @brief Map HTTP status codes to ESP error codes, as main/http_client.c does
+ */
+static esp_err_t http_status_to_err(int status_code) {
+    if (status_code >= 200 && status_code < 300) {
+        ESP_LOGI(TAG, "HTTP request successful with status %d", status_code);
+        return ESP_OK;
+    }
+
+    ESP_LOGE(TAG, "HTTP request failed with status %d", status_code);
+    switch (status_code) {
+        case 400:
+            return ESP_ERR_INVALID_ARG;
+        case 401:
+        case 403:
+            return ESP_ERR_NOT_ALLOWED;
+        case 404:
+            return ESP_ERR_NOT_FOUND;
+        case 415:
+            return ESP_ERR_NOT_SUPPORTED;
+        case 500:
+        case 502:
+        case 503:
+            return ESP_ERR_INVALID_RESPONSE;
+        default:
+            return ESP_FAIL;
+    }
+}
+
+/**
+ * @brief Split an http:// URL into host, port and path
+ */
+static esp_err_t parse_url(char *host, char *port, char *path) {
+    const char *prefix = "http://";
+    if (strncmp(s_url, prefix, strlen(prefix)) != 0) {
+        ESP_LOGE(TAG, "Only http:// URLs are supported on the host: %s", s_url);
+        return ESP_ERR_NOT_SUPPORTED;
+    }
+
+    const char *authority = s_url + strlen(prefix);
+    const char *slash = strchr(authority, '/');
+    size_t authority_len = slash ? (size_t)(slash - authority) : strlen(authority);
+    if (authority_len == 0 || authority_len >= MAX_HOST_LEN) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    memcpy(host, authority, authority_len);
+    host[authority_len] = '\0';
+    snprintf(path, MAX_PATH_LEN, "%s", slash ? slash : "/");
+
+    char *colon = strrchr(host, ':');
+    if (colon != NULL) {
+        *colon = '\0';
+        snprintf(port, 8, "%s", colon + 1);
+    } else {
+        snprintf(port, 8, "80");
+    }
+    return ESP_OK;
+}
+
+static esp_err_t send_all(int fd, const void *data, size_t len) {
+    const char *p = data;
+    while (len > 0) {
+        ssize_t sent = send(fd, p, len, MSG_NOSIGNAL);
+        if (sent <= 0) {
+            return ESP_FAIL;
+        }
+        p += sent;
+        len -= (size_t)sent;
+    }
+    return ESP_OK;
+}
+
+void http_session_begin(void) {
+}
+
+void http_session_end(void) {
+}
+
+esp_err_t http_stream_open(size_t content_length, const char* content_type,
+                           const char* bearer_token, http_stream_t* out_stream) {
+    s_last_status_code = 0;
+    char host[MAX_HOST_LEN];
+    char port[8];
+    char path[MAX_PATH_LEN];
+    esp_err_t err = parse_url(host, port, path);
+    if (err != ESP_OK) {
+        return err;
+    }
+
+    struct addrinfo hints = {.ai_family = AF_UNSPEC, .ai_socktype = SOCK_STREAM};
+    struct addrinfo *addresses = NULL;
+    if (getaddrinfo(host, port, &hints, &addresses) != 0) {
+        ESP_LOGE(TAG, "Cannot resolve %s", host);
+        return ESP_FAIL;
+    }
+    int fd = -1;
+    for (struct addrinfo *a = addresses; a != NULL && fd < 0; a = a->ai_next) {
+        fd = socket(a->ai_family, a->ai_socktype, a->ai_protocol);
+        if (fd >= 0 && connect(fd, a->ai_addr, a->ai_addrlen) != 0) {
+            close(fd);
+            fd = -1;
+        }
+    }
+    freeaddrinfo(addresses);
+    if (fd < 0) {
+        ESP_LOGE(TAG, "Cannot connect to %s:%s", host, port);
+        return ESP_FAIL;
+    }
+
+    char head[RESPONSE_HEAD_SIZE];
+    int head_len = snprintf(head, sizeof(head),
+                            "POST %s HTTP/1.1\r\nHost: %s:%s\r\nContent-Type: %s\r\n"
+                            "Authorization: Bearer %s\r\nContent-Length: %zu\r\nConnection: close\r\n\r\n",
+                            path, host, port, content_type, bearer_token, content_length);
+    if (head_len < 0 || (size_t)head_len >= sizeof(head) || send_all(fd, head, (size_t)head_len) != ESP_OK) {
+        close(fd);
+        return ESP_FAIL;
+    }
+
+    struct esp_http_client *stream = malloc(sizeof(*stream));
+    if (stream == NULL) {
+        close(fd);
+        return ESP_ERR_NO_MEM;
+    }
+    stream->fd = fd;
+    stream->remaining = content_length;
+    *out_stream = stream;
+    return ESP_OK;
+}
+
+esp_err_t http_stream_write(http_stream_t stream, const void* data, size_t len) {
+    if (stream == NULL || len > stream->remaining) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    if (send_all(stream->fd, data, len) != ESP_OK) {
+        ESP_LOGE(TAG, "Failed to write request body");
+        return ESP_FAIL;
+    }
+    stream->remaining -= len;
+    return ESP_OK;
+}
+
+esp_err_t http_stream_finish(http_stream_t stream) {
+    if (stream == NULL) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    if (stream->remaining != 0) {
+        ESP_LOGE(TAG, "Request body is %zu bytes short", stream->remaining);
+        http_stream_abort(stream);
+        return ESP_FAIL;
+    }
+
+    // The status line is all that is needed; the server closes the connection
+    char response[RESPONSE_HEAD_SIZE];
+    size_t len = 0;
+    while (len < sizeof(response) - 1) {
+        ssize_t got = recv(stream->fd, response + len, sizeof(response) - 1 - len, 0);
+        if (got <= 0) {
+            break;
+        }
+        len += (size_t)got;
+    }
+    response[len] = '\0';
+    http_stream_abort(stream);
+
+    int status_code = 0;
+    if (sscanf(response, "HTTP/%*d.%*d %d", &status_code) != 1) {
+        ESP_LOGE(TAG, "No HTTP response");
+        return ESP_FAIL;
+    }
+    s_last_status_code = status_code;
+    return http_status_to_err(status_code);
+}
+
+void http_stream_abort(http_stream_t stream) {
+    if (stream != NULL) {
+        close(stream->fd);
+        free(stream);
+    }
+}
+
+int http_last_status_code(void) {
+    return s_last_status_code;
+}
+
+esp_err_t http_send_payload(const void* payload, size_t payload_size,
+                            const char* content_type, const char* bearer_token) {
+    http_stream_t stream = NULL;
+    esp_err_t err = http_stream_open(payload_size, content_type, bearer_token, &stream);
+    if (err != ESP_OK) {
+        return err;
+    }
+    err = http_stream_write(stream, payload, payload_size);
+    if (err != ESP_OK) {
+        http_stream_abort(stream);
+        return err;
+    }
+    return http_stream_finish(stream);
+}
+
+esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token) {
+    return http_send_payload(json_payload, strlen(json_payload), "application/json", bearer_token);
+}
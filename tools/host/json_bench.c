@@ -0,0 +1,220 @@
+/**
+* @file json_bench.c
+ *
+ * Host benchmark of the two ways of serializing a readings chunk: the cJSON
+ * DOM with cJSON_Print, and the streaming json_writer. Built and run by
+ * tools/json_bench.py.
+ *
+ * Usage: json_bench <readings> [dump_dir]
+ *
+ * Prints one JSON line per path with payload bytes, allocations, peak heap
+ * and time per reading. With dump_dir, also writes each path's payload to
+ * <dump_dir>/<path>_<readings>.json for comparison.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "json_writer.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#ifdef HAVE_CJSON
+#include "cJSON.h"
+#endif
+
+#define SENSOR_ID "sensor_1"
+#define SENSOR_SET "set_a"
+#define MIN_BENCH_SECONDS 0.2
+
+typedef struct {
+    const char *path;
+    size_t bytes;
+    size_t allocs;
+    size_t peak_heap;
+    size_t stack_bytes;
+} bench_result_t;
+
+// Serialized payload goes here so the work cannot be optimized away
+static char *s_sink;
+static size_t s_sink_len;
+
+static size_t s_allocs;
+static size_t s_live_bytes;
+static size_t s_peak_bytes;
+
+static double now_seconds(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (double)ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+static void sink_write(const void *data, size_t len) {
+    memcpy(s_sink + s_sink_len, data, len);
+    s_sink_len += len;
+}
+
+#ifdef HAVE_CJSON
+// Allocation hooks that count calls and track peak live bytes
+static void *counting_malloc(size_t size) {
+    size_t *block = malloc(size + sizeof(max_align_t));
+    if (block == NULL) {
+        return NULL;
+    }
+    *block = size;
+    s_allocs++;
+    s_live_bytes += size;
+    if (s_live_bytes > s_peak_bytes) {
+        s_peak_bytes = s_live_bytes;
+    }
+    return (char *)block + sizeof(max_align_t);
+}
+
+static void counting_free(void *ptr) {
+    if (ptr == NULL) {
+        return;
+    }
+    size_t *block = (size_t *)((char *)ptr - sizeof(max_align_t));
+    s_live_bytes -= *block;
+    free(block);
+}
+
+// The readings path as api_client.c built it before json_writer
+static void serialize_cjson(const sensor_reading_t *readings, int count) {
+    cJSON *root_array = cJSON_CreateArray();
+    for (int i = 0; i < count; i++) {
+        cJSON *sensor_object = cJSON_CreateObject();
+        char timestamp_str[32];
+        struct tm tm_utc;
+        gmtime_r(&readings[i].timestamp, &tm_utc);
+        strftime(timestamp_str, sizeof(timestamp_str), "%Y-%m-%dT%H:%M:%SZ", &tm_utc);
+        cJSON_AddNumberToObject(sensor_object, "light_intensity", readings[i].lux);
+        cJSON_AddStringToObject(sensor_object, "sensor_id", SENSOR_ID);
+        cJSON_AddStringToObject(sensor_object, "timestamp", timestamp_str);
+        cJSON_AddStringToObject(sensor_object, "sensor_set_id", SENSOR_SET);
+        cJSON_AddNumberToObject(sensor_object, "chip_temp_c", readings[i].chip_temp_c);
+        cJSON_AddNumberToObject(sensor_object, "chip_temp_f", readings[i].chip_temp_f);
+        cJSON_AddItemToArray(root_array, sensor_object);
+    }
+    char *json_payload = cJSON_Print(root_array);
+    sink_write(json_payload, strlen(json_payload));
+    cJSON_Delete(root_array);
+    counting_free(json_payload);
+}
+#endif
+
+// The readings path as api_client.c streams it: measure, then write piece by piece
+static void serialize_stream(const sensor_reading_t *readings, int count) {
+    char piece[JSON_READING_MAX_SIZE];
+    json_writer_t w;
+    size_t payload_size = 0;
+
+    for (int pass = 0; pass < 2; pass++) {
+        json_writer_init(&w, piece, sizeof(piece));
+        for (int i = 0; i < count; i++) {
+            json_writer_clear(&w);
+            if (i == 0) {
+                json_writer_begin_array(&w, NULL);
+            }
+            json_writer_add_reading(&w, &readings[i], SENSOR_ID, SENSOR_SET);
+            if (i == count - 1) {
+                json_writer_end_array(&w);
+            }
+            if (pass == 0) {
+                payload_size += w.len;
+            } else {
+                sink_write(piece, w.len);
+            }
+        }
+    }
+    (void)payload_size;
+}
+
+static double time_per_reading(void (*serialize)(const sensor_reading_t *, int),
+                               const sensor_reading_t *readings, int count) {
+    long iterations = 0;
+    double start = now_seconds();
+    double elapsed;
+    do {
+        s_sink_len = 0;
+        serialize(readings, count);
+        iterations++;
+        elapsed = now_seconds() - start;
+    } while (elapsed < MIN_BENCH_SECONDS);
+    return elapsed / iterations / count * 1e9;
+}
+
+static void run_path(bench_result_t *result, void (*serialize)(const sensor_reading_t *, int),
+                     const sensor_reading_t *readings, int count, const char *dump_dir) {
+    s_allocs = 0;
+    s_live_bytes = 0;
+    s_peak_bytes = 0;
+    s_sink_len = 0;
+    serialize(readings, count);
+    result->bytes = s_sink_len;
+    result->allocs = s_allocs;
+    result->peak_heap = s_peak_bytes;
+
+    if (dump_dir != NULL) {
+        char path[512];
+        snprintf(path, sizeof(path), "%s/%s_%d.json", dump_dir, result->path, count);
+        FILE *f = fopen(path, "wb");
+        if (f == NULL) {
+            perror(path);
+            exit(1);
+        }
+        fwrite(s_sink, 1, s_sink_len, f);
+        fclose(f);
+    }
+
+    double ns = time_per_reading(serialize, readings, count);
+    printf("{\"path\": \"%s\", \"readings\": %d, \"bytes\": %zu, \"allocs\": %zu, "
+           "\"peak_heap\": %zu, \"stack_bytes\": %zu, \"ns_per_reading\": %.1f}\n",
+           result->path, count, result->bytes, result->allocs,
+           result->peak_heap, result->stack_bytes, ns);
+}
+
+int main(int argc, char **argv) {
+    if (argc < 2 || atoi(argv[1]) <= 0) {
+        fprintf(stderr, "usage: %s <readings> [dump_dir]\n", argv[0]);
+        return 2;
+    }
+    int count = atoi(argv[1]);
+    const char *dump_dir = argc > 2 ? argv[2] : NULL;
+
+    sensor_reading_t *readings = calloc((size_t)count, sizeof(*readings));
+    s_sink = malloc((size_t)count * 512 + 64);
+    if (readings == NULL || s_sink == NULL) {
+        fprintf(stderr, "out of memory\n");
+        return 1;
+    }
+
+    // Plausible values: lux with fractions, the odd failed temperature read
+    srand(1);
+    for (int i = 0; i < count; i++) {
+        readings[i].timestamp = 1750000000 + 15 * i;
+        readings[i].lux = (float)(rand() % 6500000) / 100.0f;
+        if (i % 97 == 13) {
+            readings[i].chip_temp_c = -999.0f;
+            readings[i].chip_temp_f = -999.0f;
+        } else {
+            readings[i].chip_temp_c = 20.0f + (float)(rand() % 2500) / 100.0f;
+            readings[i].chip_temp_f = (readings[i].chip_temp_c * 9.0f / 5.0f) + 32.0f;
+        }
+    }
+
+#ifdef HAVE_CJSON
+    cJSON_Hooks hooks = { .malloc_fn = counting_malloc, .free_fn = counting_free };
+    cJSON_InitHooks(&hooks);
+    bench_result_t dom = { .path = "cjson", .stack_bytes = 0 };
+    run_path(&dom, serialize_cjson, readings, count, dump_dir);
+#endif
+    bench_result_t stream = { .path = "stream", .stack_bytes = JSON_READING_MAX_SIZE };
+    run_path(&stream, serialize_stream, readings, count, dump_dir);
+
+    free(readings);
+    free(s_sink);
+    return 0;
+}
@@ -0,0 +1,17 @@
+/**
+* @file i2c_master.h
+ *
+ * Host stand-in for ESP-IDF's I2C master driver header; only the port
+ * numbers app_config.h refers to.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+typedef enum {
+    I2C_NUM_0 = 0,
+    I2C_NUM_MAX
+} i2c_port_num_t;
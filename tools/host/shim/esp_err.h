@@ -0,0 +1,38 @@
+/**
+* @file esp_err.h
+ *
+ * Host stand-in for ESP-IDF's esp_err.h: the error codes the firmware uses.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+
+typedef int esp_err_t;
+
+#define ESP_OK                      0
+#define ESP_FAIL                    -1
+#define ESP_ERR_NO_MEM              0x101
+#define ESP_ERR_INVALID_ARG         0x102
+#define ESP_ERR_INVALID_STATE       0x103
+#define ESP_ERR_INVALID_SIZE        0x104
+#define ESP_ERR_NOT_FOUND           0x105
+#define ESP_ERR_NOT_SUPPORTED       0x106
+#define ESP_ERR_TIMEOUT             0x107
+#define ESP_ERR_INVALID_RESPONSE    0x108
+#define ESP_ERR_INVALID_CRC         0x109
+#define ESP_ERR_INVALID_VERSION     0x10A
+#define ESP_ERR_INVALID_MAC         0x10B
+#define ESP_ERR_NOT_FINISHED        0x10C
+#define ESP_ERR_NOT_ALLOWED         0x10D
+#define ESP_ERR_NVS_BASE            0x1100
+#define ESP_ERR_NVS_NOT_INITIALIZED (ESP_ERR_NVS_BASE + 0x01)
+#define ESP_ERR_NVS_NOT_FOUND       (ESP_ERR_NVS_BASE + 0x02)
+
+const char *esp_err_to_name(esp_err_t code);
@@ -0,0 +1,41 @@
+/**
+* @file esp_log.h
+ *
+ * Host stand-in for ESP-IDF's logging macros. Messages go to stderr in the
+ * firmware's "I (time) TAG: message" form; debug and verbose messages are
+ * dropped. Set host_log_level to ESP_LOG_NONE to silence a run.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stdint.h>
+#include <stdio.h>
+
+typedef enum {
+    ESP_LOG_NONE,
+    ESP_LOG_ERROR,
+    ESP_LOG_WARN,
+    ESP_LOG_INFO,
+    ESP_LOG_DEBUG,
+    ESP_LOG_VERBOSE
+} esp_log_level_t;
+
+extern esp_log_level_t host_log_level;
+
+uint32_t esp_log_timestamp(void);
+
+#define HOST_LOG(level, letter, tag, format, ...) do { \
+        if (host_log_level >= (level)) { \
+            fprintf(stderr, letter " (%u) %s: " format "\n", (unsigned)esp_log_timestamp(), tag, ##__VA_ARGS__); \
+        } \
+    } while (0)
+
+#define ESP_LOGE(tag, format, ...) HOST_LOG(ESP_LOG_ERROR, "E", tag, format, ##__VA_ARGS__)
+#define ESP_LOGW(tag, format, ...) HOST_LOG(ESP_LOG_WARN, "W", tag, format, ##__VA_ARGS__)
+#define ESP_LOGI(tag, format, ...) HOST_LOG(ESP_LOG_INFO, "I", tag, format, ##__VA_ARGS__)
+#define ESP_LOGD(tag, format, ...) do { } while (0)
+#define ESP_LOGV(tag, format, ...) do { } while (0)
@@ -0,0 +1,26 @@
+/**
+* @file esp_rom_crc.h
+ *
+ * Host stand-in for the ROM CRC32 routine, with the same conventions as
+ * esp_rom_crc32_le() (bits reflected, value inverted on entry and exit).
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+
+static inline uint32_t esp_rom_crc32_le(uint32_t crc, const uint8_t *buf, uint32_t len) {
+    crc = ~crc;
+    for (uint32_t i = 0; i < len; i++) {
+        crc ^= buf[i];
+        for (int bit = 0; bit < 8; bit++) {
+            crc = (crc >> 1) ^ (0xEDB88320u & (0u - (crc & 1u)));
+        }
+    }
+    return ~crc;
+}
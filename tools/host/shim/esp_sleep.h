@@ -0,0 +1,25 @@
+/**
+* @file esp_sleep.h
+ *
+ * Host stand-in for ESP-IDF's sleep API. A host run always starts from a
+ * power-on reset and never deep sleeps.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_err.h"
+#include <stdint.h>
+
+typedef enum {
+    ESP_SLEEP_WAKEUP_UNDEFINED,
+    ESP_SLEEP_WAKEUP_ALL,
+    ESP_SLEEP_WAKEUP_EXT0,
+    ESP_SLEEP_WAKEUP_EXT1,
+    ESP_SLEEP_WAKEUP_TIMER,
+} esp_sleep_wakeup_cause_t;
+
+esp_sleep_wakeup_cause_t esp_sleep_get_wakeup_cause(void);
@@ -0,0 +1,19 @@
+/**
+* @file esp_system.h
+ *
+ * Host stand-in for ESP-IDF's esp_system.h.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+
+// size_t rather than uint32_t because api_client.c logs it with %zu, which
+// is only a mismatch on the host where size_t is 64 bits
+size_t esp_get_free_heap_size(void);
+uint32_t esp_get_minimum_free_heap_size(void);
@@ -0,0 +1,15 @@
+/**
+* @file esp_timer.h
+ *
+ * Host stand-in for ESP-IDF's esp_timer.h: microseconds of virtual time.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include <stdint.h>
+
+int64_t esp_timer_get_time(void);
@@ -0,0 +1,30 @@
+/**
+* @file FreeRTOS.h
+ *
+ * Host stand-in for the FreeRTOS types and macros the firmware uses. Ticks
+ * are milliseconds of virtual time (see freertos/task.h).
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_system.h"
+#include <stdbool.h>
+#include <stdint.h>
+#include <sys/types.h>  // uint, which newlib defines and app_config.h uses
+
+typedef uint32_t TickType_t;
+typedef int BaseType_t;
+typedef unsigned int UBaseType_t;
+
+#define pdTRUE                  1
+#define pdFALSE                 0
+#define pdPASS                  pdTRUE
+#define portMAX_DELAY           ((TickType_t)0xFFFFFFFF)
+#define portTICK_PERIOD_MS      ((TickType_t)1)
+#define configTICK_RATE_HZ      1000
+#define pdMS_TO_TICKS(ms)       ((TickType_t)(ms))
+#define tskIDLE_PRIORITY        ((UBaseType_t)0)
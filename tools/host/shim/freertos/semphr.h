@@ -0,0 +1,22 @@
+/**
+* @file semphr.h
+ *
+ * Host stand-in for FreeRTOS mutexes. A task waiting for a mutex delays one
+ * tick at a time until it is given or the wait times out.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "freertos/FreeRTOS.h"
+#include "freertos/task.h"
+
+typedef struct host_semaphore *SemaphoreHandle_t;
+
+SemaphoreHandle_t xSemaphoreCreateMutex(void);
+void vSemaphoreDelete(SemaphoreHandle_t semaphore);
+BaseType_t xSemaphoreTake(SemaphoreHandle_t semaphore, TickType_t ticks_to_wait);
+BaseType_t xSemaphoreGive(SemaphoreHandle_t semaphore);
@@ -0,0 +1,33 @@
+/**
+* @file task.h
+ *
+ * Host stand-in for FreeRTOS tasks. Tasks are threads, but only one runs at
+ * a time and they switch only when the running task delays, so a run is
+ * deterministic. Delays advance the virtual clock instead of sleeping: when
+ * every task is delayed, the clock jumps to the earliest wake-up. Ticks are
+ * milliseconds of virtual time.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "freertos/FreeRTOS.h"
+
+typedef void (*TaskFunction_t)(void *);
+typedef struct host_task *TaskHandle_t;
+
+BaseType_t xTaskCreate(TaskFunction_t task_code, const char *name, uint32_t stack_depth,
+                       void *parameters, UBaseType_t priority, TaskHandle_t *created_task);
+void vTaskDelete(TaskHandle_t task);
+void vTaskDelay(TickType_t ticks);
+void vTaskDelayUntil(TickType_t *previous_wake_time, TickType_t time_increment);
+TickType_t xTaskGetTickCount(void);
+
+// Only one task runs at a time and none is preempted, so critical sections have nothing to exclude
+typedef int portMUX_TYPE;
+#define portMUX_INITIALIZER_UNLOCKED 0
+#define taskENTER_CRITICAL(mux) ((void)(mux))
+#define taskEXIT_CRITICAL(mux) ((void)(mux))
@@ -0,0 +1,28 @@
+/**
+* @file generated_config.h
+ *
+ * Fixed sensor configuration for host builds, in place of the header
+ * dynamic_envs.py generates from credentials.ini. The API URL is replaced at
+ * run time with http_host_set_url().
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#define CONFIG_SENSOR_ID "sensor_1"
+#define CONFIG_BEARER_TOKEN "host-token"
+#define CONFIG_WIFI_CREDENTIALS "host:host"
+#define CONFIG_API_URL "http://127.0.0.1:8080/"
+#define CONFIG_SENSOR_SET "host_set"
+#define CONFIG_SENSOR_SDA_GPIO 4
+#define CONFIG_SENSOR_SCL_GPIO 5
+#define CONFIG_BATTERY_ADC_GPIO -1
+#define CONFIG_NIGHT_START_HOUR 22
+#define CONFIG_NIGHT_END_HOUR 4
+#define CONFIG_LOCAL_TIMEZONE "CST6CDT,M3.2.0/2,M11.1.0/2"
+
+// Helper macros
+#define CONFIG_HAS_BATTERY_CIRCUIT (CONFIG_BATTERY_ADC_GPIO >= 0)
@@ -0,0 +1,15 @@
+/**
+* @file git_version.h
+ *
+ * Placeholder commit info for host builds, in place of the header
+ * get_git_info.py generates.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#define GIT_COMMIT_SHA "host"
+#define GIT_COMMIT_TIMESTAMP "1970-01-01T00:00:00Z"
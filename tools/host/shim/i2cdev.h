@@ -0,0 +1,17 @@
+/**
+* @file i2cdev.h
+ *
+ * Host stand-in for the i2cdev component: the device descriptor type that
+ * app_context.h holds a pointer to.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+typedef struct {
+    int port;
+    int addr;
+} i2c_dev_t;
@@ -0,0 +1,33 @@
+/**
+* @file nvs.h
+ *
+ * Host stand-in for ESP-IDF's NVS API. The store is always empty, so code
+ * that looks for legacy keys finds none.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_err.h"
+#include <stddef.h>
+#include <stdint.h>
+
+typedef uint32_t nvs_handle_t;
+
+typedef enum {
+    NVS_READONLY,
+    NVS_READWRITE
+} nvs_open_mode_t;
+
+esp_err_t nvs_open(const char *name, nvs_open_mode_t open_mode, nvs_handle_t *out_handle);
+esp_err_t nvs_get_i32(nvs_handle_t handle, const char *key, int32_t *out_value);
+esp_err_t nvs_set_i32(nvs_handle_t handle, const char *key, int32_t value);
+esp_err_t nvs_get_blob(nvs_handle_t handle, const char *key, void *out_value, size_t *length);
+esp_err_t nvs_set_blob(nvs_handle_t handle, const char *key, const void *value, size_t length);
+esp_err_t nvs_erase_key(nvs_handle_t handle, const char *key);
+esp_err_t nvs_erase_all(nvs_handle_t handle);
+esp_err_t nvs_commit(nvs_handle_t handle);
+void nvs_close(nvs_handle_t handle);
@@ -0,0 +1,15 @@
+/**
+* @file nvs_flash.h
+ *
+ * Host stand-in for ESP-IDF's nvs_flash.h.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "nvs.h"
+
+esp_err_t nvs_flash_init(void);
@@ -0,0 +1,27 @@
+/**
+* @file time.h
+ *
+ * Wraps the C library's time.h so that time() reads the virtual clock: the
+ * firmware's timestamps, send intervals and night hours then follow
+ * simulated time. Everything else (localtime_r, TZ handling) is the C
+ * library's.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include_next <time.h>
+
+// newlib's time.h brings these in, and the firmware relies on it
+#include <stdint.h>
+#include <stdlib.h>
+
+/**
+ * @brief Seconds since the epoch on the virtual clock (see host_set_epoch())
+ */
+time_t host_time(time_t *out);
+
+#define time(out) host_time(out)
@@ -0,0 +1,77 @@
+/**
+* @file sim_board.c
+ *
+ * Simulated sensor board for host runs of the firmware: implements
+ * light_sensor.h, internal_temp.h and power_management.h. Light follows a
+ * clear-sky day in the configured local time zone and the chip sits at
+ * 30 °C. The board is USB-powered, so it never deep sleeps.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#include "sim_board.h"
+#include "light_sensor.h"
+#include "internal_temp.h"
+#include "power_management.h"
+#include "time_utils.h"
+#include <math.h>
+
+#define PEAK_LUX 100000.0
+#define SUNRISE_HOUR 6.0
+#define SUNSET_HOUR 20.0
+#define CHIP_TEMP_C 30.0f
+
+static i2c_dev_t s_light_sensor;
+static int s_readings_taken = 0;
+
+int sim_board_readings_taken(void) {
+    return s_readings_taken;
+}
+
+static void daylight_callback(const struct tm* local_time, time_t now, void* user_data) {
+    (void)now;
+    double hour = local_time->tm_hour + local_time->tm_min / 60.0 + local_time->tm_sec / 3600.0;
+    double lux = 0.0;
+    if (hour > SUNRISE_HOUR && hour < SUNSET_HOUR) {
+        lux = PEAK_LUX * sin(M_PI * (hour - SUNRISE_HOUR) / (SUNSET_HOUR - SUNRISE_HOUR));
+    }
+    *(float*)user_data = (float)lux;
+}
+
+esp_err_t init_light_sensor(i2c_dev_t **dev) {
+    *dev = &s_light_sensor;
+    return ESP_OK;
+}
+
+esp_err_t get_ambient_light(i2c_dev_t *dev, float *lux) {
+    (void)dev;
+    with_local_timezone(daylight_callback, lux);
+    s_readings_taken++;
+    return ESP_OK;
+}
+
+esp_err_t internal_temp_init(void) {
+    return ESP_OK;
+}
+
+esp_err_t internal_temp_read(float *temp_celsius) {
+    *temp_celsius = CHIP_TEMP_C;
+    return ESP_OK;
+}
+
+bool should_enter_deep_sleep(void) {
+    return false;
+}
+
+uint64_t calculate_sleep_duration_us(void) {
+    return calculate_night_sleep_duration_us();
+}
+
+void enter_night_sleep(void) {
+}
+
+esp_sleep_wakeup_cause_t check_wakeup_reason(void) {
+    return esp_sleep_get_wakeup_cause();
+}
@@ -0,0 +1,16 @@
+/**
+* @file sim_board.h
+ *
+ * Simulated sensor board for host runs of the firmware (see sim_board.c).
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+/**
+ * @brief Number of light readings the firmware has taken
+ */
+int sim_board_readings_taken(void);
@@ -0,0 +1,328 @@
+/**
+* @file sim_link.c
+ *
+ * Simulated WiFi link and ingest server (see sim_link.h). Connection and
+ * request times are spent with vTaskDelay(), so the sensor task keeps taking
+ * readings while the send task waits on the network, as on the device.
+ *
+ * The server decodes binary batches and JSON reading arrays just far enough
+ * to get each reading's timestamp, which identifies it: readings are taken
+ * seconds apart, so a timestamp seen twice is a duplicate delivery.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#define _GNU_SOURCE  // strptime()
+
+#include "sim_link.h"
+#include "host_platform.h"
+#include "http_client.h"
+#include "network_manager.h"
+#include "status_reporter.h"
+#include "batch_codec.h"
+#include "esp_log.h"
+#include "freertos/FreeRTOS.h"
+#include "freertos/task.h"
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#define TAG "SIM_LINK"
+#define MAX_OUTAGES 32
+#define WIFI_RETRY_DELAY_MS 2000     // network_manager.c's wait between connection checks
+#define REQUEST_TIMEOUT_MS 10000     // Time a request takes to fail while WiFi is down
+#define SEEN_BLOCK_SECONDS (24 * 3600)
+
+struct esp_http_client {
+    char content_type[64];
+    uint8_t *body;
+    size_t length;
+    size_t written;
+};
+
+typedef struct {
+    uint64_t start_s;
+    uint64_t end_s;
+} outage_t;
+
+static sim_link_config_t s_config = { .latency_ms = 200, .connect_ms = 3000, .accept_binary = true, .seed = 1 };
+static outage_t s_outages[MAX_OUTAGES];
+static int s_outage_count = 0;
+static sim_link_stats_t s_stats;
+// Status of the most recent request, 0 when it got no response
+static int s_last_status_code = 0;
+static uint64_t s_rng_state = 1;
+
+// One flag per second since the start of the run: has a reading with that timestamp arrived?
+static time_t s_seen_base = 0;
+static uint8_t *s_seen = NULL;
+static size_t s_seen_size = 0;
+
+void sim_link_init(const sim_link_config_t *config) {
+    s_config = *config;
+    s_rng_state = ((uint64_t)config->seed << 1) | 1;
+    memset(&s_stats, 0, sizeof(s_stats));
+    s_seen_base = time(NULL);
+}
+
+esp_err_t sim_link_add_outage(uint64_t start_s, uint64_t duration_s) {
+    if (s_outage_count == MAX_OUTAGES) {
+        return ESP_ERR_NO_MEM;
+    }
+    s_outages[s_outage_count].start_s = start_s;
+    s_outages[s_outage_count].end_s = start_s + duration_s;
+    s_outage_count++;
+    return ESP_OK;
+}
+
+void sim_link_get_stats(sim_link_stats_t *stats) {
+    *stats = s_stats;
+}
+
+static bool link_is_up(void) {
+    uint64_t now_s = host_virtual_ms() / 1000;
+    for (int i = 0; i < s_outage_count; i++) {
+        if (now_s >= s_outages[i].start_s && now_s < s_outages[i].end_s) {
+            return false;
+        }
+    }
+    return true;
+}
+
+static double next_random(void) {
+    // xorshift64*, enough for picking failed requests repeatably
+    s_rng_state ^= s_rng_state >> 12;
+    s_rng_state ^= s_rng_state << 25;
+    s_rng_state ^= s_rng_state >> 27;
+    return (double)((s_rng_state * 2685821657736338717ULL) >> 11) / (double)(1ULL << 53);
+}
+
+// --- Server ---
+
+static void record_reading(time_t timestamp) {
+    if (timestamp < s_seen_base) {
+        s_stats.readings_received++;
+        return;
+    }
+    size_t index = (size_t)(timestamp - s_seen_base);
+    if (index >= s_seen_size) {
+        size_t size = (index / SEEN_BLOCK_SECONDS + 1) * SEEN_BLOCK_SECONDS;
+        uint8_t *seen = realloc(s_seen, size);
+        if (seen == NULL) {
+            s_stats.readings_received++;
+            return;
+        }
+        memset(seen + s_seen_size, 0, size - s_seen_size);
+        s_seen = seen;
+        s_seen_size = size;
+    }
+    if (s_seen[index]) {
+        s_stats.duplicate_readings++;
+    } else {
+        s_seen[index] = 1;
+        s_stats.readings_received++;
+    }
+}
+
+/**
+ * @brief Record the readings in a binary batch (layout in tools/batch_codec.py)
+ */
+static bool receive_batch(const uint8_t *body, size_t length) {
+    if (length < 6 || memcmp(body, "SLB", 3) != 0 || body[3] != BATCH_FORMAT_VERSION) {
+        return false;
+    }
+    int count = body[4] | (body[5] << 8);
+    size_t pos = 6;
+    for (int id = 0; id < 2; id++) {
+        if (pos >= length) {
+            return false;
+        }
+        pos += 1 + body[pos];
+    }
+    if (pos + 8 > length) {
+        return false;
+    }
+    int64_t timestamp = 0;
+    for (int i = 0; i < 8; i++) {
+        timestamp |= (int64_t)body[pos + i] << (8 * i);
+    }
+    pos += 8;
+    record_reading((time_t)timestamp);
+
+    for (int i = 1; i < count; i++) {
+        uint64_t zigzag = 0;
+        int shift = 0;
+        do {
+            if (pos >= length || shift > 63) {
+                return false;
+            }
+            zigzag |= (uint64_t)(body[pos] & 0x7F) << shift;
+            shift += 7;
+        } while (body[pos++] & 0x80);
+        timestamp += (int64_t)(zigzag >> 1) ^ -(int64_t)(zigzag & 1);
+        record_reading((time_t)timestamp);
+    }
+    return true;
+}
+
+/**
+ * @brief Record the readings in a JSON array; returns false if it holds none
+ */
+static bool receive_json_readings(const uint8_t *body, size_t length) {
+    char *text = malloc(length + 1);
+    if (text == NULL) {
+        return false;
+    }
+    memcpy(text, body, length);
+    text[length] = '\0';
+
+    bool any = false;
+    for (char *p = strstr(text, "\"light_intensity\""); p != NULL; p = strstr(p + 1, "\"light_intensity\"")) {
+        char *field = strstr(p, "\"timestamp\":\"");
+        struct tm tm;
+        memset(&tm, 0, sizeof(tm));
+        if (field != NULL && strptime(field + strlen("\"timestamp\":\""), "%Y-%m-%dT%H:%M:%SZ", &tm) != NULL) {
+            record_reading(timegm(&tm));
+            any = true;
+        }
+    }
+    free(text);
+    return any;
+}
+
+/**
+ * @brief Deliver one request to the simulated server
+ */
+static esp_err_t sim_post(const void *body, size_t length, const char *content_type) {
+    s_stats.requests++;
+    s_stats.bytes_sent += length;
+    s_last_status_code = 0;
+
+    if (!link_is_up()) {
+        vTaskDelay(pdMS_TO_TICKS(REQUEST_TIMEOUT_MS));
+        s_stats.failed_requests++;
+        ESP_LOGE(TAG, "Request failed: WiFi is down");
+        return ESP_FAIL;
+    }
+
+    vTaskDelay(pdMS_TO_TICKS(s_config.latency_ms));
+    if (s_config.fail_rate > 0 && next_random() < s_config.fail_rate) {
+        s_stats.failed_requests++;
+        s_last_status_code = 503;
+        ESP_LOGE(TAG, "HTTP request failed with status 503");
+        return ESP_ERR_INVALID_RESPONSE;
+    }
+
+    if (strcmp(content_type, BATCH_CONTENT_TYPE) == 0) {
+        if (!s_config.accept_binary) {
+            s_last_status_code = 415;
+            ESP_LOGE(TAG, "HTTP request failed with status 415");
+            return ESP_ERR_NOT_SUPPORTED;
+        }
+        if (!receive_batch(body, length)) {
+            s_last_status_code = 400;
+            ESP_LOGE(TAG, "HTTP request failed with status 400");
+            return ESP_ERR_INVALID_ARG;
+        }
+    } else if (!receive_json_readings(body, length)) {
+        s_stats.status_requests++;
+    }
+    s_last_status_code = 200;
+    return ESP_OK;
+}
+
+// --- http_client.h ---
+
+void http_session_begin(void) {
+    s_stats.sessions++;
+}
+
+void http_session_end(void) {
+}
+
+esp_err_t http_send_payload(const void* payload, size_t payload_size,
+                            const char* content_type, const char* bearer_token) {
+    (void)bearer_token;
+    return sim_post(payload, payload_size, content_type);
+}
+
+int http_last_status_code(void) {
+    return s_last_status_code;
+}
+
+esp_err_t http_send_json_payload(const char* json_payload, const char* bearer_token) {
+    return http_send_payload(json_payload, strlen(json_payload), "application/json", bearer_token);
+}
+
+esp_err_t http_stream_open(size_t content_length, const char* content_type,
+                           const char* bearer_token, http_stream_t* out_stream) {
+    (void)bearer_token;
+    struct esp_http_client *stream = calloc(1, sizeof(*stream));
+    if (stream == NULL || (stream->body = malloc(content_length ? content_length : 1)) == NULL) {
+        free(stream);
+        return ESP_ERR_NO_MEM;
+    }
+    snprintf(stream->content_type, sizeof(stream->content_type), "%s", content_type);
+    stream->length = content_length;
+    *out_stream = stream;
+    return ESP_OK;
+}
+
+esp_err_t http_stream_write(http_stream_t stream, const void* data, size_t len) {
+    if (stream == NULL || len > stream->length - stream->written) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    memcpy(stream->body + stream->written, data, len);
+    stream->written += len;
+    return ESP_OK;
+}
+
+esp_err_t http_stream_finish(http_stream_t stream) {
+    if (stream == NULL) {
+        return ESP_ERR_INVALID_ARG;
+    }
+    esp_err_t err = stream->written == stream->length
+                    ? sim_post(stream->body, stream->length, stream->content_type)
+                    : ESP_FAIL;
+    http_stream_abort(stream);
+    return err;
+}
+
+void http_stream_abort(http_stream_t stream) {
+    if (stream != NULL) {
+        free(stream->body);
+        free(stream);
+    }
+}
+
+// --- network_manager.h ---
+
+bool initialize_network_connection(int max_retries) {
+    s_stats.connects++;
+    if (link_is_up()) {
+        vTaskDelay(pdMS_TO_TICKS(s_config.connect_ms));
+        return true;
+    }
+    vTaskDelay(pdMS_TO_TICKS(WIFI_RETRY_DELAY_MS * max_retries));
+    s_stats.connect_failures++;
+    return false;
+}
+
+void send_wifi_connection_status(bool is_initial_connection) {
+    if (is_initial_connection) {
+        send_status_update_with_retry("wifi connected");
+    }
+}
+
+void handle_ntp_sync(time_t *last_ntp_sync_time, bool is_initial_boot) {
+    // The virtual clock is always right; only the boot-time status is sent
+    if (is_initial_boot) {
+        send_status_update_with_retry("ntp set");
+    }
+    *last_ntp_sync_time = time(NULL);
+}
+
+void disconnect_wifi_for_power_saving(void) {
+}
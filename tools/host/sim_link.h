@@ -0,0 +1,63 @@
+/**
+* @file sim_link.h
+ *
+ * Simulated WiFi link and ingest server for host runs of the firmware.
+ * sim_link.c implements network_manager.h and http_client.h: connecting
+ * takes virtual time and fails during outages, and every request reaches an
+ * in-process server that may fail it and that counts the readings it
+ * receives.
+ *
+ * Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+ *
+ * Apache 2.0 Licensed as described in the file LICENSE
+ */
+
+#pragma once
+
+#include "esp_err.h"
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+typedef struct {
+    double fail_rate;       // Fraction of requests the server answers 503
+    uint32_t latency_ms;    // Virtual time each request takes
+    uint32_t connect_ms;    // Virtual time WiFi takes to connect
+    bool accept_binary;     // false answers binary batches 415, as an old server would
+    uint32_t seed;          // Seed for choosing the failed requests
+} sim_link_config_t;
+
+typedef struct {
+    int connects;               // WiFi connection attempts
+    int connect_failures;       // Attempts that failed because of an outage
+    int sessions;               // http_session_begin() calls
+    int requests;               // Requests sent (including failed ones)
+    int failed_requests;        // Requests that failed (503 or link down)
+    int status_requests;        // Accepted requests without readings
+    int readings_received;      // Distinct readings the server accepted
+    int duplicate_readings;     // Readings the server accepted more than once
+    size_t bytes_sent;          // Request bodies, including failed requests
+} sim_link_stats_t;
+
+/**
+ * @brief Configure the link; call before the firmware's tasks start
+ *
+ * @param config Link behaviour
+ */
+void sim_link_init(const sim_link_config_t *config);
+
+/**
+ * @brief Take WiFi down for a window of virtual time
+ *
+ * @param start_s Start of the outage, seconds of virtual time
+ * @param duration_s Length of the outage in seconds
+ * @return esp_err_t ESP_OK, or ESP_ERR_NO_MEM if there are too many outages
+ */
+esp_err_t sim_link_add_outage(uint64_t start_s, uint64_t duration_s);
+
+/**
+ * @brief Get the link and server counters
+ *
+ * @param stats Output parameter
+ */
+void sim_link_get_stats(sim_link_stats_t *stats);
@@ -0,0 +1,166 @@
+"""
+json_bench.py
+
+Builds tools/host/json_bench.c for the host and compares the two readings
+serializers: the cJSON DOM with cJSON_Print that api_client.c used to build,
+and the streaming json_writer (main/json_writer.c) it uses now. For each chunk
+size it reports payload bytes, heap allocations, peak heap and time per
+reading, and checks that both payloads hold the same values.
+
+cJSON is taken from --cjson, or from the json component of an ESP-IDF
+install ($IDF_PATH or PlatformIO's framework-espidf package). Without it
+only the streaming path is measured.
+
+    python -m tools.json_bench
+    python -m tools.json_bench --counts 50,240,960 --cjson ~/esp/esp-idf/components/json/cJSON
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_SOURCE = os.path.join(PROJECT_DIR, "tools", "host", "json_bench.c")
+WRITER_SOURCE = os.path.join(PROJECT_DIR, "main", "json_writer.c")
+INCLUDE_DIR = os.path.join(PROJECT_DIR, "include")
+DEFAULT_BUILD_DIR = os.path.join(PROJECT_DIR, ".pio", "json_bench")
+DEFAULT_COUNTS = "20,50,240,960"
+
+
+def find_cjson(explicit=None):
+    """
+    Locate a directory holding cJSON.c and cJSON.h.
+
+    Args:
+        explicit (str): Directory given on the command line, checked first
+
+    Returns:
+        str: The directory, or None if cJSON was not found
+    """
+    candidates = [explicit] if explicit else []
+    if os.environ.get("IDF_PATH"):
+        candidates.append(os.path.join(os.environ["IDF_PATH"], "components", "json", "cJSON"))
+    candidates.append(os.path.join(os.path.expanduser("~"), ".platformio", "packages",
+                                   "framework-espidf", "components", "json", "cJSON"))
+    for candidate in candidates:
+        if candidate and os.path.isfile(os.path.join(candidate, "cJSON.c")):
+            return candidate
+    return None
+
+
+def build_bench(build_dir, cjson_dir=None, cc=None):
+    """
+    Compile the host benchmark.
+
+    Args:
+        build_dir (str): Output directory
+        cjson_dir (str): cJSON sources, or None to build the streaming path only
+        cc (str): C compiler (default: $CC, cc, gcc or clang)
+
+    Returns:
+        str: Path of the executable
+    """
+    cc = cc or os.environ.get("CC") or next(
+        (name for name in ("cc", "gcc", "clang") if shutil.which(name)), None)
+    if cc is None:
+        raise RuntimeError("No C compiler found; set CC")
+    os.makedirs(build_dir, exist_ok=True)
+    exe = os.path.join(build_dir, "json_bench")
+    cmd = [cc, "-O2", "-std=gnu11", "-Wall", "-I", INCLUDE_DIR, BENCH_SOURCE, WRITER_SOURCE]
+    if cjson_dir:
+        cmd += ["-DHAVE_CJSON", "-I", cjson_dir, os.path.join(cjson_dir, "cJSON.c")]
+    cmd += ["-o", exe, "-lm"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Compile failed:\n{' '.join(cmd)}\n{result.stderr}")
+    return exe
+
+
+def run_bench(exe, count, dump_dir):
+    """
+    Run the benchmark for one chunk size.
+
+    Returns:
+        list: One result dict per serialization path
+    """
+    result = subprocess.run([exe, str(count), dump_dir], capture_output=True, text=True, check=True)
+    return [json.loads(line) for line in result.stdout.splitlines() if line.strip()]
+
+
+def payloads_match(dump_dir, count):
+    """
+    Check that both paths produced the same JSON values for a chunk size.
+
+    Returns:
+        bool: True if they match, None if there is no cJSON payload to compare
+    """
+    cjson_path = os.path.join(dump_dir, f"cjson_{count}.json")
+    if not os.path.exists(cjson_path):
+        return None
+    with open(cjson_path, "r") as f:
+        expected = json.load(f)
+    with open(os.path.join(dump_dir, f"stream_{count}.json"), "r") as f:
+        actual = json.load(f)
+    return expected == actual
+
+
+def format_results(results):
+    lines = [f"{'Path':<8} {'Readings':>8} {'Bytes':>9} {'B/reading':>10} {'Allocs':>8} "
+             f"{'Allocs/rdg':>10} {'Peak heap':>10} {'Stack':>6} {'ns/reading':>11}"]
+    for r in results:
+        lines.append(f"{r['path']:<8} {r['readings']:>8} {r['bytes']:>9} {r['bytes'] / r['readings']:>10.1f} "
+                     f"{r['allocs']:>8} {r['allocs'] / r['readings']:>10.1f} {r['peak_heap']:>10} "
+                     f"{r['stack_bytes']:>6} {r['ns_per_reading']:>11.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cJSON DOM vs streaming JSON for readings chunks")
+    parser.add_argument("--counts", default=DEFAULT_COUNTS, help="comma-separated chunk sizes")
+    parser.add_argument("--cjson", help="directory with cJSON.c and cJSON.h")
+    parser.add_argument("--cc", help="C compiler")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    try:
+        counts = [int(c) for c in args.counts.split(",") if c.strip()]
+    except ValueError:
+        print(f"[ERROR] --counts must be comma-separated integers: {args.counts}")
+        sys.exit(1)
+
+    cjson_dir = find_cjson(args.cjson)
+    if cjson_dir is None:
+        print("[WARN] cJSON not found (pass --cjson or set IDF_PATH); measuring the streaming path only")
+    try:
+        exe = build_bench(args.build_dir, cjson_dir, args.cc)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    results = []
+    mismatches = []
+    for count in counts:
+        results.extend(run_bench(exe, count, args.build_dir))
+        if payloads_match(args.build_dir, count) is False:
+            mismatches.append(count)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+
+    if mismatches:
+        print(f"[ERROR] Payloads differ for chunk sizes: {', '.join(map(str, mismatches))}")
+        sys.exit(1)
+    if cjson_dir:
+        print("[INFO] Both paths produce the same JSON values")
+
+
+if __name__ == "__main__":
+    main()
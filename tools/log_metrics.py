@@ -0,0 +1,499 @@
+"""
+log_metrics.py
+
+Send-path performance metrics from captured sensor logs. The firmware
+already logs what is needed; this turns those lines into per-event tables:
+
+- send cycles: "=== DATA SEND CYCLE n START === (heap: h bytes)" to
+  "=== DATA SEND CYCLE n END ===", with the heap at the start, the lowest
+  heap logged during the cycle, chunks, readings sent and send attempts
+- chunks: "Sending chunk a-b of n total readings" to "Successfully sent
+  chunk" or "Failed to send chunk", with the HTTP payload size
+- heap samples: every "(heap: n bytes)" and "Heap before ...: n bytes"
+- WiFi connections: "Attempting to connect to network" to "Successfully
+  connected", with retries, disconnect reasons and networks tried
+
+Durations come from the log tick (ms since boot); a tick that goes
+backwards, or a ROM boot banner, is a reboot and closes whatever was open
+as incomplete. Input is what tools/serial_monitor.py captures (JSONL,
+gzipped or not), raw serial logs, or the .log files tools/nvs_decode.py
+writes from log_capture.c's ring.
+
+    python -m tools.log_metrics .pio/logs                    # percentiles per device
+    python -m tools.log_metrics .pio/logs/sensor_1.jsonl --device sensor_1
+    python -m tools.log_metrics .pio/logs --csv .pio/log_metrics --resample 1h
+
+Summaries use NumPy when it is installed. --csv and --resample, and
+to_frames() for notebooks, need pandas (pip install pandas): each table
+becomes a DataFrame indexed by the host time the line was captured.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+
+from tools.serial_monitor import parse_line, replay
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (50, 90, 99)
+CAPTURE_SUFFIXES = (".jsonl", ".jsonl.gz", ".log", ".log.gz", ".txt")
+
+SendCycle = collections.namedtuple("SendCycle", [
+    "device", "time", "tick", "cycle", "duration_ms", "heap_start", "heap_min", "chunks", "chunk_failures",
+    "readings_sent", "send_attempts", "wifi_connected", "completed"])
+Chunk = collections.namedtuple("Chunk", [
+    "device", "time", "tick", "cycle", "first", "last", "total", "payload_bytes", "latency_ms", "ok"])
+HeapSample = collections.namedtuple("HeapSample", ["device", "time", "tick", "cycle", "tag", "context", "heap"])
+WifiConnect = collections.namedtuple("WifiConnect", [
+    "device", "time", "tick", "cycle", "network", "connect_ms", "retries", "disconnects", "reasons",
+    "networks_tried", "ok"])
+
+TABLES = {"cycles": SendCycle, "chunks": Chunk, "heap": HeapSample, "wifi": WifiConnect}
+
+CYCLE_START_RE = re.compile(r"=== DATA SEND CYCLE (\d+) START ===")
+CYCLE_END_RE = re.compile(r"=== DATA SEND CYCLE (\d+) END ===")
+CHUNK_START_RE = re.compile(r"Sending chunk (\d+)-(\d+) of (\d+) total readings")
+CHUNK_SENT_RE = re.compile(r"Successfully sent chunk\. Progress: (\d+)/(\d+)")
+CHUNK_FAILED_RE = re.compile(r"Failed to send chunk (\d+)-(\d+)")
+PAYLOAD_RE = re.compile(r"HTTP payload size: (\d+) bytes")
+SEND_ATTEMPT_RE = re.compile(r"Sensor data send attempt (\d+)/(\d+)")
+HEAP_RE = re.compile(r"^(.*?)[\s(-]*heap: (\d+)(?: bytes)?\)?$|^(Heap [^:]*): (\d+) bytes")
+WIFI_ATTEMPT_RE = re.compile(r"Attempting to connect to network: (.*?) \(heap")
+WIFI_CONNECTED_RE = re.compile(r"Successfully connected to '(.*)' with IP")
+WIFI_RETRY_RE = re.compile(r"Retrying connection to '.*' \(attempt (\d+)/(\d+)\)")
+WIFI_DISCONNECT_RE = re.compile(r"WiFi disconnected, reason: (\d+) \(([^)]*)\)")
+# Lines in log_capture.c's ring are prefixed with the UTC time they were stored
+CAPTURED_PREFIX_RE = re.compile(r"^\d\d:\d\d:\d\d (?=[EWIDV] \()")
+# First lines the ROM bootloader prints after any reset
+BOOT_BANNER_RE = re.compile(r"^(ESP-ROM:|rst:0x)")
+
+
+# Stands in for a record when the logs end with something still open
+_LogEnd = collections.namedtuple("_LogEnd", ["device", "time", "tick"])
+
+
+def _elapsed_ms(start, end):
+    """Milliseconds between two records: by tick, or by host time when there is no tick."""
+    if start.tick is not None and end.tick is not None:
+        return end.tick - start.tick
+    if start.time is not None and end.time is not None:
+        return round((end.time - start.time) * 1000)
+    return None
+
+
+class _DeviceState:
+    """What is open on one device while its log is read."""
+
+    def __init__(self):
+        self.last_tick = None
+        self.cycle = None
+        self.cycle_start = None
+        self.cycle_stats = None
+        self.chunk_start = None
+        self.chunk_range = None
+        self.chunk_payload = None
+        self.wifi_start = None
+        self.wifi_stats = None
+
+
+class LogMetrics:
+    """
+    Extracts the metric tables from log records, one device at a time or
+    interleaved.
+
+    Attributes:
+        cycles (list): SendCycle for each send cycle, complete or not
+        chunks (list): Chunk for each chunk sent or failed
+        heap (list): HeapSample for each logged heap size
+        wifi (list): WifiConnect for each connection attempt
+        reboots (Counter): Device -> reboots seen in its log
+    """
+
+    def __init__(self):
+        self.cycles = []
+        self.chunks = []
+        self.heap = []
+        self.wifi = []
+        self.reboots = collections.Counter()
+        self._devices = collections.defaultdict(_DeviceState)
+
+    def add(self, record):
+        """Process one LogRecord."""
+        if record.level is None:
+            if CAPTURED_PREFIX_RE.match(record.message):
+                record = parse_line(CAPTURED_PREFIX_RE.sub("", record.message), record.device, record.time)
+            elif BOOT_BANNER_RE.match(record.message):
+                self._reboot(record)
+                return
+            else:
+                return
+        state = self._devices[record.device]
+        if record.tick is not None:
+            if state.last_tick is not None and record.tick < state.last_tick:
+                self._reboot(record)
+                state = self._devices[record.device]
+            state.last_tick = record.tick
+
+        message = record.message
+        heap = HEAP_RE.search(message) if "eap" in message else None
+        if heap:
+            context, value = (heap.group(1), heap.group(2)) if heap.group(2) else (heap.group(3), heap.group(4))
+            value = int(value)
+
+        if record.tag == "SEND_DATA_TASK":
+            self._send_task(state, record, message, value if heap else None)
+        elif record.tag == "API_CLIENT":
+            self._api_client(state, record, message)
+        elif record.tag == "HTTP_CLIENT":
+            payload = PAYLOAD_RE.search(message)
+            if payload and state.chunk_start is not None:
+                state.chunk_payload = int(payload.group(1))
+        elif record.tag == "DATA_PROCESSOR":
+            if state.cycle_stats is not None and SEND_ATTEMPT_RE.search(message):
+                state.cycle_stats["send_attempts"] += 1
+        elif record.tag == "WIFI_MANAGER":
+            self._wifi_manager(state, record, message)
+        elif record.tag == "NETWORK_MANAGER" and message.startswith("WiFi disconnected to save power"):
+            self._end_wifi(state, record, ok=False)
+
+        # After the cycle bookkeeping, so a cycle's START line counts towards that cycle
+        if heap:
+            self._heap_sample(state, record, context.strip(" .-"), value)
+
+    def _heap_sample(self, state, record, context, value):
+        self.heap.append(HeapSample(record.device, record.time, record.tick, state.cycle, record.tag, context, value))
+        if state.cycle_stats is not None:
+            low = state.cycle_stats["heap_min"]
+            state.cycle_stats["heap_min"] = value if low is None else min(low, value)
+
+    def _send_task(self, state, record, message, heap):
+        match = CYCLE_START_RE.search(message)
+        if match:
+            self._end_cycle(state, record, completed=False)
+            state.cycle = int(match.group(1))
+            state.cycle_start = record
+            state.cycle_stats = {"heap_start": heap, "heap_min": None, "chunks": 0, "chunk_failures": 0,
+                                 "readings_sent": 0, "send_attempts": 0, "wifi_connected": False}
+            return
+        match = CYCLE_END_RE.search(message)
+        if match and state.cycle_start is not None:
+            self._end_cycle(state, record, completed=True)
+        elif message.startswith("Failed to connect to WiFi"):
+            self._end_wifi(state, record, ok=False)
+        elif message.startswith("WiFi connected successfully") and state.wifi_start is not None:
+            self._end_wifi(state, record, ok=True)
+
+    def _api_client(self, state, record, message):
+        match = CHUNK_START_RE.search(message)
+        if match:
+            self._end_chunk(state, record, ok=False, timed=False)
+            state.chunk_start = record
+            state.chunk_range = tuple(int(value) for value in match.groups())
+            state.chunk_payload = None
+            return
+        if state.chunk_start is None:
+            return
+        if CHUNK_SENT_RE.search(message):
+            self._end_chunk(state, record, ok=True)
+        elif CHUNK_FAILED_RE.search(message):
+            self._end_chunk(state, record, ok=False)
+
+    def _wifi_manager(self, state, record, message):
+        match = WIFI_ATTEMPT_RE.search(message)
+        if match:
+            if state.wifi_start is None:
+                state.wifi_start = record
+                state.wifi_stats = {"network": match.group(1), "retries": 0, "reasons": [], "networks_tried": 1}
+            else:
+                state.wifi_stats["networks_tried"] += 1
+                state.wifi_stats["network"] = match.group(1)
+            return
+        if state.wifi_start is None:
+            return
+        match = WIFI_DISCONNECT_RE.search(message)
+        if match:
+            state.wifi_stats["reasons"].append(match.group(2) or match.group(1))
+        elif WIFI_RETRY_RE.search(message):
+            state.wifi_stats["retries"] += 1
+        else:
+            match = WIFI_CONNECTED_RE.search(message)
+            if match:
+                state.wifi_stats["network"] = match.group(1)
+                self._end_wifi(state, record, ok=True)
+
+    def _end_chunk(self, state, record, ok, timed=True):
+        if state.chunk_start is None:
+            return
+        first, last, total = state.chunk_range
+        # A chunk superseded by the next one, or cut off by a reboot, has no latency
+        latency = _elapsed_ms(state.chunk_start, record) if timed else None
+        self.chunks.append(Chunk(record.device, state.chunk_start.time, state.chunk_start.tick, state.cycle,
+                                 first, last, total, state.chunk_payload, latency, ok))
+        if state.cycle_stats is not None:
+            state.cycle_stats["chunks"] += 1
+            if ok:
+                state.cycle_stats["readings_sent"] += last - first + 1
+            else:
+                state.cycle_stats["chunk_failures"] += 1
+        state.chunk_start = state.chunk_range = state.chunk_payload = None
+
+    def _end_wifi(self, state, record, ok):
+        if state.wifi_start is None:
+            return
+        stats = state.wifi_stats
+        self.wifi.append(WifiConnect(record.device, state.wifi_start.time, state.wifi_start.tick, state.cycle,
+                                     stats["network"], _elapsed_ms(state.wifi_start, record) if ok else None,
+                                     stats["retries"], len(stats["reasons"]), ";".join(stats["reasons"]),
+                                     stats["networks_tried"], ok))
+        if ok and state.cycle_stats is not None:
+            state.cycle_stats["wifi_connected"] = True
+        state.wifi_start = state.wifi_stats = None
+
+    def _end_cycle(self, state, record, completed):
+        if state.cycle_start is None:
+            return
+        self._end_chunk(state, record, ok=False, timed=False)
+        self._end_wifi(state, record, ok=False)
+        start = state.cycle_start
+        self.cycles.append(SendCycle(record.device, start.time, start.tick, state.cycle,
+                                     _elapsed_ms(start, record) if completed else None,
+                                     completed=completed, **state.cycle_stats))
+        state.cycle_start = state.cycle_stats = None
+
+    def _reboot(self, record):
+        state = self._devices[record.device]
+        self._end_chunk(state, record, ok=False, timed=False)
+        self._end_wifi(state, record, ok=False)
+        self._end_cycle(state, record, completed=False)
+        if state.last_tick is not None:
+            self.reboots[record.device] += 1
+        self._devices[record.device] = fresh = _DeviceState()
+        fresh.last_tick = record.tick
+
+    def finish(self):
+        """Close what is still open at the end of the logs (as incomplete)."""
+        for device, state in self._devices.items():
+            end = _LogEnd(device, None, None)
+            self._end_chunk(state, end, ok=False, timed=False)
+            self._end_wifi(state, end, ok=False)
+            self._end_cycle(state, end, completed=False)
+        return self
+
+
+def find_captures(paths):
+    """
+    Expand files and directories into capture files, oldest first so a
+    device's rotated files come before its current one.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = [os.path.join(path, name) for name in os.listdir(path) if name.endswith(CAPTURE_SUFFIXES)]
+            files.extend(sorted(found, key=lambda name: (os.path.getmtime(name), name)))
+        else:
+            files.append(path)
+    return files
+
+
+def _capture_device(path):
+    """Device name of a capture file: sensor_1-20250915-120000.jsonl.gz -> sensor_1."""
+    return re.sub(r"-\d{8}-\d{6}(-\d+)?$", "", os.path.basename(path).split(".")[0])
+
+
+def extract(paths, device=None):
+    """
+    Read capture files and extract the metric tables.
+
+    Args:
+        paths (list): Capture files or directories of them
+        device (str): Only this device
+
+    Returns:
+        LogMetrics: The tables
+    """
+    metrics = LogMetrics()
+    for path in find_captures(paths):
+        for record in replay(path, _capture_device(path)):
+            if device is None or record.device == device:
+                metrics.add(record)
+    return metrics.finish()
+
+
+def percentiles(values, qs=PERCENTILES):
+    """
+    Percentiles by linear interpolation between closest ranks (NumPy's
+    default method, which is used when NumPy is installed).
+    """
+    if np is not None:
+        return [float(value) for value in np.percentile(values, qs)]
+    ordered = sorted(values)
+    results = []
+    for q in qs:
+        rank = (len(ordered) - 1) * q / 100
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        results.append(ordered[low] + (ordered[high] - ordered[low]) * (rank - low))
+    return results
+
+
+# (table, column, label, rows to include) for each summarized metric
+SUMMARY_METRICS = [
+    ("cycles", "duration_ms", "cycle_ms", lambda row: row.completed),
+    ("chunks", "latency_ms", "chunk_ms", lambda row: row.ok),
+    ("chunks", "payload_bytes", "chunk_bytes", lambda row: row.ok),
+    ("wifi", "connect_ms", "wifi_connect_ms", lambda row: row.ok),
+    ("wifi", "retries", "wifi_retries", lambda row: True),
+    ("cycles", "send_attempts", "send_attempts", lambda row: row.completed and row.wifi_connected),
+    ("cycles", "heap_min", "cycle_heap_min", lambda row: True),
+    ("heap", "heap", "heap", lambda row: True),
+]
+
+SummaryRow = collections.namedtuple("SummaryRow", ["device", "metric", "count", "min"]
+                                    + [f"p{q}" for q in PERCENTILES] + ["max"])
+
+
+def summarize(metrics):
+    """
+    Percentile summary of each metric, per device.
+
+    Returns:
+        list: SummaryRow for each device and metric with any values
+    """
+    values = collections.defaultdict(list)
+    for table, column, label, include in SUMMARY_METRICS:
+        for row in getattr(metrics, table):
+            value = getattr(row, column)
+            if value is not None and include(row):
+                values[(row.device, label)].append(value)
+    order = {label: index for index, (_table, _column, label, _include) in enumerate(SUMMARY_METRICS)}
+    rows = []
+    for (device, label), series in sorted(values.items(), key=lambda item: (item[0][0], order[item[0][1]])):
+        rows.append(SummaryRow(device, label, len(series), min(series), *percentiles(series), max(series)))
+    return rows
+
+
+def format_summary(metrics, rows):
+    """Format the summary as one table per device."""
+    lines = []
+    by_device = collections.defaultdict(list)
+    for row in rows:
+        by_device[row.device].append(row)
+    for device in sorted({row.device for row in metrics.cycles + metrics.wifi + metrics.heap} | set(by_device)):
+        cycles = [cycle for cycle in metrics.cycles if cycle.device == device]
+        incomplete = sum(1 for cycle in cycles if not cycle.completed)
+        failed_chunks = sum(1 for chunk in metrics.chunks if chunk.device == device and not chunk.ok)
+        failed_wifi = sum(1 for attempt in metrics.wifi if attempt.device == device and not attempt.ok)
+        lines.append(f"{device}: {len(cycles)} send cycles ({incomplete} incomplete), "
+                     f"{failed_chunks} failed chunks, {failed_wifi} failed WiFi connections, "
+                     f"{metrics.reboots[device]} reboots")
+        header = f"  {'metric':<16} {'n':>6} {'min':>9}" + "".join(f" {f'p{q}':>9}" for q in PERCENTILES)
+        lines.append(header + f" {'max':>9}")
+        for row in by_device[device]:
+            numbers = [row.min] + [getattr(row, f"p{q}") for q in PERCENTILES] + [row.max]
+            lines.append(f"  {row.metric:<16} {row.count:>6}" + "".join(f" {value:>9.0f}" for value in numbers))
+    return "\n".join(lines)
+
+
+def _import_pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise RuntimeError("Time series need pandas (pip install pandas)")
+    return pandas
+
+
+def to_frames(metrics):
+    """
+    Turn each table into a pandas DataFrame indexed by capture time (UTC).
+    Rows from raw logs, which have no capture time, have NaT in the index.
+
+    Returns:
+        dict: Table name -> DataFrame
+    """
+    pd = _import_pandas()
+    frames = {}
+    for name, row_type in TABLES.items():
+        frame = pd.DataFrame.from_records(getattr(metrics, name), columns=row_type._fields)
+        frame.index = pd.to_datetime(frame.pop("time"), unit="s", utc=True)
+        frames[name] = frame.sort_index(kind="stable")
+    return frames
+
+
+def resample(frames, rule):
+    """
+    Per-device time series at a fixed interval: cycles, median cycle time,
+    p90 chunk latency, lowest heap and WiFi retries in each interval.
+
+    Args:
+        frames (dict): From to_frames()
+        rule (str): pandas offset alias, e.g. "1h" or "1D"
+
+    Returns:
+        DataFrame: Indexed by (device, interval start)
+    """
+    pd = _import_pandas()
+    # Rows from raw logs have no capture time to bucket by
+    timed = {name: frame[frame.index.notna()] for name, frame in frames.items()}
+    cycles = timed["cycles"][timed["cycles"]["completed"].astype(bool)].dropna(subset=["duration_ms"])
+    chunks = timed["chunks"][timed["chunks"]["ok"].astype(bool)]
+    columns = {
+        "cycles": cycles.groupby("device").resample(rule)["duration_ms"].count(),
+        "cycle_ms_p50": cycles.groupby("device").resample(rule)["duration_ms"].median(),
+        "chunk_ms_p90": chunks.groupby("device").resample(rule)["latency_ms"].quantile(0.9),
+        "heap_min": timed["heap"].groupby("device").resample(rule)["heap"].min(),
+        "wifi_retries": timed["wifi"].groupby("device").resample(rule)["retries"].sum(),
+    }
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send-path latency and heap metrics from captured sensor logs")
+    parser.add_argument("paths", nargs="+", help="capture files, or directories of them (e.g. .pio/logs)")
+    parser.add_argument("--device", help="only this device")
+    parser.add_argument("--csv", metavar="DIR", help="write each table as DIR/<table>.csv (needs pandas)")
+    parser.add_argument("--resample", metavar="RULE",
+                        help="print a per-device time series at this interval, e.g. 1h (needs pandas)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        metrics = extract(args.paths, args.device)
+    except OSError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    rows = summarize(metrics)
+    if not rows and not metrics.cycles:
+        print("[ERROR] No send-path log lines found")
+        sys.exit(1)
+    print(format_summary(metrics, rows))
+
+    if args.csv or args.resample:
+        try:
+            frames = to_frames(metrics)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        if args.csv:
+            os.makedirs(args.csv, exist_ok=True)
+            for name, frame in frames.items():
+                frame.to_csv(os.path.join(args.csv, f"{name}.csv"))
+            print(f"[INFO] Wrote {', '.join(f'{name}.csv' for name in frames)} to {args.csv}")
+        if args.resample:
+            print(resample(frames, args.resample).to_string())
+
+    print(f"[INFO] {len(metrics.cycles)} cycles, {len(metrics.chunks)} chunks, {len(metrics.heap)} heap samples, "
+          f"{len(metrics.wifi)} WiFi connections in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
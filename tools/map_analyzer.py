@@ -0,0 +1,471 @@
+"""
+map_analyzer.py
+
+Reads the GNU ld map file a build writes to .pio/build/<env>/firmware.map
+and attributes flash, IRAM and DRAM bytes to every symbol, object file and
+component. The map is streamed line by line, so multi-megabyte maps from
+full ESP-IDF builds are never held in memory.
+
+Memory is classified by address, using the regions in the map's Memory
+Configuration (the ESP32-C3 linker scripts define iram0_0_seg, iram0_2_seg
+for code in flash, dram0_0_seg, drom0_0_seg for constants in flash and
+rtc_iram_seg). The summary compares each region with its size, and the image
+with the factory partition in partitions.csv.
+
+    python -m tools.map_analyzer .pio/build/sensor_temp/firmware.map
+    python -m tools.map_analyzer firmware.map --by symbol --top 30
+    python -m tools.map_analyzer old.map new.map          # what grew between two builds
+
+build.py runs the analysis after every successful build that produced a map.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import sys
+
+from tools.partitions import find_partition
+
+CATEGORIES = ["flash", "iram", "dram", "rtc"]
+CATEGORY_LABELS = {"flash": "Flash", "iram": "IRAM", "dram": "DRAM", "rtc": "RTC"}
+APP_PARTITION = "factory"
+MAP_FILE = "firmware.map"
+# Written next to the map after each analysis, so the next build can show what grew
+MEMORY_FILE = "memory.json"
+
+# Warn when the image or DRAM gets closer than this to its limit
+MIN_APP_HEADROOM = 64 * 1024
+MIN_DRAM_HEADROOM = 16 * 1024
+
+_HEX = r"0x([0-9a-fA-F]+)"
+_REGION_RE = re.compile(rf"^(\S+)\s+{_HEX}\s+{_HEX}(?:\s+\S+)?\s*$")
+# ".text   0x42000020   0x1234" at column 0, or the name alone with the numbers on the next line
+_OUTPUT_SECTION_RE = re.compile(rf"^([.\w]\S*)(?:\s+{_HEX}\s+{_HEX})?\s*$")
+# " .text.foo   0x42000020   0x4c   esp-idf/main/libmain.a(main.c.obj)"
+_INPUT_SECTION_RE = re.compile(rf"^ (\S+)\s+{_HEX}\s+{_HEX}(?:\s+(\S.*?))?\s*$")
+_INPUT_NAME_ONLY_RE = re.compile(r"^ ([.\w*]\S*)\s*$")
+# Continuation of a wrapped line: "                0x42000020   0x4c   file" or "... 0x.. 0x.." alone
+_CONTINUATION_RE = re.compile(rf"^\s+{_HEX}\s+{_HEX}(?:\s+(\S.*))?$")
+# "                0x42000020                symbol"
+_SYMBOL_RE = re.compile(rf"^\s+{_HEX}\s+([A-Za-z_.$][\w.$]*)\s*$")
+_ARCHIVE_RE = re.compile(r"(?:^|/)lib([^/()]+)\.a\(([^)]+)\)$")
+# Prefixes -ffunction-sections/-fdata-sections put before a symbol's name
+_SECTION_PREFIXES = (".text.", ".literal.", ".rodata.", ".data.rel.ro.", ".data.", ".sdata.",
+                     ".bss.", ".sbss.", ".iram1.", ".dram1.", ".srodata.", ".noinit.")
+
+Region = collections.namedtuple("Region", ["name", "origin", "length", "category"])
+Entry = collections.namedtuple("Entry", ["symbol", "object", "component", "category", "size"])
+
+
+def region_category(name):
+    """Map an ESP-IDF memory region name to flash, iram, dram or rtc (None for others)."""
+    name = name.lower()
+    if "drom" in name or "irom" in name or "iram0_2" in name or "flash" in name:
+        return "flash"
+    if "rtc" in name:
+        return "rtc"
+    if "iram" in name:
+        return "iram"
+    if "dram" in name:
+        return "dram"
+    return None
+
+
+def section_category(name):
+    """Classify an output section by name, for maps without memory regions."""
+    if name.startswith((".iram", ".iram0")):
+        return "iram"
+    if name.startswith((".rtc",)):
+        return "rtc"
+    if name.startswith((".text", ".rodata", ".flash", ".init", ".fini", ".eh_frame")):
+        return "flash"
+    if name.startswith((".data", ".bss", ".sdata", ".sbss", ".dram", ".noinit", ".tbss", ".tdata")):
+        return "dram"
+    return None
+
+
+def is_loaded(section_name):
+    """Return False for sections that take RAM but nothing in the image (.bss, .noinit)."""
+    return not any(part in section_name for part in ("bss", "noinit", ".heap", "stack"))
+
+
+def split_object(path):
+    """
+    Return (object, component) for an input file as written in the map.
+
+    esp-idf/freertos/libfreertos.a(tasks.c.obj) is tasks.c.obj in freertos;
+    a plain object file belongs to the directory it was compiled in.
+    """
+    path = path.strip()
+    match = _ARCHIVE_RE.search(path)
+    if match:
+        return match.group(2), match.group(1)
+    parts = path.replace("\\", "/").split("/")
+    return parts[-1], parts[-2] if len(parts) > 1 else parts[-1]
+
+
+def _symbol_from_section(name):
+    for prefix in _SECTION_PREFIXES:
+        if name.startswith(prefix) and len(name) > len(prefix):
+            return name[len(prefix):]
+    return name
+
+
+class _InputSection:
+    __slots__ = ("name", "address", "size", "path", "category", "symbols")
+
+    def __init__(self, name, address, size, path, category):
+        self.name = name
+        self.address = address
+        self.size = size
+        self.path = path
+        self.category = category
+        self.symbols = []
+
+
+class MapFile:
+    """
+    The memory use recorded in one GNU ld map file.
+
+    Attributes:
+        path (str): The map file
+        regions (list): Region tuples from the Memory Configuration
+        region_used (dict): Region name -> bytes placed in it
+        sections (dict): Output section name -> bytes, for sections in memory
+        totals (dict): Category -> bytes
+        image_bytes (int): Bytes that are stored in flash (code, constants and
+                           the initial values of IRAM and DRAM data)
+        entries (list): One Entry per symbol (or per input section without one)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.regions = []
+        self.region_used = collections.Counter()
+        self.sections = collections.Counter()
+        self.totals = collections.Counter()
+        self.image_bytes = 0
+        self.entries = []
+        self._parse()
+
+    def _region_for(self, address):
+        for region in self.regions:
+            if region.origin <= address < region.origin + region.length:
+                return region
+        return None
+
+    def _emit(self, section):
+        """Split an input section between the symbols it defines and record them."""
+        if section is None or section.size == 0 or section.category is None:
+            return
+        obj, component = split_object(section.path) if section.path else ("(fill)", "(fill)")
+        symbols = sorted(s for s in section.symbols if section.address <= s[0] < section.address + section.size)
+        if not symbols:
+            name = _symbol_from_section(section.name) if section.path else "*fill*"
+            self.entries.append(Entry(name, obj, component, section.category, section.size))
+            return
+        # Bytes before the first symbol (alignment, literals) go to the first symbol
+        for index, (address, symbol) in enumerate(symbols):
+            start = section.address if index == 0 else address
+            end = symbols[index + 1][0] if index + 1 < len(symbols) else section.address + section.size
+            if end > start:
+                self.entries.append(Entry(symbol, obj, component, section.category, end - start))
+
+    def _parse(self):
+        phase = "preamble"
+        output_name, output_category = None, None
+        pending_output, pending_input = None, None
+        section = None
+
+        with open(self.path, "r", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if phase == "preamble":
+                    if line.startswith("Memory Configuration"):
+                        phase = "memory"
+                    elif line.startswith("Linker script and memory map"):
+                        phase = "map"
+                    continue
+                if phase == "memory":
+                    if line.startswith("Linker script and memory map"):
+                        phase = "map"
+                        continue
+                    match = _REGION_RE.match(line)
+                    if match and match.group(1) not in ("Name", "*default*"):
+                        name = match.group(1)
+                        self.regions.append(Region(name, int(match.group(2), 16), int(match.group(3), 16),
+                                                   region_category(name)))
+                    continue
+                if line.startswith("Cross Reference Table"):
+                    break
+
+                if pending_output is not None or pending_input is not None:
+                    match = _CONTINUATION_RE.match(line)
+                    if match:
+                        address, size, path = int(match.group(1), 16), int(match.group(2), 16), match.group(3)
+                        if pending_output is not None:
+                            output_name, output_category = self._begin_output(
+                                pending_output, address, size)
+                        elif path:
+                            self._emit(section)
+                            section = self._begin_input(pending_input, address, size, path, output_category)
+                        pending_output, pending_input = None, None
+                        continue
+                    pending_output, pending_input = None, None
+
+                if not line:
+                    continue
+                if line[0] not in " \t":
+                    self._emit(section)
+                    section = None
+                    match = _OUTPUT_SECTION_RE.match(line)
+                    if not match or line.startswith(("LOAD ", "OUTPUT(", "START GROUP", "END GROUP")):
+                        output_name, output_category = None, None
+                        continue
+                    if match.group(2) is None:
+                        pending_output = match.group(1)
+                    else:
+                        output_name, output_category = self._begin_output(
+                            match.group(1), int(match.group(2), 16), int(match.group(3), 16))
+                    continue
+                if output_name is None:
+                    continue
+
+                match = _SYMBOL_RE.match(line)
+                if match:
+                    if section is not None:
+                        section.symbols.append((int(match.group(1), 16), match.group(2)))
+                    continue
+                match = _INPUT_SECTION_RE.match(line)
+                if match:
+                    self._emit(section)
+                    name, address, size = match.group(1), int(match.group(2), 16), int(match.group(3), 16)
+                    path = None if name == "*fill*" else match.group(4)
+                    section = self._begin_input(name, address, size, path, output_category)
+                    continue
+                match = _INPUT_NAME_ONLY_RE.match(line)
+                if match and not line.startswith(" *("):
+                    self._emit(section)
+                    section = None
+                    pending_input = match.group(1)
+        self._emit(section)
+
+    def _begin_output(self, name, address, size):
+        """Start an output section; return (name, category)."""
+        region = self._region_for(address) if address else None
+        category = region.category if region else (section_category(name) if not self.regions else None)
+        if region is not None:
+            self.region_used[region.name] += size
+        if category is not None:
+            self.sections[name] += size
+            if category == "flash" or is_loaded(name):
+                self.image_bytes += size
+        return name, category
+
+    def _begin_input(self, name, address, size, path, category):
+        if category is not None:
+            self.totals[category] += size
+        return _InputSection(name, address, size, path, category)
+
+    def usage(self, key):
+        """
+        Sum bytes per category by "symbol", "object" or "component".
+
+        Returns:
+            dict: Key -> Counter of category -> bytes
+        """
+        usage = collections.defaultdict(collections.Counter)
+        for entry in self.entries:
+            if key == "symbol":
+                name = f"{entry.symbol} ({entry.object})" if entry.symbol != "*fill*" else entry.symbol
+            else:
+                name = getattr(entry, key)
+            usage[name][entry.category] += entry.size
+        return usage
+
+
+def summarize(map_file, image_path=None, partitions_csv="partitions.csv"):
+    """
+    Summarize a map's memory use against its regions and the app partition.
+
+    Args:
+        map_file (MapFile): The parsed map
+        image_path (str): firmware.bin, whose size is the real image size (optional)
+        partitions_csv (str): Partition table with the factory partition
+
+    Returns:
+        dict: totals, regions (name, size, used, free), output section sizes, image
+              bytes and partition headroom
+    """
+    summary = {
+        "map": map_file.path,
+        "totals": {category: map_file.totals.get(category, 0) for category in CATEGORIES},
+        "regions": [{"name": r.name, "category": r.category, "size": r.length,
+                     "used": map_file.region_used.get(r.name, 0),
+                     "free": r.length - map_file.region_used.get(r.name, 0)} for r in map_file.regions],
+        "sections": dict(map_file.sections),
+        "image_bytes": map_file.image_bytes,
+    }
+    if image_path and os.path.exists(image_path):
+        summary["image_bytes"] = os.path.getsize(image_path)
+    partition = find_partition(APP_PARTITION, partitions_csv) if os.path.exists(partitions_csv) else None
+    if partition is not None:
+        summary["partition"] = {"name": partition.name, "size": partition.size,
+                                "free": partition.size - summary["image_bytes"]}
+    return summary
+
+
+def headroom_warnings(summary, min_app=MIN_APP_HEADROOM, min_dram=MIN_DRAM_HEADROOM):
+    """Return warning strings for an image or DRAM close to its limit."""
+    warnings = []
+    partition = summary.get("partition")
+    if partition and partition["free"] < min_app:
+        warnings.append(f"image is {summary['image_bytes']:,} bytes, leaving {partition['free']:,} of "
+                        f"{partition['size']:,} bytes free in the {partition['name']} partition")
+    for region in summary["regions"]:
+        if region["category"] == "dram" and region["free"] < min_dram:
+            warnings.append(f"{region['name']} has {region['free']:,} of {region['size']:,} bytes free")
+    return warnings
+
+
+def format_summary(summary):
+    """Format a summary as a few lines of text."""
+    totals = summary["totals"]
+    lines = ["  ".join(f"{CATEGORY_LABELS[category]} {totals[category]:,}" for category in CATEGORIES) + " bytes"]
+    for region in summary["regions"]:
+        if region["used"]:
+            lines.append(f"  {region['name']:<16} {region['used']:>10,} / {region['size']:>10,} bytes "
+                         f"({region['used'] / region['size'] * 100:5.1f}%)")
+    partition = summary.get("partition")
+    if partition:
+        lines.append(f"  {'image':<16} {summary['image_bytes']:>10,} / {partition['size']:>10,} bytes "
+                     f"({summary['image_bytes'] / partition['size'] * 100:5.1f}% of {partition['name']})")
+    return "\n".join(lines)
+
+
+def format_usage(usage, top, label):
+    """Format the largest entries of a usage table."""
+    rows = sorted(usage.items(), key=lambda item: -sum(item[1].values()))[:top]
+    width = max([len(label)] + [len(name) for name, _counts in rows])
+    lines = [f"{label:<{width}}  {'Flash':>9}  {'IRAM':>8}  {'DRAM':>8}  {'Total':>9}"]
+    for name, counts in rows:
+        lines.append(f"{name:<{width}}  {counts['flash']:>9,}  {counts['iram']:>8,}  {counts['dram']:>8,}  "
+                     f"{sum(counts.values()):>9,}")
+    return "\n".join(lines)
+
+
+def diff_usage(old, new):
+    """
+    Compare two usage tables.
+
+    Returns:
+        list: (name, old bytes, new bytes, Counter of per-category change), largest growth first
+    """
+    changes = []
+    for name in set(old) | set(new):
+        before, after = old.get(name, collections.Counter()), new.get(name, collections.Counter())
+        delta = collections.Counter({category: after[category] - before[category] for category in CATEGORIES})
+        if any(delta.values()):
+            changes.append((name, sum(before.values()), sum(after.values()), delta))
+    changes.sort(key=lambda change: (-(change[2] - change[1]), change[0]))
+    return changes
+
+
+def format_diff(changes, top, label):
+    width = max([len(label)] + [len(name) for name, *_rest in changes[:top]])
+    lines = [f"{label:<{width}}  {'Before':>9}  {'After':>9}  {'Change':>8}  {'Flash':>7}  {'IRAM':>7}  "
+             f"{'DRAM':>7}"]
+    for name, before, after, delta in changes[:top]:
+        lines.append(f"{name:<{width}}  {before:>9,}  {after:>9,}  {after - before:>+8,}  {delta['flash']:>+7,}  "
+                     f"{delta['iram']:>+7,}  {delta['dram']:>+7,}")
+    return "\n".join(lines)
+
+
+def analyze_build(build_dir, partitions_csv="partitions.csv"):
+    """
+    Analyze the map of a finished build and compare it with the previous one.
+
+    The summary and per-symbol usage are saved to memory.json in build_dir,
+    which is what the next build is compared with.
+
+    Args:
+        build_dir (str): .pio/build/<env>
+        partitions_csv (str): Partition table with the factory partition
+
+    Returns:
+        tuple: (summary, changes) where changes is diff_usage() by symbol against
+               the previous build ([] for the first), or None without a map
+    """
+    map_path = os.path.join(build_dir, MAP_FILE)
+    if not os.path.exists(map_path):
+        return None
+    map_file = MapFile(map_path)
+    summary = summarize(map_file, os.path.join(build_dir, "firmware.bin"), partitions_csv)
+    usage = map_file.usage("symbol")
+
+    memory_path = os.path.join(build_dir, MEMORY_FILE)
+    changes = []
+    try:
+        with open(memory_path, "r") as f:
+            previous = json.load(f)["symbols"]
+        changes = diff_usage({name: collections.Counter(counts) for name, counts in previous.items()}, usage)
+    except (OSError, ValueError, KeyError):
+        pass
+    with open(memory_path, "w") as f:
+        json.dump({"summary": summary, "symbols": {name: dict(counts) for name, counts in usage.items()}}, f)
+    return summary, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attribute flash, IRAM and DRAM use in a GNU ld map file")
+    parser.add_argument("maps", nargs="+", metavar="MAP", help="map file, or two to compare (old new)")
+    parser.add_argument("--by", choices=["component", "object", "symbol"], default="component")
+    parser.add_argument("--top", type=int, default=20, help="rows to show (default: 20)")
+    parser.add_argument("--image", help="firmware.bin, for the real image size (default: next to the map)")
+    parser.add_argument("--partitions", default="partitions.csv")
+    parser.add_argument("--json", action="store_true", help="print the summary and usage as JSON")
+    args = parser.parse_args()
+
+    if len(args.maps) > 2:
+        parser.error("give one map to analyze or two to compare")
+    for path in args.maps:
+        if not os.path.exists(path):
+            print(f"[ERROR] {path} not found")
+            sys.exit(1)
+
+    maps = [MapFile(path) for path in args.maps]
+    label = args.by.capitalize()
+    if len(maps) == 2:
+        old, new = maps
+        changes = diff_usage(old.usage(args.by), new.usage(args.by))
+        if args.json:
+            print(json.dumps([{"name": name, "before": before, "after": after, "change": dict(delta)}
+                              for name, before, after, delta in changes], indent=2))
+            return
+        totals = {category: new.totals[category] - old.totals[category] for category in CATEGORIES}
+        print("Change: " + "  ".join(f"{CATEGORY_LABELS[category]} {totals[category]:+,}"
+                                     for category in CATEGORIES) + " bytes")
+        print(format_diff(changes, args.top, label) if changes else "[INFO] No differences")
+        return
+
+    map_file = maps[0]
+    image = args.image or os.path.join(os.path.dirname(map_file.path), "firmware.bin")
+    summary = summarize(map_file, image, args.partitions)
+    usage = map_file.usage(args.by)
+    if args.json:
+        summary["usage"] = {name: dict(counts) for name, counts in usage.items()}
+        print(json.dumps(summary, indent=2))
+        return
+    print(format_summary(summary))
+    print()
+    print(format_usage(usage, args.top, label))
+    for warning in headroom_warnings(summary):
+        print(f"[WARN] {warning}")
+
+
+if __name__ == "__main__":
+    main()
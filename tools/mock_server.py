@@ -0,0 +1,568 @@
+"""
+mock_server.py
+
+Local stand-in for the sensor ingest API, for testing clients and sizing the
+backend without the live service.
+
+It accepts the same requests the firmware sends (api_client.c): a POST of a
+JSON array holding either readings
+
+    {"light_intensity", "sensor_id", "timestamp", "sensor_set_id",
+     "chip_temp_c", "chip_temp_f"}
+
+or status objects
+
+    {"sensor_id", "timestamp", "sensor_set_id", "status", "commit_sha",
+     "commit_timestamp", ["battery_voltage", "battery_percent", "wifi_dbm",
+     "profile"]}
+
+authenticated with "Authorization: Bearer <token>". Tokens come from the
+sensor sections of credentials.ini, and the sensor_id of every object must
+belong to the token that sent it. Objects with missing, mistyped or unknown
+fields are rejected with 400 so contract drift shows up immediately.
+Readings may also arrive as a binary batch (Content-Type
+application/vnd.sunlight.batch, see tools/batch_codec.py); any other
+content type gets 415.
+
+Rows are queued and written by one writer task in batched transactions
+(SQLite, or Parquet when pyarrow is installed); a request is answered once
+its rows are committed. Request rate and p50/p99 latency are printed every
+--report-interval seconds, and GET /stats returns the totals as JSON.
+
+With --fail-rate a random fraction of valid POSTs are answered 503 before
+their rows are stored, to check that clients retry and make progress over a
+flaky link.
+
+    python -m tools.mock_server --port 8080
+    python -m tools.mock_server --parquet .pio/mock_ingest --batch-size 2000
+    python -m tools.mock_server --fail-rate 0.3 --seed 1
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import asyncio
+import configparser
+import json
+import os
+import random
+import sqlite3
+import ssl
+import sys
+import time
+from datetime import datetime
+
+from tools.batch_codec import CONTENT_TYPE as BATCH_CONTENT_TYPE, BatchFormatError, decode_batch
+
+DEFAULT_DB = os.path.join(".pio", "mock_ingest.sqlite")
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+MAX_BODY_SIZE = 1024 * 1024
+
+# (field, accepted JSON types, required) for each object kind the firmware sends
+_NUMBER = (int, float)
+READING_FIELDS = [
+    ("light_intensity", _NUMBER, True),
+    ("sensor_id", str, True),
+    ("timestamp", str, True),
+    ("sensor_set_id", str, True),
+    ("chip_temp_c", _NUMBER, True),
+    ("chip_temp_f", _NUMBER, True),
+]
+STATUS_FIELDS = [
+    ("sensor_id", str, True),
+    ("timestamp", str, True),
+    ("sensor_set_id", str, True),
+    ("status", str, True),
+    ("commit_sha", str, True),
+    ("commit_timestamp", str, True),
+    ("battery_voltage", _NUMBER, False),
+    ("battery_percent", _NUMBER, False),
+    ("wifi_dbm", _NUMBER, False),
+    ("profile", str, False),
+]
+_SCHEMAS = {
+    "readings": (READING_FIELDS, {name for name, _types, _required in READING_FIELDS}),
+    "statuses": (STATUS_FIELDS, {name for name, _types, _required in STATUS_FIELDS}),
+}
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+                404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+                413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error",
+                503: "Service Unavailable"}
+
+
+class PayloadError(Exception):
+    """Raised when a request body does not match the firmware's JSON contract."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def load_tokens(credentials_file):
+    """
+    Map each sensor's bearer token to its sensor_id.
+
+    Args:
+        credentials_file (str): Path to credentials.ini
+
+    Returns:
+        dict: token -> sensor_id
+    """
+    config = configparser.ConfigParser()
+    if not config.read(credentials_file):
+        raise FileNotFoundError(f"{credentials_file} not found")
+    tokens = {}
+    for section in config.sections():
+        if section != "all_sensors" and config.has_option(section, "bearer_token"):
+            tokens[config.get(section, "bearer_token")] = config.get(section, "sensor_id", fallback=section)
+    return tokens
+
+
+def validate_payload(body, sensor_id=None, content_type="application/json"):
+    """
+    Check a request body against the firmware's JSON contract.
+
+    Args:
+        body (bytes): Request body
+        sensor_id (str): Sensor the bearer token belongs to, or None to skip the check
+        content_type (str): Content-Type of the request
+
+    Returns:
+        dict: Rows to store, keyed by table ("readings" and "statuses")
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == BATCH_CONTENT_TYPE:
+        try:
+            objects = decode_batch(body)
+        except BatchFormatError as e:
+            raise PayloadError(f"Invalid batch: {e}")
+    elif media_type in ("application/json", ""):
+        try:
+            objects = json.loads(body)
+        except ValueError as e:
+            raise PayloadError(f"Invalid JSON: {e}")
+    else:
+        raise PayloadError(f"Unsupported content type '{content_type}'", 415)
+    if not isinstance(objects, list) or not objects:
+        raise PayloadError("Body must be a non-empty JSON array")
+
+    rows = {"readings": [], "statuses": []}
+    for i, obj in enumerate(objects):
+        if not isinstance(obj, dict):
+            raise PayloadError(f"Item {i} is not an object")
+        table = "statuses" if "status" in obj else "readings"
+        fields, allowed = _SCHEMAS[table]
+        unknown = set(obj) - allowed
+        if unknown:
+            raise PayloadError(f"Item {i}: unknown fields {sorted(unknown)}")
+        row = []
+        for name, types, required in fields:
+            value = obj.get(name)
+            if value is None:
+                if required:
+                    raise PayloadError(f"Item {i}: missing '{name}'")
+            elif not isinstance(value, types) or isinstance(value, bool):
+                raise PayloadError(f"Item {i}: '{name}' has the wrong type")
+            row.append(value)
+        try:
+            datetime.strptime(obj["timestamp"], TIMESTAMP_FORMAT)
+        except ValueError:
+            raise PayloadError(f"Item {i}: timestamp '{obj['timestamp']}' is not {TIMESTAMP_FORMAT}")
+        if sensor_id is not None and obj["sensor_id"] != sensor_id:
+            raise PayloadError(f"Item {i}: token does not belong to sensor '{obj['sensor_id']}'", 403)
+        rows[table].append(row)
+    return rows
+
+
+class SqliteStore:
+    """Stores rows in one SQLite database, one transaction per batch."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        # Used only from the writer's worker thread after creation
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        for table, (fields, _allowed) in _SCHEMAS.items():
+            columns = ", ".join(name for name, _types, _required in fields)
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}, received_at REAL)")
+            # Databases from before an optional field was added get it as a new column
+            existing = {row[1] for row in self.db.execute(f"PRAGMA table_info({table})")}
+            for name, _types, _required in fields:
+                if name not in existing:
+                    self.db.execute(f"ALTER TABLE {table} ADD COLUMN {name}")
+        self.db.commit()
+
+    def write(self, batch):
+        with self.db:
+            for table, rows in batch.items():
+                if rows:
+                    fields = _SCHEMAS[table][0]
+                    columns = ", ".join([name for name, _types, _required in fields] + ["received_at"])
+                    placeholders = ", ".join("?" * (len(fields) + 1))
+                    self.db.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+    def close(self):
+        self.db.close()
+
+
+class ParquetStore:
+    """Appends each batch as a row group to one Parquet file per table."""
+
+    def __init__(self, directory):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.writers = {}
+        # Fixed schemas, so optional columns keep their type even when a batch has no values
+        self.schemas = {
+            table: pyarrow.schema(
+                [(name, pyarrow.float64() if types is _NUMBER else pyarrow.string())
+                 for name, types, _required in fields] + [("received_at", pyarrow.float64())])
+            for table, (fields, _allowed) in _SCHEMAS.items()
+        }
+
+    def write(self, batch):
+        for table, rows in batch.items():
+            if not rows:
+                continue
+            schema = self.schemas[table]
+            columns = [self.pa.array([row[i] for row in rows], type=field.type)
+                       for i, field in enumerate(schema)]
+            if table not in self.writers:
+                self.writers[table] = self.pq.ParquetWriter(
+                    os.path.join(self.directory, f"{table}.parquet"), schema)
+            self.writers[table].write_table(self.pa.Table.from_arrays(columns, schema=schema))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class LatencyStats:
+    """Request counters and latencies, per report interval and in total."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.total_requests = 0
+        self.total_errors = 0
+        self.total_rows = 0
+        self.connections = 0
+        self.tls_full_handshakes = 0
+        self.tls_resumed_handshakes = 0
+        self.injected_failures = 0
+        self._reset_interval()
+
+    def _reset_interval(self):
+        self.interval_start = time.monotonic()
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, seconds, status, rows=0):
+        self.total_requests += 1
+        self.latencies.append(seconds)
+        if status >= 400:
+            self.total_errors += 1
+            self.errors += 1
+        self.total_rows += rows
+
+    def record_connection(self, ssl_object=None):
+        """Count a new connection and, for HTTPS, whether its TLS session was resumed."""
+        self.connections += 1
+        if ssl_object is not None:
+            if ssl_object.session_reused:
+                self.tls_resumed_handshakes += 1
+            else:
+                self.tls_full_handshakes += 1
+
+    @staticmethod
+    def percentile(values, fraction):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def interval_report(self):
+        """Return a one-line summary of the interval (None if it was idle) and start a new one."""
+        if not self.latencies:
+            self._reset_interval()
+            return None
+        elapsed = max(time.monotonic() - self.interval_start, 1e-9)
+        line = (f"{len(self.latencies) / elapsed:.1f} req/s, "
+                f"p50 {self.percentile(self.latencies, 0.50) * 1000:.1f} ms, "
+                f"p99 {self.percentile(self.latencies, 0.99) * 1000:.1f} ms, "
+                f"{self.errors} errors, {self.total_rows} rows stored")
+        self._reset_interval()
+        return line
+
+    def totals(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "requests": self.total_requests,
+            "errors": self.total_errors,
+            "rows": self.total_rows,
+            "connections": self.connections,
+            "tls_full_handshakes": self.tls_full_handshakes,
+            "tls_resumed_handshakes": self.tls_resumed_handshakes,
+            "injected_failures": self.injected_failures,
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(self.total_requests / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class IngestServer:
+    """
+    Asyncio HTTP/1.1 ingest server.
+
+    Args:
+        store: SqliteStore or ParquetStore
+        tokens (dict): Bearer token -> sensor_id, or None to accept any request
+        batch_size (int): Rows per transaction
+        flush_interval (float): Longest time rows wait for a batch to fill
+        fail_rate (float): Fraction of valid POSTs answered 503 without storing
+        seed (int): Seed for choosing the failed requests, for repeatable runs
+    """
+
+    def __init__(self, store, tokens=None, batch_size=500, flush_interval=0.2, fail_rate=0.0, seed=None):
+        self.store = store
+        self.tokens = tokens
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self.stats = LatencyStats()
+        self._queue = asyncio.Queue()
+        self._server = None
+        self._writer_task = None
+
+    async def start(self, host, port, ssl_context=None):
+        """Start listening and return the bound port."""
+        self._writer_task = asyncio.create_task(self._write_batches())
+        # A large backlog so a burst of reconnecting sensors is queued rather than refused
+        self._server = await asyncio.start_server(self._handle_connection, host, port, ssl=ssl_context,
+                                                  backlog=4096)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop accepting requests, flush queued rows and close the store."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer_task:
+            await self._queue.put(None)
+            await self._writer_task
+        self.store.close()
+
+    async def _write_batches(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            pending = [item]
+            row_count = sum(len(rows) for rows in item[0].values())
+            deadline = loop.time() + self.flush_interval
+            while row_count < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                row_count += sum(len(rows) for rows in item[0].values())
+
+            batch = {table: [] for table in _SCHEMAS}
+            for rows, _future in pending:
+                for table, table_rows in rows.items():
+                    batch[table].extend(table_rows)
+            try:
+                await asyncio.to_thread(self.store.write, batch)
+                error = None
+            except Exception as e:  # Report storage failures to every waiting request
+                error = e
+            for _rows, future in pending:
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+
+    async def _store_rows(self, rows):
+        received_at = time.time()
+        for table_rows in rows.values():
+            for row in table_rows:
+                row.append(received_at)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        await future
+
+    def _authorize(self, headers):
+        if self.tokens is None:
+            return None
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            raise PayloadError("Missing bearer token", 401)
+        sensor_id = self.tokens.get(auth[len("Bearer "):].strip())
+        if sensor_id is None:
+            raise PayloadError("Unknown bearer token", 401)
+        return sensor_id
+
+    async def _handle_request(self, method, path, headers, body):
+        if method == "GET" and path == "/stats":
+            return 200, self.stats.totals()
+        if method != "POST":
+            raise PayloadError(f"{method} not supported", 405)
+        sensor_id = self._authorize(headers)
+        rows = validate_payload(body, sensor_id, headers.get("content-type", ""))
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            self.stats.injected_failures += 1
+            raise PayloadError("Injected failure", 503)
+        try:
+            await self._store_rows(rows)
+        except Exception as e:
+            raise PayloadError(f"Storage failed: {e}", 500)
+        count = sum(len(table_rows) for table_rows in rows.values())
+        return 200, {"status": "ok", "received": count}
+
+    async def _handle_connection(self, reader, writer):
+        self.stats.record_connection(writer.get_extra_info("ssl_object"))
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                start = time.monotonic()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                rows = 0
+                # Until the body has been read the rest of the stream cannot be
+                # parsed, so an error before that closes the connection
+                body_read = False
+                try:
+                    try:
+                        length = int(headers.get("content-length", "0"))
+                    except ValueError:
+                        raise PayloadError("Invalid Content-Length", 411)
+                    if length < 0 or "transfer-encoding" in headers:
+                        raise PayloadError("Invalid Content-Length", 411)
+                    if length > MAX_BODY_SIZE:
+                        raise PayloadError("Body too large", 413)
+                    body = await reader.readexactly(length) if length else b""
+                    body_read = True
+                    status, response = await self._handle_request(method, path, headers, body)
+                    rows = response.get("received", 0)
+                except PayloadError as e:
+                    status, response = e.status, {"status": "error", "error": str(e)}
+
+                keep_alive = (body_read and headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if path != "/stats":
+                    self.stats.record(time.monotonic() - start, status, rows)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _report(server, interval):
+    while True:
+        await asyncio.sleep(interval)
+        line = server.stats.interval_report()
+        if line:
+            print(f"[INFO] {line}")
+
+
+async def serve(args):
+    tokens = None
+    if not args.no_auth:
+        tokens = load_tokens(args.credentials)
+        print(f"[INFO] Loaded {len(tokens)} bearer tokens from {args.credentials}")
+
+    store = ParquetStore(args.parquet) if args.parquet else SqliteStore(args.db)
+    ssl_context = None
+    if args.tls_cert:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(args.tls_cert, args.tls_key)
+
+    server = IngestServer(store, tokens, args.batch_size, args.flush_interval, args.fail_rate, args.seed)
+    port = await server.start(args.host, args.port, ssl_context)
+    scheme = "https" if ssl_context else "http"
+    print(f"[INFO] Listening on {scheme}://{args.host}:{port}/ "
+          f"(storing to {args.parquet or args.db}, batches of {args.batch_size})")
+    if args.fail_rate:
+        print(f"[INFO] Failing {args.fail_rate:.0%} of valid POSTs with 503")
+
+    reporter = asyncio.create_task(_report(server, args.report_interval))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        reporter.cancel()
+        await server.stop()
+        print(f"[INFO] Totals: {json.dumps(server.stats.totals())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the sensor ingest API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--credentials", default="credentials.ini", help="source of valid bearer tokens")
+    parser.add_argument("--no-auth", action="store_true", help="accept requests without checking tokens")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database to store rows in")
+    parser.add_argument("--parquet", metavar="DIR", help="store rows as Parquet files instead (needs pyarrow)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per committed batch")
+    parser.add_argument("--flush-interval", type=float, default=0.2,
+                        help="seconds to wait for a batch to fill before committing")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds between stats lines")
+    parser.add_argument("--tls-cert", help="serve HTTPS with this certificate")
+    parser.add_argument("--tls-key", help="private key for --tls-cert")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="fraction of valid POSTs to answer 503 without storing (0-1)")
+    parser.add_argument("--seed", type=int, help="random seed for --fail-rate")
+    args = parser.parse_args()
+    if not 0.0 <= args.fail_rate <= 1.0:
+        parser.error("--fail-rate must be between 0 and 1")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    except (OSError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+nvs_decode.py
+
+Offline decoder for what a sensor leaves in flash: the log ring written by
+log_capture.c (NVS namespace debug_log, log_index and log_N strings) and the
+stored readings. Readings live in the ring that persistent_storage.c keeps in
+the readings partition (decoded by tools/ring_store.py); firmware from before
+the ring saved them in NVS (namespace sensor_data, batch_count and batch_N
+blobs of sensor_reading_t), and those are decoded too.
+
+Dumps are memory-mapped and every valid entry is indexed by namespace and
+key in one pass over the pages, so reading a value is a dictionary lookup.
+A dump can be a full flash image (the nvs partition is found through the
+partition table at 0x8000) or just the NVS partition:
+
+    esptool.py read_flash 0 0x400000 sensor_1.bin
+    python -m tools.nvs_decode sensor_1.bin
+    python -m tools.nvs_decode dumps/ --out decoded/
+
+With NumPy installed, NVS readings are returned as a structured array viewing
+the dump directly (batches stored in a single chunk are not copied).
+Without it they are lists of (timestamp, lux, chip_temp_c, chip_temp_f).
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import csv
+import os
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+from tools.nvs_image import (ENTRIES_PER_PAGE, ENTRY_SIZE, FIRST_ENTRY_OFFSET, PAGE_SIZE,
+                             PAGE_STATE_ACTIVE, PAGE_STATE_FULL, TYPE_BLOB_DATA, TYPE_BLOB_INDEX,
+                             TYPE_CODES, crc32)
+from tools.partitions import PartitionError, map_dump_partition
+from tools.ring_store import DEFAULT_PARTITION as RING_PARTITION, RingDecodeError, RingPartition
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PAGE_STATE_FREEING = 0xFFFFFFF8
+READABLE_PAGE_STATES = (PAGE_STATE_ACTIVE, PAGE_STATE_FULL, PAGE_STATE_FREEING)
+ENTRY_STATE_WRITTEN = 0b10
+TYPE_BLOB_V1 = 0x41
+DEFAULT_PARTITION = "nvs"
+
+# Must match the migration in persistent_storage.c and log_capture.c
+SENSOR_NAMESPACE = "sensor_data"
+KEY_BATCH_COUNT = "batch_count"
+KEY_BATCH_PREFIX = "batch_"
+LOG_NAMESPACE = "debug_log"
+KEY_LOG_INDEX = "log_index"
+KEY_LOG_PREFIX = "log_"
+LOG_BUFFER_SIZE = 300
+
+# sensor_reading_t on the ESP32-C3: 64-bit time_t then three floats, padded to 8 bytes
+READING_STRUCT = struct.Struct("<qfff4x")
+READING_SIZE = READING_STRUCT.size
+READING_FIELDS = ("timestamp", "lux", "chip_temp_c", "chip_temp_f")
+if np is not None:
+    READING_DTYPE = np.dtype({
+        "names": list(READING_FIELDS),
+        "formats": ["<i8", "<f4", "<f4", "<f4"],
+        "offsets": [0, 8, 12, 16],
+        "itemsize": READING_SIZE,
+    })
+
+_PRIMITIVE_STRUCTS = {
+    TYPE_CODES[name]: struct.Struct(fmt)
+    for name, fmt in (("u8", "<B"), ("i8", "<b"), ("u16", "<H"), ("i16", "<h"),
+                      ("u32", "<I"), ("i32", "<i"), ("u64", "<Q"), ("i64", "<q"))
+}
+_VARIABLE_TYPES = (TYPE_CODES["string"], TYPE_BLOB_DATA, TYPE_BLOB_V1)
+
+
+class NvsDecodeError(Exception):
+    """Raised when a dump holds no readable NVS partition."""
+
+
+class NvsPartition:
+    """
+    Index of the valid entries in an NVS partition.
+
+    Values refer into the underlying buffer, so the buffer must outlive any
+    blob or array taken from it.
+
+    Args:
+        data (bytes-like): The partition contents
+    """
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        if len(self.data) < PAGE_SIZE or len(self.data) % PAGE_SIZE:
+            raise NvsDecodeError(f"{len(self.data)} bytes is not a whole number of NVS pages")
+        self.namespaces = {}
+        self.corrupt_entries = 0
+        self._items = {}
+        self._chunks = {}
+        self._mmap = None
+        self.full_dump = False
+        self._index()
+
+    def _index(self):
+        data = self.data
+        pages = []
+        for offset in range(0, len(data), PAGE_SIZE):
+            state, sequence = struct.unpack_from("<II", data, offset)
+            if state not in READABLE_PAGE_STATES:
+                continue
+            if crc32(data[offset + 4:offset + 28]) != struct.unpack_from("<I", data, offset + 28)[0]:
+                continue
+            pages.append((sequence, offset))
+
+        # Replay pages in write order so the newest copy of a key wins
+        namespace_ids = {}
+        for _sequence, offset in sorted(pages):
+            bitmap = bytes(data[offset + 32:offset + FIRST_ENTRY_OFFSET])
+            i = 0
+            while i < ENTRIES_PER_PAGE:
+                if (bitmap[i >> 2] >> ((i & 3) * 2)) & 3 != ENTRY_STATE_WRITTEN:
+                    i += 1
+                    continue
+                pos = offset + FIRST_ENTRY_OFFSET + i * ENTRY_SIZE
+                entry = data[pos:pos + ENTRY_SIZE]
+                span = entry[2]
+                if (span < 1 or i + span > ENTRIES_PER_PAGE
+                        or crc32(bytes(entry[0:4]) + bytes(entry[8:32])) != struct.unpack_from("<I", entry, 4)[0]):
+                    self.corrupt_entries += 1
+                    i += 1
+                    continue
+
+                ns, type_code, chunk_index = entry[0], entry[1], entry[3]
+                key = bytes(entry[8:24]).split(b"\0", 1)[0].decode("utf-8", "replace")
+                payload = None
+                if type_code in _VARIABLE_TYPES:
+                    size = struct.unpack_from("<H", entry, 24)[0]
+                    payload = data[pos + ENTRY_SIZE:pos + ENTRY_SIZE + size]
+                    if (size > (span - 1) * ENTRY_SIZE
+                            or crc32(payload) != struct.unpack_from("<I", entry, 28)[0]):
+                        self.corrupt_entries += 1
+                        i += span
+                        continue
+
+                if ns == 0 and type_code == TYPE_CODES["u8"]:
+                    namespace_ids[key] = entry[24]
+                elif type_code == TYPE_BLOB_DATA:
+                    self._chunks.setdefault((ns, key), {})[chunk_index] = payload
+                else:
+                    self._items[(ns, key)] = (type_code, entry[24:32], payload)
+                i += span
+        self.namespaces = namespace_ids
+
+    @classmethod
+    def open(cls, path, partition=DEFAULT_PARTITION):
+        """
+        Memory-map a dump file and index its NVS partition.
+
+        Args:
+            path (str): Full flash dump or a dump of the NVS partition alone
+            partition (str): Partition label to use from a full flash dump
+
+        Returns:
+            NvsPartition: The indexed partition
+        """
+        try:
+            mapped, view, full_dump = map_dump_partition(path, partition)
+        except PartitionError as e:
+            raise NvsDecodeError(str(e))
+
+        nvs = cls(view)
+        nvs._mmap = mapped
+        nvs.full_dump = full_dump
+        return nvs
+
+    def close(self):
+        """Release the mapping once no blobs or arrays taken from it remain."""
+        self._items = {}
+        self._chunks = {}
+        self.data.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # Still referenced by an exported array; closed when that is freed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def keys(self, namespace):
+        """
+        List the keys present in a namespace.
+
+        Args:
+            namespace (str): Namespace name
+
+        Returns:
+            list: Key names
+        """
+        ns = self.namespaces.get(namespace)
+        if ns is None:
+            return []
+        keys = {key for (item_ns, key) in self._items if item_ns == ns}
+        keys.update(key for (item_ns, key) in self._chunks if item_ns == ns)
+        return sorted(keys)
+
+    def get(self, namespace, key, default=None):
+        """
+        Look up and decode a value.
+
+        Args:
+            namespace (str): Namespace name
+            key (str): Key name
+            default: Returned if the key is missing or unreadable
+
+        Returns:
+            int for integer types, str for strings, memoryview or bytes for blobs
+        """
+        ns = self.namespaces.get(namespace)
+        if ns is None:
+            return default
+        item = self._items.get((ns, key))
+        if item is None:
+            return default
+
+        type_code, data, payload = item
+        if type_code in _PRIMITIVE_STRUCTS:
+            return _PRIMITIVE_STRUCTS[type_code].unpack_from(data)[0]
+        if type_code == TYPE_CODES["string"]:
+            return bytes(payload).split(b"\0", 1)[0].decode("utf-8", "replace")
+        if type_code == TYPE_BLOB_V1:
+            return payload
+        if type_code == TYPE_BLOB_INDEX:
+            blob = self._assemble_blob(ns, key, data)
+            return default if blob is None else blob
+        return default
+
+    def _assemble_blob(self, ns, key, index_data):
+        size, chunk_count, chunk_start = struct.unpack_from("<IBB", index_data)
+        chunks = self._chunks.get((ns, key), {})
+        parts = [chunks.get(chunk_start + n) for n in range(chunk_count)]
+        if any(part is None for part in parts):
+            return None
+        if chunk_count == 1:
+            return parts[0][:size]  # A view into the dump, no copy
+        blob = b"".join(parts)
+        return blob[:size] if len(blob) >= size else None
+
+
+def decode_readings(blob):
+    """
+    Decode a blob of packed sensor_reading_t structs.
+
+    Args:
+        blob (bytes-like): Blob contents
+
+    Returns:
+        Structured NumPy array viewing the blob, or a list of tuples without NumPy
+    """
+    count = len(blob) // READING_SIZE
+    if np is not None:
+        return np.frombuffer(blob, dtype=READING_DTYPE, count=count)
+    return list(READING_STRUCT.iter_unpack(blob[:count * READING_SIZE]))
+
+
+def reading_batches(nvs):
+    """
+    Decode each stored batch of readings in the order it was saved.
+
+    Args:
+        nvs (NvsPartition): Indexed partition
+
+    Returns:
+        list: One decoded batch per batch_N key that could be read
+    """
+    batch_count = nvs.get(SENSOR_NAMESPACE, KEY_BATCH_COUNT, 0)
+    batches = []
+    for i in range(batch_count):
+        blob = nvs.get(SENSOR_NAMESPACE, f"{KEY_BATCH_PREFIX}{i}")
+        if blob is not None:
+            batches.append(decode_readings(blob))
+    return batches
+
+
+def stored_readings(nvs):
+    """
+    Decode all stored readings into one array (or list without NumPy).
+
+    Args:
+        nvs (NvsPartition): Indexed partition
+
+    Returns:
+        All readings in save order
+    """
+    batches = reading_batches(nvs)
+    if np is not None:
+        if len(batches) == 1:
+            return batches[0]
+        return np.concatenate(batches) if batches else np.empty(0, dtype=READING_DTYPE)
+    return [reading for batch in batches for reading in batch]
+
+
+def log_ring(nvs):
+    """
+    Rebuild the captured log in chronological order.
+
+    log_capture.c writes entry n to key log_<n % LOG_BUFFER_SIZE> and keeps
+    the next n in log_index, so the oldest surviving entry is
+    log_index - LOG_BUFFER_SIZE.
+
+    Args:
+        nvs (NvsPartition): Indexed partition
+
+    Returns:
+        list: Log lines, oldest first
+    """
+    index = nvs.get(LOG_NAMESPACE, KEY_LOG_INDEX, 0)
+    lines = []
+    for n in range(max(0, index - LOG_BUFFER_SIZE), index):
+        line = nvs.get(LOG_NAMESPACE, f"{KEY_LOG_PREFIX}{n % LOG_BUFFER_SIZE}")
+        if line:
+            lines.append(line)
+    return lines
+
+
+def reading_rows(readings):
+    """Iterate readings as (timestamp, lux, chip_temp_c, chip_temp_f) tuples."""
+    if np is not None and isinstance(readings, np.ndarray):
+        return readings.tolist()
+    return readings
+
+
+def format_timestamp(timestamp):
+    try:
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    except (OverflowError, OSError, ValueError):
+        return str(timestamp)
+
+
+def find_dumps(paths):
+    """Expand directories into the .bin files they contain."""
+    dumps = []
+    for path in paths:
+        if os.path.isdir(path):
+            dumps.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(".bin")))
+        else:
+            dumps.append(path)
+    return dumps
+
+
+def decode_dump(path, partition, out_dir=None):
+    """
+    Decode one dump, optionally writing its readings and log to out_dir.
+
+    Readings come from NVS batches left by firmware from before the ring
+    (oldest), then from the readings ring if the dump is a full flash image.
+
+    Args:
+        path (str): Dump file
+        partition (str): NVS partition label
+        out_dir (str): Directory for <name>.readings.csv and <name>.log
+
+    Returns:
+        dict: Summary with readings, first, last, log_lines and corrupt counts
+    """
+    with NvsPartition.open(path, partition) as nvs:
+        readings = list(reading_rows(stored_readings(nvs)))
+        lines = log_ring(nvs)
+        corrupt = nvs.corrupt_entries
+        full_dump = nvs.full_dump
+
+    if full_dump:
+        try:
+            ring = RingPartition.open(path, RING_PARTITION)
+            readings.extend(ring.readings())
+            corrupt += ring.corrupt_records
+        except RingDecodeError:
+            pass  # No readings partition, or a ring that was never formatted
+
+    summary = {
+        "readings": len(readings),
+        "first": readings[0][0] if readings else None,
+        "last": readings[-1][0] if readings else None,
+        "log_lines": len(lines),
+        "corrupt": corrupt,
+    }
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(os.path.join(out_dir, f"{name}.readings.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(READING_FIELDS)
+            writer.writerows(readings)
+        with open(os.path.join(out_dir, f"{name}.log"), "w") as f:
+            f.writelines(line + "\n" for line in lines)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode stored readings and logs from NVS dumps")
+    parser.add_argument("paths", nargs="+", help="dump files, or directories of .bin dumps")
+    parser.add_argument("--partition", default=DEFAULT_PARTITION,
+                        help="NVS partition label in full flash dumps")
+    parser.add_argument("--out", help="write <dump>.readings.csv and <dump>.log here")
+    args = parser.parse_args()
+
+    dumps = find_dumps(args.paths)
+    if not dumps:
+        print("[ERROR] No dumps found")
+        sys.exit(1)
+
+    failed = 0
+    start = time.perf_counter()
+    for path in dumps:
+        try:
+            s = decode_dump(path, args.partition, args.out)
+        except (NvsDecodeError, OSError) as e:
+            failed += 1
+            print(f"[ERROR] {e}")
+            continue
+        span = (f", {format_timestamp(s['first'])} to {format_timestamp(s['last'])}"
+                if s["readings"] else "")
+        corrupt = f", {s['corrupt']} corrupt entries" if s["corrupt"] else ""
+        print(f"[INFO] {path}: {s['readings']} readings{span}, {s['log_lines']} log lines{corrupt}")
+    elapsed = time.perf_counter() - start
+
+    print(f"[INFO] Decoded {len(dumps) - failed}/{len(dumps)} dumps in {elapsed:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
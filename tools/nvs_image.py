@@ -0,0 +1,385 @@
+"""
+nvs_image.py
+
+Native generator for ESP-IDF NVS partition images (format version 2).
+
+Builds the same binary layout as ESP-IDF's nvs_partition_gen.py without
+spawning it, so config images for a whole fleet can be produced in-process:
+
+    image = NvsImage(0x3000)
+    image.namespace("sensor_cfg")
+    image.add("sensor_id", "string", "sensor_1")
+    image.add("sda_gpio", "i32", 4)
+    data = image.to_bytes()
+
+Layout of one 4096-byte page:
+
+    0x000  header (32 bytes): state, sequence number, version, CRC32
+    0x020  entry state bitmap (2 bits per entry)
+    0x040  126 entries of 32 bytes
+
+Every entry holds the namespace index, type, span, chunk index, a CRC32 of
+the entry, a 16-byte key and 8 bytes of data. Strings and blob chunks keep
+their payload in the entries that follow (the span), and never cross a page.
+Blobs larger than the room left on a page are split into chunks, one per
+page, described by a separate blob index entry.
+
+It can also convert a CSV in the format ESP-IDF's generator accepts:
+
+    python -m tools.nvs_image generate input.csv output.bin 0x3000
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import base64
+import binascii
+import csv
+import os
+import struct
+import sys
+import zlib
+
+PAGE_SIZE = 4096
+ENTRY_SIZE = 32
+ENTRIES_PER_PAGE = 126
+HEADER_SIZE = 32
+BITMAP_OFFSET = 32
+FIRST_ENTRY_OFFSET = 64
+MIN_PARTITION_SIZE = 3 * PAGE_SIZE
+
+PAGE_STATE_ACTIVE = 0xFFFFFFFE
+PAGE_STATE_FULL = 0xFFFFFFFC
+PAGE_VERSION2 = 0xFE
+
+CHUNK_ANY = 0xFF
+MAX_KEY_LENGTH = 15
+MAX_NAMESPACES = 254
+MAX_STRING_SIZE = 4000
+
+# Entry type codes from nvs_types.hpp
+TYPE_CODES = {
+    "u8": 0x01,
+    "i8": 0x11,
+    "u16": 0x02,
+    "i16": 0x12,
+    "u32": 0x04,
+    "i32": 0x14,
+    "u64": 0x08,
+    "i64": 0x18,
+    "string": 0x21,
+}
+TYPE_BLOB_DATA = 0x42
+TYPE_BLOB_INDEX = 0x48
+
+# struct format for each primitive type
+_PRIMITIVE_FORMATS = {
+    "u8": "<B",
+    "i8": "<b",
+    "u16": "<H",
+    "i16": "<h",
+    "u32": "<I",
+    "i32": "<i",
+    "u64": "<Q",
+    "i64": "<q",
+}
+
+# Payload encodings in ESP-IDF's CSV format that are stored as blobs
+BLOB_ENCODINGS = ("hex2bin", "base64", "binary")
+
+
+class NvsImageError(Exception):
+    """Raised when values do not fit the NVS format or the partition."""
+
+
+def crc32(data):
+    """CRC32 as computed by the NVS library (esp_rom_crc32_le with init 0xFFFFFFFF)."""
+    return zlib.crc32(data, 0xFFFFFFFF) & 0xFFFFFFFF
+
+
+def _entries_for(length):
+    return (length + ENTRY_SIZE - 1) // ENTRY_SIZE
+
+
+class _Page:
+    """One NVS page being filled entry by entry."""
+
+    def __init__(self, sequence):
+        self.buf = bytearray(b"\xff" * PAGE_SIZE)
+        self.sequence = sequence
+        self.next_entry = 0
+        self.set_state(PAGE_STATE_ACTIVE)
+
+    @property
+    def free_entries(self):
+        return ENTRIES_PER_PAGE - self.next_entry
+
+    def set_state(self, state):
+        header = self.buf
+        struct.pack_into("<II", header, 0, state, self.sequence)
+        header[8] = PAGE_VERSION2
+        # The state word is not covered by the CRC, so it can change later
+        struct.pack_into("<I", header, 28, crc32(bytes(header[4:28])))
+
+    def write_entry(self, ns, type_code, span, chunk_index, key, data, payload=b""):
+        """
+        Write one entry followed by the payload entries of its span.
+
+        Args:
+            ns (int): Namespace index
+            type_code (int): Entry type
+            span (int): Total number of entries, including this one
+            chunk_index (int): Blob chunk index or CHUNK_ANY
+            key (bytes): Key, at most 15 bytes
+            data (bytes): 8 bytes of entry data
+            payload (bytes): Variable length data stored after the entry
+        """
+        index = self.next_entry
+        offset = FIRST_ENTRY_OFFSET + index * ENTRY_SIZE
+        entry = bytearray(ENTRY_SIZE)
+        entry[0] = ns
+        entry[1] = type_code
+        entry[2] = span
+        entry[3] = chunk_index
+        entry[8:8 + len(key)] = key
+        entry[24:32] = data
+        struct.pack_into("<I", entry, 4, crc32(bytes(entry[0:4]) + bytes(entry[8:32])))
+        self.buf[offset:offset + ENTRY_SIZE] = entry
+        if payload:
+            self.buf[offset + ENTRY_SIZE:offset + ENTRY_SIZE + len(payload)] = payload
+
+        # Mark every entry of the span as written (0b10); empty is 0b11
+        for i in range(index, index + span):
+            bit = i * 2
+            self.buf[BITMAP_OFFSET + bit // 8] &= ~(1 << (bit % 8)) & 0xFF
+        self.next_entry += span
+
+
+class NvsImage:
+    """
+    An NVS partition image under construction.
+
+    Args:
+        size (int): Partition size in bytes, a multiple of 4096 and at least
+                    three pages. The NVS library needs one page left empty,
+                    so the data may use all pages but the last.
+    """
+
+    def __init__(self, size):
+        if size % PAGE_SIZE or size < MIN_PARTITION_SIZE:
+            raise NvsImageError(f"Partition size {size:#x} must be a multiple of {PAGE_SIZE:#x} "
+                                f"and at least {MIN_PARTITION_SIZE:#x}")
+        self.size = size
+        self.max_pages = size // PAGE_SIZE - 1
+        self.pages = [_Page(0)]
+        self.namespaces = {}
+        self.current_ns = None
+
+    @property
+    def _page(self):
+        return self.pages[-1]
+
+    def _reserve(self, entries):
+        """Make sure the current page has room for a span of entries."""
+        if self._page.free_entries >= entries:
+            return
+        if len(self.pages) >= self.max_pages:
+            raise NvsImageError(f"Data does not fit in a {self.size:#x} byte partition")
+        self._page.set_state(PAGE_STATE_FULL)
+        self.pages.append(_Page(len(self.pages)))
+
+    @staticmethod
+    def _key(key):
+        encoded = key.encode("utf-8")
+        if not encoded or len(encoded) > MAX_KEY_LENGTH:
+            raise NvsImageError(f"Key '{key}' must be 1 to {MAX_KEY_LENGTH} bytes long")
+        return encoded
+
+    def namespace(self, name):
+        """
+        Select the namespace for the following entries, creating it if needed.
+
+        Args:
+            name (str): Namespace name
+        """
+        if name not in self.namespaces:
+            if len(self.namespaces) >= MAX_NAMESPACES:
+                raise NvsImageError(f"Too many namespaces (at most {MAX_NAMESPACES})")
+            index = len(self.namespaces) + 1
+            key = self._key(name)
+            self._reserve(1)
+            self._page.write_entry(0, TYPE_CODES["u8"], 1, CHUNK_ANY, key,
+                                   struct.pack("<B", index) + b"\xff" * 7)
+            self.namespaces[name] = index
+        self.current_ns = self.namespaces[name]
+
+    def add(self, key, value_type, value):
+        """
+        Add one value to the current namespace.
+
+        Args:
+            key (str): Key, at most 15 bytes
+            value_type (str): u8, i8, u16, i16, u32, i32, u64, i64, string or blob
+            value: int for the integer types, str for string, bytes for blob
+        """
+        if self.current_ns is None:
+            raise NvsImageError(f"Entry '{key}' comes before any namespace")
+        encoded_key = self._key(key)
+
+        if value_type in _PRIMITIVE_FORMATS:
+            try:
+                packed = struct.pack(_PRIMITIVE_FORMATS[value_type], int(value))
+            except struct.error:
+                raise NvsImageError(f"Value {value} of '{key}' is out of range for {value_type}")
+            self._reserve(1)
+            self._page.write_entry(self.current_ns, TYPE_CODES[value_type], 1, CHUNK_ANY, encoded_key,
+                                   packed + b"\xff" * (8 - len(packed)))
+        elif value_type == "string":
+            self._add_string(encoded_key, value)
+        elif value_type == "blob":
+            self._add_blob(encoded_key, bytes(value))
+        else:
+            raise NvsImageError(f"Unknown type '{value_type}' for '{key}'")
+
+    def _add_string(self, key, value):
+        data = value.encode("utf-8") + b"\0"
+        if len(data) > MAX_STRING_SIZE:
+            raise NvsImageError(f"String '{key.decode()}' is longer than {MAX_STRING_SIZE - 1} bytes")
+        span = 1 + _entries_for(len(data))
+        # Like ESP-IDF's generator, never let a string take a page's last entry
+        self._reserve(span + 1)
+        self._page.write_entry(self.current_ns, TYPE_CODES["string"], span, CHUNK_ANY, key,
+                               struct.pack("<HHI", len(data), 0xFFFF, crc32(data)), data)
+
+    def _add_blob(self, key, data):
+        chunk_count = 0
+        offset = 0
+        # Each chunk fills what is left of the current page. As in ESP-IDF's
+        # generator, a page with only one free entry gets an empty chunk.
+        while offset < len(data) or chunk_count == 0:
+            self._reserve(1)
+            chunk = data[offset:offset + (self._page.free_entries - 1) * ENTRY_SIZE]
+            span = 1 + _entries_for(len(chunk))
+            self._page.write_entry(self.current_ns, TYPE_BLOB_DATA, span, chunk_count, key,
+                                   struct.pack("<HHI", len(chunk), 0xFFFF, crc32(chunk)), chunk)
+            offset += len(chunk)
+            chunk_count += 1
+            if chunk_count > 127:
+                raise NvsImageError(f"Blob '{key.decode()}' is too large")
+
+        self._reserve(1)
+        self._page.write_entry(self.current_ns, TYPE_BLOB_INDEX, 1, CHUNK_ANY, key,
+                               struct.pack("<IBBH", len(data), chunk_count, 0, 0xFFFF))
+
+    def to_bytes(self):
+        """
+        Return the finished partition image.
+
+        Returns:
+            bytes: The image, padded with erased (0xFF) pages to the partition size
+        """
+        data = b"".join(bytes(page.buf) for page in self.pages)
+        return data + b"\xff" * (self.size - len(data))
+
+
+def build_image(size, namespace, entries):
+    """
+    Build an image holding a single namespace.
+
+    Args:
+        size (int): Partition size in bytes
+        namespace (str): Namespace name
+        entries (list): (key, type, value) tuples
+
+    Returns:
+        bytes: The partition image
+    """
+    image = NvsImage(size)
+    image.namespace(namespace)
+    for key, value_type, value in entries:
+        image.add(key, value_type, value)
+    return image.to_bytes()
+
+
+def _decode_payload(encoding, value, key):
+    if encoding == "hex2bin":
+        try:
+            return binascii.unhexlify(value.strip())
+        except binascii.Error:
+            raise NvsImageError(f"Invalid hex value for '{key}'")
+    if encoding == "base64":
+        try:
+            return base64.b64decode(value, validate=True)
+        except binascii.Error:
+            raise NvsImageError(f"Invalid base64 value for '{key}'")
+    return value.encode("utf-8")
+
+
+def image_from_csv(csv_path, size):
+    """
+    Build an image from a CSV in the format used by ESP-IDF's generator.
+
+    Rows are key,type,encoding,value where type is namespace, data or file.
+
+    Args:
+        csv_path (str): Input CSV
+        size (int): Partition size in bytes
+
+    Returns:
+        bytes: The partition image
+    """
+    image = NvsImage(size)
+    base_dir = os.path.dirname(os.path.abspath(csv_path))
+    with open(csv_path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#") or row[0].strip() == "key":
+                continue
+            fields = [field.strip() for field in row] + [""] * (4 - len(row))
+            key, row_type, encoding, value = fields[:4]
+            if row_type == "namespace":
+                image.namespace(key)
+            elif row_type == "file":
+                path = value if os.path.isabs(value) else os.path.join(base_dir, value)
+                with open(path, "rb") as payload:
+                    content = payload.read()
+                if encoding == "string":
+                    image.add(key, "string", content.decode("utf-8"))
+                elif encoding in BLOB_ENCODINGS:
+                    image.add(key, "blob", _decode_payload(encoding, content.decode("ascii"), key)
+                              if encoding != "binary" else content)
+                else:
+                    raise NvsImageError(f"Unsupported file encoding '{encoding}' for '{key}'")
+            elif row_type == "data":
+                if encoding in BLOB_ENCODINGS:
+                    image.add(key, "blob", _decode_payload(encoding, value, key))
+                elif encoding in TYPE_CODES:
+                    image.add(key, encoding, value if encoding == "string" else int(value, 0))
+                else:
+                    raise NvsImageError(f"Unsupported encoding '{encoding}' for '{key}'")
+            else:
+                raise NvsImageError(f"Unknown row type '{row_type}' for '{key}'")
+    return image.to_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate an NVS partition image")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate = subparsers.add_parser("generate", help="convert an ESP-IDF style CSV to an image")
+    generate.add_argument("input", help="CSV file (key,type,encoding,value)")
+    generate.add_argument("output", help="image to write")
+    generate.add_argument("size", help="partition size, e.g. 0x3000")
+    args = parser.parse_args()
+
+    try:
+        data = image_from_csv(args.input, int(args.size, 0))
+    except (NvsImageError, OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"[INFO] Wrote {len(data)} bytes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+objcache.py
+
+A content-addressed object cache for compiler invocations, in the style of
+ccache. Every sensor environment compiles the same sources with the same
+flags; only the generated configuration differs. Keying each object on the
+preprocessed source plus the normalized command line lets environments share
+every object that does not actually use a per-sensor value.
+
+The preprocessed source keeps its line markers, so an edit that only moves
+lines (comments, blank lines) still changes the key and the debug line table
+stays right. The environment's build directory is normalized out of the key,
+and cached compiles map it to DEBUG_BUILD_DIR in the debug info, so a shared
+object does not point at whichever environment compiled it first. For gdb,
+`set substitute-path /BUILD_DIR .pio/build/<env>` finds generated files again.
+
+The cache is driven from object_cache.py (a PlatformIO pre-script) which
+routes compiler invocations through ObjectCache.compile(). It can also be
+inspected from the command line:
+
+    python -m tools.objcache stats [cache_dir]
+    python -m tools.objcache prune [cache_dir] --max-mb 2048
+    python -m tools.objcache clear [cache_dir]
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(".pio", "objcache")
+
+# Bump when the key derivation changes so old entries are never reused
+CACHE_KEY_VERSION = b"objcache-v2"
+
+# Stands in for the environment's build directory in the debug info of cached objects
+DEBUG_BUILD_DIR = "/BUILD_DIR"
+
+CACHEABLE_SOURCE_EXTENSIONS = (".c", ".cc", ".cpp", ".cxx")
+
+# Flags whose side effects (dependency files) a cache hit would not reproduce
+UNCACHEABLE_FLAGS = ("-MD", "-MMD", "-MF", "-MT", "-MQ", "-M", "-MM", "--coverage", "-ftest-coverage")
+
+
+def expand_response_files(argv):
+    """
+    Expand @file arguments the way GCC does.
+
+    PlatformIO moves long command lines into response files, so the compiler
+    arguments have to be read back from them before they can be hashed.
+
+    Args:
+        argv (list): Command line, possibly containing @file arguments
+
+    Returns:
+        list: Command line with response files replaced by their contents
+    """
+    expanded = []
+    for arg in argv:
+        if arg.startswith("@") and os.path.isfile(arg[1:]):
+            with open(arg[1:], "r") as f:
+                expanded.extend(shlex.split(f.read()))
+        else:
+            expanded.append(arg)
+    return expanded
+
+
+def parse_compile_command(argv):
+    """
+    Work out whether a command is a single-source compile we can cache.
+
+    Args:
+        argv (list): Expanded compiler command line
+
+    Returns:
+        tuple: (source, output, args_without_output) or None if not cacheable
+    """
+    if len(argv) < 2 or "-c" not in argv:
+        return None
+
+    source = None
+    output = None
+    rest = [argv[0]]
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg in UNCACHEABLE_FLAGS or arg.startswith("-MF") or arg.startswith("-Wp,-M"):
+            return None
+        if arg == "-o":
+            if i + 1 >= len(argv):
+                return None
+            output = argv[i + 1]
+            i += 2
+            continue
+        if arg.startswith("-o") and len(arg) > 2:
+            output = arg[2:]
+        elif not arg.startswith("-") and arg.lower().endswith(CACHEABLE_SOURCE_EXTENSIONS):
+            if source is not None:
+                return None  # More than one source per command
+            source = arg
+            rest.append(arg)
+        else:
+            rest.append(arg)
+        i += 1
+
+    if source is None or output is None:
+        return None
+    return source, output, rest
+
+
+class ObjectCache:
+    """
+    Content-addressed store of compiled objects shared between environments.
+
+    Args:
+        cache_dir (str): Directory holding cached objects
+        build_dir (str): The environment's build directory. Paths inside it are
+                         normalized out of the key so that identical objects
+                         from different environments share one entry.
+    """
+
+    def __init__(self, cache_dir, build_dir=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.build_dirs = []
+        if build_dir:
+            # Normalize both spellings PlatformIO uses on the command line
+            self.build_dirs = sorted({os.path.abspath(build_dir), os.path.relpath(build_dir)},
+                                     key=len, reverse=True)
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._lock = threading.Lock()
+        self._compiler_ids = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _normalize(self, arg):
+        for build_dir in self.build_dirs:
+            arg = arg.replace(build_dir, "<BUILD_DIR>")
+        return arg
+
+    def _normalize_output(self, data):
+        for build_dir in self.build_dirs:
+            data = data.replace(build_dir.encode(), b"<BUILD_DIR>")
+        return data
+
+    def _debug_prefix_maps(self):
+        """Flags that keep the build directory out of the debug info."""
+        return [f"-fdebug-prefix-map={build_dir}={DEBUG_BUILD_DIR}" for build_dir in self.build_dirs]
+
+    def _compiler_id(self, compiler, env):
+        """Identify a compiler binary by its resolved path, size and mtime."""
+        if compiler not in self._compiler_ids:
+            path = shutil.which(compiler, path=(env or os.environ).get("PATH")) or compiler
+            try:
+                st = os.stat(path)
+                ident = f"{os.path.realpath(path)}:{st.st_size}:{int(st.st_mtime)}"
+            except OSError:
+                ident = compiler
+            self._compiler_ids[compiler] = ident
+        return self._compiler_ids[compiler]
+
+    def _entry_path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key[2:] + suffix)
+
+    def compute_key(self, args, env=None):
+        """
+        Hash the preprocessed source together with the normalized command line.
+
+        Args:
+            args (list): Compiler command line without the -o output
+            env (dict): Environment to run the preprocessor in
+
+        Returns:
+            str: Hex key, or None if preprocessing failed
+        """
+        # Line markers stay in: they carry the line numbers the debug info records
+        preprocess = [a for a in args if a != "-c"] + ["-E"]
+        result = subprocess.run(preprocess, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+
+        h = hashlib.sha256(CACHE_KEY_VERSION)
+        h.update(self._compiler_id(args[0], env).encode())
+        for arg in args[1:]:
+            h.update(b"\0")
+            h.update(self._normalize(arg).encode())
+        h.update(b"\0\0")
+        h.update(self._normalize_output(result.stdout))
+        return h.hexdigest()
+
+    def _store(self, key, output, stderr):
+        obj_path = self._entry_path(key, ".o")
+        os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(obj_path), prefix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(output, tmp_path)
+            os.replace(tmp_path, obj_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        if stderr:
+            with open(self._entry_path(key, ".stderr"), "wb") as f:
+                f.write(stderr)
+
+    def compile(self, argv, env=None):
+        """
+        Compile through the cache.
+
+        Args:
+            argv (list): Full compiler command line (response files allowed)
+            env (dict): Environment for the compiler process
+
+        Returns:
+            int: Compiler exit status, or None if the command is not cacheable
+                 and should be run normally by the caller
+        """
+        argv = expand_response_files(argv)
+        parsed = parse_compile_command(argv)
+        if parsed is None:
+            self._count("uncacheable")
+            return None
+        source, output, args = parsed
+        argv = argv + self._debug_prefix_maps()
+        args = args + self._debug_prefix_maps()
+
+        key = self.compute_key(args, env)
+        if key is None:
+            # Let the real compiler report the error
+            self._count("uncacheable")
+            return None
+
+        obj_path = self._entry_path(key, ".o")
+        if os.path.exists(obj_path):
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            shutil.copyfile(obj_path, output)
+            stderr_path = self._entry_path(key, ".stderr")
+            if os.path.exists(stderr_path):
+                with open(stderr_path, "rb") as f:
+                    sys.stderr.buffer.write(f.read())
+            # Refresh the entry so prune() keeps recently used objects
+            os.utime(obj_path)
+            self._count("hits")
+            return 0
+
+        result = subprocess.run(argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.stdout:
+            sys.stdout.buffer.write(result.stdout)
+        if result.stderr:
+            sys.stderr.buffer.write(result.stderr)
+        if result.returncode == 0 and os.path.exists(output):
+            self._store(key, output, result.stderr)
+        self._count("misses")
+        return result.returncode
+
+    def stats(self):
+        """
+        Return hit/miss counters for this build.
+
+        Returns:
+            dict: hits, misses, uncacheable and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def write_stats(self, path):
+        """Write this build's counters as JSON so build.py can report them."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.stats(), f)
+
+
+def read_stats(path):
+    """
+    Read counters written by ObjectCache.write_stats().
+
+    Args:
+        path (str): Stats file
+
+    Returns:
+        dict: The counters, or None if the file is missing or unreadable
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def format_stats(stats):
+    """Format cache counters as a one-line summary."""
+    return (f"{stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate'] * 100:.0f}% hit rate, {stats['uncacheable']} uncacheable)")
+
+
+def _cache_entries(cache_dir):
+    for root, _dirs, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith(".o"):
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                yield path, st.st_size, st.st_mtime
+
+
+def prune(cache_dir, max_bytes):
+    """
+    Delete least recently used objects until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): Cache directory
+        max_bytes (int): Size limit
+
+    Returns:
+        int: Number of objects removed
+    """
+    entries = sorted(_cache_entries(cache_dir), key=lambda e: e[2])
+    total = sum(size for _path, size, _mtime in entries)
+    removed = 0
+    for path, size, _mtime in entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        stderr_path = path[:-2] + ".stderr"
+        if os.path.exists(stderr_path):
+            os.remove(stderr_path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or maintain the shared object cache")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("cache_dir", nargs="?", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-mb", type=int, default=2048, help="size limit for prune")
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+        print(f"[INFO] Cleared {args.cache_dir}")
+    elif args.command == "prune":
+        removed = prune(args.cache_dir, args.max_mb * 1024 * 1024)
+        print(f"[INFO] Removed {removed} objects from {args.cache_dir}")
+    else:
+        entries = list(_cache_entries(args.cache_dir))
+        total = sum(size for _path, size, _mtime in entries)
+        print(f"[INFO] {args.cache_dir}: {len(entries)} objects, {total / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
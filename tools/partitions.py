@@ -0,0 +1,177 @@
+"""
+partitions.py
+
+Readers for the ESP-IDF partition table, both the CSV source (partitions.csv)
+and the binary table flashed at 0x8000.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import collections
+import csv
+import mmap
+import struct
+
+Partition = collections.namedtuple("Partition", ["name", "type", "subtype", "offset", "size", "flags"])
+
+# Sizes in partitions.csv may use K/M suffixes
+_SIZE_SUFFIXES = {"K": 1024, "M": 1024 * 1024}
+
+# Binary partition table: 32-byte entries at 0x8000, ended by an MD5 entry or erased flash
+PARTITION_TABLE_OFFSET = 0x8000
+PARTITION_TABLE_SIZE = 0xC00
+_TABLE_ENTRY = struct.Struct("<2sBBII16sI")
+_ENTRY_MAGIC = b"\xaa\x50"
+
+_TYPE_NAMES = {0x00: "app", 0x01: "data"}
+_DATA_SUBTYPE_NAMES = {0x00: "ota", 0x01: "phy", 0x02: "nvs", 0x03: "coredump", 0x04: "nvs_keys",
+                       0x05: "efuse", 0x06: "undefined", 0x81: "fat", 0x82: "spiffs"}
+
+
+class PartitionError(Exception):
+    """Raised when a dump does not hold the partition asked for."""
+
+
+def parse_size(value):
+    """
+    Parse an offset or size field from partitions.csv.
+
+    Args:
+        value (str): Field such as "0x9000", "24K" or "4M"
+
+    Returns:
+        int: Value in bytes
+    """
+    value = value.strip()
+    suffix = value[-1:].upper()
+    if suffix in _SIZE_SUFFIXES:
+        return int(value[:-1], 0) * _SIZE_SUFFIXES[suffix]
+    return int(value, 0)
+
+
+def read_partition_table(path="partitions.csv"):
+    """
+    Read a partition table CSV.
+
+    Offsets must be given explicitly, as they are in this project's table.
+
+    Args:
+        path (str): Path to the CSV file
+
+    Returns:
+        list: Partition tuples in table order
+    """
+    partitions = []
+    with open(path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            fields = [field.strip() for field in row] + [""] * (6 - len(row))
+            partitions.append(Partition(
+                name=fields[0],
+                type=fields[1],
+                subtype=fields[2],
+                offset=parse_size(fields[3]),
+                size=parse_size(fields[4]),
+                flags=fields[5],
+            ))
+    return partitions
+
+
+def find_partition(name, path="partitions.csv"):
+    """
+    Look up one partition by name.
+
+    Args:
+        name (str): Partition name
+        path (str): Path to the CSV file
+
+    Returns:
+        Partition: The partition, or None if it is not in the table
+    """
+    for partition in read_partition_table(path):
+        if partition.name == name:
+            return partition
+    return None
+
+
+def _subtype_name(type_code, subtype):
+    if type_code == 0x01:
+        return _DATA_SUBTYPE_NAMES.get(subtype, hex(subtype))
+    if type_code == 0x00:
+        if subtype == 0x00:
+            return "factory"
+        if 0x10 <= subtype < 0x20:
+            return f"ota_{subtype - 0x10}"
+        if subtype == 0x20:
+            return "test"
+    return hex(subtype)
+
+
+def parse_partition_table(data, offset=PARTITION_TABLE_OFFSET):
+    """
+    Parse the binary partition table inside a flash dump.
+
+    Args:
+        data (bytes-like): Flash contents starting at address 0
+        offset (int): Address of the partition table
+
+    Returns:
+        list: Partition tuples, empty if there is no table at the offset
+    """
+    partitions = []
+    end = min(len(data), offset + PARTITION_TABLE_SIZE)
+    for pos in range(offset, end - _TABLE_ENTRY.size + 1, _TABLE_ENTRY.size):
+        magic, type_code, subtype, part_offset, size, label, flags = _TABLE_ENTRY.unpack_from(data, pos)
+        if magic != _ENTRY_MAGIC:
+            break
+        partitions.append(Partition(
+            name=label.split(b"\0", 1)[0].decode("utf-8", "replace"),
+            type=_TYPE_NAMES.get(type_code, hex(type_code)),
+            subtype=_subtype_name(type_code, subtype),
+            offset=part_offset,
+            size=size,
+            flags="encrypted" if flags & 1 else "",
+        ))
+    return partitions
+
+
+def map_dump_partition(path, name):
+    """
+    Memory-map a flash dump and cut out one partition.
+
+    A dump with a partition table at 0x8000 is a full flash image and the
+    named partition is looked up in it; any other file is taken to be a dump
+    of the partition alone.
+
+    Args:
+        path (str): Dump file
+        name (str): Partition label
+
+    Returns:
+        tuple: (mmap, memoryview of the partition, True if the dump is a full flash image)
+    """
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise PartitionError(f"{path} is empty")
+    view = memoryview(mapped)
+
+    table = parse_partition_table(view)
+    if not table:
+        return mapped, view, False
+
+    match = [p for p in table if p.name == name]
+    error = None
+    if not match:
+        error = f"{path} has no '{name}' partition"
+    elif match[0].offset + match[0].size > len(view):
+        error = f"{path} ends before the '{name}' partition does"
+    if error:
+        view.release()
+        mapped.close()
+        raise PartitionError(error)
+    part = view[match[0].offset:match[0].offset + match[0].size]
+    view.release()
+    return mapped, part, True
@@ -0,0 +1,206 @@
+"""
+posix_tz.py
+
+Parser for POSIX TZ strings such as CST6CDT,M3.2.0/2,M11.1.0/2, the format
+of the local_timezone setting in credentials.ini that time_utils.c hands to
+setenv("TZ"). Converts Unix times to local time the way newlib does, so the
+tools can place night hours and daylight saving transitions without the
+host's own timezone database.
+
+Supported: std and dst names (alphabetic or <quoted>), offsets as
+[+-]hh[:mm[:ss]], and transition rules Mm.w.d, Jn and n with an optional
+/time (which may be negative or beyond 24 hours). A dst name without rules
+uses the US rules, as newlib and glibc do.
+
+    python -m tools.posix_tz CST6CDT,M3.2.0/2,M11.1.0/2 2025
+    python -m tools.posix_tz "<+1030>-10:30<+11>-11,M10.1.0,M4.1.0" 2025
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import calendar
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+_NAME = r"(?:<[^>]+>|[A-Za-z]{3,})"
+_OFFSET = r"[+-]?\d{1,3}(?::\d{1,2}){0,2}"
+_RULE = r"(?:M\d{1,2}\.\d\.\d|J\d{1,3}|\d{1,3})(?:/" + _OFFSET + r")?"
+_TZ_RE = re.compile(rf"^({_NAME})({_OFFSET})(?:({_NAME})({_OFFSET})?(?:,({_RULE}),({_RULE}))?)?$")
+DEFAULT_RULES = ("M3.2.0", "M11.1.0")
+DEFAULT_TRANSITION_TIME = 2 * 3600
+
+
+def parse_seconds(value):
+    """
+    Parse [+-]hh[:mm[:ss]] into seconds.
+
+    Args:
+        value (str): Offset or time of day as written in a TZ string
+
+    Returns:
+        int: Seconds (negative if value starts with '-')
+    """
+    sign = -1 if value.startswith("-") else 1
+    parts = [int(part) for part in value.lstrip("+-").split(":")]
+    parts += [0] * (3 - len(parts))
+    return sign * (parts[0] * 3600 + parts[1] * 60 + parts[2])
+
+
+class TransitionRule:
+    """
+    One daylight saving transition: a day of the year and a local time.
+
+    Args:
+        spec (str): Mm.w.d, Jn or n, optionally followed by /time
+    """
+
+    def __init__(self, spec):
+        day, _, at = spec.partition("/")
+        self.spec = spec
+        self.seconds = parse_seconds(at) if at else DEFAULT_TRANSITION_TIME
+        if day.startswith("M"):
+            self.kind = "M"
+            self.month, self.week, self.weekday = (int(part) for part in day[1:].split("."))
+            if not (1 <= self.month <= 12 and 1 <= self.week <= 5 and 0 <= self.weekday <= 6):
+                raise ValueError(f"Bad rule '{spec}'")
+        elif day.startswith("J"):
+            self.kind = "J"
+            self.day = int(day[1:])
+            if not 1 <= self.day <= 365:
+                raise ValueError(f"Bad rule '{spec}'")
+        else:
+            self.kind = "n"
+            self.day = int(day)
+            if not 0 <= self.day <= 365:
+                raise ValueError(f"Bad rule '{spec}'")
+
+    def local_time(self, year):
+        """
+        Return the transition as seconds since the epoch in the local time
+        the rule is written in (i.e. before subtracting the UTC offset).
+        """
+        jan1 = calendar.timegm((year, 1, 1, 0, 0, 0))
+        if self.kind == "J":
+            # Day 60 is always March 1st: February 29th is never counted
+            day = self.day - 1
+            if calendar.isleap(year) and self.day >= 60:
+                day += 1
+        elif self.kind == "n":
+            day = self.day
+        else:
+            first = calendar.timegm((year, self.month, 1, 0, 0, 0))
+            # calendar.weekday counts from Monday; POSIX counts from Sunday
+            first_weekday = (calendar.weekday(year, self.month, 1) + 1) % 7
+            mday = 1 + (self.weekday - first_weekday) % 7 + (self.week - 1) * 7
+            if mday > calendar.monthrange(year, self.month)[1]:
+                mday -= 7
+            day = (first - jan1) // 86400 + mday - 1
+        return jan1 + day * 86400 + self.seconds
+
+
+class PosixTimezone:
+    """
+    A timezone described by a POSIX TZ string.
+
+    Args:
+        spec (str): TZ string, e.g. CST6CDT,M3.2.0/2,M11.1.0/2
+
+    Raises:
+        ValueError: If spec is not a valid POSIX TZ string
+    """
+
+    def __init__(self, spec):
+        match = _TZ_RE.match(spec or "")
+        if match is None:
+            raise ValueError(f"Not a POSIX TZ string: '{spec}'")
+        std_name, std_offset, dst_name, dst_offset, start, end = match.groups()
+        self.spec = spec
+        self.std_name = std_name.strip("<>")
+        # POSIX offsets are west of UTC; keep them east-positive like datetime
+        self.std_offset = -parse_seconds(std_offset)
+        self.dst_name = dst_name.strip("<>") if dst_name else None
+        self.dst_offset = -parse_seconds(dst_offset) if dst_offset else self.std_offset + 3600
+        if self.dst_name:
+            start, end = (start, end) if start else DEFAULT_RULES
+            self.start_rule, self.end_rule = TransitionRule(start), TransitionRule(end)
+        self._years = {}
+
+    def transitions(self, year):
+        """
+        Return the UTC times daylight saving time starts and ends in a year.
+
+        Returns:
+            tuple: (start, end) as Unix times, or None without daylight saving
+        """
+        if not self.dst_name:
+            return None
+        if year not in self._years:
+            # The start is written in standard time and the end in daylight time
+            self._years[year] = (self.start_rule.local_time(year) - self.std_offset,
+                                 self.end_rule.local_time(year) - self.dst_offset)
+        return self._years[year]
+
+    def is_dst(self, ts):
+        """Return True if daylight saving time is in effect at Unix time ts."""
+        if not self.dst_name:
+            return False
+        # The year in standard time decides which rules apply, as in newlib
+        year = time.gmtime(ts + self.std_offset).tm_year
+        start, end = self.transitions(year)
+        if start < end:
+            return start <= ts < end
+        # Southern hemisphere: daylight time spans the new year
+        return ts >= start or ts < end
+
+    def utcoffset(self, ts):
+        """Return the UTC offset in seconds (east positive) at Unix time ts."""
+        return self.dst_offset if self.is_dst(ts) else self.std_offset
+
+    def localtime(self, ts):
+        """Return the local time at Unix time ts as a time.struct_time."""
+        return time.gmtime(ts + self.utcoffset(ts))
+
+    def to_utc(self, year, month, day, hour=0, minute=0):
+        """
+        Return the Unix time of a local wall-clock time, choosing standard time
+        where the wall clock is ambiguous or skipped.
+        """
+        naive = calendar.timegm((year, month, day, hour, minute, 0))
+        for offset in (self.std_offset, self.dst_offset):
+            if self.utcoffset(naive - offset) == offset:
+                return naive - offset
+        return naive - self.std_offset
+
+    def __repr__(self):
+        return f"PosixTimezone({self.spec!r})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a POSIX TZ string's offsets and DST transitions")
+    parser.add_argument("tz", help="POSIX TZ string, e.g. CST6CDT,M3.2.0/2,M11.1.0/2")
+    parser.add_argument("year", type=int, nargs="?", default=datetime.now(timezone.utc).year)
+    args = parser.parse_args()
+
+    try:
+        tz = PosixTimezone(args.tz)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    print(f"Standard time: {tz.std_name} UTC{tz.std_offset / 3600:+g}")
+    if not tz.dst_name:
+        print("No daylight saving time")
+        return
+    print(f"Daylight time: {tz.dst_name} UTC{tz.dst_offset / 3600:+g}")
+    for label, ts in zip(("starts", "ends"), tz.transitions(args.year)):
+        before = time.strftime("%Y-%m-%d %H:%M", tz.localtime(ts - 1))
+        after = time.strftime("%Y-%m-%d %H:%M", tz.localtime(ts))
+        print(f"  DST {label} {time.strftime('%Y-%m-%d %H:%M', time.gmtime(ts))} UTC "
+              f"(local {before}:59 -> {after})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+power_sim.py
+
+Replays a year of the firmware's power-management decisions on a virtual
+clock and turns them into an energy model, to tune night hours for battery
+life without waiting months.
+
+The schedule follows task_send_data.c, main.c, power_management.c and
+time_utils.c:
+
+- a send cycle (WiFi connect and POST) every DATA_SEND_INTERVAL_MINUTES,
+  checked every TASK_LOOP_CHECK_INTERVAL_S, so cycles are a little more than
+  five minutes apart
+- at the first send cycle in night hours (local hour >= night_start or
+  < night_end, in the sensor's POSIX TZ), a battery-powered sensor waits two
+  seconds and deep sleeps until night_end, at most NIGHT_CHECK_INTERVAL_US
+  at a time, counting whole minutes as calculate_night_sleep_duration_us()
+  does
+- a timer wakeup at night boots, checks the time and goes straight back to
+  sleep without the radio; the first wakeup after night_end boots fully,
+  connects, sends status and catches up
+- USB-powered sensors never sleep; at night they stay awake and skip the send
+
+Daylight saving transitions come from the TZ string (tools/posix_tz.py), so
+the short and long nights in spring and autumn are included. Sensors come
+from credentials.ini (battery-powered if battery_adc_gpio is set) or from
+--timezone and --night, which are simulated in every combination.
+
+Each day is split into radio-on, awake (radio-on included) and deep-sleep
+seconds, and charge per day is radio_ma * radio + active_ma * (awake - radio)
++ sleep_ua * sleep. The currents and durations are options; the defaults
+are typical ESP32-C3 figures, not measurements of this board.
+
+    python -m tools.power_sim
+    python -m tools.power_sim --credentials credentials.ini --year 2025
+    python -m tools.power_sim --timezone CST6CDT,M3.2.0/2,M11.1.0/2 --night 22:4 --night 20:6 --daily days.csv
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import bisect
+import configparser
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+
+from tools.fleet_sim import read_firmware_constants
+from tools.posix_tz import PosixTimezone
+
+# The defaults in dynamic_envs.py for settings missing from credentials.ini
+DEFAULT_TIMEZONE = "CST6CDT,M3.2.0/2,M11.1.0/2"
+DEFAULT_NIGHT = (22, 4)
+DEFAULT_YEAR = 2025
+# Fallbacks for when the firmware sources are not available
+DEFAULT_POWER_CONSTANTS = {
+    "TASK_LOOP_CHECK_INTERVAL_S": 30,
+    "NIGHT_CHECK_INTERVAL_MINUTES": 30,
+}
+SLEEP_DELAY_S = 2  # vTaskDelay before enter_night_sleep() in task_send_data.c
+
+_LOOP_CHECK_RE = re.compile(r"#define\s+TASK_LOOP_CHECK_INTERVAL_S\s+(\d+)")
+_NIGHT_CHECK_RE = re.compile(r"#define\s+NIGHT_CHECK_INTERVAL_US\s+\((\d+)\s*\*\s*60\s*\*\s*1000000ULL\)")
+
+
+def read_power_constants(project_dir="."):
+    """
+    Read the send interval and the power-management timing from the firmware sources.
+
+    Args:
+        project_dir (str): Project root holding main/ and include/
+
+    Returns:
+        dict: Constant name -> integer value
+    """
+    constants = dict(DEFAULT_POWER_CONSTANTS)
+    constants["DATA_SEND_INTERVAL_MINUTES"] = read_firmware_constants(project_dir)["DATA_SEND_INTERVAL_MINUTES"]
+    for name, regex, source in (
+            ("TASK_LOOP_CHECK_INTERVAL_S", _LOOP_CHECK_RE, "task_send_data.c"),
+            ("NIGHT_CHECK_INTERVAL_MINUTES", _NIGHT_CHECK_RE, "time_utils.c")):
+        path = os.path.join(project_dir, "main", source)
+        if os.path.exists(path):
+            with open(path, "r", errors="replace") as f:
+                match = regex.search(f.read())
+            if match:
+                constants[name] = int(match.group(1))
+    return constants
+
+
+class SensorConfig:
+    """The power-related settings of one sensor."""
+
+    def __init__(self, name, timezone, night_start, night_end, battery):
+        self.name = name
+        self.timezone = timezone
+        self.night_start = night_start
+        self.night_end = night_end
+        self.battery = battery
+        self.tz = PosixTimezone(timezone)
+
+    def is_night(self, ts):
+        """is_nighttime_local() at Unix time ts."""
+        hour = self.tz.localtime(ts).tm_hour
+        return hour >= self.night_start or hour < self.night_end
+
+    def sleep_duration(self, ts, cap_s):
+        """calculate_night_sleep_duration_us() at Unix time ts, in seconds."""
+        local = self.tz.localtime(ts)
+        hour, minute = local.tm_hour, local.tm_min
+        if not (hour >= self.night_start or hour < self.night_end):
+            return 0
+        if hour >= self.night_start:
+            minutes_until_wake = (24 - hour) * 60 - minute + self.night_end * 60
+        else:
+            minutes_until_wake = self.night_end * 60 - (hour * 60 + minute)
+        return min(minutes_until_wake * 60, cap_s)
+
+
+class DailyLedger:
+    """
+    Radio, awake and deep-sleep seconds and boots per local calendar day.
+
+    Args:
+        tz (PosixTimezone): The sensor's timezone, which decides where days start
+        year (int): Calendar year covered
+    """
+
+    def __init__(self, tz, year):
+        self.midnights = [tz.to_utc(year, 1, 1)]
+        ts = self.midnights[0]
+        while True:
+            local = tz.localtime(ts + 30 * 3600)
+            ts = tz.to_utc(local.tm_year, local.tm_mon, local.tm_mday)
+            self.midnights.append(ts)
+            if local.tm_year != year:
+                break
+        days = len(self.midnights) - 1
+        self.radio = [0.0] * days
+        self.awake = [0.0] * days
+        self.sleep = [0.0] * days
+        self.boots = [0] * days
+
+    @property
+    def start(self):
+        return self.midnights[0]
+
+    @property
+    def end(self):
+        return self.midnights[-1]
+
+    def add(self, column, start, end):
+        """Add the interval [start, end) to a column, split across days."""
+        start, end = max(start, self.start), min(end, self.end)
+        day = bisect.bisect_right(self.midnights, start) - 1
+        while start < end:
+            day_end = min(end, self.midnights[day + 1])
+            column[day] += day_end - start
+            start = day_end
+            day += 1
+
+    def boot(self, ts):
+        if self.start <= ts < self.end:
+            self.boots[bisect.bisect_right(self.midnights, ts) - 1] += 1
+
+
+def simulate_year(sensor, year, constants, timing):
+    """
+    Run one sensor's power-management schedule for a calendar year.
+
+    The sensor is powered on at local midnight on January 1st.
+
+    Args:
+        sensor (SensorConfig): The sensor
+        year (int): Calendar year
+        constants (dict): Output of read_power_constants()
+        timing (dict): boot_s, connect_s, send_s and setup_s
+
+    Returns:
+        DailyLedger: Seconds per day in each state
+    """
+    ledger = DailyLedger(sensor.tz, year)
+    send_interval = constants["DATA_SEND_INTERVAL_MINUTES"] * 60
+    loop_interval = constants["TASK_LOOP_CHECK_INTERVAL_S"]
+    sleep_cap = constants["NIGHT_CHECK_INTERVAL_MINUTES"] * 60
+    boot_s, connect_s = timing["boot_s"], timing["connect_s"]
+
+    t = ledger.start
+    timer_wakeup = False
+    while t < ledger.end:
+        # app_main(): a timer wakeup at night goes straight back to sleep
+        ledger.boot(t)
+        ledger.add(ledger.awake, t, t + boot_s)
+        t += boot_s
+        if timer_wakeup and sensor.battery and sensor.is_night(t):
+            duration = sensor.sleep_duration(t, sleep_cap)
+            if duration:
+                ledger.add(ledger.sleep, t, t + duration)
+                t += duration
+                continue
+
+        # task_send_data(): initial connection, status, NTP and catch-up
+        setup = connect_s + timing["setup_s"]
+        ledger.add(ledger.radio, t, t + setup)
+        ledger.add(ledger.awake, t, t + setup)
+        t += setup
+        last_send = t
+        loop = t
+
+        slept = False
+        while loop < ledger.end and not slept:
+            if loop - last_send < send_interval:
+                loop += math.ceil((send_interval - (loop - last_send)) / loop_interval) * loop_interval
+                continue
+            ledger.add(ledger.awake, t, loop)
+            t = loop
+
+            if sensor.is_night(t):
+                if not sensor.battery:
+                    last_send = t
+                    loop = t + loop_interval
+                    continue
+                ledger.add(ledger.awake, t, t + SLEEP_DELAY_S)
+                t += SLEEP_DELAY_S
+                duration = sensor.sleep_duration(t, sleep_cap)
+                if duration:
+                    ledger.add(ledger.sleep, t, t + duration)
+                    t += duration
+                    slept = True
+                    continue
+
+            cycle = connect_s + timing["send_s"]
+            ledger.add(ledger.radio, t, t + cycle)
+            ledger.add(ledger.awake, t, t + cycle)
+            t += cycle
+            last_send = t
+            loop = t + loop_interval
+
+        if not slept:
+            ledger.add(ledger.awake, t, ledger.end)
+            break
+        timer_wakeup = True
+    return ledger
+
+
+def charge_mah(radio_s, awake_s, sleep_s, currents):
+    """Charge in mAh for the given seconds in each state."""
+    return (currents["radio_ma"] * radio_s + currents["active_ma"] * (awake_s - radio_s)
+            + currents["sleep_ua"] / 1000.0 * sleep_s) / 3600.0
+
+
+def summarize(sensor, ledger, currents, battery_mah):
+    """
+    Average a sensor's year into per-day figures.
+
+    Returns:
+        dict: Per-day seconds, boots, charge and battery life, plus the DST days
+    """
+    days = len(ledger.awake)
+    radio, awake, sleep = sum(ledger.radio), sum(ledger.awake), sum(ledger.sleep)
+    mah_per_day = charge_mah(radio, awake, sleep, currents) / days
+    dst_days = []
+    for day in range(days):
+        length = ledger.midnights[day + 1] - ledger.midnights[day]
+        if length != 86400:
+            dst_days.append({
+                "date": time.strftime("%Y-%m-%d", sensor.tz.localtime(ledger.midnights[day])),
+                "hours": length / 3600,
+                "radio_s": round(ledger.radio[day], 1),
+                "awake_s": round(ledger.awake[day], 1),
+                "sleep_s": round(ledger.sleep[day], 1),
+            })
+    return {
+        "sensor": sensor.name,
+        "timezone": sensor.timezone,
+        "night": f"{sensor.night_start}:{sensor.night_end}",
+        "power": "battery" if sensor.battery else "usb",
+        "days": days,
+        "radio_s_per_day": round(radio / days, 1),
+        "awake_s_per_day": round(awake / days, 1),
+        "sleep_s_per_day": round(sleep / days, 1),
+        "boots_per_day": round(sum(ledger.boots) / days, 1),
+        "mah_per_day": round(mah_per_day, 2),
+        "battery_days": round(battery_mah / mah_per_day, 1) if mah_per_day else None,
+        "max_awake_s": round(max(ledger.awake), 1),
+        "min_awake_s": round(min(ledger.awake), 1),
+        "dst_days": dst_days,
+    }
+
+
+def load_sensors(credentials):
+    """
+    Read each sensor's timezone, night hours and power source from credentials.ini.
+
+    Returns:
+        list: SensorConfig for each section with a sensor_id
+    """
+    config = configparser.ConfigParser()
+    if not config.read(credentials):
+        raise FileNotFoundError(f"{credentials} not found")
+    sensors = []
+    for section in config.sections():
+        if not config.has_option(section, "sensor_id"):
+            continue
+        sensors.append(SensorConfig(
+            section,
+            config.get(section, "local_timezone", fallback=DEFAULT_TIMEZONE),
+            config.getint(section, "night_start_hour", fallback=DEFAULT_NIGHT[0]),
+            config.getint(section, "night_end_hour", fallback=DEFAULT_NIGHT[1]),
+            config.getint(section, "battery_adc_gpio", fallback=-1) >= 0))
+    if not sensors:
+        raise ValueError(f"No sensor sections in {credentials}")
+    return sensors
+
+
+def parse_night(value):
+    """Parse START:END night hours."""
+    try:
+        start, end = (int(part) for part in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:END hours, got '{value}'")
+    if not (0 <= start <= 23 and 0 <= end <= 23):
+        raise argparse.ArgumentTypeError(f"night hours must be 0-23, got '{value}'")
+    return start, end
+
+
+def write_daily(path, results):
+    """Write every sensor's per-day figures to a CSV file."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sensor", "timezone", "night", "date", "hours", "radio_s", "awake_s", "sleep_s", "boots"])
+        for sensor, ledger in results:
+            for day in range(len(ledger.awake)):
+                start = ledger.midnights[day]
+                writer.writerow([sensor.name, sensor.timezone, f"{sensor.night_start}:{sensor.night_end}",
+                                 time.strftime("%Y-%m-%d", sensor.tz.localtime(start)),
+                                 (ledger.midnights[day + 1] - start) / 3600, round(ledger.radio[day], 1),
+                                 round(ledger.awake[day], 1), round(ledger.sleep[day], 1), ledger.boots[day]])
+
+
+def format_table(summaries):
+    lines = [f"{'Sensor':<16} {'Night':>5} {'Power':>7} {'Radio s':>8} {'Awake s':>8} {'Sleep s':>8} "
+             f"{'Boots':>6} {'mAh/day':>8} {'Days':>7}"]
+    for s in summaries:
+        days = f"{s['battery_days']:.0f}" if s["battery_days"] else "-"
+        lines.append(f"{s['sensor'][:16]:<16} {s['night']:>5} {s['power']:>7} {s['radio_s_per_day']:>8.0f} "
+                     f"{s['awake_s_per_day']:>8.0f} {s['sleep_s_per_day']:>8.0f} {s['boots_per_day']:>6.1f} "
+                     f"{s['mah_per_day']:>8.1f} {days:>7}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a year of night sleep decisions and estimate energy use")
+    parser.add_argument("--credentials", help="take sensors' timezones, night hours and batteries from this file")
+    parser.add_argument("--timezone", action="append", default=[], metavar="TZ",
+                        help=f"POSIX TZ string to simulate; may be repeated (default {DEFAULT_TIMEZONE})")
+    parser.add_argument("--night", type=parse_night, action="append", default=[], metavar="START:END",
+                        help="night hours to simulate; may be repeated (default 22:4)")
+    parser.add_argument("--usb", action="store_true", help="simulate --timezone/--night sensors as USB-powered")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR, help="calendar year to simulate")
+    parser.add_argument("--boot-s", type=float, default=0.4, help="awake time of a boot before app_main decides")
+    parser.add_argument("--connect-s", type=float, default=3.0, help="radio time to connect to WiFi")
+    parser.add_argument("--send-s", type=float, default=1.5, help="radio time of one send cycle once connected")
+    parser.add_argument("--setup-s", type=float, default=4.0,
+                        help="radio time of the boot setup (status, NTP, stored readings) once connected")
+    parser.add_argument("--radio-ma", type=float, default=85.0, help="average current with WiFi active")
+    parser.add_argument("--active-ma", type=float, default=22.0, help="current awake with WiFi off")
+    parser.add_argument("--sleep-ua", type=float, default=10.0, help="deep-sleep current of the whole board")
+    parser.add_argument("--battery-mah", type=float, default=2000.0, help="usable battery capacity")
+    parser.add_argument("--daily", help="write per-day figures to this CSV file")
+    parser.add_argument("--project-dir", default=".", help="firmware sources to read timing constants from")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    if args.credentials and (args.timezone or args.night):
+        print("[ERROR] --credentials takes timezones and night hours from the file; drop --timezone/--night")
+        sys.exit(1)
+    try:
+        if args.credentials:
+            sensors = load_sensors(args.credentials)
+        else:
+            sensors = [SensorConfig(f"tz{i + 1}" if len(args.timezone) > 1 else "sensor", tz, start, end,
+                                    not args.usb)
+                       for i, tz in enumerate(args.timezone or [DEFAULT_TIMEZONE])
+                       for start, end in (args.night or [DEFAULT_NIGHT])]
+    except (OSError, ValueError, configparser.Error) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    for sensor in sensors:
+        if sensor.night_start <= sensor.night_end:
+            print(f"[WARN] {sensor.name}: night {sensor.night_start}:{sensor.night_end} is every hour to the firmware "
+                  f"(hour >= start or hour < end); it only works for windows that cross midnight")
+
+    constants = read_power_constants(args.project_dir)
+    timing = {"boot_s": args.boot_s, "connect_s": args.connect_s, "send_s": args.send_s, "setup_s": args.setup_s}
+    currents = {"radio_ma": args.radio_ma, "active_ma": args.active_ma, "sleep_ua": args.sleep_ua}
+
+    started = time.monotonic()
+    results = [(sensor, simulate_year(sensor, args.year, constants, timing)) for sensor in sensors]
+    summaries = [summarize(sensor, ledger, currents, args.battery_mah) for sensor, ledger in results]
+    if args.daily:
+        write_daily(args.daily, results)
+
+    if args.json:
+        print(json.dumps({"year": args.year, "constants": constants, "timing": timing, "currents": currents,
+                          "sensors": summaries}, indent=2))
+        return
+
+    print(f"[INFO] {len(sensors)} sensors x {args.year}, simulated in {time.monotonic() - started:.1f}s; "
+          f"firmware timing: {json.dumps(constants)}")
+    print(format_table(summaries))
+    for s in summaries:
+        for day in s["dst_days"]:
+            print(f"  {s['sensor']} {s['night']} {day['date']} ({day['hours']:g} h): radio {day['radio_s']:.0f}s, "
+                  f"awake {day['awake_s']:.0f}s, sleep {day['sleep_s']:.0f}s")
+    if args.daily:
+        print(f"[INFO] Per-day figures written to {args.daily}")
+
+
+if __name__ == "__main__":
+    main()
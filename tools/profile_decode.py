@@ -0,0 +1,293 @@
+"""
+profile_decode.py
+
+Decode the "profile" field of sensor status updates (profiling.c) and
+aggregate it per phase across the fleet and per sensor.
+
+Each status a sensor sends carries the timing counters recorded since its
+previous report:
+
+    p1 w=21600 i2c=720/233280/410/0.720 http=74/61642000/2210000/0.0.0.0.0.0.60.14
+
+"w" is the seconds the counters cover; each phase is
+count/total_us/max_us/histogram, where histogram bucket 0 is under 256 us,
+every later bucket is 4 times wider and the last one is unbounded. Trailing
+empty buckets are left out. Percentiles are estimated from the histograms by
+interpolating inside the bucket they fall in, so they are approximate
+(within a factor of 4 of the bucket's lower bound, and never above max).
+
+The radio column is each phase's share of radio-on time, taken as WiFi
+connect + HTTP + JSON building (the send path's JSON is built while
+connected); radio duty is that time over the seconds covered.
+
+Input is the mock server's SQLite database (statuses table), JSON or JSONL
+files of status objects, or profile strings given with --text.
+
+    python -m tools.profile_decode                           # .pio/mock_ingest.sqlite
+    python -m tools.profile_decode statuses.jsonl --per-sensor
+    python -m tools.profile_decode --text "p1 w=300 i2c=20/5120/310/0.20"
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import json
+import os
+import sqlite3
+import sys
+
+from tools.mock_server import DEFAULT_DB
+
+FORMAT_VERSION = "p1"
+
+# Same order and names as profile_id_t and profile_name() in profiling.h
+PHASES = ("i2c", "json", "http", "wifi", "nvs")
+RADIO_PHASES = ("wifi", "http", "json")
+
+# PROFILE_BUCKETS and PROFILE_FIRST_BUCKET_US; upper bound of each bucket, None for the last
+BUCKETS = 10
+FIRST_BUCKET_US = 256
+BUCKET_LIMITS = [FIRST_BUCKET_US * 4 ** i for i in range(BUCKETS - 1)] + [None]
+
+PERCENTILES = (50, 90, 99)
+
+PhaseCounter = collections.namedtuple("PhaseCounter", ["count", "total_us", "max_us", "buckets"])
+Profile = collections.namedtuple("Profile", ["sensor_id", "timestamp", "window_s", "phases"])
+
+
+class ProfileFormatError(ValueError):
+    """Raised when a profile string does not match profile_format()."""
+
+
+def parse_profile(text):
+    """
+    Parse one profile string.
+
+    Args:
+        text: String from a status update's "profile" field
+
+    Returns:
+        (window_s, {phase name: PhaseCounter}); names not in PHASES are kept
+    """
+    tokens = text.split()
+    if not tokens or tokens[0] != FORMAT_VERSION:
+        raise ProfileFormatError(f"Not a {FORMAT_VERSION} profile: {text[:40]!r}")
+    window_s = None
+    phases = {}
+    for token in tokens[1:]:
+        name, sep, value = token.partition("=")
+        if not sep:
+            raise ProfileFormatError(f"Bad field {token!r}")
+        if name == "w":
+            window_s = int(value)
+            continue
+        try:
+            count, total_us, max_us, histogram = value.split("/")
+            buckets = [int(bucket) for bucket in histogram.split(".")]
+            counter = PhaseCounter(int(count), int(total_us), int(max_us), buckets)
+        except ValueError:
+            raise ProfileFormatError(f"Bad phase {token!r}")
+        if len(buckets) > BUCKETS:
+            raise ProfileFormatError(f"Phase {name!r} has {len(buckets)} buckets, expected at most {BUCKETS}")
+        phases[name] = counter._replace(buckets=buckets + [0] * (BUCKETS - len(buckets)))
+    if window_s is None:
+        raise ProfileFormatError("Missing w=")
+    return window_s, phases
+
+
+def _statuses_from_sqlite(path):
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return [{"sensor_id": sensor_id, "timestamp": timestamp, "profile": profile}
+                for sensor_id, timestamp, profile in db.execute(
+                    "SELECT sensor_id, timestamp, profile FROM statuses "
+                    "WHERE profile IS NOT NULL ORDER BY timestamp")]
+    except sqlite3.OperationalError:
+        # Written before the profile column existed
+        return []
+    finally:
+        db.close()
+
+
+def _statuses_from_json(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def load_profiles(paths=(), texts=(), sensor_id=None):
+    """
+    Read profiles from status sources.
+
+    Args:
+        paths: SQLite databases (.sqlite/.db) or JSON/JSONL files of status objects
+        texts: Literal profile strings
+        sensor_id: Only keep this sensor
+
+    Returns:
+        (list of Profile, number of profile strings that could not be parsed)
+    """
+    statuses = []
+    for path in paths:
+        if path.endswith((".sqlite", ".db")):
+            statuses.extend(_statuses_from_sqlite(path))
+        else:
+            statuses.extend(_statuses_from_json(path))
+    statuses.extend({"sensor_id": "-", "timestamp": None, "profile": text} for text in texts)
+
+    profiles = []
+    bad = 0
+    for status in statuses:
+        text = status.get("profile")
+        if not text or (sensor_id is not None and status.get("sensor_id") != sensor_id):
+            continue
+        try:
+            window_s, phases = parse_profile(text)
+        except ProfileFormatError as e:
+            print(f"[WARN] {status.get('sensor_id')} {status.get('timestamp')}: {e}")
+            bad += 1
+            continue
+        profiles.append(Profile(status.get("sensor_id"), status.get("timestamp"), window_s, phases))
+    return profiles, bad
+
+
+class PhaseTotals:
+    """Counters for one phase summed over many reports."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, counter):
+        self.count += counter.count
+        self.total_us += counter.total_us
+        self.max_us = max(self.max_us, counter.max_us)
+        for i, value in enumerate(counter.buckets):
+            self.buckets[i] += value
+
+    def mean_us(self):
+        return self.total_us / self.count if self.count else 0.0
+
+    def percentile_us(self, q):
+        """
+        Estimate a percentile from the histogram.
+
+        Args:
+            q: Percentile, 0-100
+
+        Returns:
+            Estimated duration in microseconds
+        """
+        bucketed = sum(self.buckets)
+        if bucketed == 0:
+            return 0.0
+        target = bucketed * q / 100
+        seen = 0
+        for i, value in enumerate(self.buckets):
+            if value and seen + value >= target:
+                lower = BUCKET_LIMITS[i - 1] if i else 0
+                upper = BUCKET_LIMITS[i]
+                # The maximum bounds the top bucket; it restarts with each report, so it may be below lower
+                if upper is None or lower <= self.max_us < upper:
+                    upper = max(self.max_us, lower)
+                return lower + (upper - lower) * (target - seen) / value
+            seen += value
+        return float(self.max_us)
+
+
+class ProfileSummary:
+    """Per-phase totals for a set of reports."""
+
+    def __init__(self):
+        self.reports = 0
+        self.window_s = 0
+        self.phases = collections.defaultdict(PhaseTotals)
+
+    def add(self, profile):
+        self.reports += 1
+        self.window_s += profile.window_s
+        for name, counter in profile.phases.items():
+            self.phases[name].add(counter)
+
+    def radio_us(self):
+        return sum(self.phases[name].total_us for name in RADIO_PHASES if name in self.phases)
+
+    def names(self):
+        known = [name for name in PHASES if name in self.phases]
+        return known + sorted(name for name in self.phases if name not in PHASES)
+
+
+def aggregate(profiles):
+    """
+    Sum reports across the fleet and per sensor.
+
+    Args:
+        profiles: Profiles from load_profiles()
+
+    Returns:
+        (fleet ProfileSummary, {sensor_id: ProfileSummary})
+    """
+    fleet = ProfileSummary()
+    sensors = collections.defaultdict(ProfileSummary)
+    for profile in profiles:
+        fleet.add(profile)
+        sensors[profile.sensor_id].add(profile)
+    return fleet, dict(sensors)
+
+
+def format_summary(title, summary):
+    """Format one summary as a table, durations in ms."""
+    radio_us = summary.radio_us()
+    duty = f", radio duty {100 * radio_us / (summary.window_s * 1e6):.3f}%" if summary.window_s else ""
+    lines = [f"{title}: {summary.reports} reports covering {summary.window_s / 3600:.1f} h{duty}"]
+    header = f"  {'phase':<6} {'n':>8} {'mean_ms':>9}" + "".join(f" {f'~p{q}_ms':>9}" for q in PERCENTILES)
+    lines.append(header + f" {'max_ms':>9} {'total_s':>9} {'radio':>6}")
+    for name in summary.names():
+        phase = summary.phases[name]
+        numbers = [phase.mean_us()] + [phase.percentile_us(q) for q in PERCENTILES] + [phase.max_us]
+        share = f"{100 * phase.total_us / radio_us:5.1f}%" if name in RADIO_PHASES and radio_us else "-"
+        lines.append(f"  {name:<6} {phase.count:>8}" + "".join(f" {value / 1000:>9.1f}" for value in numbers)
+                     + f" {phase.total_us / 1e6:>9.1f} {share:>6}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode and aggregate profiling counters from sensor statuses")
+    parser.add_argument("paths", nargs="*",
+                        help=f"SQLite databases or JSON/JSONL status files (default: {DEFAULT_DB})")
+    parser.add_argument("--text", action="append", default=[], help="a profile string to decode (repeatable)")
+    parser.add_argument("--sensor", help="only this sensor_id")
+    parser.add_argument("--per-sensor", action="store_true", help="also print a table for each sensor")
+    args = parser.parse_args()
+
+    paths = args.paths or ([] if args.text else [DEFAULT_DB])
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"[ERROR] Not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    try:
+        profiles, bad = load_profiles(paths, args.text, args.sensor)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    if not profiles:
+        print("[ERROR] No profile fields found")
+        sys.exit(1)
+
+    fleet, sensors = aggregate(profiles)
+    print(format_summary(f"fleet ({len(sensors)} sensors)", fleet))
+    if args.per_sensor:
+        for sensor_id in sorted(sensors, key=str):
+            print()
+            print(format_summary(sensor_id, sensors[sensor_id]))
+    print(f"[INFO] {len(profiles)} reports decoded" + (f", {bad} skipped" if bad else ""))
+
+
+if __name__ == "__main__":
+    main()
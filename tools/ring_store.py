@@ -0,0 +1,247 @@
+"""
+ring_store.py
+
+Reader for the readings ring that persistent_storage.c keeps in the raw
+"readings" partition, for flash dumps taken off a sensor.
+
+The partition is a ring of 4 KB sectors of 32-byte slots. Slot 0 of each
+sector is a header (magic "SLRS", version, slot size, sector sequence
+number, erase count, tail and next reading sequence number when the sector
+was opened, CRC32); the other slots hold records (sequence number, type,
+timestamp or new tail, lux, chip_temp_c, chip_temp_f, CRC32). Readings
+before the highest tail have been sent or dropped. The layout must match
+main/persistent_storage.c.
+
+A dump can be a full flash image (the partition is found through the
+partition table at 0x8000) or just the readings partition:
+
+    esptool.py read_flash 0 0x400000 sensor_1.bin
+    python -m tools.ring_store sensor_1.bin
+    python -m tools.ring_store sensor_1.bin --csv sensor_1.readings.csv --all
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import csv
+import struct
+import sys
+
+from tools.nvs_image import crc32
+from tools.partitions import PartitionError, map_dump_partition
+
+DEFAULT_PARTITION = "readings"
+SECTOR_SIZE = 4096
+SLOT_SIZE = 32
+SLOTS_PER_SECTOR = SECTOR_SIZE // SLOT_SIZE
+RECORDS_PER_SECTOR = SLOTS_PER_SECTOR - 1
+MAGIC = 0x53524C53
+VERSION = 1
+RECORD_READING = 0x01
+RECORD_TAIL = 0x02
+
+HEADER_STRUCT = struct.Struct("<IHHIIIII4x")
+RECORD_STRUCT = struct.Struct("<IB3xqfff")
+_CRC_STRUCT = struct.Struct("<I")
+_ERASED_SLOT = b"\xff" * SLOT_SIZE
+
+Sector = collections.namedtuple("Sector", ["index", "valid", "blank", "sector_seq", "erase_count",
+                                           "first_seq", "end_seq", "used_slots"])
+READING_FIELDS = ("timestamp", "lux", "chip_temp_c", "chip_temp_f")
+
+
+class RingDecodeError(Exception):
+    """Raised when a dump holds no readable readings ring."""
+
+
+def capacity(partition_size):
+    """
+    Readings a ring of this size holds before the oldest are overwritten.
+
+    One sector is always being erased for reuse, so it does not count.
+
+    Args:
+        partition_size (int): Size of the readings partition in bytes
+
+    Returns:
+        int: Number of readings
+    """
+    return max(0, partition_size // SECTOR_SIZE - 1) * RECORDS_PER_SECTOR
+
+
+def _slot_crc_ok(slot):
+    return crc32(slot[:28]) == _CRC_STRUCT.unpack_from(slot, 28)[0]
+
+
+class RingPartition:
+    """
+    Decoded state of a readings ring, rebuilt the way the firmware mounts it.
+
+    Args:
+        data (bytes-like): The partition contents
+    """
+
+    def __init__(self, data):
+        data = memoryview(data)
+        if len(data) < 2 * SECTOR_SIZE:
+            raise RingDecodeError(f"{len(data)} bytes is too small for a readings ring")
+        self.sectors = []
+        self.corrupt_records = 0
+        self.tail_seq = 0
+        self.next_seq = 0
+        self._readings = {}  # sector index -> [(seq, timestamp, lux, chip_temp_c, chip_temp_f)]
+        for index in range(len(data) // SECTOR_SIZE):
+            self._scan_sector(index, data[index * SECTOR_SIZE:(index + 1) * SECTOR_SIZE])
+        if not any(sector.valid for sector in self.sectors):
+            raise RingDecodeError("No ring sectors found (not a readings partition, or never written)")
+
+    def _scan_sector(self, index, sector):
+        header = bytes(sector[:SLOT_SIZE])
+        valid = False
+        sector_seq = erase_count = 0
+        if header != _ERASED_SLOT and _slot_crc_ok(header):
+            magic, version, slot_size, sector_seq, erase_count, tail_seq, base_seq = \
+                HEADER_STRUCT.unpack_from(header)[:7]
+            valid = magic == MAGIC and version == VERSION and slot_size == SLOT_SIZE
+        if valid:
+            self.tail_seq = max(self.tail_seq, tail_seq)
+            self.next_seq = max(self.next_seq, base_seq)
+
+        readings = []
+        used_slots = 0 if header == _ERASED_SLOT else 1
+        for slot_index in range(1, SLOTS_PER_SECTOR):
+            slot = bytes(sector[slot_index * SLOT_SIZE:(slot_index + 1) * SLOT_SIZE])
+            if slot == _ERASED_SLOT:
+                continue
+            used_slots = slot_index + 1
+            if not valid:
+                continue
+            if not _slot_crc_ok(slot):
+                self.corrupt_records += 1
+                continue
+            seq, record_type, value, lux, chip_temp_c, chip_temp_f = RECORD_STRUCT.unpack_from(slot)
+            if record_type == RECORD_READING:
+                readings.append((seq, value, lux, chip_temp_c, chip_temp_f))
+                self.next_seq = max(self.next_seq, seq + 1)
+            elif record_type == RECORD_TAIL:
+                self.tail_seq = max(self.tail_seq, value)
+
+        first_seq = readings[0][0] if readings else 0
+        end_seq = readings[-1][0] + 1 if readings else 0
+        self.sectors.append(Sector(index, valid, used_slots == 0, sector_seq, erase_count,
+                                   first_seq, end_seq, used_slots))
+        if readings:
+            self._readings[index] = readings
+
+    @classmethod
+    def open(cls, path, partition=DEFAULT_PARTITION):
+        """
+        Read the ring from a dump file.
+
+        Args:
+            path (str): Full flash dump or a dump of the readings partition alone
+            partition (str): Partition label to use from a full flash dump
+
+        Returns:
+            RingPartition: The decoded ring
+        """
+        try:
+            mapped, view, _full = map_dump_partition(path, partition)
+        except PartitionError as e:
+            raise RingDecodeError(str(e))
+        try:
+            return cls(view)
+        finally:
+            view.release()
+            mapped.close()
+
+    @property
+    def live_start(self):
+        """Sequence number of the oldest reading still stored."""
+        firsts = [s.first_seq for s in self.sectors if s.valid and s.end_seq > s.first_seq]
+        return max(self.tail_seq, min(firsts, default=self.next_seq))
+
+    @property
+    def head(self):
+        """The sector being appended to."""
+        return max((s for s in self.sectors if s.valid), key=lambda s: s.sector_seq)
+
+    def readings(self, include_sent=False):
+        """
+        Stored readings, oldest first.
+
+        Args:
+            include_sent (bool): Also return readings before the tail that
+                have not been erased yet
+
+        Returns:
+            list: (timestamp, lux, chip_temp_c, chip_temp_f) tuples
+        """
+        start = 0 if include_sent else self.live_start
+        ordered = sorted((s for s in self.sectors if s.index in self._readings), key=lambda s: s.sector_seq)
+        return [reading[1:] for sector in ordered for reading in self._readings[sector.index]
+                if reading[0] >= start]
+
+    def stats(self):
+        """
+        Usage and wear, as far as the dump shows them.
+
+        Returns:
+            dict: count, capacity, sectors, erase counts and corrupt records
+        """
+        erase_counts = [s.erase_count for s in self.sectors if s.valid]
+        return {
+            "count": self.next_seq - self.live_start,
+            "capacity": (len(self.sectors) - 1) * RECORDS_PER_SECTOR,
+            "sectors": len(self.sectors),
+            "head": self.head.index,
+            "next_seq": self.next_seq,
+            "tail_seq": self.tail_seq,
+            "min_erase_count": min(erase_counts),
+            "max_erase_count": max(erase_counts),
+            "total_erases": sum(erase_counts),
+            "corrupt_records": self.corrupt_records,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode the readings ring from a flash dump")
+    parser.add_argument("dump", help="full flash dump, or a dump of the readings partition")
+    parser.add_argument("--partition", default=DEFAULT_PARTITION, help="partition label in full flash dumps")
+    parser.add_argument("--csv", help="write the readings to this CSV file")
+    parser.add_argument("--all", action="store_true", help="include sent readings not yet erased")
+    parser.add_argument("--sectors", action="store_true", help="list every sector")
+    args = parser.parse_args()
+
+    try:
+        ring = RingPartition.open(args.dump, args.partition)
+    except (RingDecodeError, OSError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    readings = ring.readings(args.all)
+    stats = ring.stats()
+    print(f"[INFO] {stats['count']} readings stored (capacity {stats['capacity']}), "
+          f"sequence {ring.live_start}..{ring.next_seq}, head sector {stats['head']}")
+    print(f"[INFO] Sector erases: {stats['min_erase_count']}..{stats['max_erase_count']} "
+          f"({stats['total_erases']} total over {stats['sectors']} sectors)")
+    if stats["corrupt_records"]:
+        print(f"[WARN] {stats['corrupt_records']} records with a bad CRC (torn writes)")
+    if args.sectors:
+        for s in ring.sectors:
+            state = "ring" if s.valid else ("blank" if s.blank else "invalid")
+            span = f"readings {s.first_seq}..{s.end_seq}" if s.end_seq > s.first_seq else "no readings"
+            print(f"  sector {s.index:2}: {state:7} seq {s.sector_seq:5} erases {s.erase_count:5} "
+                  f"slots {s.used_slots:3}/{SLOTS_PER_SECTOR} {span}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(READING_FIELDS)
+            writer.writerows(readings)
+        print(f"[INFO] Wrote {len(readings)} readings to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
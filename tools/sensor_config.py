@@ -0,0 +1,427 @@
+"""
+sensor_config.py
+
+One parse of the project's configuration, shared by build.py, dynamic_envs.py
+and tools/build_plan.py: the environments in platformio.ini with their
+extends chains resolved, and every sensor section of credentials.ini as
+typed settings.
+
+A fleet build runs dynamic_envs.py once per environment, each in its own
+SCons process, so the parsed model is cached in .pio/config_cache.pickle.
+The cache is keyed on the size, mtime and SHA-256 of both files: a touched
+but unchanged file is re-hashed but not re-parsed, and an edited one is
+parsed again.
+
+    python -m tools.sensor_config              # summary of environments and sensors
+    python -m tools.sensor_config sensor_1     # one sensor's settings (secrets redacted)
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import configparser
+import os
+import pickle
+import sys
+import tempfile
+
+from tools.generated_files import file_digest
+
+PLATFORMIO_FILE = "platformio.ini"
+CREDENTIALS_FILE = "credentials.ini"
+DEFAULT_CACHE = os.path.join(".pio", "config_cache.pickle")
+# Bump when the model changes so older pickles are never loaded
+CACHE_VERSION = 1
+
+BASE_ENV = "env:esp32c3_base"
+SHARED_SECTION = "all_sensors"
+DEFAULT_CONFIG_MODE = "header"
+
+# (option, type, default) for each sensor setting; None means required.
+# The defaults are the ones the firmware has always been built with.
+SENSOR_OPTIONS = [
+    ("sensor_id", str, None),
+    ("sensor_set_id", str, None),
+    ("bearer_token", str, None),
+    ("wifi_credentials", str, None),
+    ("sda_gpio", int, None),
+    ("scl_gpio", int, None),
+    # -1 means there is no battery circuit
+    ("battery_adc_gpio", int, -1),
+    ("night_start_hour", int, 22),
+    ("night_end_hour", int, 4),
+    ("local_timezone", str, "CST6CDT,M3.2.0/2,M11.1.0/2"),
+]
+SECRET_OPTIONS = ("bearer_token", "wifi_credentials")
+
+# Buffer sizes, terminator included, of the string settings main/device_config.c
+# loads from the sensor_cfg partition (nvs mode). dynamic_envs.py emits them as
+# CONFIG_*_MAX_LEN; "url" is the shared API URL from [all_sensors].
+NVS_STRING_LIMITS = {
+    "sensor_id": 32,
+    "bearer_token": 120,
+    "wifi_credentials": 512,
+    "url": 128,
+    "sensor_set_id": 32,
+    "local_timezone": 64,
+}
+
+# Room api_client.c has for one reading of a JSON chunk (JSON_READING_MAX_SIZE in json_writer.h)
+JSON_READING_MAX_SIZE = 384
+# Longest number json_writer_add_number() writes for a float reading, e.g. -1.1754943508222875e-38
+JSON_NUMBER_MAX_LEN = 23
+
+SensorSettings = collections.namedtuple(
+    "SensorSettings", ["section", "url"] + [option for option, _type, _default in SENSOR_OPTIONS])
+PlatformioEnv = collections.namedtuple("PlatformioEnv", ["name", "chain", "options"])
+
+
+class ConfigError(Exception):
+    """Raised when platformio.ini or a requested sensor's settings are unusable."""
+
+
+def _read_ini(path, interpolation=None):
+    config = configparser.ConfigParser(interpolation=interpolation)
+    with open(path, "r") as f:
+        config.read_file(f, source=path)
+    return config
+
+
+def _section_dict(config, section):
+    return {key: value.strip() for key, value in config.items(section)}
+
+
+def resolve_env(sections, name):
+    """
+    Resolve one environment's options through its extends chain.
+
+    An option comes from the nearest section that sets it: the environment
+    itself, then what it extends (in the order listed, recursively), then [env].
+
+    Args:
+        sections (dict): platformio.ini section name -> {option: value}
+        name (str): Environment name, without the env: prefix
+
+    Returns:
+        PlatformioEnv: The environment
+    """
+    chain = []
+    pending = [f"env:{name}"]
+    while pending:
+        section = pending.pop(0)
+        if section in chain or section not in sections:
+            continue
+        chain.append(section)
+        parents = sections[section].get("extends", "")
+        pending.extend(parent.strip() for parent in parents.split(",") if parent.strip())
+    if "env" in sections and "env" not in chain:
+        chain.append("env")
+
+    options = {}
+    for section in reversed(chain):
+        options.update(sections[section])
+    options.pop("extends", None)
+    return PlatformioEnv(name, tuple(chain), options)
+
+
+def parse_sensor(section, values, url):
+    """
+    Turn one credentials.ini section into typed settings.
+
+    Args:
+        section (str): Section name
+        values (dict): The section's raw options
+        url (str): The shared API URL from [all_sensors]
+
+    Returns:
+        tuple: (SensorSettings or None, list of problem strings)
+    """
+    problems = []
+    settings = {"section": section, "url": url}
+    for option, option_type, default in SENSOR_OPTIONS:
+        raw = values.get(option)
+        if raw is None or raw == "":
+            if default is None:
+                problems.append(f"missing '{option}'")
+            settings[option] = default
+            continue
+        if option_type is int:
+            try:
+                settings[option] = int(raw)
+            except ValueError:
+                problems.append(f"'{option}' is not an integer: {raw}")
+                settings[option] = None
+        else:
+            settings[option] = raw
+    if problems:
+        return None, problems
+    return SensorSettings(**settings), problems
+
+
+def nvs_length_problem(option, value):
+    """
+    Check a string setting against its sensor_cfg buffer size.
+
+    nvs_get_str() fails with ESP_ERR_NVS_INVALID_LENGTH for a value that does
+    not fit, and the sensor then boots without its settings.
+
+    Args:
+        option (str): Option name, a key of NVS_STRING_LIMITS
+        value (str): The setting
+
+    Returns:
+        str: Problem description, or None if the value fits
+    """
+    limit = NVS_STRING_LIMITS.get(option)
+    if limit is None or value is None:
+        return None
+    length = len(value.encode("utf-8"))
+    if length + 1 > limit:
+        return f"'{option}' is {length} bytes; the firmware loads at most {limit - 1} from the sensor_cfg partition"
+    return None
+
+
+def _json_string_size(value):
+    """Bytes of value as a JSON string the way json_writer.c escapes it."""
+    size = 2
+    for byte in value.encode("utf-8"):
+        if byte in b'"\\\b\f\n\r\t':
+            size += 2
+        elif byte < 0x20:
+            size += 6
+        else:
+            size += 1
+    return size
+
+
+def json_reading_problem(sensor_id, sensor_set_id):
+    """
+    Check that a reading with these IDs fits api_client.c's per-reading buffer.
+
+    The readings of a JSON chunk are serialized one at a time into a buffer of
+    JSON_READING_MAX_SIZE bytes. Only the IDs vary in length, so a reading
+    that does not fit never will, and the sensor cannot send any.
+
+    Args:
+        sensor_id (str): The sensor's sensor_id
+        sensor_set_id (str): The sensor's sensor_set_id
+
+    Returns:
+        str: Problem description, or None if every reading fits
+    """
+    if sensor_id is None or sensor_set_id is None:
+        return None
+    # '[' or ',' before the object and ']' after it, three numbers and the fixed-width timestamp
+    fixed = ('[{"light_intensity":,"sensor_id":,"timestamp":"0000-00-00T00:00:00Z","sensor_set_id":'
+             ',"chip_temp_c":,"chip_temp_f":}]')
+    size = len(fixed) + 3 * JSON_NUMBER_MAX_LEN + _json_string_size(sensor_id) + _json_string_size(sensor_set_id)
+    if size > JSON_READING_MAX_SIZE:
+        return (f"'sensor_id' and 'sensor_set_id' make a reading up to {size} bytes of JSON; "
+                f"the firmware sends at most {JSON_READING_MAX_SIZE}")
+    return None
+
+
+class ProjectConfig:
+    """
+    The parsed platformio.ini and credentials.ini.
+
+    Attributes:
+        platformio_sections (dict): Section -> raw options, as written
+        envs (dict): Environment name -> PlatformioEnv, for every [env:...]
+        credential_sections (dict): credentials.ini section -> raw options
+        url (str): [all_sensors] url, or None
+        sensors (dict): Section -> SensorSettings for every valid sensor section
+        problems (dict): Section -> list of problems for invalid sections
+        credentials_found (bool): Whether credentials.ini exists
+        credentials_error (str): Why credentials.ini could not be parsed, or None
+    """
+
+    def __init__(self, platformio_sections, credential_sections, credentials_found, credentials_error=None):
+        self.platformio_sections = platformio_sections
+        self.envs = {section[len("env:"):]: resolve_env(platformio_sections, section[len("env:"):])
+                     for section in platformio_sections if section.startswith("env:")}
+        self.credential_sections = credential_sections
+        self.credentials_found = credentials_found
+        self.credentials_error = credentials_error
+        self.url = credential_sections.get(SHARED_SECTION, {}).get("url")
+        self.sensors = {}
+        self.problems = {}
+        if credentials_error:
+            self.problems[CREDENTIALS_FILE] = [credentials_error]
+        elif credentials_found and self.url is None:
+            self.problems[SHARED_SECTION] = [f"missing '[{SHARED_SECTION}]' section or its 'url'"]
+        for section, values in credential_sections.items():
+            if section == SHARED_SECTION:
+                continue
+            settings, problems = parse_sensor(section, values, self.url)
+            if problems:
+                self.problems[section] = problems
+            else:
+                self.sensors[section] = settings
+
+    def sensor_envs(self):
+        """
+        Return every sensor environment: those that extend the ESP32-C3 base
+        environment, directly or not, in the order they appear in the file.
+        """
+        return [name for name, env in self.envs.items()
+                if f"env:{name}" != BASE_ENV and BASE_ENV in env.chain]
+
+    def config_mode(self, env_name):
+        """Return an environment's custom_sensor_config (header, object or nvs)."""
+        env = self.envs.get(env_name)
+        value = env.options.get("custom_sensor_config", DEFAULT_CONFIG_MODE) if env else DEFAULT_CONFIG_MODE
+        return value.strip().lower()
+
+    def sensor(self, section):
+        """
+        Return one sensor's settings.
+
+        Raises:
+            ConfigError: If credentials.ini, the section or one of its settings is missing or invalid
+        """
+        if not self.credentials_found:
+            raise ConfigError(f"Credentials file '{CREDENTIALS_FILE}' not found.")
+        if self.credentials_error:
+            raise ConfigError(self.credentials_error)
+        if SHARED_SECTION in self.problems:
+            raise ConfigError(f"[{SHARED_SECTION}]: {'; '.join(self.problems[SHARED_SECTION])}")
+        if section not in self.credential_sections:
+            raise ConfigError(f"Section '[{section}]' not found in {CREDENTIALS_FILE}.")
+        if section in self.problems:
+            raise ConfigError(f"[{section}]: {'; '.join(self.problems[section])}")
+        return self.sensors[section]
+
+
+def _file_key(path, cached_key=None):
+    """
+    Return (size, mtime_ns, sha256) for a file, reusing the cached digest
+    when size and mtime are unchanged. A missing file is (None, None, None).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (None, None, None)
+    if cached_key and cached_key[0] == st.st_size and cached_key[1] == st.st_mtime_ns:
+        return cached_key
+    return (st.st_size, st.st_mtime_ns, file_digest(path))
+
+
+def _same_content(key, cached_key):
+    return cached_key is not None and key[0] == cached_key[0] and key[2] == cached_key[2]
+
+
+_memo = {}
+
+
+def load_project_config(project_dir=".", cache_path=DEFAULT_CACHE):
+    """
+    Load platformio.ini and credentials.ini, from the pickle cache when both
+    are unchanged.
+
+    Args:
+        project_dir (str): Project root
+        cache_path (str): Pickle cache, relative to project_dir (None disables it)
+
+    Returns:
+        ProjectConfig: The parsed configuration
+
+    Raises:
+        ConfigError: If platformio.ini is missing or cannot be parsed
+    """
+    platformio_path = os.path.join(project_dir, PLATFORMIO_FILE)
+    credentials_path = os.path.join(project_dir, CREDENTIALS_FILE)
+    cache_file = os.path.join(project_dir, cache_path) if cache_path else None
+
+    cached = _memo.get(cache_file)
+    if cached is None and cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") != CACHE_VERSION:
+                cached = None
+        except Exception:
+            # A cache from another version, or half-written: just parse again
+            cached = None
+
+    keys = {
+        "platformio": _file_key(platformio_path, cached["keys"]["platformio"] if cached else None),
+        "credentials": _file_key(credentials_path, cached["keys"]["credentials"] if cached else None),
+    }
+    if cached and all(_same_content(keys[name], cached["keys"][name]) for name in keys):
+        project = cached["config"]
+        if keys != cached["keys"] and cache_file:
+            # Touched but unchanged: remember the new mtimes so the next load skips hashing
+            _save_cache(cache_file, {"version": CACHE_VERSION, "keys": keys, "config": project})
+        _memo[cache_file] = {"version": CACHE_VERSION, "keys": keys, "config": project}
+        return project
+
+    if keys["platformio"][0] is None:
+        raise ConfigError(f"{platformio_path} not found")
+    try:
+        platformio = _read_ini(platformio_path)
+        platformio_sections = {section: _section_dict(platformio, section) for section in platformio.sections()}
+    except configparser.Error as e:
+        raise ConfigError(str(e))
+
+    # A broken credentials.ini is reported when a sensor's settings are
+    # needed, so it doesn't stop builds that don't use them (nvs mode)
+    credential_sections, credentials_error = {}, None
+    if keys["credentials"][0] is not None:
+        try:
+            # credentials.ini has always been read with %-interpolation (a literal % is %%)
+            credentials = _read_ini(credentials_path, configparser.BasicInterpolation())
+            credential_sections = {section: _section_dict(credentials, section)
+                                   for section in credentials.sections()}
+        except configparser.Error as e:
+            credentials_error = str(e)
+
+    project = ProjectConfig(platformio_sections, credential_sections, keys["credentials"][0] is not None,
+                            credentials_error)
+    entry = {"version": CACHE_VERSION, "keys": keys, "config": project}
+    if cache_file:
+        _save_cache(cache_file, entry)
+    _memo[cache_file] = entry
+    return project
+
+
+def _save_cache(cache_file, entry):
+    """Write the cache atomically; a failure only costs a parse next time."""
+    directory = os.path.dirname(cache_file) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config_cache-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except OSError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the parsed platformio.ini and credentials.ini")
+    parser.add_argument("section", nargs="?", help="show one sensor's settings")
+    parser.add_argument("--no-cache", action="store_true", help="parse the files without the pickle cache")
+    args = parser.parse_args()
+
+    try:
+        project = load_project_config(cache_path=None if args.no_cache else DEFAULT_CACHE)
+        if args.section:
+            settings = project.sensor(args.section)
+            for field, value in settings._asdict().items():
+                print(f"{field:<18} {'redacted' if field in SECRET_OPTIONS else value}")
+            return
+    except ConfigError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    for name in project.sensor_envs():
+        print(f"env:{name:<20} {project.config_mode(name):<7} extends {' -> '.join(project.envs[name].chain[1:])}")
+    print(f"[INFO] {len(project.sensors)} valid sensor sections in {CREDENTIALS_FILE}")
+    for section, problems in project.problems.items():
+        print(f"[WARN] [{section}]: {'; '.join(problems)}")
+
+
+if __name__ == "__main__":
+    main()
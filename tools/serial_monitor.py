@@ -0,0 +1,488 @@
+"""
+serial_monitor.py
+
+Serial log monitor for one or more sensors, replacing the miniterm loop in
+monitor.sh. ESP-IDF log lines
+
+    I (319249) SEND_DATA_TASK: Data send interval reached. Connecting to WiFi...
+
+are parsed into records with the host time, device, level, tick (ms since
+boot), TAG and message. Lines that aren't log lines (the ROM bootloader,
+panic backtraces) are kept with no level or tag.
+
+All ports are read by one thread: each is opened non-blocking and waited on
+with selectors, so a few boards at 115200 baud need no process per board. A
+board that is unplugged or resets its USB serial port is reopened every
+--reconnect seconds, and with no ports given every /dev/ttyACM* and
+/dev/ttyUSB* is captured, including boards plugged in later.
+
+With --output, records are appended to <dir>/<device>.jsonl, which is
+renamed and gzipped once it reaches --rotate-mb; the newest --keep
+compressed files per device are kept. --replay reads a capture instead of a
+port: a raw log (as saved from miniterm or pio device monitor) or a JSONL
+capture, either optionally gzipped, so parsing and filters can be tried
+without hardware.
+
+    python -m tools.serial_monitor                                # every board found
+    python -m tools.serial_monitor /dev/ttyACM0=sensor_1 /dev/ttyACM1=sensor_2 --output .pio/logs
+    python -m tools.serial_monitor --tag SENSOR_TASK --tag API_CLIENT --level W
+    python -m tools.serial_monitor --replay .pio/logs/sensor_1.jsonl --tag HTTP_CLIENT
+
+Live capture needs pyserial (pip install pyserial); --replay does not.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import glob
+import gzip
+import json
+import os
+import re
+import selectors
+import shutil
+import sys
+import threading
+import time
+
+DEFAULT_BAUD = 115200
+DEFAULT_PORT_PATTERNS = ("/dev/ttyACM*", "/dev/ttyUSB*")
+DEFAULT_ROTATE_MB = 10
+DEFAULT_KEEP = 20
+RECONNECT_SECONDS = 1.0
+READ_SIZE = 4096
+# A line longer than this without a newline is emitted as is
+MAX_LINE_BYTES = 4096
+
+# ESP-IDF log levels, most severe first
+LEVELS = "EWIDV"
+LEVEL_NAMES = {"E": "ERROR", "W": "WARN", "I": "INFO", "D": "DEBUG", "V": "VERBOSE"}
+LEVEL_COLORS = {"E": "\x1b[0;31m", "W": "\x1b[0;33m", "I": "\x1b[0;32m"}
+
+# "I (1234) TAG: message". The timestamp is a tick count, or a wall clock
+# time with CONFIG_LOG_TIMESTAMP_SOURCE_SYSTEM. The WiFi driver's own lines
+# ("I (1234) wifi:state: run -> init") have no space after the colon.
+LOG_LINE_RE = re.compile(r"^([EWIDV]) \(([^)]*)\) ([^:]+?):\s?(.*)$")
+# Colour codes, also when a copy-paste has dropped the escape character
+ANSI_RE = re.compile(r"\x1b?\[[0-9;]*m")
+
+LogRecord = collections.namedtuple("LogRecord", ["time", "device", "level", "tick", "tag", "message"])
+
+
+def parse_line(line, device=None, host_time=None):
+    """
+    Parse one line of serial output.
+
+    Args:
+        line (str): The line, without its newline (colour codes are removed)
+        device (str): Device name to record
+        host_time (float): Unix time the line was received
+
+    Returns:
+        LogRecord: The record; level, tick and tag are None for non-log lines
+    """
+    line = ANSI_RE.sub("", line).rstrip("\r\n")
+    match = LOG_LINE_RE.match(line)
+    if not match:
+        return LogRecord(host_time, device, None, None, None, line)
+    level, stamp, tag, message = match.groups()
+    tick = int(stamp) if stamp.isdigit() else None
+    return LogRecord(host_time, device, level, tick, tag, message)
+
+
+def record_from_json(text):
+    """Turn one line of a JSONL capture back into a LogRecord."""
+    data = json.loads(text)
+    return LogRecord._make(map(data.get, LogRecord._fields))
+
+
+def format_record(record, show_device=False, color=False):
+    """Format a record for the terminal, in the firmware's own log format."""
+    if record.level is None:
+        text = record.message
+    else:
+        stamp = record.tick if record.tick is not None else "?"
+        text = f"{record.level} ({stamp}) {record.tag}: {record.message}"
+        if color and record.level in LEVEL_COLORS:
+            text = f"{LEVEL_COLORS[record.level]}{text}\x1b[0m"
+    if show_device:
+        text = f"[{record.device}] {text}"
+    return text
+
+
+class RecordFilter:
+    """
+    Keeps records at or above a level and, optionally, from some TAGs only.
+    Non-log lines are kept unless a tag is asked for.
+    """
+
+    def __init__(self, tags=None, level=None):
+        self.tags = set(tags) if tags else None
+        self.levels = set(LEVELS[:LEVELS.index(level) + 1]) if level else None
+
+    def __call__(self, record):
+        if self.tags is not None and record.tag not in self.tags:
+            return False
+        if self.levels is not None and record.level is not None and record.level not in self.levels:
+            return False
+        return True
+
+
+class LineSplitter:
+    """Reassembles lines from the chunks a serial read returns."""
+
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, data):
+        """
+        Add bytes read from the port.
+
+        Returns:
+            list: Complete lines, decoded
+        """
+        lines = (self.pending + data).split(b"\n")
+        self.pending = lines.pop()
+        if len(self.pending) > MAX_LINE_BYTES:
+            lines.append(self.pending)
+            self.pending = b""
+        return [line.decode("utf-8", "replace").rstrip("\r") for line in lines]
+
+    def flush(self):
+        """Return whatever is left as a final line, if anything."""
+        lines = [self.pending.decode("utf-8", "replace").rstrip("\r")] if self.pending else []
+        self.pending = b""
+        return lines
+
+
+class RotatingJsonlWriter:
+    """
+    Appends records to <directory>/<device>.jsonl. When the file reaches
+    max_bytes it is renamed with a timestamp and gzipped on a background
+    thread, so compressing never holds up reading the ports.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_ROTATE_MB * 1024 * 1024, keep=DEFAULT_KEEP):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.files = {}
+        self.sizes = {}
+        self.compressors = []
+
+    def _safe_name(self, device):
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", device.lstrip("/")) or "device"
+
+    def path(self, device):
+        return os.path.join(self.directory, f"{self._safe_name(device)}.jsonl")
+
+    def write(self, record):
+        f = self.files.get(record.device)
+        if f is None:
+            path = self.path(record.device)
+            f = self.files[record.device] = open(path, "ab")
+            self.sizes[record.device] = f.tell()
+        line = (json.dumps(record._asdict(), separators=(",", ":")) + "\n").encode("utf-8")
+        f.write(line)
+        self.sizes[record.device] += len(line)
+        if self.sizes[record.device] >= self.max_bytes:
+            self.rotate(record.device)
+
+    def rotate(self, device):
+        """Close a device's file and compress it under a timestamped name."""
+        f = self.files.pop(device, None)
+        if f is None:
+            return
+        f.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rotated = os.path.join(self.directory, f"{self._safe_name(device)}-{stamp}.jsonl")
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = os.path.join(self.directory, f"{self._safe_name(device)}-{stamp}-{suffix}.jsonl")
+            suffix += 1
+        os.replace(self.path(device), rotated)
+        thread = threading.Thread(target=self._compress, args=(rotated, device), daemon=True)
+        thread.start()
+        self.compressors = [t for t in self.compressors if t.is_alive()] + [thread]
+
+    def _compress(self, path, device):
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(path)
+        pattern = os.path.join(self.directory, f"{glob.escape(self._safe_name(device))}-[0-9]*.jsonl.gz")
+        rotated = sorted(glob.glob(pattern), key=os.path.getmtime)
+        for old in rotated[:max(0, len(rotated) - self.keep)]:
+            os.remove(old)
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        for thread in self.compressors:
+            thread.join()
+
+
+def _import_serial():
+    try:
+        import serial
+    except ImportError:
+        raise RuntimeError("Live capture needs pyserial (pip install pyserial); --replay works without it")
+    return serial
+
+
+class SerialDevice:
+    """One port, its name and its partial line."""
+
+    def __init__(self, port, name=None):
+        self.port = port
+        self.name = name or os.path.basename(port)
+        self.serial = None
+        self.splitter = LineSplitter()
+        self.next_attempt = 0.0
+        self.connected_once = False
+        # Whether a failure to open has been reported since the last success
+        self.warned = False
+
+
+class SerialMonitor:
+    """
+    Reads every port from one thread with selectors. Ports that fail to open
+    or disappear are retried every `reconnect` seconds.
+
+    Args:
+        devices (list): SerialDevice for each port given on the command line
+        sink (callable): Called with each LogRecord
+        baud (int): Baud rate
+        reconnect (float): Seconds between attempts to reopen a port
+        scan (bool): Also pick up ports matching DEFAULT_PORT_PATTERNS
+    """
+
+    def __init__(self, devices, sink, baud=DEFAULT_BAUD, reconnect=RECONNECT_SECONDS, scan=False):
+        self.serial = _import_serial()
+        self.devices = {device.port: device for device in devices}
+        self.sink = sink
+        self.baud = baud
+        self.reconnect = reconnect
+        self.scan = scan
+        self.selector = selectors.DefaultSelector()
+        self.stats = collections.Counter()
+
+    def _log(self, device, message):
+        self.sink(LogRecord(time.time(), device.name, None, None, None, f"[monitor] {message}"))
+
+    def _scan(self):
+        for pattern in DEFAULT_PORT_PATTERNS:
+            for port in sorted(glob.glob(pattern)):
+                if port not in self.devices:
+                    self.devices[port] = SerialDevice(port)
+
+    def _open(self, device):
+        try:
+            # timeout=0: read() returns whatever is buffered and never blocks
+            device.serial = self.serial.Serial(device.port, self.baud, timeout=0)
+        except (self.serial.SerialException, OSError) as e:
+            device.serial = None
+            device.next_attempt = time.monotonic() + self.reconnect
+            if not device.warned and not self.scan:
+                self._log(device, f"cannot open {device.port} ({e}); retrying every {self.reconnect:g} s")
+            device.warned = True
+            return
+        self.selector.register(device.serial.fileno(), selectors.EVENT_READ, device)
+        if device.connected_once:
+            self.stats["reconnects"] += 1
+            self._log(device, f"reconnected to {device.port}")
+        else:
+            self._log(device, f"connected to {device.port}")
+        device.connected_once = True
+        device.warned = False
+
+    def _close(self, device, reason):
+        try:
+            self.selector.unregister(device.serial.fileno())
+        except (KeyError, ValueError, OSError):
+            pass
+        try:
+            device.serial.close()
+        except (self.serial.SerialException, OSError):
+            pass
+        device.serial = None
+        device.next_attempt = time.monotonic() + self.reconnect
+        self._emit(device, device.splitter.flush())
+        self._log(device, f"lost {device.port} ({reason}); retrying every {self.reconnect:g} s")
+
+    def _emit(self, device, lines):
+        now = time.time()
+        for line in lines:
+            self.stats["lines"] += 1
+            self.sink(parse_line(line, device.name, now))
+
+    def _read(self, device):
+        try:
+            data = device.serial.read(READ_SIZE)
+        except (self.serial.SerialException, OSError) as e:
+            self._close(device, e)
+            return
+        if not data:
+            # Readable but empty: the port has gone away (pyserial raises for this on most platforms)
+            self._close(device, "no data")
+            return
+        self.stats["bytes"] += len(data)
+        self._emit(device, device.splitter.feed(data))
+
+    def _connect_pending(self):
+        if self.scan:
+            self._scan()
+        now = time.monotonic()
+        for device in self.devices.values():
+            if device.serial is None and now >= device.next_attempt:
+                self._open(device)
+
+    def run(self, duration=None):
+        """
+        Capture until interrupted, or for `duration` seconds.
+        """
+        end = time.monotonic() + duration if duration else None
+        next_connect = 0.0
+        try:
+            while end is None or time.monotonic() < end:
+                if time.monotonic() >= next_connect:
+                    self._connect_pending()
+                    next_connect = time.monotonic() + self.reconnect
+                timeout = max(0.0, next_connect - time.monotonic())
+                if end is not None:
+                    timeout = min(timeout, max(0.0, end - time.monotonic()))
+                if not self.selector.get_map():
+                    time.sleep(timeout)
+                    continue
+                for key, _events in self.selector.select(timeout):
+                    self._read(key.data)
+        finally:
+            for device in self.devices.values():
+                if device.serial is not None:
+                    self._emit(device, device.splitter.flush())
+                    try:
+                        device.serial.close()
+                    except (self.serial.SerialException, OSError):
+                        pass
+            self.selector.close()
+
+
+def _open_capture(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def replay(path, device=None):
+    """
+    Yield the records in a capture file: a JSONL capture written by
+    --output, or a raw serial log. Either may be gzipped.
+
+    Args:
+        path (str): Capture file
+        device (str): Device name for a raw log (default: the file name)
+
+    Yields:
+        LogRecord: Each record in order
+    """
+    name = device or os.path.basename(path).split(".")[0]
+    with _open_capture(path) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.startswith("{"):
+                try:
+                    record = record_from_json(line)
+                except (ValueError, TypeError):
+                    pass
+                else:
+                    yield record if record.device else record._replace(device=name)
+                    continue
+            yield parse_line(line, name)
+
+
+def parse_port(spec):
+    """Split a PORT[=NAME] argument."""
+    port, _sep, name = spec.partition("=")
+    return SerialDevice(port, name or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture and parse ESP-IDF serial logs from one or more sensors")
+    parser.add_argument("ports", nargs="*", metavar="PORT[=NAME]",
+                        help=f"serial ports to read (default: every {' and '.join(DEFAULT_PORT_PATTERNS)})")
+    parser.add_argument("--baud", type=int, default=DEFAULT_BAUD, help=f"baud rate (default: {DEFAULT_BAUD})")
+    parser.add_argument("--output", metavar="DIR", help="append records to DIR/<device>.jsonl")
+    parser.add_argument("--rotate-mb", type=float, default=DEFAULT_ROTATE_MB,
+                        help=f"gzip a device's file once it reaches this size (default: {DEFAULT_ROTATE_MB})")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP,
+                        help=f"compressed files to keep per device (default: {DEFAULT_KEEP})")
+    parser.add_argument("--reconnect", type=float, default=RECONNECT_SECONDS,
+                        help=f"seconds between attempts to reopen a port (default: {RECONNECT_SECONDS:g})")
+    parser.add_argument("--replay", metavar="FILE", help="read a raw or JSONL capture instead of serial ports")
+    parser.add_argument("--device", help="device name for the records of a raw --replay file")
+    parser.add_argument("--tag", action="append", help="only show/save this TAG (repeatable)")
+    parser.add_argument("--level", choices=list(LEVELS), help="only show/save this level and more severe")
+    parser.add_argument("--json", action="store_true", help="print records as JSON lines")
+    parser.add_argument("--quiet", action="store_true", help="don't print records, only save them")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    keep = RecordFilter(args.tag, args.level)
+    writer = RotatingJsonlWriter(args.output, int(args.rotate_mb * 1024 * 1024), args.keep) if args.output else None
+    show_device = args.replay is None and len(args.ports) != 1
+    color = sys.stdout.isatty()
+    counts = collections.Counter()
+
+    def sink(record):
+        if not keep(record):
+            return
+        counts[record.level or "-"] += 1
+        if writer:
+            writer.write(record)
+        if args.quiet:
+            return
+        if args.json:
+            print(json.dumps(record._asdict()), flush=args.replay is None)
+        else:
+            print(format_record(record, show_device, color), flush=args.replay is None)
+
+    start = time.monotonic()
+    try:
+        if args.replay:
+            for record in replay(args.replay, args.device):
+                sink(record)
+        else:
+            try:
+                monitor = SerialMonitor([parse_port(spec) for spec in args.ports], sink, args.baud,
+                                        args.reconnect, scan=not args.ports)
+            except RuntimeError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+            if not args.ports:
+                print(f"[INFO] Waiting for boards on {', '.join(DEFAULT_PORT_PATTERNS)}", file=sys.stderr)
+            monitor.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Piped into head or less, which has exited
+        sys.stderr.close()
+        return
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.monotonic() - start
+    summary = ", ".join(f"{counts[level]} {LEVEL_NAMES[level]}" for level in LEVELS if counts[level])
+    other = counts["-"]
+    print(f"[INFO] {sum(counts.values())} records in {elapsed:.1f} s ({summary or 'no log lines'}"
+          f"{f', {other} other lines' if other else ''})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+size_store.py
+
+A local SQLite history of every environment's builds, keyed by the git SHA
+that get_git_info.py compiles into the firmware: image size, flash, IRAM and
+DRAM totals, output section sizes and build duration.
+
+build.py uses it as a size gate. After each build the new sizes are compared
+with the environment's baseline - the build pinned with `baseline`, or else
+the most recent passing build of a different commit - and the build fails
+when the image or static RAM (DRAM plus IRAM, which share the ESP32-C3's
+SRAM) grew by more than the limit. The limits default to DEFAULT_IMAGE_GROWTH
+and DEFAULT_RAM_GROWTH and can be set per environment in platformio.ini:
+
+    custom_max_image_growth = 8192
+    custom_max_ram_growth = 512
+
+Builds that take much longer than the environment's recent builds of the
+same kind (clean or incremental) are reported too, without failing.
+
+    python -m tools.size_store                       # latest build of each env against its baseline
+    python -m tools.size_store history sensor_temp
+    python -m tools.size_store baseline sensor_temp [SHA]    # pin a baseline (default: latest build)
+    python -m tools.size_store unpin sensor_temp
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+DEFAULT_STORE = os.path.join(".pio", "size_history.sqlite")
+
+DEFAULT_IMAGE_GROWTH = 4096
+DEFAULT_RAM_GROWTH = 1024
+# Report builds this fraction slower than the median of the last few like them
+BUILD_TIME_GROWTH = 0.5
+BUILD_TIME_SAMPLES = 10
+
+BUILD_FIELDS = ["id", "env", "commit_sha", "commit_time", "built_at", "clean", "passed", "image_bytes",
+                "flash_bytes", "iram_bytes", "dram_bytes", "rtc_bytes", "build_seconds", "compile_seconds",
+                "link_seconds"]
+BuildRecord = collections.namedtuple("BuildRecord", BUILD_FIELDS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    env TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    commit_time TEXT,
+    built_at REAL NOT NULL,
+    clean INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    image_bytes INTEGER,
+    flash_bytes INTEGER,
+    iram_bytes INTEGER,
+    dram_bytes INTEGER,
+    rtc_bytes INTEGER,
+    build_seconds REAL,
+    compile_seconds REAL,
+    link_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS builds_env_time ON builds (env, built_at);
+CREATE INDEX IF NOT EXISTS builds_env_commit ON builds (env, commit_sha, built_at);
+CREATE TABLE IF NOT EXISTS sections (
+    build_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (build_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS baselines (
+    env TEXT PRIMARY KEY,
+    build_id INTEGER NOT NULL
+);
+"""
+
+
+def static_ram(record):
+    """DRAM plus IRAM, or None if the build had no map."""
+    if record.dram_bytes is None or record.iram_bytes is None:
+        return None
+    return record.dram_bytes + record.iram_bytes
+
+
+def growth_limits(options):
+    """
+    Read an environment's size limits from its platformio.ini options.
+
+    Args:
+        options (dict): The environment's resolved options
+
+    Returns:
+        tuple: (image bytes, static RAM bytes)
+    """
+    return (int(options.get("custom_max_image_growth", DEFAULT_IMAGE_GROWTH)),
+            int(options.get("custom_max_ram_growth", DEFAULT_RAM_GROWTH)))
+
+
+def check_growth(current, baseline, image_limit, ram_limit):
+    """
+    Compare a build's sizes with its baseline.
+
+    Returns:
+        list: A message for each size that grew past its limit
+    """
+    failures = []
+    if current.image_bytes is not None and baseline.image_bytes is not None:
+        growth = current.image_bytes - baseline.image_bytes
+        if growth > image_limit:
+            failures.append(f"image grew by {growth:,} bytes to {current.image_bytes:,} since "
+                            f"{baseline.commit_sha} (limit {image_limit:,})")
+    current_ram, baseline_ram = static_ram(current), static_ram(baseline)
+    if current_ram is not None and baseline_ram is not None:
+        growth = current_ram - baseline_ram
+        if growth > ram_limit:
+            failures.append(f"static RAM (DRAM + IRAM) grew by {growth:,} bytes to {current_ram:,} since "
+                            f"{baseline.commit_sha} (limit {ram_limit:,})")
+    return failures
+
+
+def check_build_time(seconds, recent):
+    """
+    Compare a build's duration with the median of recent builds like it.
+
+    Returns:
+        str: A message if the build was unusually slow, else None
+    """
+    if seconds is None or len(recent) < 3:
+        return None
+    median = statistics.median(recent)
+    if median > 0 and seconds > median * (1 + BUILD_TIME_GROWTH):
+        return (f"build took {seconds:.1f}s, {seconds / median:.1f}x the median of the last {len(recent)} "
+                f"({median:.1f}s)")
+    return None
+
+
+class SizeStore:
+    """
+    The build history database.
+
+    Args:
+        path (str): SQLite file (created with its directory if missing)
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        # Parallel fleet builds each open their own connection and wait for the write lock
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _records(self, query, params):
+        return [BuildRecord(*row) for row in self.db.execute(query, params)]
+
+    def _one(self, query, params):
+        records = self._records(query, params)
+        return records[0] if records else None
+
+    def record(self, env, commit, commit_time, summary, phases, clean, passed, image_bytes=None):
+        """
+        Store one build.
+
+        Args:
+            env (str): Environment name
+            commit (str): Git SHA from get_git_info.py
+            commit_time (str): Commit timestamp from get_git_info.py
+            summary (dict): map_analyzer.summarize() output, or None without a map
+            phases (dict): Phase -> seconds from the build report
+            clean (bool): Whether it was a clean build
+            passed (bool): Whether it passed the size gate
+            image_bytes (int): Image size when there is no map summary
+
+        Returns:
+            BuildRecord: The stored build
+        """
+        totals = summary["totals"] if summary else {}
+        values = {
+            "env": env,
+            "commit_sha": commit,
+            "commit_time": commit_time,
+            "built_at": time.time(),
+            "clean": int(bool(clean)),
+            "passed": int(bool(passed)),
+            "image_bytes": summary["image_bytes"] if summary else image_bytes,
+            "flash_bytes": totals.get("flash"),
+            "iram_bytes": totals.get("iram"),
+            "dram_bytes": totals.get("dram"),
+            "rtc_bytes": totals.get("rtc"),
+            "build_seconds": sum(seconds for phase, seconds in phases.items() if phase in ("compile", "link"))
+            if phases else None,
+            "compile_seconds": phases.get("compile"),
+            "link_seconds": phases.get("link"),
+        }
+        with self.db:
+            cursor = self.db.execute(
+                f"INSERT INTO builds ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+                list(values.values()))
+            build_id = cursor.lastrowid
+            if summary:
+                self.db.executemany("INSERT INTO sections VALUES (?, ?, ?)",
+                                    [(build_id, name, size) for name, size in summary["sections"].items()])
+        return BuildRecord(id=build_id, **values)
+
+    def set_passed(self, build_id, passed):
+        with self.db:
+            self.db.execute("UPDATE builds SET passed = ? WHERE id = ?", (int(bool(passed)), build_id))
+
+    def baseline(self, env, commit):
+        """
+        Return the build an environment's sizes are compared with: the pinned
+        baseline, or the latest passing build of another commit.
+        """
+        pinned = self._one(f"SELECT {', '.join(f'b.{f}' for f in BUILD_FIELDS)} FROM baselines p "
+                           "JOIN builds b ON b.id = p.build_id WHERE p.env = ?", (env,))
+        if pinned is not None:
+            return pinned
+        return self._one(f"SELECT {', '.join(BUILD_FIELDS)} FROM builds WHERE env = ? AND commit_sha != ? "
+                         "AND passed = 1 ORDER BY built_at DESC LIMIT 1", (env, commit))
+
+    def pin_baseline(self, env, commit=None):
+        """
+        Pin an environment's baseline to its latest build (of a commit, if given).
+
+        Returns:
+            BuildRecord: The pinned build, or None if there is no such build
+        """
+        if commit:
+            build = self._one(f"SELECT {', '.join(BUILD_FIELDS)} FROM builds WHERE env = ? AND commit_sha LIKE ? "
+                              "ORDER BY built_at DESC LIMIT 1", (env, f"{commit[:7]}%"))
+        else:
+            build = self.latest(env)
+        if build is not None:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?)", (env, build.id))
+        return build
+
+    def unpin_baseline(self, env):
+        with self.db:
+            self.db.execute("DELETE FROM baselines WHERE env = ?", (env,))
+
+    def latest(self, env):
+        return self._one(f"SELECT {', '.join(BUILD_FIELDS)} FROM builds WHERE env = ? "
+                         "ORDER BY built_at DESC LIMIT 1", (env,))
+
+    def history(self, env, limit=50):
+        """Return an environment's most recent builds, newest first."""
+        return self._records(f"SELECT {', '.join(BUILD_FIELDS)} FROM builds WHERE env = ? "
+                             "ORDER BY built_at DESC LIMIT ?", (env, limit))
+
+    def recent_build_seconds(self, env, clean, before_id, limit=BUILD_TIME_SAMPLES):
+        """Return the durations of an environment's last builds of the same kind."""
+        rows = self.db.execute("SELECT build_seconds FROM builds WHERE env = ? AND clean = ? AND id < ? "
+                               "AND build_seconds IS NOT NULL ORDER BY built_at DESC LIMIT ?",
+                               (env, int(bool(clean)), before_id, limit))
+        return [row[0] for row in rows]
+
+    def sections(self, build_id):
+        return dict(self.db.execute("SELECT name, size FROM sections WHERE build_id = ?", (build_id,)))
+
+    def envs(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT env FROM builds ORDER BY env")]
+
+    def gate(self, env, commit, commit_time, summary, phases, clean, limits, image_bytes=None, enforce=True):
+        """
+        Record a build and check it against the environment's baseline.
+
+        Args:
+            limits (tuple): (image bytes, static RAM bytes) from growth_limits()
+            enforce (bool): Compare with the baseline; without it the build is
+                            only recorded, as passing, and becomes the next baseline
+            See record() for the others
+
+        Returns:
+            tuple: (failures, warnings) as lists of messages
+        """
+        current = self.record(env, commit, commit_time, summary, phases, clean, True, image_bytes)
+        baseline = self.baseline(env, commit) if enforce else None
+        failures = check_growth(current, baseline, *limits) if baseline else []
+        if failures:
+            self.set_passed(current.id, False)
+        warnings = []
+        slow = check_build_time(current.build_seconds,
+                                self.recent_build_seconds(env, clean, current.id))
+        if slow:
+            warnings.append(slow)
+        return failures, warnings
+
+
+def _format_bytes(value):
+    return f"{value:,}" if value is not None else "-"
+
+
+def _format_change(current, baseline):
+    if current is None or baseline is None:
+        return "-"
+    return f"{current - baseline:+,}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or manage the build size history")
+    parser.add_argument("command", nargs="?", choices=["status", "history", "baseline", "unpin"], default="status")
+    parser.add_argument("env", nargs="?")
+    parser.add_argument("commit", nargs="?", help="commit to pin as the baseline (default: latest build)")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--limit", type=int, default=20, help="builds to show in history")
+    args = parser.parse_args()
+
+    if args.command != "status" and not args.env:
+        parser.error(f"{args.command} needs an environment")
+    if not os.path.exists(args.store):
+        print(f"[ERROR] No build history at {args.store}")
+        sys.exit(1)
+
+    store = SizeStore(args.store)
+    try:
+        if args.command == "baseline":
+            build = store.pin_baseline(args.env, args.commit)
+            if build is None:
+                print(f"[ERROR] No build of {args.env}{f' at {args.commit}' if args.commit else ''}")
+                sys.exit(1)
+            print(f"[INFO] {args.env} baseline pinned to {build.commit_sha} "
+                  f"({_format_bytes(build.image_bytes)} byte image)")
+        elif args.command == "unpin":
+            store.unpin_baseline(args.env)
+            print(f"[INFO] {args.env} compares with its previous commit again")
+        elif args.command == "history":
+            print(f"{'Built':<20}  {'Commit':<8}  {'Clean':<5}  {'Gate':<4}  {'Image':>10}  {'DRAM':>8}  "
+                  f"{'IRAM':>8}  {'Build':>7}")
+            for build in store.history(args.env, args.limit):
+                built = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(build.built_at))
+                seconds = f"{build.build_seconds:.1f}s" if build.build_seconds is not None else "-"
+                print(f"{built:<20}  {build.commit_sha:<8}  {'yes' if build.clean else 'no':<5}  "
+                      f"{'ok' if build.passed else 'FAIL':<4}  {_format_bytes(build.image_bytes):>10}  "
+                      f"{_format_bytes(build.dram_bytes):>8}  {_format_bytes(build.iram_bytes):>8}  {seconds:>7}")
+        else:
+            envs = [args.env] if args.env else store.envs()
+            width = max([len("Environment")] + [len(env) for env in envs])
+            print(f"{'Environment':<{width}}  {'Commit':<8}  {'Image':>10}  {'Change':>8}  {'Static RAM':>10}  "
+                  f"{'Change':>8}  Baseline")
+            for env in envs:
+                build = store.latest(env)
+                if build is None:
+                    continue
+                baseline = store.baseline(env, build.commit_sha)
+                print(f"{env:<{width}}  {build.commit_sha:<8}  {_format_bytes(build.image_bytes):>10}  "
+                      f"{_format_change(build.image_bytes, baseline.image_bytes if baseline else None):>8}  "
+                      f"{_format_bytes(static_ram(build)):>10}  "
+                      f"{_format_change(static_ram(build), static_ram(baseline) if baseline else None):>8}  "
+                      f"{baseline.commit_sha if baseline else '-'}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
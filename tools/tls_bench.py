@@ -0,0 +1,379 @@
+"""
+tls_bench.py
+
+Measures what reusing one HTTPS connection per send cycle saves, against a
+local HTTPS stand-in for the ingest API (tools/mock_server.py).
+
+Clients replay the requests of a catch-up send cycle - a battery status,
+the stored readings and the buffered readings, in chunks of
+MAX_READINGS_PER_CHUNK - the way http_client.c sends them:
+
+- per-request: JSON, with a new connection and full TLS handshake for every
+  request and the old 1 s pause between chunks
+- session-json: the default firmware. The status and the streamed JSON
+  chunks share one keep-alive connection for the whole cycle
+  (http_session_begin); http_stream_finish() reads each response to the end
+  so the next request goes out on the same connection. The TLS session is
+  saved so the next cycle's connection resumes it
+- session-binary: the same with binary batches (API_BINARY_BATCHES)
+
+The server counts connections and full vs resumed handshakes; an optional
+--rtt runs the traffic through a proxy that adds network latency, since
+handshake round trips are what cost radio time on the sensor.
+
+    python -m tools.tls_bench
+    python -m tools.tls_bench --cycles 5 --stored 960 --rtt 80
+
+A throwaway self-signed certificate is generated with the openssl command
+unless --tls-cert and --tls-key are given.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from tools.batch_codec import CONTENT_TYPE as BATCH_CONTENT_TYPE, encode_batch
+from tools.fleet_sim import read_firmware_constants
+from tools.mock_server import IngestServer, SqliteStore
+
+LEGACY_CHUNK_DELAY_S = 1.0
+BUFFERED_READINGS = 20
+TOKEN = "tls_bench"
+
+
+def make_certificate(directory):
+    """
+    Create a self-signed certificate for localhost with the openssl command.
+
+    Returns:
+        tuple: (cert_path, key_path)
+    """
+    if shutil.which("openssl") is None:
+        raise RuntimeError("openssl not found; pass --tls-cert and --tls-key")
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    result = subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+         "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"openssl failed: {result.stderr.strip()}")
+    return cert, key
+
+
+class LatencyProxy:
+    """TCP proxy that delays every chunk of data by half the round-trip time in each direction."""
+
+    def __init__(self, target_port, rtt):
+        self.target_port = target_port
+        self.delay = rtt / 2
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _pipe(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                deadline, data = await queue.get()
+                if data is None:
+                    break
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.create_task(deliver())
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                queue.put_nowait((loop.time() + self.delay, data))
+        except ConnectionError:
+            pass
+        queue.put_nowait((0, None))
+        try:
+            await sender
+        except ConnectionError:
+            pass
+
+    async def _handle(self, reader, writer):
+        try:
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        except OSError:
+            writer.close()
+            return
+        await asyncio.gather(self._pipe(reader, up_writer), self._pipe(up_reader, writer))
+
+
+class StandIn:
+    """Runs the HTTPS mock server (and optional latency proxy) on a background event loop."""
+
+    def __init__(self, cert, key, rtt):
+        self.cert = cert
+        self.key = key
+        self.rtt = rtt
+        self.server = None
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._proxy = None
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def start(self):
+        self._thread.start()
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(self.cert, self.key)
+
+        async def start_all():
+            self.server = IngestServer(SqliteStore(":memory:"), flush_interval=0.01)
+            port = await self.server.start("127.0.0.1", 0, context)
+            if self.rtt > 0:
+                self._proxy = LatencyProxy(port, self.rtt)
+                port = await self._proxy.start()
+            return port
+
+        self.port = self._run(start_all())
+
+    def handshakes(self):
+        stats = self.server.stats
+        return stats.connections, stats.tls_full_handshakes, stats.tls_resumed_handshakes
+
+    def stop(self):
+        async def stop_all():
+            if self._proxy:
+                await self._proxy.stop()
+            await self.server.stop()
+
+        self._run(stop_all())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class FirmwareClient:
+    """
+    Blocking HTTPS client that sends like http_client.c.
+
+    Args:
+        port (int): Stand-in port
+        context (SSLContext): Client context trusting the stand-in certificate
+        persistent (bool): Keep the connection between requests and resume the TLS session
+    """
+
+    def __init__(self, port, context, persistent):
+        self.port = port
+        self.context = context
+        self.persistent = persistent
+        self._sock = None
+        self._session = None
+
+    def _connect(self):
+        raw = socket.create_connection(("127.0.0.1", self.port))
+        raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self.context.wrap_socket(raw, server_hostname="localhost",
+                                        session=self._session if self.persistent else None)
+
+    def post(self, body, content_type):
+        """
+        Send one request.
+
+        Args:
+            body (bytes): Request body
+            content_type (str): Content-Type header
+
+        Returns:
+            int: HTTP status
+        """
+        if self._sock is None:
+            self._sock = self._connect()
+        request = (f"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+                   f"Authorization: Bearer {TOKEN}\r\nContent-Length: {len(body)}\r\n"
+                   f"Connection: {'keep-alive' if self.persistent else 'close'}\r\n\r\n").encode() + body
+        self._sock.sendall(request)
+        status = self._read_response()
+        if self.persistent:
+            self._session = self._sock.session
+        if not self.persistent:
+            self.end_cycle()
+        return status
+
+    def _read_response(self):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed before the response")
+            data += chunk
+        head, rest = data.split(b"\r\n\r\n", 1)
+        lines = head.decode("latin-1").split("\r\n")
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        while len(rest) < length:
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed inside the response body")
+            rest += chunk
+        return int(lines[0].split()[1])
+
+    def end_cycle(self):
+        """http_session_end(): close the connection, keep the saved TLS session."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def json_chunk(readings):
+    """Encode readings as the JSON array json_writer.c streams."""
+    return json.dumps([{
+        "light_intensity": lux,
+        "sensor_id": "bench",
+        "timestamp": datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "sensor_set_id": "bench",
+        "chip_temp_c": chip_temp_c,
+        "chip_temp_f": round(chip_temp_c * 9 / 5 + 32, 2),
+    } for timestamp, lux, chip_temp_c in readings], separators=(",", ":")).encode()
+
+
+def cycle_requests(stored, chunk_size, binary, start=1750000000):
+    """
+    The requests of one catch-up send cycle.
+
+    Args:
+        stored (int): Stored readings sent before the buffered ones
+        chunk_size (int): Readings per request
+        binary (bool): Send readings as binary batches instead of streamed JSON
+
+    Returns:
+        list: (body, content_type) tuples
+    """
+    status = json.dumps([{
+        "sensor_id": "bench", "timestamp": "2025-06-15T15:00:00Z", "sensor_set_id": "bench",
+        "status": "battery", "battery_voltage": 3.9, "battery_percent": 80, "wifi_dbm": -60,
+        "commit_sha": "bench", "commit_timestamp": "1970-01-01 00:00:00 +0000",
+    }], indent="\t").encode()
+    requests = [(status, "application/json")]
+    for batch_size in (stored, BUFFERED_READINGS):
+        readings = [(start + 15 * i, 100.5, 30.25) for i in range(batch_size)]
+        for offset in range(0, len(readings), chunk_size):
+            chunk = readings[offset:offset + chunk_size]
+            if binary:
+                requests.append((encode_batch("bench", "bench", chunk), BATCH_CONTENT_TYPE))
+            else:
+                requests.append((json_chunk(chunk), "application/json"))
+    return requests
+
+
+def run_mode(stand_in, context, persistent, cycles, requests, chunk_delay):
+    """
+    Run send cycles in one mode.
+
+    Returns:
+        list: Per-cycle dicts with requests, connections, handshakes and seconds
+    """
+    client = FirmwareClient(stand_in.port, context, persistent)
+    results = []
+    for _ in range(cycles):
+        before = stand_in.handshakes()
+        start = time.monotonic()
+        for i, (body, content_type) in enumerate(requests):
+            if i > 1 and chunk_delay:
+                time.sleep(chunk_delay)  # Between readings chunks, not after the status message
+            status = client.post(body, content_type)
+            if status != 200:
+                raise RuntimeError(f"Stand-in answered {status}")
+        client.end_cycle()
+        elapsed = time.monotonic() - start
+        time.sleep(0.05)  # Let the server finish counting the last connection
+        after = stand_in.handshakes()
+        results.append({
+            "requests": len(requests),
+            "connections": after[0] - before[0],
+            "full_handshakes": after[1] - before[1],
+            "resumed_handshakes": after[2] - before[2],
+            "seconds": round(elapsed, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request HTTPS connections with the per-cycle session")
+    parser.add_argument("--cycles", type=int, default=3, help="send cycles per mode")
+    parser.add_argument("--stored", type=int, default=960, help="stored readings sent in each cycle")
+    parser.add_argument("--chunk-size", type=int, help="readings per request (default: from api_client.c)")
+    parser.add_argument("--rtt", type=float, default=50, help="added round-trip time in milliseconds")
+    parser.add_argument("--tls-cert", help="server certificate (default: generate one)")
+    parser.add_argument("--tls-key", help="private key for --tls-cert")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    chunk_size = args.chunk_size or read_firmware_constants()["MAX_READINGS_PER_CHUNK"]
+    json_requests = cycle_requests(args.stored, chunk_size, binary=False)
+    binary_requests = cycle_requests(args.stored, chunk_size, binary=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            cert, key = (args.tls_cert, args.tls_key) if args.tls_cert else make_certificate(tmp)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        context = ssl.create_default_context(cafile=cert)
+        stand_in = StandIn(cert, key, args.rtt / 1000)
+        stand_in.start()
+        try:
+            results = {
+                "per-request": run_mode(stand_in, context, False, args.cycles, json_requests,
+                                        LEGACY_CHUNK_DELAY_S),
+                "session-json": run_mode(stand_in, context, True, args.cycles, json_requests, 0),
+                "session-binary": run_mode(stand_in, context, True, args.cycles, binary_requests, 0),
+            }
+        finally:
+            stand_in.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"[INFO] {len(json_requests)} requests per cycle ({args.stored} stored + {BUFFERED_READINGS} buffered "
+          f"readings in chunks of {chunk_size}, plus a status), {args.rtt:g} ms added RTT\n")
+    print(f"{'Mode':<14} {'Cycle':>5} {'Conns':>6} {'Full TLS':>9} {'Resumed':>8} {'Seconds':>8}")
+    for mode, cycles in results.items():
+        for i, r in enumerate(cycles, 1):
+            print(f"{mode:<14} {i:>5} {r['connections']:>6} {r['full_handshakes']:>9} "
+                  f"{r['resumed_handshakes']:>8} {r['seconds']:>8.2f}")
+    print()
+    for mode, cycles in results.items():
+        handshakes = sum(r["full_handshakes"] + r["resumed_handshakes"] for r in cycles) / len(cycles)
+        seconds = sum(r["seconds"] for r in cycles) / len(cycles)
+        print(f"[INFO] {mode}: {handshakes:.1f} handshakes and {seconds:.2f}s per cycle")
+
+
+if __name__ == "__main__":
+    main()
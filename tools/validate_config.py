@@ -0,0 +1,331 @@
+"""
+validate_config.py
+
+Checks every section of credentials.ini in one pass, before any build starts,
+and reports every problem at once instead of stopping at the first one:
+
+- required settings are present and integers are integers
+- GPIOs are usable on the ESP32-C3: 0-21, not the SPI flash pins (12-17),
+  the battery on an ADC1 pin (0-4), and no pin used twice
+- wifi_credentials parses the way main/wifi_manager.c parses it
+  (SSID:Password;SSID2:Password2, at most 5 networks, 31-byte SSIDs and
+  63-byte passwords)
+- local_timezone is a POSIX TZ string (see tools/posix_tz.py)
+- night hours are 0-23 and start after they end, since the firmware treats
+  hour >= start || hour < end as night
+- sensor_ids are unique across sections
+- sensor_id and sensor_set_id leave a reading small enough for the
+  per-reading JSON buffer in api_client.c
+- string settings fit the buffers main/device_config.c reads them into when
+  they are stamped with stamp_config.py (errors for sections that can only
+  be stamped, warnings for sections that also have their own environment)
+- every sensor environment in platformio.ini has a section, and every
+  section has an environment (a warning names the nvs environment that
+  can still run it with stamp_config.py)
+
+    python -m tools.validate_config                # every section
+    python -m tools.validate_config sensor_1 sensor_temp
+    python -m tools.validate_config --strict       # fail on warnings too
+
+build.py runs the same checks on the environments of a fleet build before
+launching it.
+
+Copyright (c) 2025 Caden Howell (cadenhowell@gmail.com)
+Apache 2.0 Licensed as described in the file LICENSE
+"""
+import argparse
+import collections
+import json
+import sys
+import time
+
+from tools.posix_tz import PosixTimezone
+from tools.sensor_config import (CREDENTIALS_FILE, DEFAULT_CACHE, NVS_STRING_LIMITS, SENSOR_OPTIONS, SHARED_SECTION,
+                                 ConfigError, json_reading_problem, load_project_config, nvs_length_problem,
+                                 parse_sensor)
+
+ERROR = "error"
+WARNING = "warning"
+
+# Options read by nothing in the build, but allowed in a section
+EXTRA_OPTIONS = ("board_type",)
+
+# ESP32-C3 pins
+GPIO_COUNT = 22
+FLASH_GPIOS = range(12, 18)
+USB_GPIOS = (18, 19)
+# adc_battery.c reads the battery on ADC1, whose channels are GPIO0-4
+ADC1_GPIOS = range(0, 5)
+
+# Sizes of wifi_network_t in main/wifi_manager.c
+MAX_WIFI_NETWORKS = 5
+MAX_SSID_BYTES = 31
+MAX_PASSWORD_BYTES = 63
+MIN_WPA_PASSWORD = 8
+
+Diagnostic = collections.namedtuple("Diagnostic", ["severity", "section", "message"])
+
+
+def check_gpio(option, value):
+    """
+    Check that a pin can be used for I2C or ADC on the ESP32-C3.
+
+    Returns:
+        list: (severity, message) tuples
+    """
+    if not 0 <= value < GPIO_COUNT:
+        return [(ERROR, f"'{option}' = {value}: the ESP32-C3 has GPIO0-{GPIO_COUNT - 1}")]
+    if value in FLASH_GPIOS:
+        return [(ERROR, f"'{option}' = {value}: GPIO{FLASH_GPIOS[0]}-{FLASH_GPIOS[-1]} are the SPI flash pins")]
+    if value in USB_GPIOS:
+        return [(WARNING, f"'{option}' = {value}: GPIO18/19 are the USB serial/JTAG pins used for flashing "
+                          "and logs")]
+    return []
+
+
+def check_wifi_credentials(value):
+    """
+    Check a wifi_credentials string the way wifi_manager.c splits it: networks
+    on ';', then SSID and password on ':'. Networks it would drop are errors.
+
+    Returns:
+        list: (severity, message) tuples
+    """
+    results = []
+    networks = [network for network in value.split(";") if network]
+    for index, network in enumerate(networks, 1):
+        fields = [field for field in network.split(":") if field]
+        if len(fields) < 2:
+            results.append((ERROR, f"wifi_credentials network {index} is not SSID:Password; "
+                                   "the firmware skips it"))
+            continue
+        ssid, password = fields[0], ":".join(fields[1:])
+        if len(fields) > 2:
+            results.append((ERROR, f"wifi_credentials network {index} ({ssid}): the password contains ':', "
+                                   "which the firmware treats as a separator"))
+        if len(ssid.encode("utf-8")) > MAX_SSID_BYTES:
+            results.append((ERROR, f"wifi_credentials network {index}: SSID longer than {MAX_SSID_BYTES} bytes"))
+        if len(password.encode("utf-8")) > MAX_PASSWORD_BYTES:
+            results.append((ERROR, f"wifi_credentials network {index} ({ssid}): password longer than "
+                                   f"{MAX_PASSWORD_BYTES} bytes"))
+        elif len(password) < MIN_WPA_PASSWORD:
+            results.append((WARNING, f"wifi_credentials network {index} ({ssid}): password shorter than "
+                                     f"{MIN_WPA_PASSWORD} characters, too short for WPA2"))
+    if not networks:
+        results.append((ERROR, "wifi_credentials has no networks"))
+    elif len(networks) > MAX_WIFI_NETWORKS:
+        results.append((WARNING, f"wifi_credentials has {len(networks)} networks; the firmware uses the first "
+                                 f"{MAX_WIFI_NETWORKS}"))
+    return results
+
+
+_timezone_results = {}
+
+
+def check_timezone(value):
+    """
+    Check that local_timezone is a POSIX TZ string. Results are cached,
+    since a fleet usually shares one or two timezones.
+
+    Returns:
+        list: (severity, message) tuples
+    """
+    if value not in _timezone_results:
+        try:
+            PosixTimezone(value)
+            _timezone_results[value] = []
+        except ValueError as e:
+            _timezone_results[value] = [(ERROR, f"local_timezone: {e}")]
+    return _timezone_results[value]
+
+
+def check_night_hours(start, end, has_battery):
+    """
+    Check the night window. The firmware sleeps when hour >= start or
+    hour < end, so a start at or before the end is night all day.
+
+    Returns:
+        list: (severity, message) tuples
+    """
+    results = [(ERROR, f"'{option}' = {value}: must be 0-23")
+               for option, value in (("night_start_hour", start), ("night_end_hour", end))
+               if not 0 <= value <= 23]
+    if not results and start <= end:
+        # Only battery-powered sensors sleep, so elsewhere it's harmless
+        results.append((ERROR if has_battery else WARNING,
+                        f"night_start_hour ({start}) is not after night_end_hour ({end}), so every hour "
+                        "counts as night"))
+    return results
+
+
+def _int_option(values, option, default):
+    try:
+        return int(values.get(option) or default)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_sensor(section, values, url):
+    """
+    Check one sensor section.
+
+    Args:
+        section (str): Section name
+        values (dict): The section's raw options
+        url (str): The shared API URL from [all_sensors]
+
+    Returns:
+        list: (severity, message) tuples
+    """
+    _settings, problems = parse_sensor(section, values, url)
+    results = [(ERROR, problem) for problem in problems]
+
+    known = {option for option, _type, _default in SENSOR_OPTIONS}
+    results += [(WARNING, f"unknown option '{option}'") for option in values
+                if option not in known and option not in EXTRA_OPTIONS]
+
+    defaults = {option: default for option, _type, default in SENSOR_OPTIONS}
+    gpios = {option: _int_option(values, option, defaults[option])
+             for option in ("sda_gpio", "scl_gpio", "battery_adc_gpio")}
+    for option in ("sda_gpio", "scl_gpio"):
+        if gpios[option] is not None:
+            results += check_gpio(option, gpios[option])
+    battery = gpios["battery_adc_gpio"]
+    if battery is not None and battery != -1 and battery not in ADC1_GPIOS:
+        results.append((ERROR, f"'battery_adc_gpio' = {battery}: must be an ADC1 pin "
+                               f"(GPIO{ADC1_GPIOS[0]}-{ADC1_GPIOS[-1]}) or -1 for no battery"))
+    used = collections.defaultdict(list)
+    for option, value in gpios.items():
+        if value is not None and value >= 0:
+            used[value].append(option)
+    results += [(ERROR, f"GPIO{gpio} is used for both {' and '.join(options)}")
+                for gpio, options in sorted(used.items()) if len(options) > 1]
+
+    problem = json_reading_problem(values.get("sensor_id"), values.get("sensor_set_id"))
+    if problem:
+        results.append((ERROR, problem))
+    if values.get("wifi_credentials"):
+        results += check_wifi_credentials(values["wifi_credentials"])
+    results += check_timezone(values.get("local_timezone") or defaults["local_timezone"])
+
+    start = _int_option(values, "night_start_hour", defaults["night_start_hour"])
+    end = _int_option(values, "night_end_hour", defaults["night_end_hour"])
+    if start is not None and end is not None:
+        results += check_night_hours(start, end, battery is not None and battery >= 0)
+    return results
+
+
+def validate_project(project, env_names=None):
+    """
+    Check credentials.ini against itself and against platformio.ini.
+
+    Args:
+        project (ProjectConfig): The parsed configuration
+        env_names (list): Only check these sensor environments and their
+                          sections (default: every env and every section)
+
+    Returns:
+        list: Diagnostics, errors first
+    """
+    diagnostics = []
+
+    def report(section, results):
+        diagnostics.extend(Diagnostic(severity, section, message) for severity, message in results)
+
+    if not project.credentials_found:
+        report(CREDENTIALS_FILE, [(ERROR, "not found")])
+        return diagnostics
+    if project.credentials_error:
+        report(CREDENTIALS_FILE, [(ERROR, project.credentials_error)])
+        return diagnostics
+
+    url = project.url
+    if url is None:
+        report(SHARED_SECTION, [(ERROR, f"missing '[{SHARED_SECTION}]' section or its 'url'")])
+    elif not url.startswith(("http://", "https://")):
+        report(SHARED_SECTION, [(ERROR, f"url '{url}' does not start with http:// or https://")])
+
+    sensor_envs = project.sensor_envs()
+    built_from_credentials = [name for name in sensor_envs if project.config_mode(name) != "nvs"]
+    stamp_envs = [name for name in sensor_envs if project.config_mode(name) == "nvs"]
+    sections = [section for section in project.credential_sections if section != SHARED_SECTION]
+    if env_names is not None:
+        built_from_credentials = [name for name in built_from_credentials if name in env_names]
+        sections = [section for section in sections if section in env_names]
+
+    for name in env_names or []:
+        if name not in project.envs and name not in project.credential_sections:
+            report(name, [(ERROR, f"neither [env:{name}] in platformio.ini nor [{name}] in {CREDENTIALS_FILE}")])
+    for name in built_from_credentials:
+        if name not in project.credential_sections:
+            report(f"env:{name}", [(ERROR, f"no [{name}] section in {CREDENTIALS_FILE}")])
+
+    # Sections that reach a device only through stamp_config.py
+    stamp_only = [section for section in sections
+                  if stamp_envs and (section not in project.envs or project.config_mode(section) == "nvs")]
+    if stamp_envs and url is not None:
+        problem = nvs_length_problem("url", url)
+        if problem:
+            report(SHARED_SECTION, [(ERROR if stamp_only else WARNING, problem)])
+
+    sensor_ids = collections.defaultdict(list)
+    for section in sections:
+        values = project.credential_sections[section]
+        report(section, validate_sensor(section, values, url))
+        if values.get("sensor_id"):
+            sensor_ids[values["sensor_id"]].append(section)
+        if stamp_envs:
+            problems = [nvs_length_problem(option, values.get(option)) for option in NVS_STRING_LIMITS]
+            severity = ERROR if section in stamp_only else WARNING
+            report(section, [(severity, problem) for problem in problems if problem])
+        if section not in project.envs:
+            if stamp_envs:
+                report(section, [(WARNING, f"no [env:{section}] in platformio.ini; only buildable via "
+                                           f"{' or '.join(stamp_envs)} + stamp_config.py")])
+            else:
+                report(section, [(WARNING, f"no [env:{section}] in platformio.ini, so no build uses it")])
+
+    for sensor_id, owners in sensor_ids.items():
+        if len(owners) > 1:
+            for section in owners:
+                others = ", ".join(f"[{other}]" for other in owners if other != section)
+                report(section, [(ERROR, f"sensor_id '{sensor_id}' is also used by {others}")])
+
+    diagnostics.sort(key=lambda d: d.severity != ERROR)
+    return diagnostics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check credentials.ini for every sensor before building")
+    parser.add_argument("sections", nargs="*", help="sections/environments to check (default: all)")
+    parser.add_argument("--strict", action="store_true", help="exit non-zero on warnings too")
+    parser.add_argument("--json", action="store_true", help="print the diagnostics as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="parse the files without the pickle cache")
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    try:
+        project = load_project_config(cache_path=None if args.no_cache else DEFAULT_CACHE)
+    except ConfigError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    diagnostics = validate_project(project, args.sections or None)
+    elapsed_ms = (time.monotonic() - start) * 1000
+
+    errors = sum(1 for d in diagnostics if d.severity == ERROR)
+    warnings = len(diagnostics) - errors
+    if args.json:
+        print(json.dumps([d._asdict() for d in diagnostics], indent=2))
+    else:
+        for d in diagnostics:
+            print(f"[{'ERROR' if d.severity == ERROR else 'WARN'}] [{d.section}] {d.message}")
+        checked = len(args.sections) if args.sections else len(project.credential_sections) - 1
+        print(f"[INFO] Checked {max(checked, 0)} sections: {errors} errors, {warnings} warnings "
+              f"({elapsed_ms:.0f} ms)")
+
+    if errors or (args.strict and warnings):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()